@@ -26,6 +26,89 @@
 # max_tokens, which could satisfy the need of  input size for certain model that limits context window
 # max_tokens = 4500
 
+# rusty compiler in docker mode keeps a pool of long-lived containers and sends checks with `docker exec`.
+# set rusty_pool_size = 0 to start a fresh `docker run --rm` container for every check instead.
+# rusty_pool_size = 2
+# rusty_pool_health_interval = 30   # seconds between health checks of an idle container
+# rusty_pool_check_timeout = 60     # seconds allowed for a single plc --check
+# rusty_pool_acquire_timeout = 300  # seconds to wait for a free container before giving up
+# rusty_pool_workspace = None       # host dir mounted at /workspace, by default a fresh temp dir
+
+# compile results are cached on disk, keyed by the normalized ST source + compiler kind/version/mode.
+# compile_cache_enabled = True
+# result_cache_path = "~/.cache/agents4plc/results.sqlite"   # sqlite file shared by all result caches
+# result_cache_max_entries = 20000  # least recently used entries beyond this are evicted
+# result_cache_max_age_days = 30
+# batch compile (compile_many, used by the evaluation scripts): files without conflicting POU names
+# share one `plc --check` call; everything else is checked individually on a bounded thread pool.
+# compile_batch_group_size = 16     # max files per plc invocation, 1 disables grouping
+# compile_max_workers = 8           # defaults to min(8, cpu count)
+# in-process ST pre-check (src/st_precheck.py) run by the Verifier before the external compiler;
+# syntax errors and unresolved references (plus type / declaration errors for matiec only) are
+# reported in milliseconds without invoking RuSTy / matiec.
+# st_precheck_enabled = True
+# workspace for compiler / verifier artifacts (src/workspace.py): per-job dirs on tmpfs, recycled
+# from a pool and deleted in the background. Set keep_artifacts = True to keep them for debugging.
+# workspace_root = "/dev/shm"         # defaults to /dev/shm, or the system temp dir if not writable
+# workspace_pool_size = 16
+# keep_artifacts = False
+# external tools (plc, iec2iec, plcverif-cli, nuXmv, cbmc, docker) run through src/toolchain_runner.py
+# with per-tool wall / CPU time (seconds) and memory (MiB) limits; override the defaults per tool here.
+# toolchain_limits = {"cbmc": {"wall": 60, "memory_mb": 8192}, "nuXmv": {"wall": 10}}
+# properties of one task are verified in parallel; this caps concurrent plcverif runs per process
+# (shared by all Verifier instances). Defaults to the number of CPUs.
+# plcverif_max_workers = 4
+# pattern properties of a task (implication / invariant / forbidden / reachability / repeatability)
+# share one plcverif translation and are checked together in a single nuXmv run.
+# plcverif_shared_model = True
+# pattern properties are verified on the cone-of-influence slice of the program (src/st_slicer.py): only
+# the statements and variables that can affect the referenced variables are kept.
+# plcverif_slicing = True
+# value ranges of INT / DINT / REAL variables are inferred from the program (src/st_ranges.py, widened to
+# program and property constants) and added as INVAR constraints to the shared and native nuXmv models.
+# range_narrowing = True
+# warm plcverif workers (src/plcverif_daemon.py) instead of a cold plcverif-cli JVM per job: a command
+# that serves plcverif-cli argument lists as JSON lines on stdin/stdout (protocol in the module header).
+# The worker is an EXTERNAL program, it is not shipped with this repository. Unset (the default), or a
+# worker that is missing / fails to start = a cold plcverif-cli JVM per property, as before.
+# plcverif_daemon_cmd = ["/opt/plcverif/plcverif-worker"]   # example path of an externally built worker
+# plcverif_daemon_pool_size = 2
+# plcverif_daemon_startup_timeout = 120   # seconds until a worker reports ready
+# conclusive plcverif verdicts are cached in the result cache, keyed by the normalized ST source, the
+# property, backend settings and plcverif-cli / nuXmv / cbmc versions (upgrading a tool invalidates them).
+# verification_cache_enabled = True
+# race the nusmv and cbmc backends per property and keep the first conclusive verdict (the loser is
+# killed). plcverif_race_max_properties caps how many properties race at once (2 processes each);
+# the others use the sequential nusmv -> cbmc fallback. Set plcverif_backend_race = False on small machines.
+# plcverif_backend_race = True
+# plcverif_race_max_properties = 2        # defaults to half the number of CPUs
+# plcverif_property_budget = 120          # seconds per racing property, None = tool limits only
+# nuXmv sessions (src/nuXmv.py) try engines per spec kind: invariants IC3 -> BMC k-induction -> BDD,
+# LTL BMC -> BDD, CTL BDD. Every engine but the last gets nuxmv_engine_timeout seconds.
+# nuxmv_engine_portfolio = {"invar": ["ic3", "bdd"]}
+# nuxmv_engine_timeout = 30               # defaults to half the nuXmv wall limit
+# nuxmv_bmc_bound = 20
+# cbmc unwind is deepened adaptively per property (2, 4, 8, ... up to cbmc_max_unwind) within
+# cbmc_unwind_budget seconds; the largest completed bound per program is remembered in the result cache.
+# cbmc_initial_unwind = 2
+# cbmc_max_unwind = 64
+# cbmc_min_unwind = 10                    # passes below this bound (budget exhausted) are inconclusive
+# cbmc_unwind_budget = 30                 # defaults to the cbmc wall limit
+# counterexamples (src/counterexample.py) keep only the last counterexample_max_steps cycles / states of
+# long traces; the Markdown table in the verification summary is rendered from them.
+# counterexample_max_steps = 200
+# evaluation runs (evaluate/plcverif_evaluation.py) verify the files cheapest first under one wall-clock
+# limit; every file gets a share of the remaining time proportional to the historical cost of its
+# properties, and verification_schedule.json reports the properties left inconclusive by the budget.
+# plcverif_batch_time_limit = 3600        # seconds for the whole verification step, None = unlimited
+# plcverif_min_case_budget = 10           # seconds a file gets at least while time is left
+# plcverif_default_property_cost = 30     # estimated seconds for a property without history
+# the direct SMV evaluation (evaluate/smv_evaluation.py) translates ST to SMV with src/st_to_smv.py; programs
+# outside its subset (arrays, structs, user FBs, loops other than constant FOR) go to the LLM translation.
+# smv_translator = "native"               # "llm" reproduces the original LLM4PLC translation
+# smv_llm_fallback = True
+# smv_cycle_time_ms = 100                 # duration of one PLC cycle for TON / TOF / TP presets
+
 # terminated since folder path is now directly transfered to langGraph workflow kwargs.
 # folder_path = "/home/work/result/generation_log_20240703142338339087"
 
@@ -0,0 +1,266 @@
+"""
+Simulator Benchmark - 比较编译执行和逐行 eval 解释执行的扫描周期吞吐量
+
+基线是改为编译执行之前 STSimulator 的求值方式：每个周期逐行处理代码，
+正则把 ST 关键字改写成 Python、每个变量一次 re.sub 把值拼进表达式文本，再 eval()。
+（基线不含旧实现每行两次 deepcopy 的开销，对编译执行更严格。）
+
+批量模拟（st_batch）另外与逐个场景调用 simulate 比较吞吐量（场景 × 周期 / 秒），并抽查结果一致。
+含定时器的程序比较逐周期执行和快进空闲周期模拟同一段工厂时间的耗时，并检查结果一致。
+（前两项吞吐量都关闭快进，测的是每个周期真正执行的速度。）
+
+用法: python benchmark_simulator.py [--cycles N] [--scenarios N]
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent))
+
+from src.st_parser import STParser
+from src.st_simulator import STSimulator
+
+
+DEMO_PROGRAMS = {
+    "MotorControl": ("""
+FUNCTION_BLOCK MotorControl
+VAR_INPUT
+    start_button : BOOL;
+    stop_button : BOOL;
+    temperature : REAL;
+END_VAR
+VAR_OUTPUT
+    motor : BOOL;
+    alarm : BOOL;
+END_VAR
+VAR
+    running_time : INT := 0;
+    overheat : BOOL := FALSE;
+END_VAR
+IF start_button AND NOT overheat THEN
+    motor := TRUE;
+END_IF;
+IF stop_button THEN
+    motor := FALSE;
+    running_time := 0;
+END_IF;
+IF temperature > 80.0 THEN
+    overheat := TRUE;
+    alarm := TRUE;
+    motor := FALSE;
+END_IF;
+IF motor THEN
+    running_time := running_time + 1;
+END_IF;
+END_FUNCTION_BLOCK
+""", {'start_button': True, 'stop_button': False, 'temperature': 25.0}),
+    "TemperatureControlSystem": ("""
+FUNCTION_BLOCK TemperatureControlSystem
+VAR_INPUT
+    temperature : REAL;
+    manual_mode : BOOL;
+END_VAR
+VAR_OUTPUT
+    heater : BOOL;
+    cooler : BOOL;
+    alarm  : BOOL;
+END_VAR
+VAR
+    auto_heater_cmd : BOOL := FALSE;
+    auto_cooler_cmd : BOOL := FALSE;
+    auto_alarm_cmd  : BOOL := FALSE;
+END_VAR
+auto_heater_cmd := FALSE;
+auto_cooler_cmd := FALSE;
+auto_alarm_cmd  := FALSE;
+IF (temperature < 5.0) OR (temperature > 40.0) THEN
+    auto_alarm_cmd := TRUE;
+END_IF;
+IF NOT manual_mode THEN
+    IF temperature < 18.0 THEN
+        auto_heater_cmd := TRUE;
+        auto_cooler_cmd := FALSE;
+    ELSIF temperature > 26.0 THEN
+        auto_heater_cmd := FALSE;
+        auto_cooler_cmd := TRUE;
+    ELSE
+        auto_heater_cmd := FALSE;
+        auto_cooler_cmd := FALSE;
+    END_IF;
+END_IF;
+IF manual_mode THEN
+    heater := FALSE;
+    cooler := FALSE;
+ELSE
+    heater := auto_heater_cmd;
+    cooler := auto_cooler_cmd;
+END_IF;
+alarm := auto_alarm_cmd;
+END_FUNCTION_BLOCK
+""", {'temperature': 30.0, 'manual_mode': False}),
+}
+
+BATCH_CYCLES = 100
+
+# 液位控制：泵启动后延时开阀，高液位报警持续 5 秒才确认；模拟 TIMER_DURATION 的工厂时间
+TIMER_PROGRAM = ("""
+FUNCTION_BLOCK LevelControl
+VAR_INPUT
+    start : BOOL;
+    high_level : BOOL;
+END_VAR
+VAR_OUTPUT
+    pump : BOOL;
+    valve : BOOL;
+    alarm : BOOL;
+END_VAR
+VAR
+    valve_delay : TON;
+    alarm_delay : TON;
+    pump_cycles : CTU;
+END_VAR
+pump := start AND NOT alarm;
+valve_delay(IN := pump, PT := T#30s);
+valve := valve_delay.Q;
+alarm_delay(IN := high_level, PT := T#5s, Q => alarm);
+pump_cycles(CU := valve, R := NOT start, PV := 10);
+END_FUNCTION_BLOCK
+""", {'start': True, 'high_level': False})
+TIMER_DURATION = 'T#2h'
+TIMER_SCAN_MS = 10
+
+
+class LineEvalBaseline:
+    """旧的逐行解释执行（仅保留求值路径，用作基线）"""
+
+    def __init__(self, program):
+        self.program = program
+        self.variables = {var.name: var.initial_value for var in program.get_all_variables().values()}
+
+    def run(self, input_values, cycles):
+        self.variables.update(input_values)
+        for _ in range(cycles):
+            if_stack = []
+            for line_info in self.program.code_lines:
+                code = line_info['code']
+                upper = code.upper()
+                if upper.startswith('END_IF'):
+                    if if_stack:
+                        if_stack.pop()
+                    continue
+                if upper.startswith('ELSIF') or upper.startswith('ELSE'):
+                    if not if_stack:
+                        continue
+                    current = if_stack[-1]
+                    if current['taken']:
+                        current['skip'] = True
+                    elif upper.startswith('ELSE'):
+                        current['taken'], current['skip'] = True, False
+                    else:
+                        result = self.evaluate(re.match(r'ELSIF\s+(.+?)\s+THEN', code, re.IGNORECASE).group(1))
+                        current['taken'], current['skip'] = bool(result), not result
+                    continue
+                if any(state['skip'] for state in if_stack):
+                    if upper.startswith('IF'):
+                        if_stack.append({'taken': True, 'skip': True})
+                    continue
+                if ':=' in code:
+                    match = re.match(r'(\w+)\s*:=\s*(.+?);?$', code)
+                    self.variables[match.group(1)] = self.evaluate(match.group(2).strip().rstrip(';'))
+                elif upper.startswith('IF'):
+                    result = self.evaluate(re.match(r'IF\s+(.+?)\s+THEN', code, re.IGNORECASE).group(1))
+                    if_stack.append({'taken': bool(result), 'skip': not result})
+        return self.variables
+
+    def evaluate(self, expr):
+        for pattern, replacement in ((r'\bTRUE\b', 'True'), (r'\bFALSE\b', 'False'), (r'\bAND\b', 'and'),
+                                     (r'\bOR\b', 'or'), (r'\bNOT\b', 'not'), (r'\bMOD\b', '%')):
+            expr = re.sub(pattern, replacement, expr, flags=re.IGNORECASE)
+        for name in re.findall(r'\b[a-zA-Z_]\w*\b', expr):
+            if name in self.variables:
+                expr = re.sub(rf'\b{name}\b', repr(self.variables[name]), expr)
+        return eval(expr, {"__builtins__": {}}, {})
+
+
+def cycles_per_second(run, cycles):
+    started = time.perf_counter()
+    run(cycles)
+    return cycles / (time.perf_counter() - started)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--cycles', type=int, default=2000, help="cycles for the line-eval baseline")
+    arg_parser.add_argument('--scenarios', type=int, default=10000, help="scenarios for the batch simulation")
+    args = arg_parser.parse_args()
+
+    print(f"{'program':<28}{'line eval':>14}{'compiled':>14}{'traced':>12}{'speed-up':>10}")
+    for name, (code, inputs) in DEMO_PROGRAMS.items():
+        program = STParser().parse(code)
+        simulator = STSimulator(program)
+
+        baseline = LineEvalBaseline(program)
+        expected = dict(baseline.run(inputs, 1))
+        result = simulator.simulate(inputs, max_cycles=1, trace=False, fast_forward=False)
+        assert result.success and all(result.final_variables[key] == value for key, value in expected.items()), \
+            f"{name}: compiled result differs from the baseline"
+
+        assert simulator.simulate(inputs, max_cycles=1, trace=True).success, f"{name}: traced run failed"
+
+        old = cycles_per_second(lambda n: baseline.run(inputs, n), args.cycles)
+        new = cycles_per_second(lambda n: simulator.simulate(inputs, max_cycles=n, trace=False, fast_forward=False),
+                                args.cycles * 200)
+        traced = cycles_per_second(lambda n: simulator.simulate(inputs, max_cycles=n, trace=True), args.cycles)
+        print(f"{name:<28}{old:>12,.0f}/s{new:>12,.0f}/s{traced:>10,.0f}/s{new / old:>9.0f}x")
+
+    # 批量模拟：每个场景随机一组输入，所有场景执行 BATCH_CYCLES 个周期
+    print(f"\n{'program':<28}{'one by one':>14}{'batch':>14}{'speed-up':>10}   ({args.scenarios} scenarios)")
+    rng = np.random.default_rng(0)
+    for name, (code, inputs) in DEMO_PROGRAMS.items():
+        simulator = STSimulator(STParser().parse(code))
+        stimuli = {key: (rng.random(args.scenarios) < 0.5 if isinstance(value, bool)
+                         else rng.uniform(0.0, 100.0, args.scenarios)) for key, value in inputs.items()}
+        scenario = lambda i: {key: values[i].item() for key, values in stimuli.items()}
+
+        batch = simulator.simulate_batch(stimuli, max_cycles=BATCH_CYCLES)
+        assert batch.success, f"{name}: {batch.error_message}"
+        for i in rng.choice(args.scenarios, size=20, replace=False):
+            expected = simulator.simulate(scenario(i), max_cycles=BATCH_CYCLES, trace=False,
+                                          fast_forward=False).final_variables
+            assert all(batch.final_variables[key][i].item() == value for key, value in expected.items()), \
+                f"{name}: batch result of scenario {i} differs from simulate"
+
+        sample = min(args.scenarios, 1000)
+        started = time.perf_counter()
+        for i in range(sample):
+            simulator.simulate(scenario(i), max_cycles=BATCH_CYCLES, trace=False, fast_forward=False)
+        single = sample * BATCH_CYCLES / (time.perf_counter() - started)
+        started = time.perf_counter()
+        simulator.simulate_batch(stimuli, max_cycles=BATCH_CYCLES)
+        batched = args.scenarios * BATCH_CYCLES / (time.perf_counter() - started)
+        print(f"{name:<28}{single:>12,.0f}/s{batched:>12,.0f}/s{batched / single:>9.0f}x")
+
+    # 定时器：逐周期执行 vs 快进空闲周期
+    code, inputs = TIMER_PROGRAM
+    simulator = STSimulator(STParser().parse(code), scan_time_ms=TIMER_SCAN_MS)
+    runs = {}
+    for fast_forward in (False, True):
+        started = time.perf_counter()
+        result = simulator.simulate(inputs, duration=TIMER_DURATION, trace=False, fast_forward=fast_forward)
+        runs[fast_forward] = (result, time.perf_counter() - started)
+        assert result.success, result.error_message
+    (plain, plain_time), (fast, fast_time) = runs[False], runs[True]
+    assert plain.final_variables == fast.final_variables, "fast-forward result differs from cycle-by-cycle run"
+    print(f"\n{'timers':<28}{'cycles':>14}{'executed':>14}{'seconds':>10}   ({TIMER_DURATION} at {TIMER_SCAN_MS} ms scan)")
+    for label, (result, seconds) in (('cycle by cycle', runs[False]), ('fast-forward', runs[True])):
+        print(f"{label:<28}{result.cycles:>14,}{result.executed_cycles:>14,}{seconds:>10.3f}")
+    print(f"{'speed-up':<28}{plain_time / fast_time:>47.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,10 @@
 # Agents4PLC Demo - Source Module
 
+import sys
+from pathlib import Path
+
+# The ST front end (st_ast) is shared with the main project and not copied here: <repo>/src is put on
+# the import path and the demo modules import it as the top-level module `st_ast`.
+_shared_src = str(Path(__file__).resolve().parent.parent.parent / "src")
+if _shared_src not in sys.path:
+    sys.path.append(_shared_src)
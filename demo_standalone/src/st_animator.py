@@ -79,23 +79,18 @@ class STAnimator:
                 'code': line_info['code']
             })
 
-        # 准备执行步骤
-        steps = []
-        for step in result.steps:
-            steps.append({
-                'step': step.step_num,
-                'line': step.line_index,
-                'code': step.code_line,
-                'description': step.description,
-                'variables': step.variables,
-                'changed': step.changed_vars
-            })
+        # 准备执行步骤：只放每一步的变化，页面里从初始状态重放得到任意一步的变量
+        steps, initial_variables = [], {}
+        if result.steps:
+            steps = list(result.steps.deltas())
+            initial_variables = result.steps.variables_at(result.steps.first_step)
 
         return {
             'program_name': program.name,
             'variables': variables,
             'code_lines': code_lines,
             'steps': steps,
+            'initial_variables': initial_variables,
             'input_values': input_values or {},
             'raw_code': program.raw_code
         }
@@ -443,6 +438,40 @@ class STAnimator:
         // Animation data
         const animationData = {json.dumps(data, ensure_ascii=False, indent=2)};
 
+        // Variables of step i = variables of the first step + changes of steps 1..i.
+        // Keyframes (every KEYFRAME_INTERVAL steps) are built lazily, so seeking replays at most that many steps.
+        const KEYFRAME_INTERVAL = 64;
+        const keyframes = [];
+
+        function variablesAt(index) {{
+            if (keyframes.length === 0) {{
+                keyframes.push(Object.assign({{}}, animationData.initial_variables));
+            }}
+            const frame = Math.floor(index / KEYFRAME_INTERVAL);
+            while (keyframes.length <= frame) {{
+                const k = keyframes.length;
+                const vars = Object.assign({{}}, keyframes[k - 1]);
+                for (let i = (k - 1) * KEYFRAME_INTERVAL + 1; i <= k * KEYFRAME_INTERVAL; i++) {{
+                    Object.assign(vars, animationData.steps[i].changes);
+                }}
+                keyframes.push(vars);
+            }}
+            const vars = Object.assign({{}}, keyframes[frame]);
+            for (let i = frame * KEYFRAME_INTERVAL + 1; i <= index; i++) {{
+                Object.assign(vars, animationData.steps[i].changes);
+            }}
+            return vars;
+        }}
+
+        // Arrays as JSON, function block instances as "Q=true ET=300"
+        function formatValue(value) {{
+            if (Array.isArray(value)) return JSON.stringify(value);
+            if (value !== null && typeof value === 'object') {{
+                return Object.entries(value).map(([member, v]) => `${{member}}=${{v}}`).join(' ');
+            }}
+            return value;
+        }}
+
         let currentStepIndex = 0;
         let isPlaying = false;
         let playInterval = null;
@@ -519,12 +548,12 @@ class STAnimator:
             }}
 
             // Update variables
-            for (const [varName, value] of Object.entries(step.variables)) {{
+            for (const [varName, value] of Object.entries(variablesAt(stepIndex))) {{
                 const valueElement = document.getElementById(`val-${{varName}}`);
                 const cardElement = document.getElementById(`var-${{varName}}`);
 
                 if (valueElement) {{
-                    valueElement.textContent = value;
+                    valueElement.textContent = formatValue(value);
                 }}
 
                 if (cardElement) {{
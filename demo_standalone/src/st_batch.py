@@ -0,0 +1,519 @@
+"""
+ST Batch Simulator - 用 NumPy 向量化地同时模拟 N 组输入（场景）
+每个变量是长度为 N 的数组（数组变量为 (N, 各维长度)），表达式逐元素求值；
+IF / ELSIF / ELSE、CASE 和循环用布尔掩码表示哪些场景在执行当前分支，
+一次调用执行所有场景的一个扫描周期。适合在模型检查之前用成千上万组激励筛查程序。
+"""
+
+import functools
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from st_ast import (Index, Name, UnaryOp, BinaryOp, Call, CaseRange, Assignment, CallStatement, IfStatement,
+                    CaseStatement, ForStatement, WhileStatement, RepeatStatement, ExitStatement,
+                    ContinueStatement, ReturnStatement)
+from src.st_compiler import (_CodeGenerator, _scalar_kind, STCompileError, SlotInfo, CONVERSION_RE,
+                             MAX_LOOP_ITERATIONS)
+from src.st_parser import STProgram
+
+# 槽位类型 -> NumPy dtype（字符串、枚举和类型未知的变量用 object 数组）
+DTYPES = {'BOOL': np.bool_, 'INT': np.int64, 'REAL': np.float64}
+
+MATH_FUNCTIONS = {'SQRT': 'np.sqrt', 'LN': 'np.log', 'LOG': 'np.log10', 'EXP': 'np.exp',
+                  'SIN': 'np.sin', 'COS': 'np.cos', 'TAN': 'np.tan',
+                  'ASIN': 'np.arcsin', 'ACOS': 'np.arccos', 'ATAN': 'np.arctan'}
+
+
+class ScenarioError(RuntimeError):
+    """部分场景在本周期出错（除零、数组越界、死循环），lanes 是出错场景的掩码"""
+
+    def __init__(self, lanes, message):
+        self.lanes = np.array(lanes, dtype=bool)
+        scenarios = np.flatnonzero(self.lanes)
+        shown = ', '.join(map(str, scenarios[:10])) + (', ...' if len(scenarios) > 10 else '')
+        super().__init__(f"{message} (scenario {shown})")
+        self.message = message
+
+
+############### runtime helpers (globals of the generated code) ###############
+
+def _set(mask, value, old):
+    """掩码赋值：执行中的场景取 value，其余保持原值（总是生成新数组，不改动 old）"""
+    if old.ndim > 1:
+        mask = mask.reshape(mask.shape + (1,) * (old.ndim - 1))
+    return np.where(mask, value, old).astype(old.dtype, copy=False)
+
+
+def _put(array, mask, index, value):
+    """数组元素的掩码赋值（原地修改），index 是每一维的下标数组"""
+    rows = np.flatnonzero(mask)
+    if len(rows):
+        value = np.broadcast_to(np.asarray(value), mask.shape)
+        array[(rows,) + tuple(np.broadcast_to(i, mask.shape)[rows] for i in index)] = value[rows]
+
+
+def _ix(index, low, high, mask):
+    index = np.broadcast_to(np.asarray(index), mask.shape)
+    bad = mask & ((index < low) | (index > high))
+    if bad.any():
+        raise ScenarioError(bad, f"array index out of bounds [{low}..{high}]")
+    return np.clip(index, low, high) - low
+
+
+def _nonzero(b, mask):
+    """除数：执行中的场景除零时报错，其余场景的 0 换成 1（结果反正被掩码丢弃）"""
+    zero = np.asarray(b) == 0
+    if (mask & zero).any():
+        raise ScenarioError(mask & zero, "division by zero")
+    return np.where(zero, 1, b)
+
+
+def _idiv(a, b, mask):
+    """整数除法，向零取整"""
+    b = _nonzero(b, mask)
+    q = np.abs(a) // np.abs(b)
+    return np.where((np.asarray(a) >= 0) == (b >= 0), q, -q)
+
+
+def _fdiv(a, b, mask):
+    return a / _nonzero(b, mask)
+
+
+def _div(a, b, mask):
+    """类型未知时按数组的 dtype 选择整数除法或实数除法"""
+    if np.issubdtype(np.asarray(a).dtype, np.integer) and np.issubdtype(np.asarray(b).dtype, np.integer):
+        return _idiv(a, b, mask)
+    return _fdiv(a, b, mask)
+
+
+def _mod(a, b, mask):
+    return a - b * _idiv(a, b, mask)
+
+
+def _to_int(value):
+    """REAL -> 整数按四舍五入（远离零），BOOL -> 0 / 1"""
+    value = np.asarray(value)
+    if np.issubdtype(value.dtype, np.floating):
+        value = np.where(value >= 0, np.floor(value + 0.5), -np.floor(-value + 0.5))
+    return value.astype(np.int64)
+
+
+def _to_str(value):
+    return np.vectorize(str, otypes=[object])(value)
+
+
+def _for_step(step, mask):
+    if (mask & (np.asarray(step) == 0)).any():
+        raise ScenarioError(mask & (np.asarray(step) == 0), "FOR loop with step 0")
+    return step
+
+
+def _for_test(counter, end, step):
+    return np.where(np.asarray(step) > 0, counter <= end, counter >= end)
+
+
+def _isin(value, choices):
+    return functools.reduce(np.logical_or, [value == choice for choice in choices])
+
+
+def _loop_limit(mask):
+    raise ScenarioError(mask, f"loop exceeded {MAX_LOOP_ITERATIONS} iterations")
+
+
+_BATCH_RUNTIME = {
+    '__builtins__': {'bool': bool, 'float': float, 'int': int, 'range': range, 'tuple': tuple},
+    'np': np, 'functools': functools,
+    '_set': _set, '_put': _put, '_ix': _ix, '_idiv': _idiv, '_fdiv': _fdiv, '_div': _div, '_mod': _mod,
+    '_to_int': _to_int, '_to_str': _to_str, '_for_step': _for_step, '_for_test': _for_test, '_isin': _isin,
+    '_loop_limit': _loop_limit, 'MAX_LOOP_ITERATIONS': MAX_LOOP_ITERATIONS,
+}
+
+
+############### compiled program ###############
+
+class CompiledBatchProgram:
+    """
+    向量化编译结果。state 是按槽位排列的 NumPy 数组（initial_state(n) 生成），
+    cycle(state, active) 对 active 掩码中的场景执行一个扫描周期。
+    """
+
+    def __init__(self, slots: List[SlotInfo], cycle, python_source: str):
+        self.slots = slots
+        self.names = [slot.name for slot in slots]
+        self.index = {slot.name.lower(): i for i, slot in enumerate(slots)}
+        self.cycle = cycle
+        self.python_source = python_source
+
+    def dtype(self, position: int):
+        return DTYPES.get(self.slots[position].kind, object)
+
+    def shape(self, position: int, n: int) -> tuple:
+        dims = self.slots[position].dims or []
+        return (n,) + tuple(high - low + 1 for low, high in dims)
+
+    def initial_state(self, n: int) -> List[np.ndarray]:
+        state = []
+        for position, slot in enumerate(self.slots):
+            state.append(self.broadcast(position, slot.initial, n))
+        return state
+
+    def broadcast(self, position: int, value: Any, n: int) -> np.ndarray:
+        """把一个值（所有场景相同）或按场景给出的值扩展成槽位的数组"""
+        array = np.empty(self.shape(position, n), dtype=self.dtype(position))
+        array[...] = value if self.slots[position].dims is None else np.asarray(value, dtype=array.dtype)
+        return array
+
+    def run(self, state: List[np.ndarray], active: np.ndarray):
+        """
+        对 active 中的场景执行一个周期。出错的场景从 active 中去掉并回滚到本周期开始时的状态，
+        其余场景重新执行本周期；返回 {场景编号: 错误信息}
+        """
+        errors = {}
+        while active.any():
+            backup = [array.copy() if array.ndim > 1 else array for array in state]   # 只有数组变量会被原地修改
+            try:
+                with np.errstate(all='ignore'):
+                    self.cycle(state, active)
+                break
+            except ScenarioError as e:
+                state[:] = backup
+                for scenario in np.flatnonzero(e.lanes):
+                    errors[int(scenario)] = e.message
+                active &= ~e.lanes
+        return errors
+
+
+def compile_batch(program: STProgram) -> CompiledBatchProgram:
+    """
+    把 STParser 解析出的程序编译成向量化的 Python 函数
+
+    Raises:
+        STCompileError: 程序使用了不支持的结构
+    """
+    if program.pou is None:
+        raise STCompileError("no PROGRAM / FUNCTION_BLOCK / FUNCTION found")
+    return _BatchCodeGenerator(program).compile()
+
+
+############### code generation ###############
+
+class _BatchCodeGenerator(_CodeGenerator):
+    """
+    AST -> 向量化的 Python 源码。masks 是当前生效的掩码变量栈（栈顶是当前语句的掩码），
+    EXIT / CONTINUE / RETURN 把执行它的场景从栈中相应的掩码里去掉。
+    """
+
+    def __init__(self, program: STProgram):
+        super().__init__(program, trace=False)
+        for slot in self.slots:
+            if slot.fb_type:
+                raise STCompileError(f"function block instance '{slot.name}' ({slot.fb_type}) is not supported "
+                                     f"in batch simulation")
+        self.masks: List[str] = ['m']
+        self.loops: List[int] = []    # 每层循环的“循环中”掩码在 masks 中的位置
+
+    @property
+    def mask(self) -> str:
+        return self.masks[-1]
+
+    def compile(self) -> CompiledBatchProgram:
+        self.statements(self.program.pou.body)
+        body = self.lines
+        if any('_R,' in line for line in body):
+            body = ['    _R = np.arange(m.shape[0])'] + body     # 数组元素访问的场景下标
+        python_source = 'def _cycle(s, m):\n' + '\n'.join(body) + '\n'
+        namespace = dict(_BATCH_RUNTIME)
+        exec(compile(python_source, f"<st-batch:{self.program.name}>", 'exec'), namespace)
+        return CompiledBatchProgram(self.slots, namespace['_cycle'], python_source)
+
+    # --- statements ---
+
+    def masked_block(self, mask: str, statements):
+        """只在 mask 非空时执行的语句块"""
+        self.emit(f"if {mask}.any():")
+        self.indent += 1
+        self.masks.append(mask)
+        self.statements(statements)
+        self.masks.pop()
+        self.indent -= 1
+
+    def statement(self, node):
+        line = node.span.line if node.span else 0
+        if isinstance(node, Assignment):
+            self.assignment(node)
+        elif isinstance(node, IfStatement):
+            rest = self.mask
+            for position, (condition, body) in enumerate(node.branches):
+                taken = self.temp('_m')
+                self.emit(f"{taken} = {rest} & {self.expr(condition)}")
+                rest = self.rest(rest, taken, position < len(node.branches) - 1 or bool(node.else_body))
+                self.masked_block(taken, body)
+            if node.else_body:
+                self.masked_block(rest, node.else_body)
+        elif isinstance(node, CaseStatement):
+            selector, rest = self.temp('_v'), self.mask
+            self.emit(f"{selector} = {self.expr(node.selector)}")
+            for position, branch in enumerate(node.branches):
+                tests = []
+                for label in branch.labels:
+                    if isinstance(label, CaseRange) and self.kind(label.low) == 'ENUM':
+                        tests.append(f"_isin({selector}, {self.enum_range(label)!r})")
+                    elif isinstance(label, CaseRange):
+                        tests.append(f"(({self.expr(label.low)} <= {selector}) & ({selector} <= {self.expr(label.high)}))")
+                    else:
+                        tests.append(f"({selector} == {self.expr(label)})")
+                taken = self.temp('_m')
+                self.emit(f"{taken} = {rest} & ({' | '.join(tests)})")
+                rest = self.rest(rest, taken, position < len(node.branches) - 1 or bool(node.else_body))
+                self.masked_block(taken, branch.body)
+            if node.else_body:
+                self.masked_block(rest, node.else_body)
+        elif isinstance(node, ForStatement):
+            slot = self.variable_slot(node.variable, line)
+            start, end, step = self.temp('_b'), self.temp('_e'), self.temp('_t')
+            self.emit(f"{start} = {self.expr(node.start)}")
+            self.emit(f"{end} = {self.expr(node.end)}")
+            self.emit(f"{step} = _for_step({self.expr(node.step) if node.step is not None else '1'}, {self.mask})")
+            self.emit(f"s[{slot}] = _set({self.mask}, {start}, s[{slot}])")
+            # 正常结束后循环变量停在最后一个值 + 步长（EXIT 跳出时保持当前值）
+            self.loop(f"_for_test(s[{slot}], {end}, {step})", node.body,
+                      increment=f"s[{slot}] = _set({{mask}}, s[{slot}] + {step}, s[{slot}])")
+        elif isinstance(node, WhileStatement):
+            self.loop(self.expr(node.condition), node.body)
+        elif isinstance(node, RepeatStatement):
+            # 先执行一次循环体；CONTINUE 之后同样要检查 UNTIL 条件
+            self.loop(None, node.body, until=self.expr(node.condition))
+        elif isinstance(node, (ExitStatement, ContinueStatement)):
+            if not self.loops:
+                raise STCompileError("EXIT / CONTINUE outside of a loop", line)
+            # EXIT 去掉循环中掩码及以内的掩码，CONTINUE 只去掉本次循环体内的掩码
+            first = self.loops[-1] + (0 if isinstance(node, ExitStatement) else 1)
+            self.leave(first)
+        elif isinstance(node, ReturnStatement):
+            self.leave(0)
+        elif isinstance(node, CallStatement):
+            raise STCompileError(f"call '{self.text(node.call.func)}' is not supported", line)
+        else:
+            raise STCompileError(f"unsupported statement {type(node).__name__}", line)
+
+    def rest(self, mask: str, taken: str, needed: bool) -> Optional[str]:
+        """没有进入 taken 分支的场景（后面还有 ELSIF / ELSE 时才需要，要在分支执行之前算好）"""
+        if not needed:
+            return None
+        rest = self.temp('_m')
+        self.emit(f"{rest} = {mask} & ~{taken}")
+        return rest
+
+    def leave(self, first: int):
+        """当前掩码里的场景离开 masks[first:] 这些层"""
+        leaving = self.temp('_x')
+        self.emit(f"{leaving} = {self.mask}")
+        for mask in self.masks[first:]:
+            self.emit(f"{mask} = {mask} & ~{leaving}")
+
+    def loop(self, condition: Optional[str], body, until: Optional[str] = None, increment: Optional[str] = None):
+        """
+        掩码循环：active 是还在循环中的场景，每次迭代先按条件缩小，全部退出时结束；
+        body 在 active 的副本（本次迭代的掩码）下执行
+        """
+        active, guard, current = self.temp('_a'), self.temp('_g'), self.temp('_m')
+        self.emit(f"{active} = {self.mask}")
+        self.emit(f"{guard} = 0")
+        self.emit("while True:")
+        self.indent += 1
+        if condition is not None:
+            self.emit(f"{active} = {active} & {condition}")
+            self.emit(f"if not {active}.any():")
+            self.emit("    break")
+        self.emit(f"{guard} += 1")
+        self.emit(f"if {guard} > MAX_LOOP_ITERATIONS:")
+        self.emit(f"    _loop_limit({active})")
+        self.emit(f"{current} = {active}")
+        self.masks.append(active)
+        self.loops.append(len(self.masks) - 1)
+        self.masks.append(current)
+        self.statements(body)
+        self.masks.pop()
+        self.loops.pop()
+        self.masks.pop()
+        if increment is not None:
+            self.emit(increment.format(mask=active))
+        if until is not None:
+            self.emit(f"{active} = {active} & ~({until})")
+            self.emit(f"if not {active}.any():")
+            self.emit("    break")
+        self.indent -= 1
+
+    def assignment(self, node: Assignment):
+        target = node.target
+        line = node.span.line if node.span else 0
+        if isinstance(target, Name):
+            slot = self.variable_slot(target.name, line)
+            self.emit(f"s[{slot}] = _set({self.mask}, {self.expr(node.value)}, s[{slot}])")
+        elif isinstance(target, Index) and isinstance(target.base, Name):
+            slot = self.variable_slot(target.base.name, line)
+            self.emit(f"_put(s[{slot}], {self.mask}, {self.indices(target, line)}, {self.expr(node.value)})")
+        else:
+            raise STCompileError(f"assignment to '{self.text(target)}' is not supported", line)
+
+    def indices(self, node: Index, line: int) -> str:
+        slot = self.variable_slot(node.base.name, line)
+        dims = self.slots[slot].dims
+        if not dims or len(node.indices) != len(dims):
+            raise STCompileError(f"'{node.base.name}' is not an array of {len(node.indices)} dimension(s)", line)
+        return '(' + ''.join(f"_ix({self.expr(index)}, {low}, {high}, {self.mask}), "
+                             for index, (low, high) in zip(node.indices, dims)) + ')'
+
+    # --- expressions ---
+
+    def element(self, node: Index, line: int) -> str:
+        slot = self.variable_slot(node.base.name, line)
+        return f"s[{slot}][(_R,) + {self.indices(node, line)}]"
+
+    def expr(self, node) -> str:
+        if isinstance(node, UnaryOp) and node.op == 'NOT':
+            # np.invert 对布尔数组是逻辑非、对整数是按位取反
+            return f"np.invert({self.expr(node.operand)})"
+        if isinstance(node, BinaryOp) and node.op in ('/', 'MOD'):
+            left, right = self.expr(node.left), self.expr(node.right)
+            if node.op == 'MOD':
+                return f"_mod({left}, {right}, {self.mask})"
+            kinds = (self.kind(node.left), self.kind(node.right))
+            if kinds == ('INT', 'INT'):
+                return f"_idiv({left}, {right}, {self.mask})"
+            return f"_fdiv({left}, {right}, {self.mask})" if 'REAL' in kinds else f"_div({left}, {right}, {self.mask})"
+        return super().expr(node)
+
+    def call(self, node: Call, line: int) -> str:
+        if not isinstance(node.func, Name):
+            raise STCompileError(f"call '{self.text(node.func)}' is not supported", line)
+        name = node.func.name.upper()
+        args = self.call_args(name, node, line)
+        conversion = CONVERSION_RE.match(name)
+        if conversion and len(args) == 1:
+            kind = _scalar_kind(conversion.group(1))
+            if kind == 'BOOL':
+                return f"np.asarray({args[0]}).astype(np.bool_)"
+            if kind == 'INT':
+                return f"_to_int({args[0]})"
+            if kind == 'REAL':
+                return f"np.asarray({args[0]}).astype(np.float64)"
+            if kind == 'STRING':
+                return f"_to_str({args[0]})"
+        if name == 'ABS' and len(args) == 1:
+            return f"np.abs({args[0]})"
+        if name in ('MIN', 'MAX') and args:
+            return f"functools.reduce(np.{'minimum' if name == 'MIN' else 'maximum'}, ({', '.join(args)},))"
+        if name == 'LIMIT' and len(args) == 3:
+            return f"np.minimum(np.maximum({args[1]}, {args[0]}), {args[2]})"
+        if name == 'SEL' and len(args) == 3:
+            return f"np.where({args[0]}, {args[2]}, {args[1]})"
+        if name == 'MUX' and len(args) >= 2:
+            return f"np.choose({args[0]}, np.broadcast_arrays({', '.join(args[1:])}))"
+        if name in MATH_FUNCTIONS and len(args) == 1:
+            return f"{MATH_FUNCTIONS[name]}({args[0]})"
+        if name == 'TRUNC' and len(args) == 1:
+            return f"np.trunc({args[0]}).astype(np.int64)"
+        if name == 'EXPT' and len(args) == 2:
+            return f"np.float_power({args[0]}, {args[1]})"
+        if name == 'MOVE' and len(args) == 1:
+            return args[0]
+        raise STCompileError(f"function '{node.func.name}' is not supported", line)
+
+
+############### batch simulation ###############
+
+@dataclass
+class BatchSimulationResult:
+    """批量模拟结果，每个变量是按场景排列的数组"""
+    scenarios: int = 0
+    cycles: int = 0
+    outputs: Dict[str, np.ndarray] = field(default_factory=dict)          # 输出变量
+    final_variables: Dict[str, np.ndarray] = field(default_factory=dict)  # 所有变量
+    failed: Optional[np.ndarray] = None     # 出错的场景（变量停在出错周期开始时的值）
+    errors: Dict[int, str] = field(default_factory=dict)                  # 场景编号 -> 错误信息
+    success: bool = True
+    error_message: str = ""
+
+
+class BatchSimulator:
+    """
+    向量化批量模拟器：N 组输入同时执行 max_cycles 个扫描周期
+
+    input_values 的每个值可以是
+        标量                  所有场景相同
+        长度为 N 的序列       每个场景一个值
+        形状为 (max_cycles, N) 的数组   每个周期、每个场景一个值（随时间变化的激励）
+    """
+
+    def __init__(self, program: STProgram):
+        self.program = program
+        self._compiled: Optional[CompiledBatchProgram] = None
+
+    def compile(self) -> CompiledBatchProgram:
+        if self._compiled is None:
+            self._compiled = compile_batch(self.program)
+        return self._compiled
+
+    def simulate(self, input_values: Dict[str, Any] = None, max_cycles: int = 1,
+                 scenarios: Optional[int] = None) -> BatchSimulationResult:
+        """
+        Args:
+            input_values: 输入变量的值（见类说明）
+            max_cycles: 扫描周期数
+            scenarios: 场景数 N，为空时从 input_values 中按场景给出的值推断
+        """
+        result = BatchSimulationResult(cycles=max_cycles)
+        try:
+            compiled = self.compile()
+            inputs = {}
+            for name, value in (input_values or {}).items():
+                position = compiled.index.get(name.lower())
+                if position is not None:
+                    inputs[position] = np.asarray(value)
+            n = scenarios if scenarios is not None else self._scenario_count(compiled, inputs, max_cycles)
+            result.scenarios = n
+
+            state = compiled.initial_state(n)
+            varying = {}
+            for position, value in inputs.items():
+                if value.ndim == len(compiled.shape(position, n)) + 1:
+                    if len(value) != max_cycles:
+                        raise ValueError(f"input '{compiled.names[position]}' has {len(value)} cycles, "
+                                         f"expected {max_cycles}")
+                    varying[position] = value
+                else:
+                    state[position] = compiled.broadcast(position, value, n)
+
+            active = np.ones(n, dtype=bool)
+            for cycle in range(max_cycles):
+                for position, value in varying.items():
+                    state[position] = _set(active, compiled.broadcast(position, value[cycle], n), state[position])
+                result.errors.update(compiled.run(state, active))
+
+            result.final_variables = dict(zip(compiled.names, state))
+            outputs = {var.name.lower() for var in self.program.outputs}
+            result.outputs = {name: array for name, array in result.final_variables.items()
+                              if name.lower() in outputs}
+            result.failed = ~active
+            result.success = True
+
+        except Exception as e:
+            result.success = False
+            result.error_message = str(e)
+
+        return result
+
+    @staticmethod
+    def _scenario_count(compiled: CompiledBatchProgram, inputs: Dict[int, np.ndarray], cycles: int) -> int:
+        """按场景给出的输入的长度（所有输入都是标量时为 1）"""
+        n = 1
+        for position, value in inputs.items():
+            scalar_dims = len(compiled.shape(position, 0)) - 1
+            if value.ndim == scalar_dims + 2:
+                n = max(n, value.shape[1])
+            elif value.ndim == scalar_dims + 1:
+                n = max(n, value.shape[0])
+        return n
@@ -0,0 +1,791 @@
+"""
+ST Compiler - 把ST程序编译成Python函数
+每个程序只编译一次：POU的AST（st_ast）被翻译成一段Python源码，再用compile()生成函数。
+变量放在列表的固定槽位里，一个扫描周期就是一次函数调用。
+trace=True时在每条语句和每个条件处插入回调，供模拟器逐步记录执行过程。
+标准功能块（TON / TOF / TP / CTU / CTD / R_TRIG / F_TRIG，见 st_function_blocks）的实例也放在槽位里。
+"""
+
+import copy
+import math
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from st_ast import (source_segment, NamedType, ArrayType, EnumType, SubrangeType, Literal, EnumLiteral, Name,
+                    Index, Member, Call, UnaryOp, BinaryOp, ArrayLiteral, RepeatedInit, CaseRange,
+                    Assignment, CallStatement, IfStatement, CaseStatement, ForStatement, WhileStatement,
+                    RepeatStatement, ExitStatement, ContinueStatement, ReturnStatement)
+from src.st_parser import STProgram
+from src.st_function_blocks import STANDARD_FBS, StandardFB, VirtualClock
+
+# WHILE / REPEAT 单个循环在一个周期内的最大迭代次数（防止模拟死循环）
+MAX_LOOP_ITERATIONS = 100000
+# 快进时判断空闲周期的最大间隔（周期数）
+IDLE_CHECK_INTERVAL = 64
+
+INTEGER_TYPES = {'SINT', 'INT', 'DINT', 'LINT', 'USINT', 'UINT', 'UDINT', 'ULINT',
+                 'BYTE', 'WORD', 'DWORD', 'LWORD', 'TIME', 'LTIME'}
+REAL_TYPES = {'REAL', 'LREAL'}
+STRING_TYPES = {'STRING', 'WSTRING'}
+
+COMPARISON_OPS = {'=': '==', '<>': '!=', '<': '<', '>': '>', '<=': '<=', '>=': '>='}
+BITWISE_OPS = {'AND': '&', 'OR': '|', 'XOR': '^'}
+
+# 标准函数的形参顺序（支持 LIMIT(MN := 0, IN := x, MX := 10) 这样的命名实参）
+FUNCTION_PARAMS = {
+    'ABS': ['IN'], 'SQRT': ['IN'], 'LN': ['IN'], 'LOG': ['IN'], 'EXP': ['IN'],
+    'SIN': ['IN'], 'COS': ['IN'], 'TAN': ['IN'], 'ASIN': ['IN'], 'ACOS': ['IN'], 'ATAN': ['IN'],
+    'TRUNC': ['IN'], 'MOVE': ['IN'], 'EXPT': ['IN1', 'IN2'],
+    'LIMIT': ['MN', 'IN', 'MX'], 'SEL': ['G', 'IN0', 'IN1'],
+}
+MATH_FUNCTIONS = {'SQRT': 'math.sqrt', 'LN': 'math.log', 'LOG': 'math.log10', 'EXP': 'math.exp',
+                  'SIN': 'math.sin', 'COS': 'math.cos', 'TAN': 'math.tan',
+                  'ASIN': 'math.asin', 'ACOS': 'math.acos', 'ATAN': 'math.atan'}
+CONVERSION_RE = re.compile(r'^(?:\w+?_)?TO_(\w+)$', re.IGNORECASE)
+_MEMBER_SPACE_RE = re.compile(r'(\w) \.(?=[A-Za-z_])')
+
+
+class STCompileError(Exception):
+    """程序使用了编译器不支持的结构（带源码行号）"""
+
+    def __init__(self, message, line=0):
+        super().__init__(message)
+        self.message = message
+        self.line = line
+
+    def __str__(self):
+        return f"line {self.line}: {self.message}" if self.line else self.message
+
+
+class LoopLimitError(RuntimeError):
+    """WHILE / REPEAT 循环超过 MAX_LOOP_ITERATIONS 次"""
+
+
+############### runtime helpers (globals of the generated code) ###############
+
+def _idiv(a, b):
+    """整数除法，向零取整（IEC 61131-3 语义，与 Python 的 // 不同）"""
+    q = abs(a) // abs(b)
+    return q if (a >= 0) == (b >= 0) else -q
+
+
+def _div(a, b):
+    """类型未知时按运行时的值选择整数除法或实数除法"""
+    if isinstance(a, int) and isinstance(b, int):
+        return _idiv(a, b)
+    return a / b
+
+
+def _mod(a, b):
+    """MOD，结果符号与被除数相同"""
+    return a - b * _idiv(a, b)
+
+
+def _not(a):
+    return not a if isinstance(a, bool) else ~a
+
+
+def _to_int(value):
+    """REAL -> 整数按四舍五入（远离零），BOOL -> 0 / 1"""
+    if isinstance(value, float):
+        return int(math.floor(value + 0.5)) if value >= 0 else -int(math.floor(-value + 0.5))
+    return int(value)
+
+
+def _ix(index, low, high):
+    if not low <= index <= high:
+        raise IndexError(f"array index {index} out of bounds [{low}..{high}]")
+    return index - low
+
+
+def _for_range(start, end, step):
+    if step == 0:
+        raise ValueError("FOR loop with step 0")
+    return range(start, end + 1, step) if step > 0 else range(start, end - 1, step)
+
+
+def _limit(mn, value, mx):
+    return min(max(value, mn), mx)
+
+
+_RUNTIME = {
+    '__builtins__': {'abs': abs, 'min': min, 'max': max, 'bool': bool, 'float': float,
+                     'int': int, 'str': str, 'range': range},
+    'math': math,
+    '_idiv': _idiv, '_div': _div, '_mod': _mod, '_not': _not, '_to_int': _to_int, '_ix': _ix,
+    '_for_range': _for_range, '_limit': _limit, '_copy': copy.deepcopy, 'LoopLimitError': LoopLimitError,
+    'MAX_LOOP_ITERATIONS': MAX_LOOP_ITERATIONS,
+}
+
+
+############### compiled program ###############
+
+@dataclass
+class TracePoint:
+    """一个插桩点：一条语句或一个条件"""
+    kind: str                      # assign, call, if, elsif, else, case, for, while, until, exit, continue, return
+    line: int                      # 源码行号
+    text: str                      # 语句 / 条件的源码（压缩空白）
+    target: Optional[str] = None   # assign / call: 被写的变量名（功能块实例名）
+    slot: int = -1                 # assign / call: 被写的槽位
+    element: bool = False          # assign: 写的是数组元素或功能块成员；call 总是 True
+
+
+@dataclass
+class SlotInfo:
+    name: str
+    kind: Optional[str]            # BOOL, INT, REAL, STRING, ENUM, FB, None（未知）
+    dims: Optional[List[tuple]] = None     # 数组各维的 (low, high)
+    initial: Any = None
+    fb_type: Optional[str] = None  # 标准功能块实例的类型（TON, CTU, ...）
+
+
+def copy_value(value: Any) -> Any:
+    """
+    变量值的独立副本：数组深拷贝，功能块实例转成成员值的字典（快照和轨迹里都用字典表示实例），
+    标量原样返回
+    """
+    if isinstance(value, list):
+        return copy.deepcopy(value)
+    if isinstance(value, StandardFB):
+        return value.state()
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+class CompiledProgram:
+    """
+    编译结果。state 是按槽位排列的变量值列表（initial_state() 生成），
+    cycle(state, trace) 执行一个扫描周期；未插桩时 trace 参数被忽略。
+    """
+
+    def __init__(self, slots: List[SlotInfo], cycle: Callable, trace_points: List[TracePoint], python_source: str,
+                 reads_elapsed: bool = False):
+        self.slots = slots
+        self.names = [slot.name for slot in slots]
+        self.index = {slot.name.lower(): i for i, slot in enumerate(slots)}
+        self.cycle = cycle
+        self.trace_points = trace_points
+        self.python_source = python_source
+        self.fb_slots = [i for i, slot in enumerate(slots) if slot.fb_type]
+        # 程序读取了定时器的 ET：ET 每个周期都在变，不能快进
+        self.reads_elapsed = reads_elapsed
+
+    def initial_state(self, input_values: Dict[str, Any] = None, clock: VirtualClock = None) -> List[Any]:
+        """初始变量值（数组每次重新复制，功能块实例每次新建并接到 clock 上），input_values 覆盖同名变量"""
+        state = [STANDARD_FBS[slot.fb_type](clock) if slot.fb_type else
+                 copy.deepcopy(slot.initial) if slot.dims else slot.initial for slot in self.slots]
+        for name, value in (input_values or {}).items():
+            position = self.index.get(name.lower())
+            if position is not None and not self.slots[position].fb_type:
+                state[position] = value
+        return state
+
+    def snapshot(self, state: List[Any]) -> Dict[str, Any]:
+        """变量名 -> 值（数组复制一份，功能块实例为成员值的字典）"""
+        return {name: copy_value(value) for name, value in zip(self.names, state)}
+
+    def run(self, state: List[Any], cycles: int = 1, clock: VirtualClock = None, fast_forward: bool = False) -> int:
+        """
+        不记录步骤，连续执行 cycles 个扫描周期（每个周期后 clock 前进一个扫描时间），返回实际执行的周期数。
+        fast_forward=True 时，一个周期执行前后状态相同（定时器的 ET 除外）就说明在下一个定时器事件之前
+        每个周期都相同，直接把时钟拨到事件发生的那个周期。状态一直在变时检查的间隔逐次加倍
+        （最多 IDLE_CHECK_INTERVAL 个周期），忙碌的程序几乎不受影响
+        """
+        cycle = self.cycle
+        scan_time = clock.scan_time_ms if clock is not None else 0
+        if not fast_forward or self.reads_elapsed:
+            if self.fb_slots and clock is not None:
+                for _ in range(cycles):
+                    cycle(state, None)
+                    clock.now += scan_time
+            else:
+                # 没有功能块时没有代码读时钟，最后一次拨到位
+                for _ in range(cycles):
+                    cycle(state, None)
+                if clock is not None:
+                    clock.tick(cycles)
+            return cycles
+        executed = done = 0
+        interval = 1
+        while done < cycles:
+            busy = min(interval - 1, cycles - done - 1)     # 这些周期不检查，直接执行
+            if busy > 0:
+                executed += self.run(state, busy, clock)
+                done += busy
+            before = self.stable_state(state)
+            cycle(state, None)
+            executed += 1
+            done += 1
+            if clock is not None:
+                clock.tick()
+            if done < cycles and self.stable_state(state) == before:
+                skipped = min(self.idle_cycles(state, clock), cycles - done)
+                if clock is not None and skipped:
+                    idle_cycle = clock.now - scan_time
+                    clock.tick(skipped)
+                    for i in self.fb_slots:
+                        state[i].catch_up(idle_cycle, clock.now - scan_time)
+                done += skipped
+                interval = 1
+            else:
+                interval = min(interval * 2, IDLE_CHECK_INTERVAL)
+        return executed
+
+    def stable_state(self, state: List[Any]) -> List[Any]:
+        """比较周期前后状态用的值（功能块取 key()，不含随时间变化的 ET）"""
+        return [value.key() if isinstance(value, StandardFB) else
+                copy.deepcopy(value) if isinstance(value, list) else value for value in state]
+
+    def idle_cycles(self, state: List[Any], clock: VirtualClock = None) -> int:
+        """状态不再变化时，到下一个定时器事件之前可以跳过的周期数（没有事件时不限）"""
+        events = [state[i].next_event() for i in self.fb_slots] if clock is not None else []
+        events = [event for event in events if event is not None]
+        if not events:
+            return float('inf')
+        return clock.cycles_until(min(events))
+
+
+def compile_program(program: STProgram, trace: bool = False) -> CompiledProgram:
+    """
+    把 STParser 解析出的程序编译成 Python 函数
+
+    Raises:
+        STCompileError: 程序使用了不支持的结构（功能块实例、结构体、用户函数调用...）
+    """
+    if program.pou is None:
+        raise STCompileError("no PROGRAM / FUNCTION_BLOCK / FUNCTION found")
+    return _CodeGenerator(program, trace).compile()
+
+
+############### code generation ###############
+
+def _scalar_kind(type_name: Optional[str]) -> Optional[str]:
+    if type_name is None:
+        return None
+    upper = type_name.upper()
+    if upper == 'BOOL':
+        return 'BOOL'
+    if upper in INTEGER_TYPES:
+        return 'INT'
+    if upper in REAL_TYPES:
+        return 'REAL'
+    if upper in STRING_TYPES:
+        return 'STRING'
+    return None
+
+
+class _CodeGenerator:
+    """AST -> Python 源码。表达式都加括号，语义不依赖 Python 的优先级。"""
+
+    def __init__(self, program: STProgram, trace: bool):
+        self.program = program
+        self.source = program.source or program.raw_code
+        self.trace = trace
+        self.lines: List[str] = []
+        self.indent = 1
+        self.temp_count = 0
+        self.trace_points: List[TracePoint] = []
+        self.loop_depth = 0
+        self.reads_elapsed = False
+        # 枚举值（小写 -> 声明时的拼写），在生成的代码里是字符串常量
+        self.enum_types: Dict[str, EnumType] = {}
+        self.enum_values: Dict[str, str] = {}
+        for decl in program.unit.types:
+            if isinstance(decl.type, EnumType):
+                self.enum_types[decl.name.lower()] = decl.type
+                for value, _ in decl.type.values:
+                    self.enum_values[value.lower()] = value
+        self.slots: List[SlotInfo] = []
+        self.slot_index: Dict[str, int] = {}
+        self._declare_slots()
+
+    # --- variables ---
+
+    def _declare_slots(self):
+        for var in self.program.get_all_variables().values():
+            decl = var.decl
+            type_ref = decl.type if decl is not None else NamedType(var.var_type)
+            slot = self._slot_for(var.name, type_ref, var.initial_value, decl.init if decl is not None else None)
+            self.slot_index[var.name.lower()] = len(self.slots)
+            self.slots.append(slot)
+        if self.program.kind == 'FUNCTION' and self.program.name.lower() not in self.slot_index:
+            # 函数名本身是返回值变量
+            return_type = self.program.pou.return_type
+            kind = _scalar_kind(return_type.name) if isinstance(return_type, NamedType) else None
+            self.slot_index[self.program.name.lower()] = len(self.slots)
+            self.slots.append(SlotInfo(self.program.name, kind, initial=self._default(kind)))
+
+    def _slot_for(self, name, type_ref, initial_value, init) -> SlotInfo:
+        line = type_ref.span.line if type_ref.span else 0
+        if isinstance(type_ref, ArrayType):
+            dims = [(self._constant(low), self._constant(high)) for low, high in type_ref.dimensions]
+            element = type_ref.element_type
+            if not isinstance(element, NamedType) or self._named_kind(element.name) is None:
+                raise STCompileError(f"array '{name}' of non-elementary type is not supported", line)
+            kind = self._named_kind(element.name)
+            default = self._default(kind, element.name)
+            values = self._array_init(init, default) if init is not None else []
+            return SlotInfo(name, kind, dims, self._nested(dims, values, default))
+        if isinstance(type_ref, SubrangeType):
+            return SlotInfo(name, 'INT', initial=initial_value if initial_value is not None else 0)
+        if not isinstance(type_ref, NamedType):
+            raise STCompileError(f"variable '{name}' has an unsupported type", line)
+        if type_ref.name.upper() in STANDARD_FBS:
+            return SlotInfo(name, 'FB', fb_type=type_ref.name.upper())
+        kind = self._named_kind(type_ref.name)
+        if kind is None:
+            raise STCompileError(f"variable '{name}' of type {type_ref.name} is not supported "
+                                 f"(user-defined function block instances, structs)", line)
+        if kind == 'ENUM' and isinstance(initial_value, str):
+            initial_value = self.enum_values.get(initial_value.lower(), initial_value)
+        if initial_value is None:
+            initial_value = self._default(kind, type_ref.name)
+        return SlotInfo(name, kind, initial=initial_value)
+
+    def _named_kind(self, type_name: str) -> Optional[str]:
+        if type_name.lower() in self.enum_types:
+            return 'ENUM'
+        return _scalar_kind(type_name)
+
+    def _default(self, kind, type_name=None):
+        if kind == 'ENUM':
+            return self.enum_types[type_name.lower()].values[0][0]
+        return {'BOOL': False, 'INT': 0, 'REAL': 0.0, 'STRING': ''}.get(kind)
+
+    def _constant(self, expr):
+        if isinstance(expr, Literal) and isinstance(expr.value, (int, float)):
+            return expr.value
+        raise STCompileError("array bounds and initial values must be literals",
+                             expr.span.line if expr.span else 0)
+
+    def _array_init(self, init, default) -> List[Any]:
+        if not isinstance(init, ArrayLiteral):
+            raise STCompileError("array initial value must be an array literal", init.span.line if init.span else 0)
+        values = []
+        for element in init.elements:
+            if isinstance(element, RepeatedInit):
+                value = self._init_value(element.value) if element.value is not None else default
+                values.extend([value] * self._constant(element.count))
+            else:
+                values.append(self._init_value(element))
+        return values
+
+    def _init_value(self, expr):
+        if isinstance(expr, Literal):
+            return expr.value
+        if isinstance(expr, EnumLiteral):
+            return self.enum_values.get(expr.value.lower(), expr.value)
+        if isinstance(expr, Name) and expr.name.lower() in self.enum_values:
+            return self.enum_values[expr.name.lower()]
+        raise STCompileError("array initial value must be an array literal", expr.span.line if expr.span else 0)
+
+    def _nested(self, dims, values, default):
+        """按维度把扁平的初始值列表排成嵌套列表（行优先，不足的补默认值）"""
+        sizes = [high - low + 1 for low, high in dims]
+        flat = list(values[:math.prod(sizes)]) + [default] * max(0, math.prod(sizes) - len(values))
+
+        def build(offset, level):
+            if level == len(sizes) - 1:
+                return flat[offset:offset + sizes[level]]
+            stride = math.prod(sizes[level + 1:])
+            return [build(offset + i * stride, level + 1) for i in range(sizes[level])]
+
+        return build(0, 0)
+
+    # --- emitting ---
+
+    def emit(self, text: str):
+        self.lines.append('    ' * self.indent + text)
+
+    def temp(self, prefix: str) -> str:
+        self.temp_count += 1
+        return f"{prefix}{self.temp_count}"
+
+    def text(self, node) -> str:
+        if not node.span:
+            return ''
+        # "Motor".Q 去掉引号后是 Motor .Q，显示时合并回去
+        return _MEMBER_SPACE_RE.sub(r'\1.', ' '.join(source_segment(self.source, node.span).split()))
+
+    def trace_point(self, kind, node, text=None, target=None, slot=-1, element=False) -> int:
+        line = node.span.line if node.span else 0
+        self.trace_points.append(TracePoint(kind, line, text if text is not None else self.text(node),
+                                            target, slot, element))
+        return len(self.trace_points) - 1
+
+    def traced(self, kind, node, code, text=None, condition=True) -> str:
+        """插桩模式下把 code 包进 _trace 回调（回调返回值本身，条件先转成 bool 便于显示）"""
+        if not self.trace:
+            return code
+        point = self.trace_point(kind, node, text)
+        return f"_trace({point}, None, {f'bool({code})' if condition else code})"
+
+    def compile(self) -> CompiledProgram:
+        self.statements(self.program.pou.body)
+        body = self.lines or ['    pass']
+        python_source = 'def _cycle(s, _trace):\n' + '\n'.join(body) + '\n'
+        namespace = dict(_RUNTIME)
+        exec(compile(python_source, f"<st:{self.program.name}>", 'exec'), namespace)
+        return CompiledProgram(self.slots, namespace['_cycle'], self.trace_points, python_source, self.reads_elapsed)
+
+    # --- statements ---
+
+    def statements(self, statements):
+        start = len(self.lines)
+        for statement in statements:
+            self.statement(statement)
+        if len(self.lines) == start:
+            self.emit('pass')
+
+    def block(self, statements):
+        self.indent += 1
+        self.statements(statements)
+        self.indent -= 1
+
+    def statement(self, node):
+        line = node.span.line if node.span else 0
+        if isinstance(node, Assignment):
+            self.assignment(node)
+        elif isinstance(node, IfStatement):
+            for position, (condition, body) in enumerate(node.branches):
+                keyword = 'if' if position == 0 else 'elif'
+                test = self.traced('if' if position == 0 else 'elsif', condition, self.expr(condition))
+                self.emit(f"{keyword} {test}:")
+                self.block(body)
+            if node.else_body is not None:
+                self.emit('else:')
+                self.indent += 1
+                if self.trace:
+                    self.emit(f"_trace({self.trace_point('else', node.else_body[0] if node.else_body else node, 'ELSE')}, None, True)")
+                self.statements(node.else_body)
+                self.indent -= 1
+        elif isinstance(node, CaseStatement):
+            selector = self.temp('_v')
+            self.emit(f"{selector} = {self.traced('case', node.selector, self.expr(node.selector), condition=False)}")
+            for position, branch in enumerate(node.branches):
+                tests = []
+                for label in branch.labels:
+                    if isinstance(label, CaseRange) and self.kind(label.low) == 'ENUM':
+                        tests.append(f"({selector} in {self.enum_range(label)!r})")
+                    elif isinstance(label, CaseRange):
+                        tests.append(f"({self.expr(label.low)} <= {selector} <= {self.expr(label.high)})")
+                    else:
+                        tests.append(f"({selector} == {self.expr(label)})")
+                self.emit(f"{'if' if position == 0 else 'elif'} {' or '.join(tests)}:")
+                self.block(branch.body)
+            if node.else_body is not None:
+                if node.branches:
+                    self.emit('else:')
+                    self.block(node.else_body)
+                else:
+                    self.statements(node.else_body)
+        elif isinstance(node, ForStatement):
+            slot = self.variable_slot(node.variable, line)
+            loop_range = self.temp('_r')
+            step = self.expr(node.step) if node.step is not None else '1'
+            self.emit(f"{loop_range} = _for_range({self.expr(node.start)}, {self.expr(node.end)}, {step})")
+            self.emit(f"for s[{slot}] in {loop_range}:")
+            self.indent += 1
+            if self.trace:
+                point = self.trace_point('for', node, node.variable)
+                self.emit(f"_trace({point}, None, s[{slot}])")
+            self.loop_depth += 1
+            self.statements(node.body)
+            self.loop_depth -= 1
+            self.indent -= 1
+            # 正常结束后循环变量停在最后一个值 + 步长（EXIT 跳出时保持当前值）
+            self.emit('else:')
+            self.emit(f"    s[{slot}] = {loop_range}[-1] + {loop_range}.step if {loop_range} else {loop_range}.start")
+        elif isinstance(node, WhileStatement):
+            guard = self.temp('_g')
+            self.emit(f"{guard} = 0")
+            self.emit(f"while {self.traced('while', node.condition, self.expr(node.condition))}:")
+            self.loop_body(guard, node.body)
+        elif isinstance(node, RepeatStatement):
+            # 先执行一次循环体；CONTINUE 之后同样要检查 UNTIL 条件
+            guard, first = self.temp('_g'), self.temp('_f')
+            self.emit(f"{guard} = 0")
+            self.emit(f"{first} = True")
+            until = self.traced('until', node.condition, self.expr(node.condition))
+            self.emit(f"while {first} or not {until}:")
+            self.emit(f"    {first} = False")
+            self.loop_body(guard, node.body)
+        elif isinstance(node, (ExitStatement, ContinueStatement)):
+            if not self.loop_depth:
+                raise STCompileError("EXIT / CONTINUE outside of a loop", line)
+            keyword = 'break' if isinstance(node, ExitStatement) else 'continue'
+            if self.trace:
+                self.emit(f"_trace({self.trace_point('exit' if keyword == 'break' else 'continue', node)}, None, None)")
+            self.emit(keyword)
+        elif isinstance(node, ReturnStatement):
+            if self.trace:
+                self.emit(f"_trace({self.trace_point('return', node)}, None, None)")
+            self.emit('return')
+        elif isinstance(node, CallStatement):
+            self.fb_call(node, line)
+        else:
+            raise STCompileError(f"unsupported statement {type(node).__name__}", line)
+
+    def fb_call(self, node: CallStatement, line: int):
+        """功能块调用：实参写入输入成员，调用实例，再把 => 的输出赋给目标变量"""
+        call = node.call
+        slot = self.fb_slot(call.func, line)
+        if slot is None:
+            raise STCompileError(f"call '{self.text(call.func)}' is not supported", line)
+        info = self.slots[slot]
+        fb_class = STANDARD_FBS[info.fb_type]
+        inputs, outputs = [], []
+        for argument in call.args:
+            if argument.name is None:
+                raise STCompileError(f"positional arguments in the call of {info.name}", line)
+            member = argument.name.upper()
+            if argument.output:
+                if member not in fb_class.OUTPUTS:
+                    raise STCompileError(f"{info.fb_type} has no output {argument.name}", line)
+                outputs.append((member, argument))
+            elif member not in fb_class.INPUTS:
+                raise STCompileError(f"{info.fb_type} has no input {argument.name}", line)
+            else:
+                inputs.append((member, self.expr(argument.value)))
+        old = self.temp('_o') if self.trace else None
+        if self.trace:
+            self.emit(f"{old} = s[{slot}].state()")
+        for member, value in inputs:
+            self.emit(f"s[{slot}].{member} = {value}")
+        self.emit(f"s[{slot}]()")
+        if self.trace:
+            arguments = [f"{arg.name} {'=>' if arg.output else ':='} {self.text(arg.value)}" for arg in call.args]
+            text = f"{info.name}({', '.join(arguments)})"
+            point = self.trace_point('call', node, text, target=info.name, slot=slot, element=True)
+            self.emit(f"_trace({point}, {old}, s[{slot}].state())")
+        for member, argument in outputs:
+            target = Assignment(argument.value, Member(call.func, member, span=argument.span), span=argument.span)
+            self.assignment(target, text=f"{self.text(argument.value)} := {info.name}.{member}")
+
+    def fb_slot(self, node, line: int) -> Optional[int]:
+        """node 是标准功能块实例名时返回它的槽位"""
+        if not isinstance(node, Name):
+            return None
+        slot = self.slot_index.get(node.name.lower())
+        return slot if slot is not None and self.slots[slot].fb_type else None
+
+    def fb_member(self, node: Member, line: int) -> str:
+        slot = self.fb_slot(node.base, line)
+        if slot is None:
+            raise STCompileError(f"member access '{self.text(node)}' is not supported", line)
+        member = node.member.upper()
+        if STANDARD_FBS[self.slots[slot].fb_type].member_kind(member) is None:
+            raise STCompileError(f"{self.slots[slot].fb_type} has no member {node.member}", line)
+        if member == 'ET':
+            self.reads_elapsed = True
+        return f"s[{slot}].{member}"
+
+    def enum_range(self, label: CaseRange) -> tuple:
+        """枚举值的 CASE 范围（IDLE..RUN）按声明顺序展开"""
+        low, high = (self.expr(bound)[1:-1] for bound in (label.low, label.high))
+        for enum in self.enum_types.values():
+            values = [value for value, _ in enum.values]
+            if low in values and high in values:
+                return tuple(values[values.index(low):values.index(high) + 1])
+        raise STCompileError("CASE range over values of different types", label.span.line if label.span else 0)
+
+    def loop_body(self, guard, body):
+        self.indent += 1
+        self.emit(f"{guard} += 1")
+        self.emit(f"if {guard} > MAX_LOOP_ITERATIONS:")
+        self.emit(f"    raise LoopLimitError('loop exceeded {MAX_LOOP_ITERATIONS} iterations')")
+        self.loop_depth += 1
+        self.statements(body)
+        self.loop_depth -= 1
+        self.indent -= 1
+
+    def assignment(self, node: Assignment, text: str = None):
+        target = node.target
+        line = node.span.line if node.span else 0
+        if isinstance(target, Name):
+            slot = self.variable_slot(target.name, line)
+            if self.slots[slot].fb_type:
+                raise STCompileError(f"assignment to function block instance '{target.name}'", line)
+            location = f"s[{slot}]"
+        elif isinstance(target, Index) and isinstance(target.base, Name):
+            slot = self.variable_slot(target.base.name, line)
+            location = self.element(target, line)
+        elif isinstance(target, Member) and self.fb_slot(target.base, line) is not None:
+            slot = self.fb_slot(target.base, line)
+            location = self.fb_member(target, line)
+        else:
+            raise STCompileError(f"assignment to '{self.text(target)}' is not supported", line)
+        value = self.expr(node.value)
+        if isinstance(target, Name) and self.slots[slot].dims:
+            value = f"_copy({value})"    # 数组整体赋值是值拷贝
+        if not self.trace:
+            self.emit(f"{location} = {value}")
+            return
+        point = self.trace_point('assign', node, text, target=self.slots[slot].name, slot=slot,
+                                 element=isinstance(target, (Index, Member)))
+        new, old = self.temp('_n'), self.temp('_o')
+        self.emit(f"{new} = {value}")
+        self.emit(f"{old} = {location}")
+        self.emit(f"{location} = {new}")
+        self.emit(f"_trace({point}, {old}, {new})")
+
+    def variable_slot(self, name: str, line: int) -> int:
+        slot = self.slot_index.get(name.lower())
+        if slot is None:
+            raise STCompileError(f"unknown variable '{name}'", line)
+        return slot
+
+    def element(self, node: Index, line: int) -> str:
+        slot = self.variable_slot(node.base.name, line)
+        dims = self.slots[slot].dims
+        if not dims or len(node.indices) != len(dims):
+            raise STCompileError(f"'{node.base.name}' is not an array of {len(node.indices)} dimension(s)", line)
+        code = f"s[{slot}]"
+        for index, (low, high) in zip(node.indices, dims):
+            code += f"[_ix({self.expr(index)}, {low}, {high})]"
+        return code
+
+    # --- expressions ---
+
+    def kind(self, node) -> Optional[str]:
+        """表达式的静态类型（BOOL / INT / REAL / STRING / ENUM，推不出时为 None）"""
+        if isinstance(node, Literal):
+            if node.type_name in ('TIME', 'INT'):
+                return 'INT'
+            return _scalar_kind(node.type_name)
+        if isinstance(node, EnumLiteral):
+            return 'ENUM'
+        if isinstance(node, Name):
+            slot = self.slot_index.get(node.name.lower())
+            if slot is not None:
+                return self.slots[slot].kind
+            return 'ENUM' if node.name.lower() in self.enum_values else None
+        if isinstance(node, Index) and isinstance(node.base, Name):
+            slot = self.slot_index.get(node.base.name.lower())
+            return self.slots[slot].kind if slot is not None else None
+        if isinstance(node, Member):
+            slot = self.fb_slot(node.base, 0)
+            return STANDARD_FBS[self.slots[slot].fb_type].member_kind(node.member.upper()) if slot is not None else None
+        if isinstance(node, UnaryOp):
+            return self.kind(node.operand)
+        if isinstance(node, BinaryOp):
+            if node.op in COMPARISON_OPS:
+                return 'BOOL'
+            left, right = self.kind(node.left), self.kind(node.right)
+            if node.op in BITWISE_OPS:
+                return left if left == right else None
+            if 'REAL' in (left, right) or node.op == '**':
+                return 'REAL'
+            return 'INT' if left == right == 'INT' else None
+        if isinstance(node, Call) and isinstance(node.func, Name):
+            name = node.func.name.upper()
+            conversion = CONVERSION_RE.match(name)
+            if conversion:
+                return _scalar_kind(conversion.group(1))
+            if name == 'TRUNC':
+                return 'INT'
+            if name in MATH_FUNCTIONS or name == 'EXPT':
+                return 'REAL'
+            kinds = {self.kind(arg.value) for arg in node.args}
+            return kinds.pop() if len(kinds) == 1 else None
+        return None
+
+    def expr(self, node) -> str:
+        line = node.span.line if node.span else 0
+        if isinstance(node, Literal):
+            if isinstance(node.value, (bool, int, float, str)):
+                return repr(node.value)
+            raise STCompileError(f"literal {node.raw} is not supported", line)
+        if isinstance(node, EnumLiteral):
+            return repr(self.enum_values.get(node.value.lower(), node.value))
+        if isinstance(node, Name):
+            slot = self.slot_index.get(node.name.lower())
+            if slot is not None:
+                return f"s[{slot}]"
+            if node.name.lower() in self.enum_values:
+                return repr(self.enum_values[node.name.lower()])
+            raise STCompileError(f"unknown variable '{node.name}'", line)
+        if isinstance(node, Index) and isinstance(node.base, Name):
+            return self.element(node, line)
+        if isinstance(node, UnaryOp):
+            operand = self.expr(node.operand)
+            if node.op == 'NOT':
+                kind = self.kind(node.operand)
+                if kind == 'BOOL':
+                    return f"(not {operand})"
+                return f"(~{operand})" if kind == 'INT' else f"_not({operand})"
+            return f"({node.op}{operand})"
+        if isinstance(node, BinaryOp):
+            left, right = self.expr(node.left), self.expr(node.right)
+            if node.op in COMPARISON_OPS:
+                return f"({left} {COMPARISON_OPS[node.op]} {right})"
+            if node.op in BITWISE_OPS:
+                # & | ^ on two bools gives a bool, on integers the bitwise result (no short circuit needed:
+                # ST expressions have no side effects)
+                return f"({left} {BITWISE_OPS[node.op]} {right})"
+            if node.op == '/':
+                kinds = (self.kind(node.left), self.kind(node.right))
+                if kinds == ('INT', 'INT'):
+                    return f"_idiv({left}, {right})"
+                return f"({left} / {right})" if 'REAL' in kinds else f"_div({left}, {right})"
+            if node.op == 'MOD':
+                return f"_mod({left}, {right})"
+            return f"({left} {node.op} {right})"
+        if isinstance(node, Call):
+            return self.call(node, line)
+        if isinstance(node, Member):
+            return self.fb_member(node, line)
+        raise STCompileError(f"unsupported expression {type(node).__name__}", line)
+
+    def call(self, node: Call, line: int) -> str:
+        if not isinstance(node.func, Name):
+            raise STCompileError(f"call '{self.text(node.func)}' is not supported", line)
+        name = node.func.name.upper()
+        args = self.call_args(name, node, line)
+        conversion = CONVERSION_RE.match(name)
+        if conversion and len(args) == 1:
+            kind = _scalar_kind(conversion.group(1))
+            if kind == 'BOOL':
+                return f"bool({args[0]})"
+            if kind == 'INT':
+                return f"_to_int({args[0]})"
+            if kind == 'REAL':
+                return f"float({args[0]})"
+            if kind == 'STRING':
+                return f"str({args[0]})"
+        if name == 'ABS' and len(args) == 1:
+            return f"abs({args[0]})"
+        if name in ('MIN', 'MAX') and args:
+            return f"{name.lower()}({', '.join(args)})"
+        if name == 'LIMIT' and len(args) == 3:
+            return f"_limit({', '.join(args)})"
+        if name == 'SEL' and len(args) == 3:
+            return f"({args[2]} if {args[0]} else {args[1]})"
+        if name == 'MUX' and len(args) >= 2:
+            return f"({', '.join(args[1:])},)[{args[0]}]"
+        if name in MATH_FUNCTIONS and len(args) == 1:
+            return f"{MATH_FUNCTIONS[name]}({args[0]})"
+        if name == 'TRUNC' and len(args) == 1:
+            return f"int({args[0]})"
+        if name == 'EXPT' and len(args) == 2:
+            return f"({args[0]} ** {args[1]})"
+        if name == 'MOVE' and len(args) == 1:
+            return args[0]
+        raise STCompileError(f"function '{node.func.name}' is not supported", line)
+
+    def call_args(self, name: str, node: Call, line: int) -> List[str]:
+        if all(arg.name is None for arg in node.args):
+            return [self.expr(arg.value) for arg in node.args]
+        params = FUNCTION_PARAMS.get(name)
+        if params is None and len(node.args) == 1:
+            params = ['IN']
+        by_name = {arg.name.upper(): arg.value for arg in node.args if arg.name is not None and not arg.output}
+        if params is None or set(by_name) - set(params) or len(by_name) != len(node.args):
+            raise STCompileError(f"named arguments of '{node.func.name}' are not supported", line)
+        missing = [param for param in params if param not in by_name]
+        if missing:
+            raise STCompileError(f"'{node.func.name}' is missing argument {missing[0]}", line)
+        return [self.expr(by_name[param]) for param in params]
@@ -0,0 +1,220 @@
+"""
+ST Function Blocks - IEC 61131-3 标准功能块（定时器、计数器、边沿检测）
+功能块实例是有状态的对象，放在模拟器状态列表里；调用前生成的代码把实参写入输入成员，
+再调用实例更新输出。定时器读取虚拟时钟（每个扫描周期前进 scan_time_ms 毫秒），
+next_event() 给出输出下一次会变化的时间，模拟器据此快进空闲周期。
+时间值（PT、ET）和 TIME 字面量一样以毫秒为单位。
+"""
+
+from typing import Any, Dict, Optional
+
+# 默认扫描周期（毫秒）
+SCAN_TIME_MS = 100
+
+
+class VirtualClock:
+    """虚拟时钟：now 是当前周期开始时的时间（毫秒），每执行一个周期 tick() 一次"""
+
+    def __init__(self, scan_time_ms: int = SCAN_TIME_MS):
+        if scan_time_ms <= 0:
+            raise ValueError("scan time must be positive")
+        self.scan_time_ms = scan_time_ms
+        self.now = 0
+
+    def tick(self, cycles: int = 1):
+        self.now += cycles * self.scan_time_ms
+
+    def cycles_until(self, time_ms: int) -> int:
+        """从当前周期起，到第一个开始时间不早于 time_ms 的周期之间相隔的周期数"""
+        return max(0, -(-(time_ms - self.now) // self.scan_time_ms))
+
+
+class StandardFB:
+    """
+    标准功能块的基类。INPUTS / OUTPUTS 是成员名 -> 类型（BOOL / INT，TIME 按 INT 处理），
+    内部状态放在以下划线开头的属性里；key() 是判断“周期前后状态是否相同”用的状态（不含随时间变化的 ET
+    和最近一次调用的时间）
+    """
+    INPUTS: Dict[str, str] = {}
+    OUTPUTS: Dict[str, str] = {}
+    __slots__ = ('clock',)
+
+    _key_fields: tuple = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._key_fields = tuple(name for klass in reversed(cls.__mro__) for name in getattr(klass, '__slots__', ())
+                                if name not in ('clock', 'ET', '_called_at'))
+
+    def __init__(self, clock: Optional[VirtualClock] = None):
+        self.clock = clock
+        for member, kind in {**self.INPUTS, **self.OUTPUTS}.items():
+            setattr(self, member, False if kind == 'BOOL' else 0)
+
+    @classmethod
+    def member_kind(cls, member: str) -> Optional[str]:
+        return cls.OUTPUTS.get(member, cls.INPUTS.get(member))
+
+    def now(self) -> int:
+        return self.clock.now if self.clock is not None else 0
+
+    def state(self) -> Dict[str, Any]:
+        """输入和输出成员的当前值（显示和轨迹记录用）"""
+        return {member: getattr(self, member) for member in {**self.INPUTS, **self.OUTPUTS}}
+
+    def key(self) -> tuple:
+        return tuple(getattr(self, name) for name in self._key_fields)
+
+    def next_event(self) -> Optional[int]:
+        """输入保持不变时输出下一次变化的时间（毫秒），不会变化时为 None"""
+        return None
+
+    def catch_up(self, idle_cycle: int, last_cycle: int):
+        """
+        快进之后补上被跳过的调用：在空闲周期（开始时间 idle_cycle）里被调用过的实例，
+        状态更新为在最后一个被跳过的周期（开始时间 last_cycle）里调用之后的样子
+        """
+
+    def __call__(self):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{k}={v}' for k, v in self.state().items())})"
+
+
+class _Timer(StandardFB):
+    INPUTS = {'IN': 'BOOL', 'PT': 'INT'}
+    OUTPUTS = {'Q': 'BOOL', 'ET': 'INT'}
+    __slots__ = ('IN', 'PT', 'Q', 'ET', '_start', '_previous', '_running', '_called_at')
+
+    def __init__(self, clock: Optional[VirtualClock] = None):
+        super().__init__(clock)
+        self._start = 0
+        self._previous = False      # 上一次调用时的 IN
+        self._running = False       # 正在计时
+        self._called_at = None      # 最近一次调用时的时间
+
+    def next_event(self) -> Optional[int]:
+        return self._start + self.PT if self._running else None
+
+    def catch_up(self, idle_cycle: int, last_cycle: int):
+        # 事件之前输出不变，被跳过的调用只让 ET 继续增加
+        if self._called_at == idle_cycle and self._running:
+            self.ET = min(last_cycle - self._start, self.PT)
+            self._called_at = last_cycle
+
+
+class TON(_Timer):
+    """通电延时：IN 为 TRUE 持续 PT 后 Q 为 TRUE，IN 为 FALSE 时复位"""
+    __slots__ = ()
+
+    def __call__(self):
+        now = self._called_at = self.now()
+        if not self.IN:
+            self.Q, self.ET, self._running = False, 0, False
+        else:
+            if not self._previous:
+                self._start, self._running = now, True
+            self.ET = min(now - self._start, self.PT)
+            self.Q = self.ET >= self.PT
+            self._running = not self.Q
+        self._previous = self.IN
+
+
+class TOF(_Timer):
+    """断电延时：IN 为 TRUE 时 Q 为 TRUE，IN 变为 FALSE 后 Q 再保持 PT"""
+    __slots__ = ()
+
+    def __call__(self):
+        now = self._called_at = self.now()
+        if self.IN:
+            self.Q, self.ET, self._running = True, 0, False
+        elif self.Q:
+            if self._previous:
+                self._start, self._running = now, True
+            self.ET = min(now - self._start, self.PT)
+            self.Q = self.ET < self.PT
+            self._running = self.Q
+        self._previous = self.IN
+
+
+class TP(_Timer):
+    """脉冲：IN 的上升沿使 Q 输出一个长度为 PT 的脉冲（脉冲期间不可重触发）"""
+    __slots__ = ()
+
+    def __call__(self):
+        now = self._called_at = self.now()
+        if self.IN and not self._previous and not self._running:
+            self._start, self._running = now, True
+        if self._running:
+            self.ET = min(now - self._start, self.PT)
+            self._running = self.ET < self.PT
+        elif not self.IN:
+            self.ET = 0
+        self.Q = self._running
+        self._previous = self.IN
+
+
+class CTU(StandardFB):
+    """加计数：CU 上升沿 CV 加 1，R 复位；CV >= PV 时 Q 为 TRUE"""
+    INPUTS = {'CU': 'BOOL', 'R': 'BOOL', 'PV': 'INT'}
+    OUTPUTS = {'Q': 'BOOL', 'CV': 'INT'}
+    __slots__ = ('CU', 'R', 'PV', 'Q', 'CV', '_previous')
+
+    def __init__(self, clock: Optional[VirtualClock] = None):
+        super().__init__(clock)
+        self._previous = False
+
+    def __call__(self):
+        if self.R:
+            self.CV = 0
+        elif self.CU and not self._previous:
+            self.CV += 1
+        self.Q = self.CV >= self.PV
+        self._previous = self.CU
+
+
+class CTD(StandardFB):
+    """减计数：CD 上升沿 CV 减 1，LD 装载 PV；CV <= 0 时 Q 为 TRUE"""
+    INPUTS = {'CD': 'BOOL', 'LD': 'BOOL', 'PV': 'INT'}
+    OUTPUTS = {'Q': 'BOOL', 'CV': 'INT'}
+    __slots__ = ('CD', 'LD', 'PV', 'Q', 'CV', '_previous')
+
+    def __init__(self, clock: Optional[VirtualClock] = None):
+        super().__init__(clock)
+        self._previous = False
+
+    def __call__(self):
+        if self.LD:
+            self.CV = self.PV
+        elif self.CD and not self._previous:
+            self.CV -= 1
+        self.Q = self.CV <= 0
+        self._previous = self.CD
+
+
+class R_TRIG(StandardFB):
+    """上升沿检测：CLK 从 FALSE 变为 TRUE 的那次调用 Q 为 TRUE"""
+    INPUTS = {'CLK': 'BOOL'}
+    OUTPUTS = {'Q': 'BOOL'}
+    __slots__ = ('CLK', 'Q', '_previous')
+
+    def __init__(self, clock: Optional[VirtualClock] = None):
+        super().__init__(clock)
+        self._previous = False
+
+    def __call__(self):
+        self.Q = self.CLK and not self._previous
+        self._previous = self.CLK
+
+
+class F_TRIG(R_TRIG):
+    """下降沿检测：CLK 从 TRUE 变为 FALSE 的那次调用 Q 为 TRUE"""
+    __slots__ = ()
+
+    def __call__(self):
+        self.Q = not self.CLK and self._previous
+        self._previous = self.CLK
+
+
+STANDARD_FBS = {fb.__name__: fb for fb in (TON, TOF, TP, CTU, CTD, R_TRIG, F_TRIG)}
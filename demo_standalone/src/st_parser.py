@@ -1,12 +1,16 @@
 """
 ST Code Parser - 解析IEC-61131-3 Structured Text代码
-提取变量定义、控制流结构等信息，用于动画演示
+基于 st_ast 的词法分析 + 递归下降语法分析得到带源码位置的 AST，
+再从中提取变量定义、代码行等信息，用于动画演示和模拟执行
 """
 
 import re
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Any, Optional
 from dataclasses import dataclass, field
 
+from st_ast import (parse_st_cached, source_segment, CompilationUnit, POU, VarDecl, NamedType, EnumType,
+                    Literal, EnumLiteral, Name)
+
 
 @dataclass
 class Variable:
@@ -15,6 +19,7 @@ class Variable:
     var_type: str  # BOOL, INT, REAL等
     var_class: str  # INPUT, OUTPUT, VAR
     initial_value: Any = None
+    decl: Optional[VarDecl] = field(default=None, repr=False, compare=False)  # AST 中的声明
 
     def __repr__(self):
         return f"{self.name}: {self.var_type} = {self.initial_value}"
@@ -29,6 +34,10 @@ class STProgram:
     internals: List[Variable] = field(default_factory=list)
     code_lines: List[str] = field(default_factory=list)
     raw_code: str = ""
+    source: str = ""  # 实际解析的源码（SCL 引号标识符去掉了引号，位置与 raw_code 一一对应）
+    kind: str = ""  # PROGRAM, FUNCTION_BLOCK, FUNCTION
+    unit: Optional[CompilationUnit] = field(default=None, repr=False)  # 整个源码的 AST（所有 POU 和 TYPE）
+    pou: Optional[POU] = field(default=None, repr=False)  # 被模拟的 POU
 
     def get_all_variables(self) -> Dict[str, Variable]:
         """获取所有变量的字典"""
@@ -38,155 +47,186 @@ class STProgram:
         return all_vars
 
 
+# VAR_IN_OUT 在模拟时和输入一样由外部给值
+SECTION_CLASSES = {'VAR_INPUT': 'INPUT', 'VAR_IN_OUT': 'INPUT', 'VAR_OUTPUT': 'OUTPUT'}
+INTEGER_TYPES = {'SINT', 'INT', 'DINT', 'LINT', 'USINT', 'UINT', 'UDINT', 'ULINT',
+                 'BYTE', 'WORD', 'DWORD', 'LWORD', 'TIME', 'LTIME'}
+REAL_TYPES = {'REAL', 'LREAL'}
+STRING_TYPES = {'STRING', 'WSTRING'}
+
+# 注释（替换为同样多的换行，保持行号）；字符串原样保留，避免把其中的 (* 当成注释
+_COMMENT_OR_STRING_RE = re.compile(r"(?P<string>'(?:\$.|[^'$\n])*'|\"(?:\$.|[^\"$\n])*\")"
+                                   r"|\(\*.*?\*\)|/\*.*?\*/|//[^\n]*", re.DOTALL)
+# 变量声明行开头的名字列表（a, b : INT）
+_DECLARATION_RE = re.compile(r"^\s*([A-Za-z_]\w*(?:\s*,\s*[A-Za-z_]\w*)*)\s*:(?!=)", re.MULTILINE)
+
+
 class STParser:
     """ST代码解析器"""
 
     def __init__(self):
         self.program = STProgram()
 
-    def parse(self, st_code: str) -> STProgram:
-        """解析ST代码"""
+    def parse(self, st_code: str, entry_point: str = None) -> STProgram:
+        """
+        解析ST代码
+
+        Args:
+            st_code: ST 源码，可以包含多个 POU 和 TYPE 定义
+            entry_point: 要提取的 POU 名称，为空时自动选择（见 _select_pou）
+
+        Raises:
+            STSyntaxError: 源码有语法错误（带行列号）
+        """
         self.program = STProgram()
         self.program.raw_code = st_code
 
-        # 提取FUNCTION_BLOCK名称
-        self._extract_program_name(st_code)
+        # AST 按源码哈希缓存，模拟器 / 动画 / 转换工具解析同一份代码时共享
+        self.program.source = self._unquote_identifiers(st_code)
+        unit = parse_st_cached(self.program.source)
+        self.program.unit = unit
+        pou = self._select_pou(unit, entry_point)
+        if pou is None:
+            return self.program
+        self.program.pou = pou
+        self.program.name = pou.name
+        self.program.kind = pou.kind
 
         # 提取变量定义
-        self._extract_variables(st_code)
+        self._extract_variables(unit, pou, st_code)
 
         # 提取代码行
-        self._extract_code_lines(st_code)
+        self._extract_code_lines(pou, st_code)
 
         return self.program
 
-    def _extract_program_name(self, st_code: str):
-        """提取程序名称"""
-        match = re.search(r'FUNCTION_BLOCK\s+(\w+)', st_code, re.IGNORECASE)
-        if match:
-            self.program.name = match.group(1)
-
-    def _extract_variables(self, st_code: str):
-        """提取变量定义"""
-        # 提取VAR_INPUT段
-        self._extract_var_section(st_code, 'VAR_INPUT', 'INPUT')
-
-        # 提取VAR_OUTPUT段
-        self._extract_var_section(st_code, 'VAR_OUTPUT', 'OUTPUT')
-
-        # 提取VAR段（内部变量）
-        self._extract_var_section(st_code, r'VAR\b(?!_)', 'VAR')
-
-    def _extract_var_section(self, st_code: str, section_pattern: str, var_class: str):
-        """提取指定的变量段"""
-        # 匹配变量段
-        pattern = rf'{section_pattern}\s*(.*?)\s*END_VAR'
-        match = re.search(pattern, st_code, re.IGNORECASE | re.DOTALL)
-
-        if not match:
-            return
-
-        var_section = match.group(1)
-
-        # 解析每个变量声明
-        # 支持格式: variable_name : TYPE; 或 variable_name : TYPE := initial_value;
-        var_pattern = r'(\w+)\s*:\s*(\w+)(?:\s*:=\s*([^;]+))?'
-
-        for line in var_section.split('\n'):
-            # 移除注释
-            line = re.sub(r'\(\*.*?\*\)', '', line)
-            line = line.strip()
-
-            if not line:
-                continue
-
-            var_match = re.search(var_pattern, line)
-            if var_match:
-                var_name = var_match.group(1)
-                var_type = var_match.group(2)
-                initial_value = var_match.group(3)
-
-                # 解析初始值
-                if initial_value:
-                    initial_value = self._parse_value(initial_value.strip(), var_type)
+    @staticmethod
+    def _unquote_identifiers(st_code: str) -> str:
+        """
+        西门子 SCL 风格的 "Motor_Run" 引号标识符：引号里是声明过的变量名时把两个引号换成空格，
+        源码位置不变（raw_code 和各节点的 span 仍然对应原始源码）
+        """
+        without_comments = _COMMENT_OR_STRING_RE.sub(
+            lambda m: m.group() if m.group('string') else '\n' * m.group().count('\n'), st_code)
+        declared = {name.lower() for names in _DECLARATION_RE.findall(without_comments)
+                    for name in re.split(r'\s*,\s*', names)}
+
+        def unquote(match):
+            text = match.group()
+            if text.startswith('"') and text[1:-1].lower() in declared:
+                return f" {text[1:-1]} "
+            return text
+
+        return _COMMENT_OR_STRING_RE.sub(unquote, st_code)
+
+    def _select_pou(self, unit: CompilationUnit, entry_point: str = None) -> Optional[POU]:
+        """
+        选择被模拟的 POU：指定了 entry_point 就按名称查找；否则优先 PROGRAM，
+        其次是没有被其他 POU 实例化的最后一个 FUNCTION_BLOCK（被调用的 FB 一般写在前面）
+        """
+        if entry_point:
+            pou = unit.find_pou(entry_point)
+            if pou is None:
+                raise ValueError(f"POU '{entry_point}' not found")
+            return pou
+        for pou in unit.pous:
+            if pou.kind == 'PROGRAM':
+                return pou
+        instantiated = {decl.type.name.lower() for pou in unit.pous for decl in pou.declarations()
+                        if isinstance(decl.type, NamedType)}
+        blocks = [pou for pou in unit.pous if pou.kind == 'FUNCTION_BLOCK']
+        top_level = [pou for pou in blocks if pou.name.lower() not in instantiated]
+        if top_level or blocks:
+            return (top_level or blocks)[-1]
+        return unit.pous[0] if unit.pous else None
+
+    def _extract_variables(self, unit: CompilationUnit, pou: POU, st_code: str):
+        """提取变量定义（所有 VAR 段，一行声明多个变量时逐个展开）"""
+        enum_types = {decl.name.lower(): decl.type for decl in unit.types if isinstance(decl.type, EnumType)}
+        for block in pou.var_blocks:
+            var_class = SECTION_CLASSES.get(block.section, 'VAR')
+            for decl in block.decls:
+                if isinstance(decl.type, NamedType) and decl.type.length is None:
+                    var_type = decl.type.name
                 else:
-                    initial_value = self._get_default_value(var_type)
-
-                var = Variable(
-                    name=var_name,
-                    var_type=var_type,
-                    var_class=var_class,
-                    initial_value=initial_value
-                )
-
-                if var_class == 'INPUT':
-                    self.program.inputs.append(var)
-                elif var_class == 'OUTPUT':
-                    self.program.outputs.append(var)
-                else:
-                    self.program.internals.append(var)
-
-    def _parse_value(self, value_str: str, var_type: str) -> Any:
-        """解析变量值"""
-        value_str = value_str.strip()
-
+                    var_type = ' '.join(source_segment(st_code, decl.type.span).split())
+                initial_value = self._initial_value(decl, var_type, enum_types)
+                for name in decl.names:
+                    var = Variable(
+                        name=name,
+                        var_type=var_type,
+                        var_class=var_class,
+                        initial_value=initial_value,
+                        decl=decl
+                    )
+                    if var_class == 'INPUT':
+                        self.program.inputs.append(var)
+                    elif var_class == 'OUTPUT':
+                        self.program.outputs.append(var)
+                    else:
+                        self.program.internals.append(var)
+
+    def _initial_value(self, decl: VarDecl, var_type: str, enum_types: Dict[str, EnumType]) -> Any:
+        """声明里的初始值（常量字面量 / 枚举值），没有或无法静态求值时取类型默认值"""
+        init = decl.init
+        if isinstance(init, Literal):
+            return self._parse_value(init.value, var_type)
+        if isinstance(init, EnumLiteral):
+            return init.value
+        if isinstance(init, Name) and var_type.lower() in enum_types:
+            return init.name
+        return self._get_default_value(var_type, enum_types)
+
+    def _parse_value(self, value: Any, var_type: str) -> Any:
+        """把字面量的值转换成变量类型对应的 Python 值"""
+        var_type = var_type.upper()
         if var_type == 'BOOL':
-            return value_str.upper() in ['TRUE', '1']
-        elif var_type in ['INT', 'DINT', 'SINT', 'LINT']:
-            try:
-                return int(value_str)
-            except:
-                return 0
-        elif var_type in ['REAL', 'LREAL']:
-            try:
-                return float(value_str)
-            except:
-                return 0.0
-        else:
-            return value_str
-
-    def _get_default_value(self, var_type: str) -> Any:
+            return bool(value)
+        if var_type in INTEGER_TYPES and isinstance(value, (int, float)):
+            return int(value)
+        if var_type in REAL_TYPES and isinstance(value, (int, float)):
+            return float(value)
+        return value
+
+    def _get_default_value(self, var_type: str, enum_types: Dict[str, EnumType] = None) -> Any:
         """获取类型的默认值"""
-        if var_type == 'BOOL':
+        upper = var_type.upper()
+        if upper == 'BOOL':
             return False
-        elif var_type in ['INT', 'DINT', 'SINT', 'LINT']:
+        elif upper in INTEGER_TYPES:
             return 0
-        elif var_type in ['REAL', 'LREAL']:
+        elif upper in REAL_TYPES:
             return 0.0
+        elif upper.split('[')[0].strip() in STRING_TYPES:
+            return ''
+        elif enum_types and var_type.lower() in enum_types:
+            # 枚举变量默认取第一个枚举值
+            return enum_types[var_type.lower()].values[0][0]
         else:
             return None
 
-    def _extract_code_lines(self, st_code: str):
-        """提取代码行"""
-        # 找到最后一个END_VAR之后的代码
-        last_end_var = st_code.rfind('END_VAR')
-        if last_end_var == -1:
+    def _extract_code_lines(self, pou: POU, st_code: str):
+        """按 AST 中语句的位置提取代码行（去掉注释和空行，line_num 为源码行号）"""
+        if not pou.body:
             return
+        first, last = pou.body[0].span, pou.body[-1].span
+        lines = st_code.split('\n')
+        section = '\n'.join(lines[first.line - 1:last.end_line])
+        section = section[first.col - 1:]
+        section = _COMMENT_OR_STRING_RE.sub(
+            lambda m: m.group() if m.group('string') else '\n' * m.group().count('\n'), section)
 
-        # 找到END_FUNCTION_BLOCK
-        end_fb = st_code.rfind('END_FUNCTION_BLOCK')
-        if end_fb == -1:
-            code_section = st_code[last_end_var + 7:]
-        else:
-            code_section = st_code[last_end_var + 7:end_fb]
-
-        # 分割成行，移除注释和空行
-        lines = code_section.split('\n')
         cleaned_lines = []
-
-        for i, line in enumerate(lines):
-            # 移除注释
-            line = re.sub(r'\(\*.*?\*\)', '', line)
-            line = line.strip()
-
+        for offset, line in enumerate(section.split('\n')):
+            code = line.strip()
             # 跳过空行
-            if not line:
+            if not code:
                 continue
-
+            line_num = first.line + offset
             cleaned_lines.append({
-                'line_num': i + 1,
-                'code': line,
-                'original': lines[i]
+                'line_num': line_num,
+                'code': code,
+                'original': lines[line_num - 1]
             })
 
         self.program.code_lines = cleaned_lines
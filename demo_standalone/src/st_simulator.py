@@ -1,32 +1,30 @@
 """
 ST Code Simulator - ST代码执行模拟器
-模拟ST代码的逐步执行，记录每一步的状态变化
+模拟ST代码的逐步执行，记录每一步的状态变化。
+程序先由 st_compiler 编译成 Python 函数（每个扫描周期一次调用）；
+需要逐步记录时使用插桩版本，每条语句 / 每个条件回调一次，变化以增量形式记入 ExecutionTrace。
+定时器由虚拟时钟驱动（每个扫描周期前进 scan_time_ms），不记录步骤时可以快进空闲周期，
+按小时计的设备时间只需要执行状态发生变化的那些周期。
 """
 
-import re
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Optional, Sequence, Union
 from dataclasses import dataclass, field
-from copy import deepcopy
+from st_ast import parse_expression, Literal
 from src.st_parser import STParser, STProgram, Variable
-
-
-@dataclass
-class ExecutionStep:
-    """执行步骤"""
-    step_num: int
-    line_index: int  # 当前执行的代码行索引
-    code_line: str  # 当前执行的代码
-    variables: Dict[str, Any]  # 当前变量状态
-    description: str = ""  # 执行描述
-    changed_vars: List[str] = field(default_factory=list)  # 本步改变的变量
+from src.st_compiler import compile_program, CompiledProgram
+from src.st_function_blocks import VirtualClock, SCAN_TIME_MS
+from src.st_trace import ExecutionStep, ExecutionTrace, KEYFRAME_INTERVAL, MAX_TRACE_STEPS
 
 
 @dataclass
 class SimulationResult:
     """模拟执行结果"""
-    steps: List[ExecutionStep] = field(default_factory=list)
+    steps: Sequence[ExecutionStep] = field(default_factory=list)  # ExecutionTrace：按需重建每个步骤
     final_variables: Dict[str, Any] = field(default_factory=dict)
     total_steps: int = 0
+    cycles: int = 0  # 模拟的扫描周期数（含快进跳过的周期）
+    executed_cycles: int = 0  # 实际执行的周期数
+    elapsed_ms: int = 0  # 虚拟时钟走过的时间
     success: bool = True
     error_message: str = ""
 
@@ -34,60 +32,74 @@ class SimulationResult:
 class STSimulator:
     """ST代码执行模拟器"""
 
-    def __init__(self, program: STProgram):
+    def __init__(self, program: STProgram, keyframe_interval: int = KEYFRAME_INTERVAL,
+                 max_trace_steps: Optional[int] = MAX_TRACE_STEPS, scan_time_ms: int = SCAN_TIME_MS):
         self.program = program
+        self.clock = VirtualClock(scan_time_ms)  # 定时器的时间基准，每次 simulate 从 0 开始
         self.variables: Dict[str, Any] = {}
-        self.steps: List[ExecutionStep] = []
+        self.steps: Optional[ExecutionTrace] = None
         self.current_step = 0
-
-        # 嵌套IF分支控制状态 - 使用栈结构支持嵌套
-        self.if_stack: List[Dict[str, bool]] = []  # 每层IF的状态栈
-        # 每个栈元素包含: {'branch_taken': bool, 'skip_until_next': bool}
+        self.state: List[Any] = []  # 按槽位排列的变量值（见 CompiledProgram）
+        self.keyframe_interval = keyframe_interval
+        self.max_trace_steps = max_trace_steps
+
+        # 编译结果按是否插桩缓存，同一个模拟器多次 simulate 只编译一次
+        self._compiled: Dict[bool, CompiledProgram] = {}
+        self._batch = None
+
+    def compile(self, trace: bool = False) -> CompiledProgram:
+        """编译（或取缓存的）程序；trace=True 时每条语句回调一次"""
+        compiled = self._compiled.get(trace)
+        if compiled is None:
+            compiled = compile_program(self.program, trace=trace)
+            self._compiled[trace] = compiled
+        return compiled
 
     def initialize_variables(self, input_values: Dict[str, Any] = None):
-        """初始化变量"""
-        self.variables = {}
-
-        # 初始化所有变量为默认值
-        for var in self.program.inputs + self.program.outputs + self.program.internals:
-            self.variables[var.name] = var.initial_value
-
-        # 设置输入值
-        if input_values:
-            for name, value in input_values.items():
-                if name in self.variables:
-                    self.variables[name] = value
-
-    def simulate(self, input_values: Dict[str, Any] = None, max_cycles: int = 1) -> SimulationResult:
+        """初始化变量（默认值 / 初始值，再用输入值覆盖）"""
+        compiled = self.compile()
+        self.clock.now = 0
+        self.state = compiled.initial_state(input_values, self.clock)
+        self.variables = compiled.snapshot(self.state)
+
+    def simulate(self, input_values: Dict[str, Any] = None, max_cycles: int = 1,
+                 trace: bool = True, duration: Union[int, str, None] = None,
+                 fast_forward: bool = True) -> SimulationResult:
         """
         模拟执行ST代码
 
         Args:
             input_values: 输入变量的值
             max_cycles: 最大循环次数（PLC通常循环执行）
+            trace: 是否逐条语句记录执行步骤；False 时只记录初始化步骤和最终变量（最快）
+            duration: 按设备时间指定模拟长度（毫秒或 TIME 字面量，如 'T#2h'），代替 max_cycles
+            fast_forward: trace=False 时快进空闲周期（状态不变的周期直接跳到下一个定时器事件）
         """
         result = SimulationResult()
-        self.steps = []
         self.current_step = 0
 
         try:
-            # 初始化变量
-            self.initialize_variables(input_values)
+            compiled = self.compile(trace)
+            if duration is not None:
+                max_cycles = -(-self._duration_ms(duration) // self.clock.scan_time_ms)
 
-            # 记录初始状态
-            initial_step = ExecutionStep(
-                step_num=0,
-                line_index=-1,
-                code_line="[INITIALIZATION]",
-                variables=deepcopy(self.variables),
-                description="初始化变量"
-            )
-            self.steps.append(initial_step)
+            # 初始化变量，轨迹的第 0 步是初始状态
+            self.initialize_variables(input_values)
+            self.steps = ExecutionTrace(self.program, self.compile(True), self.state,
+                                        self.keyframe_interval, self.max_trace_steps)
 
             # 模拟执行多个扫描周期
-            for cycle in range(max_cycles):
-                self._execute_one_cycle(cycle)
+            if trace:
+                for cycle in range(max_cycles):
+                    self._execute_one_cycle(cycle)
+                result.executed_cycles = max_cycles
+            else:
+                result.executed_cycles = compiled.run(self.state, max_cycles, self.clock, fast_forward)
+            result.cycles = max_cycles
+            result.elapsed_ms = self.clock.now
 
+            self.variables = compiled.snapshot(self.state)
+            self.current_step = self.steps.last_step
             result.steps = self.steps
             result.final_variables = self.variables
             result.total_steps = len(self.steps)
@@ -99,259 +111,34 @@ class STSimulator:
 
         return result
 
-    def _execute_one_cycle(self, cycle_num: int):
-        """执行一个扫描周期"""
-        code_lines = self.program.code_lines
-
-        # 重置分支控制状态 - 清空栈
-        self.if_stack = []
-
-        for i, line_info in enumerate(code_lines):
-            code = line_info['code']
-            code_upper = code.strip().upper()
-
-            # 检查是否应该跳过这一行
-            if self._should_skip_line(code_upper):
-                continue
-
-            self.current_step += 1
-
-            # 执行前的变量状态
-            prev_vars = deepcopy(self.variables)
-
-            # 执行代码行
-            description = self._execute_line(code)
-
-            # 检测变化的变量
-            changed_vars = []
-            for var_name, value in self.variables.items():
-                if prev_vars.get(var_name) != value:
-                    changed_vars.append(var_name)
-
-            # 记录执行步骤
-            step = ExecutionStep(
-                step_num=self.current_step,
-                line_index=i,
-                code_line=code,
-                variables=deepcopy(self.variables),
-                description=description,
-                changed_vars=changed_vars
-            )
-            self.steps.append(step)
-
-    def _should_skip_line(self, code_upper: str) -> bool:
+    def simulate_batch(self, input_values: Dict[str, Any] = None, max_cycles: int = 1):
         """
-        判断是否应该跳过当前行
-        实现嵌套IF-ELSIF-ELSE的分支控制逻辑
+        向量化批量模拟（需要 NumPy）：input_values 的值可以是标量、每个场景一个值的序列，
+        或形状为 (max_cycles, 场景数) 的逐周期激励，见 st_batch.BatchSimulator
         """
-        # 遇到END_IF，弹出当前IF层的状态
-        if code_upper.startswith('END_IF'):
-            if self.if_stack:
-                self.if_stack.pop()
-            return False  # END_IF本身不跳过
-
-        # 遇到ELSIF或ELSE，不跳过（让_execute_line处理）
-        if code_upper.startswith('ELSIF') or code_upper.startswith('ELSE'):
-            # 重置当前层的skip标志
-            if self.if_stack:
-                self.if_stack[-1]['skip_until_next'] = False
-            return False
-
-        # 检查是否需要跳过当前行
-        # 只要有任何一层IF需要跳过，就跳过这一行
-        for if_state in self.if_stack:
-            if if_state['skip_until_next']:
-                return True
-
-        return False
-
-    def _execute_line(self, code: str) -> str:
-        """执行单行代码"""
-        code = code.strip()
-
-        # 跳过空行和注释
-        if not code or code.startswith('(*'):
-            return "跳过注释或空行"
-
-        # 处理赋值语句
-        if ':=' in code:
-            return self._execute_assignment(code)
-
-        # 处理IF语句
-        if code.upper().startswith('IF'):
-            return self._execute_if(code)
-
-        # 处理ELSIF
-        if code.upper().startswith('ELSIF'):
-            return self._execute_elsif(code)
-
-        # 处理ELSE
-        if code.upper().startswith('ELSE'):
-            if not self.if_stack:
-                return "ELSE语句错误：没有对应的IF"
-
-            # 获取当前IF层的状态
-            current_if = self.if_stack[-1]
-
-            if current_if['branch_taken']:
-                # 前面的分支已经执行，跳过ELSE块
-                current_if['skip_until_next'] = True
-                return "跳过ELSE分支（前面的分支已执行）"
-            else:
-                # 执行ELSE分支
-                current_if['branch_taken'] = True
-                current_if['skip_until_next'] = False
-                return "进入ELSE分支"
-
-        # 处理END_IF
-        if code.upper().startswith('END_IF'):
-            return "结束IF语句"
-
-        # 其他语句
-        return f"执行: {code}"
-
-    def _execute_assignment(self, code: str) -> str:
-        """执行赋值语句"""
-        # 解析赋值语句: variable := expression;
-        match = re.match(r'(\w+)\s*:=\s*(.+?);?$', code)
-        if not match:
-            return f"无法解析赋值语句: {code}"
-
-        var_name = match.group(1)
-        expression = match.group(2).strip().rstrip(';')
-
-        # 计算表达式
-        try:
-            value = self._evaluate_expression(expression)
-            old_value = self.variables.get(var_name)
-            self.variables[var_name] = value
-            return f"赋值: {var_name} = {value} (原值: {old_value})"
-        except Exception as e:
-            return f"赋值失败: {e}"
-
-    def _execute_if(self, code: str) -> str:
-        """执行IF语句"""
-        # 解析IF条件: IF condition THEN
-        match = re.match(r'IF\s+(.+?)\s+THEN', code, re.IGNORECASE)
-        if not match:
-            return f"无法解析IF语句: {code}"
-
-        condition = match.group(1).strip()
-
-        try:
-            result = self._evaluate_expression(condition)
-
-            # 压入新的IF状态到栈
-            if_state = {
-                'branch_taken': result,  # IF条件是否成立
-                'skip_until_next': not result  # 如果条件不成立，跳过IF块
-            }
-            self.if_stack.append(if_state)
-
-            return f"IF条件: {condition} = {result}"
-        except Exception as e:
-            return f"IF条件评估失败: {e}"
-
-    def _execute_elsif(self, code: str) -> str:
-        """执行ELSIF语句"""
-        if not self.if_stack:
-            return "ELSIF语句错误：没有对应的IF"
-
-        # 获取当前IF层的状态
-        current_if = self.if_stack[-1]
-
-        # 如果已经执行了某个分支，跳过所有后续分支
-        if current_if['branch_taken']:
-            current_if['skip_until_next'] = True
-            return "跳过ELSIF分支（前面的分支已执行）"
+        if self._batch is None:
+            from src.st_batch import BatchSimulator
+            self._batch = BatchSimulator(self.program)
+        return self._batch.simulate(input_values, max_cycles)
 
-        match = re.match(r'ELSIF\s+(.+?)\s+THEN', code, re.IGNORECASE)
-        if not match:
-            return f"无法解析ELSIF语句: {code}"
-
-        condition = match.group(1).strip()
-
-        try:
-            result = self._evaluate_expression(condition)
-
-            if result:
-                # ELSIF条件成立，执行ELSIF块内的代码
-                current_if['branch_taken'] = True
-                current_if['skip_until_next'] = False
-            else:
-                # ELSIF条件不成立，跳过ELSIF块内的代码
-                current_if['skip_until_next'] = True
-
-            return f"ELSIF条件: {condition} = {result}"
-        except Exception as e:
-            return f"ELSIF条件评估失败: {e}"
-
-    def _evaluate_expression(self, expr: str) -> Any:
-        """
-        计算表达式
-        支持: 变量名, 布尔值, 数字, 比较运算, 逻辑运算, 算术运算
-        """
-        expr = expr.strip()
-
-        # 替换ST关键字为Python关键字
-        expr = self._convert_st_to_python(expr)
-
-        # 替换变量名为实际值
-        expr = self._replace_variables(expr)
-
-        # 使用eval计算（注意：在生产环境中应该使用更安全的方法）
-        try:
-            result = eval(expr, {"__builtins__": {}}, {})
-            return result
-        except Exception as e:
-            raise ValueError(f"无法计算表达式 '{expr}': {e}")
-
-    def _convert_st_to_python(self, expr: str) -> str:
-        """将ST表达式转换为Python表达式"""
-        # TRUE/FALSE -> True/False
-        expr = re.sub(r'\bTRUE\b', 'True', expr, flags=re.IGNORECASE)
-        expr = re.sub(r'\bFALSE\b', 'False', expr, flags=re.IGNORECASE)
-
-        # AND -> and
-        expr = re.sub(r'\bAND\b', 'and', expr, flags=re.IGNORECASE)
-
-        # OR -> or
-        expr = re.sub(r'\bOR\b', 'or', expr, flags=re.IGNORECASE)
-
-        # NOT -> not
-        expr = re.sub(r'\bNOT\b', 'not', expr, flags=re.IGNORECASE)
-
-        # MOD -> %
-        expr = re.sub(r'\bMOD\b', '%', expr, flags=re.IGNORECASE)
-
-        return expr
-
-    def _replace_variables(self, expr: str) -> str:
-        """替换变量名为实际值"""
-        # 找到所有可能的变量名
-        var_names = re.findall(r'\b[a-zA-Z_]\w*\b', expr)
-
-        for var_name in var_names:
-            # 跳过Python关键字
-            if var_name in ['True', 'False', 'and', 'or', 'not']:
-                continue
-
-            # 替换变量
-            if var_name in self.variables:
-                value = self.variables[var_name]
-
-                # 根据类型格式化值
-                if isinstance(value, bool):
-                    value_str = 'True' if value else 'False'
-                elif isinstance(value, str):
-                    value_str = f"'{value}'"
-                else:
-                    value_str = str(value)
-
-                # 使用边界匹配替换，避免部分匹配
-                expr = re.sub(rf'\b{var_name}\b', value_str, expr)
-
-        return expr
+    def _execute_one_cycle(self, cycle_num: int):
+        """执行一个扫描周期（插桩版本，每条语句记录一个步骤）"""
+        self.compile(trace=True).cycle(self.state, self._record_step)
+        self.clock.tick()
+
+    @staticmethod
+    def _duration_ms(duration: Union[int, str]) -> int:
+        if isinstance(duration, str):
+            literal = parse_expression(duration)
+            if not isinstance(literal, Literal) or literal.type_name != 'TIME':
+                raise ValueError(f"duration {duration!r} is not a TIME literal")
+            return literal.value
+        return duration
+
+    def _record_step(self, point_index: int, old: Any, new: Any) -> Any:
+        """插桩回调：把本步的变化记入轨迹，返回 new（条件值原样交还给生成的代码）"""
+        self.steps.record(point_index, old, new)
+        return new
 
 
 # 测试代码
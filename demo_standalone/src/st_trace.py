@@ -0,0 +1,250 @@
+"""
+ST Execution Trace - 增量编码的执行轨迹
+只保存初始状态和每一步的变化（执行到的插桩点、被写的槽位和新值），
+每 keyframe_interval 步保存一个完整状态（关键帧），任意一步都可以从最近的关键帧重放得到。
+步数超过 max_steps 时丢弃最早的关键帧段，长时间多周期模拟占用的内存有上限。
+"""
+
+from array import array
+from collections import deque
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.st_compiler import copy_value
+from src.st_function_blocks import STANDARD_FBS
+
+# 每段（两个关键帧之间）的步数
+KEYFRAME_INTERVAL = 256
+# 轨迹最多保留的步数（按段丢弃最早的步骤），None 表示不限制
+MAX_TRACE_STEPS = 200000
+
+INITIALIZATION = -1  # 初始化步骤的插桩点编号
+
+# 插桩点类型 -> 步骤描述
+STEP_DESCRIPTIONS = {
+    'assign': "赋值: {text} = {new} (原值: {old})",
+    'call': "调用: {text} -> {new}",
+    'if': "IF条件: {text} = {new}",
+    'elsif': "ELSIF条件: {text} = {new}",
+    'else': "进入ELSE分支",
+    'case': "CASE选择: {text} = {new}",
+    'for': "FOR循环: {text} = {new}",
+    'while': "WHILE条件: {text} = {new}",
+    'until': "UNTIL条件: {text} = {new}",
+    'exit': "EXIT: 退出循环",
+    'continue': "CONTINUE: 进入下一次循环",
+    'return': "RETURN: 结束本周期",
+}
+
+
+@dataclass
+class ExecutionStep:
+    """执行步骤"""
+    step_num: int
+    line_index: int  # 当前执行的代码行索引
+    code_line: str  # 当前执行的代码
+    variables: Dict[str, Any]  # 当前变量状态
+    description: str = ""  # 执行描述
+    changed_vars: List[str] = field(default_factory=list)  # 本步改变的变量
+
+
+def _copy_state(state: List[Any]) -> List[Any]:
+    """复制状态（数组深拷贝，功能块实例转成字典，标量共享）"""
+    return [copy_value(value) for value in state]
+
+
+class _Segment:
+    """两个关键帧之间的一段步骤，按列存放"""
+    __slots__ = ('first_step', 'keyframe', 'points', 'slots', 'values', 'elements')
+
+    def __init__(self, first_step: int, keyframe: List[Any]):
+        self.first_step = first_step
+        self.keyframe = keyframe          # 本段第一步之前的完整状态
+        self.points = array('i')          # 插桩点编号（INITIALIZATION 为初始化步骤）
+        self.slots = array('i')           # 被写的槽位，-1 表示本步没有写变量
+        self.values: List[Any] = []       # 新值（数组元素 / 功能块赋值和调用时为整个变量的副本）/ 条件的值
+        self.elements: Dict[int, tuple] = {}   # 元素赋值和功能块调用：段内偏移 -> (旧值, 新值)
+
+    def __len__(self):
+        return len(self.points)
+
+
+class ExecutionTrace(Sequence):
+    """
+    一次模拟的执行轨迹。作为序列使用时 trace[i] 在需要时重建第 i 个保留的 ExecutionStep
+    （含完整变量快照）；顺序遍历时逐步重放，不重复计算。
+
+    Args:
+        program: STParser 解析出的程序（提供代码行）
+        compiled: 插桩编译的程序（提供插桩点和槽位名）
+        state: 模拟器的当前状态列表（轨迹记录时从中复制关键帧）
+    """
+    __slots__ = ('program', 'compiled', 'keyframe_interval', 'max_steps', '_live', '_segments', '_line_index')
+
+    def __init__(self, program, compiled, state: List[Any], keyframe_interval: int = KEYFRAME_INTERVAL,
+                 max_steps: Optional[int] = MAX_TRACE_STEPS):
+        self.program = program
+        self.compiled = compiled
+        self.keyframe_interval = keyframe_interval
+        self.max_steps = max_steps
+        self._live = state
+        self._line_index = {line['line_num']: i for i, line in enumerate(program.code_lines)}
+        self._segments = deque([_Segment(0, _copy_state(state))])
+        self._append(INITIALIZATION, -1, None)
+
+    # --- recording ---
+
+    def record(self, point_index: int, old: Any, new: Any):
+        """记录一步（在模拟器的插桩回调里调用；赋值已经写入状态之后）"""
+        point = self.compiled.trace_points[point_index]
+        if point.kind not in ('assign', 'call'):
+            self._append(point_index, -1, new)
+        elif point.element:
+            segment = self._segments[-1]
+            segment.elements[len(segment)] = (old, new)
+            self._append(point_index, point.slot, copy_value(self._live[point.slot]))
+        else:
+            self._append(point_index, point.slot, copy_value(new))
+
+    def _append(self, point_index: int, slot: int, value: Any):
+        segment = self._segments[-1]
+        segment.points.append(point_index)
+        segment.slots.append(slot)
+        segment.values.append(value)
+        if len(segment) >= self.keyframe_interval:
+            self._segments.append(_Segment(segment.first_step + len(segment), _copy_state(self._live)))
+            if self.max_steps is not None:
+                while len(self._segments) > 1 and len(self) > self.max_steps:
+                    self._segments.popleft()
+
+    # --- access ---
+
+    @property
+    def first_step(self) -> int:
+        """最早保留的步骤编号（超过 max_steps 后大于 0）"""
+        return self._segments[0].first_step
+
+    @property
+    def last_step(self) -> int:
+        segment = self._segments[-1]
+        return segment.first_step + len(segment) - 1
+
+    def __len__(self) -> int:
+        return self.last_step - self.first_step + 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("trace index out of range")
+        return self.step(self.first_step + index)
+
+    def __iter__(self) -> Iterator[ExecutionStep]:
+        for step_num, state, old, segment, offset in self._replay():
+            yield self._make_step(step_num, state, old, segment, offset)
+
+    def step(self, step_num: int) -> ExecutionStep:
+        """按步骤编号重建一个步骤"""
+        segment = self._segment_of(step_num)
+        offset = step_num - segment.first_step
+        state = _copy_state(segment.keyframe)
+        for position in range(offset):
+            self._apply(state, segment, position)
+        old = self._old_value(state, segment, offset)
+        self._apply(state, segment, offset)
+        return self._make_step(step_num, state, old, segment, offset)
+
+    def state_at(self, step_num: int) -> List[Any]:
+        """第 step_num 步执行后的状态（槽位列表）"""
+        segment = self._segment_of(step_num)
+        state = _copy_state(segment.keyframe)
+        for position in range(step_num - segment.first_step + 1):
+            self._apply(state, segment, position)
+        return state
+
+    def variables_at(self, step_num: int) -> Dict[str, Any]:
+        return self.compiled.snapshot(self.state_at(step_num))
+
+    def deltas(self) -> Iterator[Dict[str, Any]]:
+        """
+        顺序输出每一步的变化（不含完整快照），供动画页面在浏览器里重放：
+        {'step', 'line', 'code', 'description', 'changed', 'changes': {变量名: 新值}}
+        """
+        names = self.compiled.names
+        for step_num, state, old, segment, offset in self._replay():
+            line_index, code_line, description, changed = self._describe(state, old, segment, offset)
+            slot = segment.slots[offset]
+            yield {
+                'step': step_num,
+                'line': line_index,
+                'code': code_line,
+                'description': description,
+                'changed': changed,
+                'changes': {names[slot]: copy_value(state[slot])} if slot >= 0 else {},
+            }
+
+    # --- replay ---
+
+    def _segment_of(self, step_num: int) -> _Segment:
+        if not self.first_step <= step_num <= self.last_step:
+            raise IndexError(f"step {step_num} is not in the trace ({self.first_step}..{self.last_step})")
+        return self._segments[(step_num - self.first_step) // self.keyframe_interval]
+
+    def _replay(self):
+        """从最早的关键帧开始顺序重放，逐步产出 (步骤编号, 状态, 旧值, 段, 偏移)"""
+        state = None
+        for segment in self._segments:
+            if state is None:
+                state = _copy_state(segment.keyframe)
+            for offset in range(len(segment)):
+                old = self._old_value(state, segment, offset)
+                self._apply(state, segment, offset)
+                yield segment.first_step + offset, state, old, segment, offset
+
+    @staticmethod
+    def _apply(state: List[Any], segment: _Segment, offset: int):
+        slot = segment.slots[offset]
+        if slot >= 0:
+            state[slot] = copy_value(segment.values[offset])
+
+    @staticmethod
+    def _old_value(state: List[Any], segment: _Segment, offset: int) -> Any:
+        if offset in segment.elements:
+            return segment.elements[offset][0]
+        slot = segment.slots[offset]
+        return state[slot] if slot >= 0 else None
+
+    def _describe(self, state, old, segment: _Segment, offset: int):
+        point_index = segment.points[offset]
+        if point_index == INITIALIZATION:
+            return -1, "[INITIALIZATION]", "初始化变量", []
+        point = self.compiled.trace_points[point_index]
+        line_index = self._line_index.get(point.line, -1)
+        code_line = self.program.code_lines[line_index]['code'] if line_index >= 0 else point.text
+        if point.kind == 'assign':
+            text = point.text.split(':=', 1)[0].strip()
+            new = segment.elements[offset][1] if offset in segment.elements else state[point.slot]
+            changed = [point.target] if old != new else []
+        elif point.kind == 'call':
+            text, new = point.text, segment.elements[offset][1]
+            changed = [point.target] if old != new else []
+            outputs = STANDARD_FBS[self.compiled.slots[point.slot].fb_type].OUTPUTS
+            new = ', '.join(f"{member}={new[member]}" for member in outputs)
+        else:
+            text, new, changed = point.text, segment.values[offset], []
+        description = STEP_DESCRIPTIONS[point.kind].format(text=text, old=old, new=new)
+        return line_index, code_line, description, changed
+
+    def _make_step(self, step_num, state, old, segment, offset) -> ExecutionStep:
+        line_index, code_line, description, changed = self._describe(state, old, segment, offset)
+        return ExecutionStep(
+            step_num=step_num,
+            line_index=line_index,
+            code_line=code_line,
+            variables=self.compiled.snapshot(state),
+            description=description,
+            changed_vars=changed
+        )
@@ -0,0 +1,88 @@
+## Per-job latency of plcverif: cold plcverif-cli process per job vs. warm worker pool
+## (src/plcverif_daemon.py, config plcverif_daemon_cmd). Every job is an assertion check of one ST
+## file with the nusmv backend, so the numbers are dominated by tool startup on small programs.
+## The worker is an external program (see src/plcverif_daemon.py); without plcverif_daemon_cmd only
+## the plcverif-cli numbers are measured.
+from pathlib import Path
+import os
+import sys
+import statistics
+import time
+# Resolve the parent directory as an absolute path
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+
+from src.plcverif import backend_binary
+from src.plcverif_daemon import PlcverifDaemonPool
+from src.toolchain_runner import run_tool
+from src.workspace import get_workspace_manager
+
+
+def assertion_job_args(st_file, output_dir, case_id="bench"):
+    """plcverif-cli 参数（不含程序名）：nusmv 后端上的 assertion 检查"""
+    return [
+        "-id", case_id,
+        "-job", "verif",
+        "-job.backend", "nusmv",
+        "-job.backend.binary_path", backend_binary("nusmv"),
+        "-lf", "step7",
+        "-sourcefiles", st_file,
+        "-output", output_dir,
+        "-job.req", "assertion",
+        "-job.reporters", "html",
+    ]
+
+
+def latency_summary(label, latencies):
+    if not latencies:
+        return f"{label}: no successful jobs"
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return (f"{label}: {len(latencies)} jobs, mean {statistics.mean(latencies):.3f}s, "
+            f"median {statistics.median(latencies):.3f}s, p95 {p95:.3f}s")
+
+
+def benchmark(st_files, repeats=5, pool_size=1):
+    """依次以 CLI 和 worker 池运行同样的作业，打印并返回每个作业的延迟"""
+    jobs = [st_file for st_file in st_files for _ in range(repeats)]
+    latencies = {"cli": [], "daemon": []}
+
+    with get_workspace_manager().acquire("plcverif_bench") as workspace:
+        for index, st_file in enumerate(jobs):
+            output_dir = workspace.file(f"cli_{index}")
+            run = run_tool('plcverif-cli', ['plcverif-cli', *assertion_job_args(st_file, output_dir)])
+            if run.ok:
+                latencies["cli"].append(run.wall_time)
+
+        pool = PlcverifDaemonPool(size=pool_size)
+        if not pool.command:
+            print("plcverif_daemon_cmd is not configured, skipping the worker pool")
+            print(latency_summary("plcverif-cli (cold JVM per job)", latencies["cli"]))
+            return latencies
+        start_time = time.perf_counter()
+        pool.start()
+        warmup_time = time.perf_counter() - start_time
+        try:
+            for index, st_file in enumerate(jobs):
+                output_dir = workspace.file(f"daemon_{index}")
+                run = pool.run(assertion_job_args(st_file, output_dir))
+                if run is not None and run.ok:
+                    latencies["daemon"].append(run.wall_time)
+        finally:
+            pool.shutdown()
+
+    print(latency_summary("plcverif-cli (cold JVM per job)", latencies["cli"]))
+    print(latency_summary("plcverif worker pool (warm)", latencies["daemon"]))
+    print(f"worker pool warm-up: {warmup_time:.2f}s for {pool_size} worker(s), paid once per process")
+    if latencies["cli"] and latencies["daemon"]:
+        speedup = statistics.median(latencies["cli"]) / max(statistics.median(latencies["daemon"]), 1e-9)
+        print(f"median speedup: {speedup:.1f}x")
+    return latencies
+
+
+if __name__ == "__main__":
+    # usage: python evaluate/plcverif_daemon_benchmark.py file.st [file.st ...]
+    # (needs plcverif-cli, nuXmv and, for the warm numbers, an external worker in config.plcverif_daemon_cmd)
+    files = [os.path.abspath(path) for path in sys.argv[1:]] or \
+        [os.path.join(parent_dir, "simple-demo", "fixed", "st_file_20241202224136.ST")]
+    benchmark(files)
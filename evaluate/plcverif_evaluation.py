@@ -3,15 +3,15 @@ import os
 import sys
 import json
 import numpy as np
-import subprocess
 
 # Resolve the parent directory as an absolute path
 parent_dir = Path(__file__).resolve().parent.parent
 sys.path.append(str(parent_dir))
 
 # from LangChain.multi_agents import multi_agent_workflow
-from src.plcverif import plcverif_validation
-from src.compiler import matiec_compiler, rusty_compiler
+from src.plcverif import plcverif_validation, estimate_property_costs
+from src.verification_scheduler import BatchScheduler
+from src.compiler import compile_st_file, compile_many
 from evaluate.pretty_summary import summary
 from config import *
 from datetime import datetime
@@ -20,6 +20,8 @@ import config
 evaluate_compiler = getattr(config, 'evaluate_compiler', 'rusty')
 plcverif_verified_threshold = getattr(config, 'plcverif_verified_threshold', 0.80)
 plcverif_passed_threshold = getattr(config, 'plcverif_passed_threshold', 0.80)
+# wall-clock limit (seconds) for the verification step of a whole evaluation run, None = unlimited
+plcverif_batch_time_limit = getattr(config, 'plcverif_batch_time_limit', None)
 
 def load_json_from_file(file_path):
     """
@@ -44,13 +46,14 @@ def load_json_from_file(file_path):
     return None
 
 
-def single_file_plcverif_evaluation(st_file_path, folder_path, properties):
+def single_file_plcverif_evaluation(st_file_path, folder_path, properties, budget=None):
     """
         evaluate if generated st file actually pass.
         input value:
         st_file_path (for syntax checking)
         properties (for semantics checking)
         log_file_path (for storing temp content in checking process)
+        budget (VerificationBudget, time budget of this file given by the batch scheduler)
         
         output:
         bool: if syntax checking fails
@@ -62,19 +65,12 @@ def single_file_plcverif_evaluation(st_file_path, folder_path, properties):
     else:
         print(f"Directory already exists: {folder_path}")
     
-    try:
-        output = subprocess.check_output(
-            f'plc --check {st_file_path} 2>&1 | sed "s/\x1b\[[0-9;]*m//g"', 
-            shell=True, 
-            text=True
-        )
-        
-        if 'error' in output:
-            return False, None
-    except subprocess.CalledProcessError as e:
+    # syntax check with RuSTy (plc --check) regardless of evaluate_compiler, as before; it goes through the
+    # shared compile cache, so a file already compiled with RuSTy in step 1 is not recompiled
+    if not compile_st_file(st_file_path, "rusty").passed:
         return False, None
     
-    validation_result = plcverif_validation(st_file_path, properties, base_dir=f"{folder_path}")
+    validation_result = plcverif_validation(st_file_path, properties, base_dir=f"{folder_path}", budget=budget)
     
     validation_statistics = {              # Statistics for different property validation statuses
         "success": 0,                # Count of properties that passed validation
@@ -171,26 +167,38 @@ def plcverif_evaluation(input_files, base_dir):
             
             
     # step 1: compiling using compiler
+    # all files are checked in one go: cache hits are skipped and the rest share batched compiler invocations
+    compile_results = compile_many([valid_input_file["st_file_path"] for valid_input_file in valid_input_files],
+                                   "matiec" if evaluate_compiler == "matiec" else "rusty")
     for valid_input_file in valid_input_files:
-        if evaluate_compiler == "matiec":
-            compile_result = matiec_compiler(valid_input_file["st_file_path"])
-        elif evaluate_compiler == "rusty":
-            compile_result = rusty_compiler(valid_input_file["st_file_path"])
-        else:
-            compile_result = rusty_compiler(valid_input_file["st_file_path"])
-            
-        if compile_result:
+        if compile_results[valid_input_file["st_file_path"]].passed:
             compilation_validation_statistics["compilation_success"] += 1
             verif_files.append(valid_input_file)
     
         # step 2: automated verification
-    for verif_file in verif_files:
-        verif_result = single_file_plcverif_evaluation(verif_file["st_file_path"], verif_file["eval_folder_path"], verif_file["properties"])
+    # files run cheapest first under one wall-clock limit (plcverif_batch_time_limit); each file gets a
+    # share of the remaining time and properties cut short by it are reported as budget exhausted
+    scheduler = BatchScheduler(plcverif_batch_time_limit)
+    verif_results = scheduler.run(
+        verif_files,
+        lambda verif_file, budget: single_file_plcverif_evaluation(
+            verif_file["st_file_path"], verif_file["eval_folder_path"], verif_file["properties"], budget),
+        estimate=lambda verif_file: sum(estimate_property_costs(
+            verif_file["st_file_path"], list(enumerate(verif_file["properties"], start=1))).values()),
+        name=lambda verif_file: verif_file["st_file_path"])
+    for verif_result in verif_results:
         if verif_result is not None:
             compilation_validation_statistics["verified"] += 1
             if verif_result == True:
                 compilation_validation_statistics["validation_satisfied"] += 1
-           
+
+    schedule = scheduler.summary()
+    print(f"Verification took {schedule['elapsed']}s (limit {schedule['time_limit']}), "
+          f"{schedule['budget_exhausted_properties']} properties inconclusive because of the time budget, "
+          f"{len(schedule['skipped_cases'])} files not started")
+    with open(os.path.join(base_dir, "verification_schedule.json"), 'w') as f:
+        json.dump(schedule, f, indent=4)
+
     summary(compilation_validation_statistics, base_dir=base_dir)     
 
 
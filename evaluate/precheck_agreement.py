@@ -0,0 +1,102 @@
+## Agreement between the in-process ST pre-check (src/st_precheck.py) and the real compiler.
+## The pre-check may only reject what the compiler rejects too: "false rejects" (pre-check fails,
+## compiler passes) must stay at zero, "misses" (pre-check passes, compiler fails) are expected
+## and only cost the compile that would have happened anyway.
+from pathlib import Path
+import os
+import sys
+import glob
+import time
+# Resolve the parent directory as an absolute path
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+
+from src.compiler import compile_many
+from src.st_precheck import precheck_st_file
+import config
+evaluate_compiler = getattr(config, 'evaluate_compiler', 'rusty')
+
+ST_FILE_PATTERNS = ("*.st", "*.ST", "*.scl", "*.SCL")
+
+
+def collect_st_files(paths):
+    """展开目录，返回 ST 文件列表"""
+    st_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for pattern in ST_FILE_PATTERNS:
+                st_files.extend(glob.glob(os.path.join(path, "**", pattern), recursive=True))
+        elif os.path.isfile(path):
+            st_files.append(path)
+    return sorted(set(st_files))
+
+
+def precheck_agreement(input_files, base_dir=None):
+    """
+    Compare pre-check and compiler verdicts on the same files.
+
+    input_files follows the evaluation protocol (see readme.md): a list of {"st_file_path": ...}
+    dicts; plain path strings are accepted as well.
+    """
+    st_files = [item["st_file_path"] if isinstance(item, dict) else item for item in input_files]
+    statistics = {
+        "total": len(st_files),
+        "both_pass": 0,
+        "both_fail": 0,
+        "false_reject": 0,   # pre-check fails, compiler passes
+        "miss": 0,           # pre-check passes, compiler fails
+        "skipped": 0,        # pre-check could not model the file and deferred to the compiler
+    }
+    disagreements = []
+
+    start_time = time.perf_counter()
+    prechecks = {st_file: precheck_st_file(st_file, evaluate_compiler) for st_file in st_files}
+    precheck_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    compiles = compile_many(st_files, "matiec" if evaluate_compiler == "matiec" else "rusty")
+    compile_time = time.perf_counter() - start_time
+
+    for st_file in st_files:
+        precheck, compiled = prechecks[st_file], compiles[st_file]
+        if precheck.output.startswith("precheck skipped"):
+            statistics["skipped"] += 1
+        if precheck.passed and compiled.passed:
+            statistics["both_pass"] += 1
+        elif not precheck.passed and not compiled.passed:
+            statistics["both_fail"] += 1
+        elif not precheck.passed:
+            statistics["false_reject"] += 1
+            disagreements.append(f"FALSE REJECT {st_file}\n{precheck.output}")
+        else:
+            statistics["miss"] += 1
+            disagreements.append(f"MISS {st_file}\n{compiled.output}")
+
+    total = max(statistics["total"], 1)
+    agreed = statistics["both_pass"] + statistics["both_fail"]
+    output_str = (
+        f"Total files: {statistics['total']}\n"
+        f"Agreement: {agreed}/{statistics['total']} ({agreed / total:.1%})\n"
+        f"Both pass: {statistics['both_pass']}, both fail: {statistics['both_fail']}\n"
+        f"False rejects (precheck fail, compiler pass): {statistics['false_reject']}\n"
+        f"Misses (precheck pass, compiler fail): {statistics['miss']}\n"
+        f"Skipped by precheck (unsupported constructs): {statistics['skipped']}\n"
+        f"Precheck time: {precheck_time * 1000:.1f} ms total, "
+        f"{precheck_time * 1000 / total:.2f} ms/file\n"
+        f"Compiler time ({evaluate_compiler}): {compile_time:.2f} s total\n"
+    )
+    print(output_str)
+    for disagreement in disagreements:
+        print(disagreement + "\n")
+
+    if base_dir:
+        os.makedirs(base_dir, exist_ok=True)
+        with open(os.path.join(base_dir, "precheck_agreement.txt"), "w") as f:
+            f.write(output_str + "\n" + "\n\n".join(disagreements))
+    return statistics
+
+
+if __name__ == "__main__":
+    # usage: python evaluate/precheck_agreement.py [st files or folders ...]
+    paths = sys.argv[1:] or [os.path.join(parent_dir, "simple-demo")]
+    precheck_agreement(collect_st_files(paths))
@@ -4,6 +4,8 @@
 ## note that this way follow the origin LLM4PLC's idea, using (maybe fine-tuned) LLM to translate ST to SMV for verification.
 ## therefore, the incosistency between st and smv model could affect the accuracy of evaluation.
 ## (however, to reproduce it, such way is necessary.)
+## by default the model is now produced by the deterministic translator of src/st_to_smv.py; the LLM
+## translation is used for programs outside its subset (smv_llm_fallback) or when smv_translator = "llm".
 
 import sys
 from datetime import datetime
@@ -18,11 +20,35 @@ LLM4PLC_parent_dir = f"{parent_dir}/LLM4PLC_reproduce"
 
 from src.tools import generate_smv_compatible_ltl_ctl_model, extract_section
 from src.simple_call_llm import call_llm
-from src.nuXmv import nuXmv_model_checker
-from src.compiler import rusty_compiler, matiec_compiler
+from src.nuXmv import nuXmv_check_specs
+from src.smv_model import SmvTranslationError
+from src.st_to_smv import translate_st
+from src.compiler import compile_many
 from evaluate.pretty_summary import summary
 import config
 evaluate_compiler = getattr(config, 'evaluate_compiler', None)
+smv_translator = getattr(config, 'smv_translator', "native")
+smv_llm_fallback = getattr(config, 'smv_llm_fallback', True)
+
+# SMV section keyword per spec kind
+SPEC_KEYWORDS = {"invar": "INVARSPEC", "ltl": "LTLSPEC", "ctl": "SPEC"}
+
+def llm_scl2smv(scl_content, properties_str):
+    """LLM4PLC 方式：由 LLM 把 ST 翻译成 SMV 模型（属性随后直接追加）"""
+    # Call LLM to generate SMV file based on SCL content
+    verification_sys_msg_path = f"{LLM4PLC_parent_dir}/prompts/phase2/task3_scl2smv"
+    with open(verification_sys_msg_path, 'r') as verification_sys_file:
+        sys_msg = verification_sys_file.read()
+    print(f"System message for SMV generation: {sys_msg}")
+
+    input_msg = f"scl_content is {scl_content} \
+                    properties to be validated: {properties_str} \
+                your generated smv file should include the meet the variable definition of these properties, and include PLC_START and PLC_END state. \
+                You only need to generate smv model, these properties will be manually directly added after your smv model "
+
+    smv_content = call_llm(sys_msg, input_msg)
+    return extract_section(smv_content, "[START_SMV]", "[END_SMV]")
+
 
 def single_file_smv_evaluation(st_file_path, folder_path, properties):
     """
@@ -51,31 +77,45 @@ def single_file_smv_evaluation(st_file_path, folder_path, properties):
     smv_file_path = os.path.join(folder_path, f"smv_verification.smv")
     log_file_path = os.path.join(folder_path, f"log.txt")
 
-    # Call LLM to generate SMV file based on SCL content
-    verification_sys_msg_path = f"{LLM4PLC_parent_dir}/prompts/phase2/task3_scl2smv"
-    with open(verification_sys_msg_path, 'r') as verification_sys_file:
-        sys_msg = verification_sys_file.read()
-    print(f"System message for SMV generation: {sys_msg}")
-    
-    
+    program = None
+    if smv_translator == "native":
+        try:
+            # property constants sharpen the inferred value ranges of the model
+            hints = [param for property in properties
+                     for param in property.get("property", {}).get("pattern_params", {}).values()]
+            program = translate_st(scl_content, range_hints=hints)
+        except SmvTranslationError as e:
+            if not smv_llm_fallback:
+                with open(log_file_path, 'w') as log_file:
+                    log_file.write(f"ST to SMV translation failed: {e}")
+                return None
+            print(f"Native ST to SMV translation failed ({e}), falling back to LLM translation")
+
     properties_str = "\n"
+    specs, kinds = [], []
     if len(properties) > 0:
         if properties == "":
             properties = []
-        for property in properties:     # by default the plcverif formulas are all CTL specs.
-            prop_str = generate_smv_compatible_ltl_ctl_model(property)
+        for property in properties:     # specs are tagged invar / ltl / ctl so that nuXmv can pick an engine per spec
+            try:
+                # parameters are typed against the translated model (word constants, folded range checks)
+                prop_str, kind = generate_smv_compatible_ltl_ctl_model(
+                    property, with_kind=True, param_converter=program.translate_expression if program else None)
+            except SmvTranslationError as e:
+                # the property refers to something the program does not declare: not verifiable on this model
+                with open(log_file_path, 'w') as log_file:
+                    log_file.write(f"Property translation failed: {e}\n{property}")
+                return None
             if prop_str:
-                properties_str += "SPEC\n" + prop_str + "\n"
-            
-    
-    input_msg = f"scl_content is {scl_content} \
-                    properties to be validated: {properties_str} \
-                your generated smv file should include the meet the variable definition of these properties, and include PLC_START and PLC_END state. \
-                You only need to generate smv model, these properties will be manually directly added after your smv model "
+                properties_str += SPEC_KEYWORDS[kind] + "\n" + prop_str + "\n"
+                specs.append(prop_str)
+                kinds.append(kind)
+
+    if program is not None:
+        smv_code = program.text
+    else:
+        smv_code = llm_scl2smv(scl_content, properties_str)
 
-    smv_content = call_llm(sys_msg, input_msg)
-    smv_code = extract_section(smv_content, "[START_SMV]", "[END_SMV]")
-    
     # # Add properties content after smv_code if properties is not an empty string 
     # # if properties:  # Only append if properties is provided
     smv_code += properties_str
@@ -88,8 +128,9 @@ def single_file_smv_evaluation(st_file_path, folder_path, properties):
     print(f"Generated SMV file saved at: {smv_file_path}")
     
 
-    # Run nuXmv verification
-    verification_result = nuXmv_model_checker(smv_code, smv_file_path)
+    # Run nuXmv verification: the model is built once in an interactive session, then every spec is checked on it
+    verification_result = nuXmv_check_specs(smv_code, smv_file_path, specs, kinds,
+                                            infinite=program.infinite if program else None)
     
     with open(log_file_path, 'w') as log_file:
         log_file.write(verification_result)
@@ -151,15 +192,11 @@ def smv_evaluation(input_files, base_dir):
             compilation_validation_statistics["valid_inputs"] += 1
             
     # step 1: compiling using compiler
+    # all files are checked in one go: cache hits are skipped and the rest share batched compiler invocations
+    compile_results = compile_many([input_file["st_file_path"] for input_file in input_files],
+                                   "matiec" if evaluate_compiler == "matiec" else "rusty")
     for input_file in input_files:
-        if evaluate_compiler == "matiec":
-            compile_result = matiec_compiler(input_file["st_file_path"])
-        elif evaluate_compiler == "rusty":
-            compile_result = rusty_compiler(input_file["st_file_path"])
-        else:
-            compile_result = rusty_compiler(input_file["st_file_path"])
-            
-        if compile_result:
+        if compile_results[input_file["st_file_path"]].passed:
             compilation_validation_statistics["compilation_success"] += 1
             verif_files.append(input_file)
     
@@ -15,9 +15,9 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parent))
 
 from src.simple_plc_generator import SimplePLCGenerator
+from src.st_ast import parse_st_cached, source_segment, Span
 from datetime import datetime
 import os
-import re
 
 print("=" * 80)
 print("🏢 真实示例：简单电梯控制系统")
@@ -164,21 +164,31 @@ print("【步骤4】转换为OpenPLC兼容的PROGRAM格式")
 print("-" * 80)
 
 def convert_to_openplc_format(st_code, program_name="ElevatorControl"):
-    """转换FUNCTION_BLOCK为OpenPLC的PROGRAM格式"""
+    """转换FUNCTION_BLOCK为OpenPLC的PROGRAM格式（按AST中的声明和语句位置截取源码）"""
+    unit = parse_st_cached(st_code)
+    blocks = [pou for pou in unit.pous if pou.kind == 'FUNCTION_BLOCK']
+    fb = blocks[-1] if blocks else unit.pous[0]
 
-    # 提取变量声明
-    var_input_match = re.search(r'VAR_INPUT(.*?)END_VAR', st_code, re.DOTALL)
-    var_input = var_input_match.group(1).strip() if var_input_match else ""
+    def declarations(*sections):
+        return "\n".join("    " + source_segment(st_code, decl.span)
+                         for block in fb.var_blocks if block.section in sections
+                         for decl in block.decls)
 
-    var_output_match = re.search(r'VAR_OUTPUT(.*?)END_VAR', st_code, re.DOTALL)
-    var_output = var_output_match.group(1).strip() if var_output_match else ""
+    # 提取变量声明
+    var_input = declarations('VAR_INPUT', 'VAR_IN_OUT')
+    var_output = declarations('VAR_OUTPUT')
+    var_internal = declarations('VAR', 'VAR_TEMP', 'VAR_STAT')
 
-    var_match = re.search(r'(?<!VAR_INPUT\s)(?<!VAR_OUTPUT\s)VAR\s(.*?)END_VAR', st_code, re.DOTALL)
-    var_internal = var_match.group(1).strip() if var_match else ""
+    # TYPE定义（枚举、结构体）原样保留在PROGRAM之前
+    types = "\n".join(f"TYPE {source_segment(st_code, decl.span).rstrip(';')}; END_TYPE" for decl in unit.types)
 
-    # 提取主逻辑
-    logic_match = re.search(r'END_VAR\s*(.*?)\s*END_FUNCTION_BLOCK', st_code, re.DOTALL)
-    logic = logic_match.group(1).strip() if logic_match else ""
+    # 提取主逻辑：第一条语句到最后一条语句（含语句间的注释）
+    logic = ""
+    if fb.body:
+        first, last = fb.body[0].span, fb.body[-1].span
+        logic = source_segment(st_code, Span(first.line, first.col, last.end_line, last.end_col))
+        if not logic.rstrip().endswith(';'):
+            logic += ';'
 
     # 构建OpenPLC格式
     openplc_code = f"""(* ================================================================
@@ -189,6 +199,8 @@ def convert_to_openplc_format(st_code, program_name="ElevatorControl"):
    Description: 简单2层电梯控制系统
    ================================================================ *)
 
+{types}
+
 PROGRAM {program_name}
 VAR
     (* 输入变量 - 映射到OpenPLC物理输入 *)
@@ -1,5 +1,6 @@
 ## valid compilers for evaluate part, which is independent with the fixing part.
-## only return True or False indicating that compilation passed(True) or failed(False)
+## rusty_compiler / matiec_compiler only return True or False indicating that compilation passed(True) or failed(False);
+## compile_st_file additionally returns the compiler output parsed into structured diagnostics.
 ## however, if compiler donnot exist, 
 import subprocess
 import sys
@@ -10,6 +11,94 @@ sys.path.append(str(parent_dir))
 
 import config
 import os
+import re
+import time
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Dict
+from src.rusty_pool import get_rusty_pool, DOCKER_EXEC_FAILURE_CODES
+from src.toolchain_runner import run_tool, ToolOutput
+from src.result_cache import get_result_cache, make_cache_key, normalize_st_source
+
+# ANSI color codes emitted by plc
+ANSI_ESCAPE_RE = re.compile(r'\x1b\[[0-9;]*m')
+
+# stands for the checked file's path inside cached compiler output
+SOURCE_PLACEHOLDER = "<source>"
+
+# rusty: "error[E007]: Unexpected token ..." followed by "   ┌─ /path/file.st:4:5"
+RUSTY_HEADER_RE = re.compile(r'^\s*(error|warning|note|info|help)(?:\[(\w+)\])?:\s*(.*)$', re.IGNORECASE)
+RUSTY_LOCATION_RE = re.compile(r'┌─\s*(.+?):(\d+):(\d+)')
+# matiec: "/path/file.st:12-5..12-10: error: ..."
+MATIEC_DIAGNOSTIC_RE = re.compile(r'^(.*?):(\d+)-(\d+)(?:\.\.\d+-\d+)?:\s*(error|warning)\s*:?\s*(.*)$', re.IGNORECASE)
+
+
+# used to decide which files can share one plc invocation in compile_many
+POU_DECLARATION_RE = re.compile(r'^\s*(?:FUNCTION_BLOCK|FUNCTION|PROGRAM|CLASS|INTERFACE)\s+(\w+)', re.IGNORECASE | re.MULTILINE)
+GLOBAL_SCOPE_RE = re.compile(r'\b(?:TYPE|VAR_GLOBAL|VAR_CONFIG|CONFIGURATION|ACTIONS?)\b', re.IGNORECASE)
+IDENTIFIER_RE = re.compile(r'\b[A-Za-z_]\w*\b')
+
+
+@dataclass
+class Diagnostic:
+    """一条编译器诊断信息"""
+    file: str
+    line: int
+    col: int
+    severity: str   # error / warning / note ...
+    code: str = ""  # 编译器错误码，如 rusty 的 E007
+    message: str = ""
+
+    def __str__(self):
+        location = f"{self.file}:{self.line}:{self.col}" if self.file else "<unknown>"
+        code = f"[{self.code}]" if self.code else ""
+        return f"{location}: {self.severity}{code}: {self.message}"
+
+
+@dataclass
+class CheckResult:
+    """一次编译检查的结果"""
+    passed: bool
+    output: str = ""
+    diagnostics: List[Diagnostic] = field(default_factory=list)
+    compiler: str = ""
+    cached: bool = False
+    metrics: Dict = field(default_factory=dict)   # 编译器调用的耗时 / CPU / 峰值内存（见 ToolRun.metrics）
+
+    @property
+    def errors(self) -> List[Diagnostic]:
+        return [d for d in self.diagnostics if d.severity == "error"]
+
+
+def parse_rusty_diagnostics(output: str) -> List[Diagnostic]:
+    """把 plc --check 的输出解析为 Diagnostic 列表（位置行紧跟在错误标题之后）"""
+    diagnostics = []
+    current = None
+    for line in output.splitlines():
+        header = RUSTY_HEADER_RE.match(line)
+        if header:
+            current = Diagnostic(file="", line=0, col=0, severity=header.group(1).lower(),
+                                 code=header.group(2) or "", message=header.group(3).strip())
+            diagnostics.append(current)
+            continue
+        location = RUSTY_LOCATION_RE.search(line)
+        if location and current is not None and not current.file:
+            current.file = location.group(1).strip()
+            current.line = int(location.group(2))
+            current.col = int(location.group(3))
+    return diagnostics
+
+
+def parse_matiec_diagnostics(output: str) -> List[Diagnostic]:
+    """把 iec2iec 的输出解析为 Diagnostic 列表"""
+    diagnostics = []
+    for line in output.splitlines():
+        match = MATIEC_DIAGNOSTIC_RE.match(line.strip())
+        if match:
+            diagnostics.append(Diagnostic(file=match.group(1), line=int(match.group(2)), col=int(match.group(3)),
+                                          severity=match.group(4).lower(), message=match.group(5).strip()))
+    return diagnostics
 
 
 def is_docker_available():
@@ -42,13 +131,22 @@ def is_plc_local_available():
         return False
 
 
-def rusty_compiler_local(file_dir):
-    """本地方式调用 RuSTy 编译器"""
+def _clean_rusty_output(output):
+    """去掉 ANSI 颜色码和 docker 镜像打印的 WARNING 行"""
+    output = ANSI_ESCAPE_RE.sub('', output)
+    return "\n".join(line for line in output.splitlines() if 'WARNING' not in line)
+
+
+def _timeout_message(run):
+    return f"error: {run.tool} timed out after {run.wall_time:.0f}s ({run.killed_reason})"
+
+
+def _rusty_local_check(file_dir):
+    """本地方式调用 RuSTy 编译器，返回 (是否通过, 编译器输出, ToolRun)"""
     print(f"\n🔧 [RuSTy Compiler] Calling local plc compiler...")
     print(f"   Command: plc --check {file_dir}")
 
     # Verify file exists and show proof
-    import os
     if file_dir and os.path.exists(file_dir):
         file_size = os.path.getsize(file_dir)
         print(f"   ✅ File exists: {file_dir}")
@@ -63,59 +161,78 @@ def rusty_compiler_local(file_dir):
         print(f"   ⚠️  File path is None or doesn't exist: {file_dir}")
 
     try:
-        output = subprocess.check_output(
-            f'plc --check {file_dir} 2>&1 | sed "s/\\x1b\\[[0-9;]*m//g"',
-            shell=True,
-            text=True
-        )
+        # 单次调用，stderr 合并进 stdout（等价于 2>&1），ANSI 颜色码在 Python 中去除
+        run = run_tool('plc', ['plc', '--check', file_dir], merge_stderr=True)
+    except OSError as e:
+        print(f"   Result: ❌ Compilation ERROR: {e}")
+        return False, str(e), None
+
+    output = _timeout_message(run) if run.timed_out else ANSI_ESCAPE_RE.sub('', run.stdout)
+    print(f"   Output: {output[:200] if output else '(no output - compilation successful)'}")
+
+    if 'error' in output:
+        print(f"   Result: ❌ Compilation FAILED")
+        return False, output, run
+    else:
+        print(f"   Result: ✅ Compilation SUCCESSFUL")
+        return True, output, run
+
+
+def rusty_compiler_local(file_dir):
+    """本地方式调用 RuSTy 编译器"""
+    return _rusty_local_check(file_dir)[0]
+
 
-        print(f"   Output: {output[:200] if output else '(no output - compilation successful)'}")
+def _rusty_docker_check(file_dir):
+    """
+    Docker 方式调用 RuSTy 编译器，返回 (是否通过, 编译器输出, ToolRun)
 
-        if 'error' in output:
-            print(f"   Result: ❌ Compilation FAILED")
-            return False
+    默认通过常驻容器池（src/rusty_pool.py）执行 `docker exec plc --check`，
+    避免每次检查都创建新容器；config.rusty_pool_size = 0 时退回一次性的 `docker run --rm`。
+    """
+    if getattr(config, 'rusty_pool_size', 2) > 0:
+        try:
+            pool_output = get_rusty_pool().check(file_dir)
+        except (RuntimeError, OSError, subprocess.SubprocessError) as e:
+            print(f"   ⚠️  RuSTy container pool unavailable ({e}), falling back to docker run --rm")
         else:
-            print(f"   Result: ✅ Compilation SUCCESSFUL")
-            return True
-    except subprocess.CalledProcessError as e:
-        print(f"   Result: ❌ Compilation ERROR: {e}")
-        return False
+            output = _clean_rusty_output(pool_output)
+            return 'error' not in output.lower(), output, pool_output.runs[-1]
 
+    # 获取 Docker 镜像配置
+    docker_image = getattr(config, 'rusty_docker_image', 'ghcr.io/plc-lang/rusty-docker:docker-x86_64')
 
-def rusty_compiler_docker(file_dir):
-    """Docker 方式调用 RuSTy 编译器"""
+    # 获取文件的绝对路径和目录
+    abs_file_path = os.path.abspath(file_dir)
+    file_name = os.path.basename(abs_file_path)
+    file_dir_parent = os.path.dirname(abs_file_path)
+
+    # 使用 Docker 运行 plc --check
     try:
-        # 获取 Docker 镜像配置
-        docker_image = getattr(config, 'rusty_docker_image', 'ghcr.io/plc-lang/rusty-docker:docker-x86_64')
-
-        # 获取文件的绝对路径和目录
-        abs_file_path = os.path.abspath(file_dir)
-        file_name = os.path.basename(abs_file_path)
-        file_dir_parent = os.path.dirname(abs_file_path)
-
-        # 使用 Docker 运行 plc --check
-        output = subprocess.check_output(
-            f'docker run --rm '
-            f'-v "{file_dir_parent}:/workspace" '
-            f'--entrypoint plc '
-            f'{docker_image} '
-            f'--check /workspace/{file_name} '
-            f'2>&1 | grep -v WARNING | sed "s/\\x1b\\[[0-9;]*m//g"',
-            shell=True,
-            text=True
-        )
+        run = run_tool('docker', ['docker', 'run', '--rm',
+                                  '-v', f'{file_dir_parent}:/workspace',
+                                  '--entrypoint', 'plc',
+                                  docker_image,
+                                  '--check', f'/workspace/{file_name}'],
+                       merge_stderr=True)
+    except OSError as e:
+        return False, str(e), None
+    if run.timed_out:
+        return False, _timeout_message(run), run
 
-        if 'error' in output.lower():
-            return False
-        else:
-            return True
-    except subprocess.CalledProcessError as e:
-        return False
+    # 诊断信息中的容器内路径映射回宿主机路径
+    output = _clean_rusty_output(run.stdout).replace(f'/workspace/{file_name}', abs_file_path)
+    return 'error' not in output.lower(), output, run
 
 
-def rusty_compiler(file_dir):
+def rusty_compiler_docker(file_dir):
+    """Docker 方式调用 RuSTy 编译器"""
+    return _rusty_docker_check(file_dir)[0]
+
+
+def _resolve_rusty_mode():
     """
-    RuSTy 编译器入口函数，根据配置自动选择调用方式
+    根据配置决定 RuSTy 的调用方式，返回 "local" 或 "docker"
 
     支持三种模式（在 config.rusty_mode 中配置）：
     - "local": 强制使用本地 plc 命令
@@ -129,22 +246,22 @@ def rusty_compiler(file_dir):
     if mode == "local":
         # 强制使用本地模式
         print(f"   → Using LOCAL mode")
-        return rusty_compiler_local(file_dir)
+        return "local"
 
     elif mode == "docker":
         # 强制使用 Docker 模式
         print(f"   → Using DOCKER mode")
-        return rusty_compiler_docker(file_dir)
+        return "docker"
 
     elif mode == "auto":
         # 自动模式：优先本地，失败则尝试 Docker
         print(f"   → Using AUTO mode (detecting available compiler...)")
         if is_plc_local_available():
             print(f"   → Detected: Local plc command available")
-            return rusty_compiler_local(file_dir)
+            return "local"
         elif is_docker_available():
             print(f"   → Detected: Docker available")
-            return rusty_compiler_docker(file_dir)
+            return "docker"
         else:
             raise RuntimeError(
                 "Neither local 'plc' nor Docker is available. "
@@ -155,7 +272,7 @@ def rusty_compiler(file_dir):
         raise ValueError(f"Invalid rusty_mode: {mode}. Must be 'local', 'docker', or 'auto'.")
 
 
-def matiec_compiler(file_dir):
+def _get_matiec_path():
     MATIEC_PATH = getattr(config, 'MATIEC_PATH', None)
 
     if MATIEC_PATH is None:
@@ -163,19 +280,317 @@ def matiec_compiler(file_dir):
 
     if MATIEC_PATH is None:
         raise ValueError("MATIEC_PATH is not set in config or as an environment variable.")
-    
+    return MATIEC_PATH
+
+
+def _matiec_check(file_dir):
+    """调用 matiec (iec2iec)，返回 (是否通过, 编译器输出, ToolRun)"""
+    MATIEC_PATH = _get_matiec_path()
+
     try:
-        output = subprocess.check_output(
-            f'iec2iec -f -p "{file_dir}" 2>&1 | head -n -2',
-            cwd=MATIEC_PATH,
-            shell=True,   # execute in shell
-            text=True     # return string
-        )
-        
-        if 'error' in output:
-            return False
-        else:
-            return True
-    except subprocess.CalledProcessError as e:
-        # raise subprocess.CalledProcessError
+        run = run_tool('iec2iec', ['iec2iec', '-f', '-p', file_dir], cwd=MATIEC_PATH, merge_stderr=True)
+    except OSError as e:
+        return False, str(e), None
+    if run.timed_out:
+        return False, _timeout_message(run), run
+
+    # iec2iec 最后两行是与诊断无关的尾部信息（原先由 `head -n -2` 去掉）
+    output = "\n".join(run.stdout.splitlines()[:-2])
+    if 'error' in output:
+        return False, output, run
+    else:
+        return True, output, run
+
+
+@lru_cache(maxsize=None)
+def _compiler_version(mode):
+    """
+    编译器版本指纹（每个进程只探测一次），作为编译缓存键的一部分，
+    这样升级编译器或更换镜像后旧的缓存结果自然失效。
+    """
+    try:
+        if mode == "local":
+            return subprocess.run(['plc', '--version'], capture_output=True, text=True, timeout=10).stdout.strip()
+        if mode == "docker":
+            docker_image = getattr(config, 'rusty_docker_image', 'ghcr.io/plc-lang/rusty-docker:docker-x86_64')
+            image_id = subprocess.run(['docker', 'image', 'inspect', '-f', '{{.Id}}', docker_image],
+                                      capture_output=True, text=True, timeout=10).stdout.strip()
+            return f"{docker_image}@{image_id}"
+        if mode == "matiec":
+            iec2iec = os.path.join(_get_matiec_path(), 'iec2iec')
+            mtime = os.path.getmtime(iec2iec) if os.path.exists(iec2iec) else 0
+            return f"{iec2iec}@{mtime}"
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return "unknown"
+
+
+def _compile_cache():
+    if not getattr(config, 'compile_cache_enabled', True):
+        return None
+    try:
+        return get_result_cache('compile_results')
+    except Exception as e:
+        print(f"   ⚠️  Compile cache disabled: {e}")
+        return None
+
+
+def _select_checker(compiler_type):
+    """返回 (调用方式, 单文件检查函数)"""
+    if compiler_type == "matiec":
+        return "matiec", _matiec_check
+    elif compiler_type == "rusty":
+        mode = _resolve_rusty_mode()
+        return mode, (_rusty_local_check if mode == "local" else _rusty_docker_check)
+    else:
+        raise ValueError(f"Unsupported compiler: {compiler_type}. Use 'rusty' or 'matiec'.")
+
+
+def _compile_cache_key(file_dir, compiler_type, mode):
+    """缓存键；编译器版本探测失败时返回 None（不缓存，避免不同编译器安装的结果互相混用）"""
+    version = _compiler_version(mode)
+    if version == "unknown":
+        return None
+    with open(file_dir, 'r', encoding='utf-8', errors='replace') as f:
+        source = f.read()
+    return make_cache_key(normalize_st_source(source), compiler_type, version, mode)
+
+
+def _tool_completed(run):
+    """
+    编译器是否真正运行完成。工具无法启动（run 为 None）、被 runner 杀死（超时 / CPU 限制）
+    或 docker 层面失败（容器不存在、镜像无法启动）是环境问题，不是代码的编译结果
+    """
+    if run is None or run.timed_out:
         return False
+    return not (run.tool == 'docker' and run.returncode in DOCKER_EXEC_FAILURE_CODES)
+
+
+def _store_compile_result(cache, key, file_dir, passed, output, run):
+    # 只缓存编译器真正运行完成的结果，暂时性的基础设施故障不能让正确的代码一直被判为编译失败
+    if not _tool_completed(run):
+        return
+    # 输出中的文件路径替换为占位符，命中时再换回当前文件路径
+    if cache is not None and key is not None:
+        cached_output = output.replace(os.path.abspath(file_dir), SOURCE_PLACEHOLDER).replace(file_dir, SOURCE_PLACEHOLDER)
+        cache.put(key, {"passed": passed, "output": cached_output})
+
+
+def compile_st_file(file_dir, compiler_type="rusty"):
+    """
+    编译检查统一入口：每次检查只调用一次编译器，返回带结构化诊断信息的 CheckResult
+
+    结果按 (规范化后的 ST 源码, 编译器类型, 编译器版本, 调用方式) 的哈希缓存在磁盘上
+    （见 src/result_cache.py），命中时完全跳过编译器子进程。
+    """
+    mode, check = _select_checker(compiler_type)
+
+    cache = _compile_cache()
+    if cache is None or not file_dir or not os.path.exists(file_dir):
+        passed, output, run = check(file_dir)
+        return _make_check_result(passed, output, compiler_type, run=run)
+
+    key = _compile_cache_key(file_dir, compiler_type, mode)
+    cached = cache.get(key) if key is not None else None
+    if cached is not None:
+        print(f"   💾 Compile cache hit ({compiler_type}/{mode}): {'PASSED' if cached['passed'] else 'FAILED'}")
+        return _make_check_result(cached['passed'], cached['output'].replace(SOURCE_PLACEHOLDER, file_dir),
+                                  compiler_type, cached=True)
+
+    passed, output, run = check(file_dir)
+    _store_compile_result(cache, key, file_dir, passed, output, run)
+    return _make_check_result(passed, output, compiler_type, run=run)
+
+
+def _split_rusty_output(output):
+    """按诊断标题把 plc 输出切成块，返回 [(Diagnostic, 该诊断的原始文本)]"""
+    blocks = []
+    for line in output.splitlines():
+        if RUSTY_HEADER_RE.match(line):
+            blocks.append([line])
+        elif blocks:
+            blocks[-1].append(line)
+    split = []
+    for lines in blocks:
+        text = "\n".join(lines)
+        split.append((parse_rusty_diagnostics(text)[0], text))
+    return split
+
+
+def _unattributed_failure(output):
+    """plc 的输出里有不属于任何诊断的错误文字（第一个诊断之前的报错、panic）"""
+    lines = output.splitlines()
+    first = next((index for index, line in enumerate(lines) if RUSTY_HEADER_RE.match(line)), len(lines))
+    preamble = "\n".join(lines[:first]).lower()
+    return 'error' in preamble or 'panicked' in output.lower()
+
+
+def _batch_groups(file_dirs, max_group_size):
+    """
+    把文件分成可以放进同一次 plc 调用的组。
+
+    plc 会把一次调用的全部文件当作同一个工程编译，所以同组文件之间不能有同名 POU，
+    也不能引用组内其他文件定义的 POU（否则一个文件的未定义引用可能被另一个文件"补上"）。
+    含 TYPE / VAR_GLOBAL / CONFIGURATION 等全局声明的文件单独检查。
+
+    Returns:
+        (groups, singles): 可合并检查的文件组列表, 需要单独检查的文件列表
+    """
+    groups = []
+    singles = []
+    for file_dir in file_dirs:
+        try:
+            with open(file_dir, 'r', encoding='utf-8', errors='replace') as f:
+                text = f.read()
+        except OSError:
+            singles.append(file_dir)
+            continue
+
+        names = {name.lower() for name in POU_DECLARATION_RE.findall(text)}
+        if not names or GLOBAL_SCOPE_RE.search(text):
+            singles.append(file_dir)
+            continue
+        identifiers = {word.lower() for word in IDENTIFIER_RE.findall(text)}
+
+        for group in groups:
+            if (len(group['files']) < max_group_size
+                    and not names & group['identifiers'] and not identifiers & group['names']):
+                group['files'].append(file_dir)
+                group['names'] |= names
+                group['identifiers'] |= identifiers
+                break
+        else:
+            groups.append({'files': [file_dir], 'names': names, 'identifiers': identifiers})
+
+    # a group of one gains nothing over a single check
+    singles.extend(group['files'][0] for group in groups if len(group['files']) == 1)
+    return [group['files'] for group in groups if len(group['files']) > 1], singles
+
+
+def _rusty_check_group(file_dirs, mode):
+    """对一组文件执行一次 plc --check，返回清理后的输出（ToolOutput，超时时抛出 TimeoutExpired）"""
+    if mode == "local":
+        run = run_tool('plc', ['plc', '--check', *file_dirs], merge_stderr=True)
+        output = ToolOutput(ANSI_ESCAPE_RE.sub('', run.stdout), [run])
+    else:
+        pool_output = get_rusty_pool().check_many(file_dirs)
+        output = ToolOutput(_clean_rusty_output(pool_output), pool_output.runs)
+    if output.runs[-1].timed_out:
+        raise subprocess.TimeoutExpired(output.runs[-1].command, output.runs[-1].wall_time)
+    return output
+
+
+def compile_many(file_dirs, compiler_type="rusty", max_workers=None):
+    """
+    批量编译检查，返回 {文件路径: CheckResult}，顺序与输入一致。
+
+    - 先查编译缓存，命中的文件不再调用编译器；
+    - RuSTy（本地或容器池模式）下把互不冲突的文件合并成组，每组只调用一次 plc --check，
+      再按诊断信息中的文件路径把结果分回各个文件；出现无法归属到具体文件的错误
+      （或整组调用失败）时，该组文件退回逐个检查；调用返回非零时只记录有错误诊断的文件，
+      其余文件也逐个复查（只有整组调用正常结束时才判定通过）；
+    - 其余文件（matiec、一次性 docker 模式、不能合并的文件）用有界线程池并行逐个检查。
+    """
+    start_time = time.monotonic()
+    file_dirs = list(dict.fromkeys(file_dirs))
+    mode, check = _select_checker(compiler_type)
+    max_workers = max_workers or getattr(config, 'compile_max_workers', min(8, os.cpu_count() or 1))
+    group_size = getattr(config, 'compile_batch_group_size', 16)
+
+    cache = _compile_cache()
+    results = {}
+    keys = {}
+    pending = []
+    for file_dir in file_dirs:
+        if cache is not None and file_dir and os.path.exists(file_dir):
+            keys[file_dir] = _compile_cache_key(file_dir, compiler_type, mode)
+            cached = cache.get(keys[file_dir]) if keys[file_dir] is not None else None
+            if cached is not None:
+                results[file_dir] = _make_check_result(
+                    cached['passed'], cached['output'].replace(SOURCE_PLACEHOLDER, file_dir), compiler_type,
+                    cached=True)
+                continue
+        pending.append(file_dir)
+    cache_hits = len(file_dirs) - len(pending)
+
+    def record(file_dir, passed, output, run, batch_size=1):
+        _store_compile_result(cache, keys.get(file_dir), file_dir, passed, output, run)
+        results[file_dir] = _make_check_result(passed, output, compiler_type, run=run)
+        if batch_size > 1:
+            results[file_dir].metrics['batch_size'] = batch_size
+
+    def check_single(file_dir):
+        passed, output, run = check(file_dir)
+        record(file_dir, passed, output, run)
+
+    def check_group(group):
+        """返回需要单独复查的文件"""
+        abs_paths = {os.path.abspath(file_dir): file_dir for file_dir in group}
+        try:
+            output = _rusty_check_group(list(abs_paths), mode)
+        except (RuntimeError, OSError, subprocess.SubprocessError) as e:
+            print(f"   ⚠️  Batch check failed ({e}), checking files one by one")
+            return group
+
+        run = output.runs[-1]
+        if _unattributed_failure(output):
+            print("   ⚠️  Batch check failed without per-file diagnostics, checking files one by one")
+            return group
+        per_file = {file_dir: [] for file_dir in group}
+        for diagnostic, text in _split_rusty_output(output):
+            if diagnostic.file not in abs_paths:
+                if diagnostic.severity == "error":
+                    # an error we cannot attribute to a file: trust nothing from this run
+                    return group
+                continue
+            per_file[abs_paths[diagnostic.file]].append((diagnostic, text))
+        failed = {file_dir for file_dir, entries in per_file.items()
+                  if any(diagnostic.severity == "error" for diagnostic, _ in entries)}
+        if run.returncode != 0 and not failed:
+            # the run failed (docker exec error, crash, kill) but reported no compile error
+            print(f"   ⚠️  Batch check exited with {run.returncode} without diagnostics, checking files one by one")
+            return group
+
+        # group members share no POU names and do not reference each other, so every error
+        # belongs to exactly one file and the others would have passed on their own;
+        # files are only recorded as passed when the whole run completed cleanly
+        recheck = []
+        for file_dir, entries in per_file.items():
+            if run.returncode != 0 and file_dir not in failed:
+                recheck.append(file_dir)
+                continue
+            file_output = "\n".join(text for _, text in entries)
+            record(file_dir, 'error' not in file_output.lower(), file_output, run, len(group))
+        return recheck
+
+    groups, singles = [], pending
+    batchable = compiler_type == "rusty" and (mode == "local" or getattr(config, 'rusty_pool_size', 2) > 0)
+    if batchable and group_size > 1:
+        groups, singles = _batch_groups(pending, group_size)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for recheck in executor.map(check_group, groups):
+            singles.extend(recheck)
+        list(executor.map(check_single, singles))
+
+    print(f"   📦 [compile_many] {len(file_dirs)} files: {cache_hits} cache hits, "
+          f"{len(groups)} batched invocations, {len(singles)} single checks "
+          f"in {time.monotonic() - start_time:.2f}s")
+    return {file_dir: results[file_dir] for file_dir in file_dirs}
+
+
+def _make_check_result(passed, output, compiler_type, cached=False, run=None):
+    parse = parse_matiec_diagnostics if compiler_type == "matiec" else parse_rusty_diagnostics
+    return CheckResult(passed=passed, output=output, diagnostics=parse(output),
+                       compiler=compiler_type, cached=cached, metrics=run.metrics() if run else {})
+
+
+def rusty_compiler(file_dir):
+    """
+    RuSTy 编译器入口函数，根据配置（config.rusty_mode）自动选择本地或 Docker 调用方式
+    """
+    return compile_st_file(file_dir, "rusty").passed
+
+
+def matiec_compiler(file_dir):
+    return compile_st_file(file_dir, "matiec").passed
@@ -0,0 +1,394 @@
+## Structured counterexamples of plcverif / nuXmv / cbmc.
+## A Counterexample is a table of steps (PLC cycle boundaries or model states) x variables with typed
+## values. It is read in a single streaming pass from plcverif's HTML report, a nuXmv trace
+## (.smv.cex) or cbmc --trace output, keeping at most max_steps steps (the last ones, where the
+## violation happens), so long traces are parsed in bounded memory. Markdown for the fixer prompt is
+## rendered on demand with to_markdown().
+import re
+import sys
+from collections import deque
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+# Resolve the parent directory as an absolute path
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+
+import config
+
+DEFAULT_MAX_STEPS = getattr(config, 'counterexample_max_steps', 200)
+READ_CHUNK_SIZE = 64 * 1024
+
+_WORD_LITERAL_RE = re.compile(r'^(-?)0([su])d(\d+)_(\d+)$')
+_INT_RE = re.compile(r'^[+-]?\d+$')
+_FLOAT_RE = re.compile(r'^[+-]?(\d+\.\d*|\.\d+|\d+)([eE][+-]?\d+)?$')
+_NUXMV_STATE_RE = re.compile(r'^\s*->\s*(State|Input):\s*([\d.]+)\s*<-')
+_NUXMV_ASSIGN_RE = re.compile(r'^\s*([^\s=]+)\s*=\s*(.+?)\s*$')
+_NUXMV_STATUS_RE = re.compile(r'^-- specification .* is (true|false)\s*$')
+_CBMC_STATE_RE = re.compile(r'^State \d+ ')
+_CBMC_ASSIGN_RE = re.compile(r'^\s+([^\s=]+)=(.*?)(?:\s+\([01 ]+\))?\s*$')
+# nuXmv model bookkeeping (plcverif's CFA location and cycle flags) and cbmc internals
+_NUXMV_HIDDEN = {'loc', 'EoC', 'BoC'}
+_CBMC_HIDDEN_RE = re.compile(r'^__|[#$!@]|^return_value')
+
+
+def parse_value(text: str):
+    """trace 里的值 -> bool / int / float；其他（枚举值等）保留字符串"""
+    text = text.strip()
+    lowered = text.lower()
+    if lowered in ('true', 'false'):
+        return lowered == 'true'
+    word = _WORD_LITERAL_RE.match(text)
+    if word:
+        value = int(word.group(4))
+        return -value if word.group(1) else value
+    if _INT_RE.match(text):
+        return int(text)
+    if _FLOAT_RE.match(text):
+        return float(text)
+    if lowered.endswith('f') and _FLOAT_RE.match(text[:-1]):
+        return float(text[:-1])     # cbmc float constants, e.g. 1.5f
+    return text
+
+
+def format_value(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value is None:
+        return "-"
+    return str(value)
+
+
+@dataclass
+class Variable:
+    name: str
+    type_name: str = ""      # e.g. "OUTPUT BOOL" in plcverif reports, empty when the source has no types
+
+
+@dataclass
+class Counterexample:
+    """
+    A violating trace: steps[k] maps variable names to their value in step k (labels[k]).
+    skipped_steps counts the leading steps dropped to stay within max_steps; loop_start is the
+    index of the first step of the lasso loop for infinite nuXmv traces.
+    """
+    source: str
+    variables: List[Variable] = field(default_factory=list)
+    labels: List[str] = field(default_factory=list)
+    steps: List[Dict[str, object]] = field(default_factory=list)
+    skipped_steps: int = 0
+    loop_start: Optional[int] = None
+
+    def __len__(self):
+        return len(self.steps)
+
+    def value(self, step: int, name: str):
+        return self.steps[step].get(name)
+
+    def values(self, name: str) -> List:
+        """一个变量在各步的值"""
+        return [step.get(name) for step in self.steps]
+
+    def to_markdown(self, changed_only: bool = False) -> str:
+        """
+        变量 x 步骤的 Markdown 表格（plcverif 报告的排布：每行一个变量）。
+        changed_only=True 时省略值从未变化的变量。
+        """
+        if not self.steps:
+            return "No counterexample found."
+        variables = [var for var in self.variables
+                     if not changed_only or len({repr(v) for v in self.values(var.name)}) > 1]
+        header = ["Type", "Variable", *self.labels] if any(var.type_name for var in variables) \
+            else ["Variable", *self.labels]
+        lines = ["### Counterexample Details:", ""]
+        if self.skipped_steps:
+            lines += [f"(first {self.skipped_steps} steps omitted)", ""]
+        lines.append(" | ".join(header))
+        lines.append(" | ".join(['---'] * len(header)))
+        for var in variables:
+            cells = [var.type_name] if len(header) == len(self.labels) + 2 else []
+            cells += [var.name, *(format_value(v) for v in self.values(var.name))]
+            lines.append(" | ".join(cells))
+        if self.loop_start is not None:
+            lines.append(f"\nThe trace loops back to {self.labels[self.loop_start]}.")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> Dict:
+        return {
+            "source": self.source,
+            "variables": [[var.name, var.type_name] for var in self.variables],
+            "labels": self.labels,
+            "steps": self.steps,
+            "skipped_steps": self.skipped_steps,
+            "loop_start": self.loop_start,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Counterexample':
+        return cls(source=data["source"], variables=[Variable(*var) for var in data["variables"]],
+                   labels=list(data["labels"]), steps=[dict(step) for step in data["steps"]],
+                   skipped_steps=data.get("skipped_steps", 0), loop_start=data.get("loop_start"))
+
+
+class _StepWindow:
+    """The last max_steps (label, valuation) pairs; older ones are only counted."""
+
+    def __init__(self, max_steps: int):
+        self.steps = deque(maxlen=max_steps)
+        self.total = 0
+        self.loop_start_total = None
+
+    def append(self, label: str, valuation: Dict):
+        self.steps.append((label, valuation))
+        self.total += 1
+
+    def mark_loop_start(self):
+        self.loop_start_total = self.total
+
+    def build(self, source: str, variables: Dict[str, Variable]) -> Counterexample:
+        skipped = self.total - len(self.steps)
+        loop_start = self.loop_start_total - skipped \
+            if self.loop_start_total is not None and self.loop_start_total >= skipped else None
+        return Counterexample(source=source, variables=list(variables.values()),
+                              labels=[label for label, _ in self.steps],
+                              steps=[valuation for _, valuation in self.steps],
+                              skipped_steps=skipped, loop_start=loop_start)
+
+
+class _ReportTableParser(HTMLParser):
+    """Collects the cells of the first <table> after <h2>Counterexample</h2> of a plcverif report."""
+
+    def __init__(self, max_steps: int):
+        super().__init__(convert_charrefs=True)
+        self.max_steps = max_steps
+        self.state = 'search'       # search -> heading -> table -> done
+        self.heading = []
+        self.rows = []
+        self.row = None
+        self.cell = None
+        self.column_count = 0
+
+    def handle_starttag(self, tag, attrs):
+        if self.state == 'search' and tag == 'h2':
+            self.state, self.heading = 'heading', []
+        elif self.state == 'table':
+            if tag == 'tr':
+                self.row = []
+            elif tag in ('td', 'th') and self.row is not None:
+                self.cell = []
+        elif self.state == 'found' and tag == 'table':
+            self.state = 'table'
+
+    def handle_endtag(self, tag):
+        if self.state == 'heading' and tag == 'h2':
+            self.state = 'found' if "".join(self.heading).strip() == "Counterexample" else 'search'
+        elif self.state == 'table':
+            if tag in ('td', 'th') and self.cell is not None:
+                self.row.append(" ".join("".join(self.cell).split()))
+                self.cell = None
+            elif tag == 'tr' and self.row is not None:
+                if self.row:
+                    self.rows.append(self._bounded(self.row))
+                self.row = None
+            elif tag == 'table':
+                self.state = 'done'
+        elif self.state == 'found' and tag == 'h2':
+            self.state = 'done'     # section without a table
+
+    def handle_data(self, data):
+        if self.state == 'heading':
+            self.heading.append(data)
+        elif self.cell is not None:
+            self.cell.append(data)
+
+    def _bounded(self, row):
+        # type and variable columns + the last max_steps step columns
+        self.column_count = max(self.column_count, len(row))
+        return row[:2] + row[2:][-self.max_steps:] if len(row) > self.max_steps + 2 else row
+
+
+def parse_html_report(html_file_path: str, max_steps: int = None) -> Optional[Counterexample]:
+    """
+    Read the counterexample table of a plcverif HTML report, stopping at the end of the table.
+    Returns None when the report has no counterexample.
+    """
+    parser = _ReportTableParser(max_steps or DEFAULT_MAX_STEPS)
+    with open(html_file_path, 'r', encoding='utf-8', errors='replace') as f:
+        while parser.state != 'done':
+            chunk = f.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            parser.feed(chunk)
+    if len(parser.rows) < 2:
+        return None
+
+    header, rows = parser.rows[0], parser.rows[1:]
+    column_count = max(len(row) for row in rows)
+    labels = header[2:] if len(header) == column_count else \
+        [f"Step {k}" for k in range(1, column_count - 1)]
+    steps = [{} for _ in labels]
+    variables = []
+    for row in rows:
+        if len(row) < 2:
+            continue
+        type_name, name = row[0], row[1]
+        variables.append(Variable(name, type_name))
+        for k, cell in enumerate(row[2:2 + len(labels)]):
+            steps[k][name] = parse_value(cell)
+    return Counterexample(source="plcverif", variables=variables, labels=labels, steps=steps,
+                          skipped_steps=max(0, parser.column_count - 2 - len(labels)))
+
+
+def read_nuxmv_cex(lines: Iterable[str], max_steps: int = None) -> Tuple[str, Optional[Counterexample]]:
+    """
+    Stream a nuXmv check_*spec output / .smv.cex file.
+
+    Returns:
+        (status, counterexample): status is 'satisfied' / 'violated' / 'unknown' for the first
+        specification in the text; the counterexample is None unless it is violated with a trace
+    """
+    status = 'unknown'
+    window = _StepWindow(max_steps or DEFAULT_MAX_STEPS)
+    variables = {}
+    current, pending_inputs, label = {}, {}, None
+    in_trace = False
+    for line in lines:
+        if status == 'unknown':
+            match = _NUXMV_STATUS_RE.match(line.rstrip())
+            if match:
+                status = 'satisfied' if match.group(1) == 'true' else 'violated'
+                if status == 'satisfied':
+                    return status, None
+            continue
+        if line.lstrip().startswith('-- specification'):
+            break           # next specification of a multi-spec output
+        if '-- Loop starts here' in line:
+            if label is not None:
+                window.append(label, dict(current))
+                label = None
+            window.mark_loop_start()
+            continue
+        state = _NUXMV_STATE_RE.match(line)
+        if state:
+            in_trace = True
+            if label is not None:
+                window.append(label, dict(current))
+                label = None
+            if state.group(1) == 'State':
+                # values not printed in this state (changes-only trace plugin) carry over
+                current.update(pending_inputs)
+                pending_inputs, label = {}, f"State {state.group(2)}"
+            else:
+                pending_inputs = {}
+            continue
+        assign = _NUXMV_ASSIGN_RE.match(line) if in_trace else None
+        if assign:
+            name, value = assign.group(1), parse_value(assign.group(2))
+            if name not in variables:
+                variables[name] = Variable(name)
+            if label is None:
+                pending_inputs[name] = value
+            else:
+                current[name] = value
+    if label is not None:
+        window.append(label, dict(current))
+    if status != 'violated' or not window.total:
+        return status, None
+    return status, _plc_cycles(window.build("nuXmv", variables))
+
+
+def _plc_cycles(cex: Counterexample) -> Counterexample:
+    """
+    plcverif models mark the cycle boundaries with BoC / EoC: keep only those states, labelled like
+    the plcverif report, and hide the CFA bookkeeping variables. Other models are returned as is.
+    """
+    if not any('EoC' in step for step in cex.steps):
+        return cex
+    labels, steps, loop_start, cycle = [], [], None, 0
+    for k, step in enumerate(cex.steps):
+        if cex.loop_start == k:
+            loop_start = len(steps)
+        if step.get('BoC') is True:
+            cycle += 1
+            labels.append(f"Beginning of Cycle {cycle}")
+        elif step.get('EoC') is True:
+            labels.append(f"End of Cycle {max(cycle, 1)}")
+        else:
+            continue
+        steps.append({name: value for name, value in step.items() if name not in _NUXMV_HIDDEN})
+    if not steps:
+        return cex
+    if loop_start is not None and loop_start >= len(steps):
+        loop_start = None
+    variables = [var for var in cex.variables if var.name not in _NUXMV_HIDDEN]
+    return Counterexample(source=cex.source, variables=variables, labels=labels, steps=steps,
+                          skipped_steps=cex.skipped_steps, loop_start=loop_start)
+
+
+def nuxmv_cex_file(cex_file_path: str, max_steps: int = None) -> Tuple[str, Optional[Counterexample]]:
+    with open(cex_file_path, 'r', encoding='utf-8', errors='replace') as f:
+        return read_nuxmv_cex(f, max_steps)
+
+
+def read_cbmc_trace(lines: Iterable[str], max_steps: int = None) -> Optional[Counterexample]:
+    """
+    Stream the first trace ("Trace for ..." section) of cbmc --trace output. cbmc lists single assignments; they are
+    grouped into steps, a new step starting whenever a variable of the current step is assigned
+    again (for plcverif's C model: once per PLC cycle). Internal variables are hidden.
+    """
+    window = _StepWindow(max_steps or DEFAULT_MAX_STEPS)
+    variables = {}
+    current, assigned = {}, set()
+    in_trace = in_state = False
+    for line in lines:
+        if not in_trace:
+            in_trace = line.startswith('Trace for ') or line.startswith('Counterexample:')   # older cbmc
+            continue
+        if line.startswith('Violated property:') or line.startswith('Trace for ') or line.startswith('**'):
+            break
+        if _CBMC_STATE_RE.match(line):
+            in_state = True
+            continue
+        assign = _CBMC_ASSIGN_RE.match(line) if in_state else None
+        if not assign:
+            continue
+        in_state = False
+        name = assign.group(1)
+        if _CBMC_HIDDEN_RE.search(name):
+            continue
+        if name in assigned:
+            window.append(f"Step {window.total + 1}", dict(current))
+            assigned = set()
+        assigned.add(name)
+        variables.setdefault(name, Variable(name))
+        current[name] = parse_value(assign.group(2))
+    if assigned:
+        window.append(f"Step {window.total + 1}", dict(current))
+    return window.build("cbmc", variables) if window.total else None
+
+
+if __name__ == "__main__":
+    trace = """-- specification AG (EoC -> instance_o < 0sd16_10)  is false
+-- as demonstrated by the following execution sequence
+Trace Description: CTL Counterexample
+Trace Type: Counterexample
+  -> State: 1.1 <-
+    loc = init_pv
+    instance_i = 0sd16_0
+    instance_o = 0sd16_0
+    EoC = FALSE
+    BoC = FALSE
+  -> State: 1.2 <-
+    loc = prepare_BoC
+    BoC = TRUE
+  -> State: 1.3 <-
+    loc = prepare_EoC
+    instance_i = 0sd16_4
+    instance_o = 0sd16_16
+    BoC = FALSE
+    EoC = TRUE
+""".splitlines(keepends=True)
+    status, cex = read_nuxmv_cex(trace)
+    print(status, cex.labels, cex.steps)
+    print(cex.to_markdown())
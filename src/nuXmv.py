@@ -1,30 +1,378 @@
 ## python function to assist the nuXmv model checker's verification process.
 
 import re
+import os
+import sys
+import queue
+import shutil
+import signal
 import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+# Resolve the parent directory as an absolute path
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+
+import config
 from config import max_tokens
+from src.toolchain_runner import run_tool, tool_limits, limit_resources, ToolOutput, ToolRun
 
 def nuXmv_model_checker(smv_content, smv_file_path):
     """
         model checking with nuXmv and return verification result.
-    """    
-    try:
-        result = subprocess.run(['nuXmv', smv_file_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE, 
-                                check=True, timeout=10)
-    except subprocess.CalledProcessError as e:
-        max_len = max_tokens
-        err_info = e.stderr.decode()[:max_len] if len(e.stderr) > max_len else e.stderr.decode()
-        return f'SMV code compilation failed.\n Origin SMV code: {smv_content}\n CodeError: {err_info}'
-    except subprocess.TimeoutExpired as e:
-        return f'SMV code execution timeout after 10 seconds.\n Origin smv code: {smv_content}'
+        Limits come from the shared toolchain runner (config toolchain_limits['nuXmv']).
+    """
+    run = run_tool('nuXmv', ['nuXmv', smv_file_path])
+    if run.timed_out:
+        return ToolOutput(f'SMV code execution timeout after {run.wall_time:.0f} seconds.\n Origin smv code: {smv_content}',
+                          [run])
+    if run.returncode != 0:
+        err_info = run.stderr[:max_tokens]
+        return ToolOutput(f'SMV code compilation failed.\n Origin SMV code: {smv_content}\n CodeError: {err_info}', [run])
 
-    output = result.stdout.decode()
+    output = run.stdout
 
     spec_fail_match = re.search(r'specification .+ is false', output)
     if spec_fail_match:
         index = spec_fail_match.end()
         end_index = output.find('\n', index)
         end_index = output.find('\n', end_index + 1)
-        return f'SMV Validation find violated properties: {output[index:end_index].strip()}'
+        return ToolOutput(f'SMV Validation find violated properties: {output[index:end_index].strip()}', [run])
+
+    return ToolOutput('SMV Validation successful', [run])
+
+
+############### interactive session ###############
+
+# engines tried per spec kind (tagged by src/tools.py PATTERN_SPEC_KINDS), first conclusive verdict wins;
+# override with config nuxmv_engine_portfolio, e.g. {"invar": ["ic3", "bdd"]}
+ENGINE_PORTFOLIO = {
+    'invar': ('ic3', 'bmc', 'bdd'),
+    'ltl': ('bmc', 'bdd'),
+    'ctl': ('bdd',),
+}
+# commands run once per session before the first check with an engine (ic3 / bmc need the boolean
+# model, so they are unavailable for models with unbounded integers or reals)
+ENGINE_SETUP = {
+    'bdd': [],
+    'ic3': ['build_boolean_model'],
+    'bmc': ['bmc_setup'],
+    'msat_bmc': [],
+}
+ENGINE_COMMANDS = {
+    ('bdd', 'ctl'): 'check_ctlspec -p "{spec}"',
+    ('bdd', 'ltl'): 'check_ltlspec -p "{spec}"',
+    ('bdd', 'invar'): 'check_invar -p "{spec}"',
+    ('ic3', 'invar'): 'check_invar_ic3 -p "{spec}"',
+    # k-induction proves invariants, plain BMC on LTL can only find counterexamples up to the bound
+    ('bmc', 'invar'): 'check_invar_bmc -a een-sorensson -k {bound} -p "{spec}"',
+    ('bmc', 'ltl'): 'check_ltlspec_bmc -k {bound} -p "{spec}"',
+    ('msat_bmc', 'invar'): 'msat_check_invar_bmc -a een-sorensson -k {bound} -p "{spec}"',
+    ('msat_bmc', 'ltl'): 'msat_check_ltlspec_bmc -k {bound} -p "{spec}"',
+}
+# models with real / integer variables are encoded for the SMT engines (`go_msat`); BDD-based checks and
+# therefore CTL are not available on them
+INFINITE_ENGINE_PORTFOLIO = {
+    'invar': ('ic3', 'msat_bmc'),
+    'ltl': ('msat_bmc',),
+    'ctl': (),
+}
+_INFINITE_TYPE_RE = re.compile(r':\s*(?:real|integer)\s*;')
+_PROMPT_RE = re.compile(r'^(?:nuXmv > )+')
+_RESULT_RE = re.compile(r'^-- (?:LTL )?(?:specification|invariant) (.*?)\s+is (true|false)\s*$', re.MULTILINE)
+_ERROR_RE = re.compile(r'(?i)\berror\b|syntax error|undefined|not supported|cannot be')
+
+
+class NuXmvSessionError(Exception):
+    """The nuXmv process died, timed out or rejected the model."""
+
+
+@dataclass
+class SpecResult:
+    """Result of one spec checked in a session."""
+    spec: str
+    kind: str                 # ctl / ltl / invar
+    status: str               # true / false / unknown (bound reached) / timeout / error
+    engine: str = "bdd"       # engine that produced the status (see ENGINE_PORTFOLIO)
+    trace: str = ""           # counterexample trace (status == false)
+    output: str = ""          # raw command output
+    wall_time: float = 0.0
+
+
+class NuXmvSession:
+    """
+    An interactive `nuXmv -int` process driven over pipes.
+
+    The model is read, flattened, encoded and its BDDs built once (load(): `go`); every spec is then
+    checked with its own command, so checking many specs on the same model pays parsing and model
+    construction only once. Each spec kind has an engine portfolio (IC3 / BMC for invariants, BMC for
+    LTL, BDD for everything): engines are tried in order and the first conclusive verdict wins.
+    After each command an `echo` marker is sent so that the output of one command can be told apart
+    from the next. A command that exceeds its timeout kills the process; the portfolio then reloads
+    the model in a fresh process for the next engine.
+    """
+
+    def __init__(self, smv_file_path, binary='nuXmv', command_timeout=None, engine_timeout=None, infinite=False):
+        self.smv_file_path = smv_file_path
+        self.infinite = infinite      # real / integer variables: SMT encoding and engines
+        self.binary = binary
+        limits = tool_limits('nuXmv')
+        self.command_timeout = command_timeout or limits.get('wall')
+        # time for every engine but the last of a portfolio, the last one gets command_timeout
+        self.engine_timeout = engine_timeout or getattr(config, 'nuxmv_engine_timeout', None) or \
+            (self.command_timeout / 2 if self.command_timeout else None)
+        self.bmc_bound = getattr(config, 'nuxmv_bmc_bound', 20)
+        self.memory_mb = limits.get('memory_mb')
+        self.process = None
+        self.runs: List[ToolRun] = []
+        self._lines = queue.Queue()
+        self._markers = 0
+        self._engines_ready = set()
+        self._engines_failed = {}
+
+    def start(self):
+        cmd = [self.binary, '-int', self.smv_file_path]
+        # nuXmv uses stdio: force line buffering on the pipe so that markers arrive right after the command
+        if shutil.which('stdbuf'):
+            cmd = ['stdbuf', '-oL', '-eL'] + cmd
+        # fresh queue: the reader of a killed process may still deliver its EOF marker
+        self._lines = queue.Queue()
+        self.process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors='replace',
+            bufsize=1,
+            start_new_session=True,
+        )
+        limit_resources(self.process.pid, None, self.memory_mb)
+        threading.Thread(target=self._read_lines, args=(self.process, self._lines), daemon=True).start()
+
+    @staticmethod
+    def _read_lines(process, lines):
+        for line in process.stdout:
+            lines.put(line)
+        lines.put(None)
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def send(self, command: str, timeout: float = None) -> str:
+        """
+        执行一条 nuXmv 命令，返回它的输出（不含提示符）
+
+        Raises:
+            NuXmvSessionError: 会话已结束，或命令超时（此时会话被终止）
+        """
+        if not self.alive:
+            raise NuXmvSessionError("nuXmv session is not running")
+        self._markers += 1
+        marker = f"__agents4plc_done_{self._markers}__"
+        start_time = time.monotonic()
+        try:
+            self.process.stdin.write(f"{command}\necho {marker}\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise NuXmvSessionError(f"nuXmv session closed: {e}")
+
+        timeout = timeout or self.command_timeout
+        deadline = start_time + timeout if timeout else None
+        output = []
+        while True:
+            try:
+                line = self._lines.get(timeout=max(0.0, deadline - time.monotonic()) if deadline else None)
+            except queue.Empty:
+                self.close(force=True)
+                self._record(command, "".join(output), start_time, timed_out=True)
+                raise NuXmvSessionError(f"nuXmv command timed out after {timeout}s: {command}")
+            if line is None:
+                self._record(command, "".join(output), start_time, returncode=self.process.wait())
+                raise NuXmvSessionError("nuXmv exited: " + "".join(output)[-max_tokens:])
+            line = _PROMPT_RE.sub('', line)
+            if line.strip() == marker:
+                break
+            output.append(line)
+        text = "".join(output)
+        self._record(command, text, start_time)
+        return text
+
+    def _record(self, command, output, start_time, returncode=0, timed_out=False):
+        self.runs.append(ToolRun(tool='nuXmv', command=[self.binary, '-int', command], returncode=returncode,
+                                 stdout=output, wall_time=time.monotonic() - start_time, timed_out=timed_out,
+                                 killed_reason='wall_timeout' if timed_out else ''))
+
+    def load(self):
+        """读取模型并构建 BDD（每个进程一次；无限状态模型用 go_msat 做 SMT 编码）"""
+        if not self.alive:
+            self.start()
+        self._engines_ready = set()
+        output = self.send("go_msat" if self.infinite else "go")
+        if re.search(r'(?i)\berror\b|syntax error|undefined', output):
+            raise NuXmvSessionError(f"nuXmv rejected the model:\n{output[:max_tokens]}")
+        return output
+
+    def reload(self):
+        """超时杀死进程后，在新进程里重新加载模型"""
+        self.close(force=True)
+        self.start()
+        return self.load()
+
+    def check(self, spec: str, kind: str = 'ctl', timeout: float = None, engine: str = None) -> SpecResult:
+        """
+        检查一条 spec（不修改已加载的模型），解析结论和反例。
+        未指定 engine 时按 ENGINE_PORTFOLIO[kind] 依次尝试，返回第一个有结论的结果（result.engine 记录引擎）。
+        """
+        if engine is not None:
+            return self.check_with_engine(spec, kind, engine, timeout)
+        if kind not in ENGINE_PORTFOLIO:
+            raise ValueError(f"Unsupported spec kind: {kind}")
+        if self.infinite:
+            portfolio = INFINITE_ENGINE_PORTFOLIO[kind]
+        else:
+            portfolio = getattr(config, 'nuxmv_engine_portfolio', {}).get(kind) or ENGINE_PORTFOLIO[kind]
+        if not portfolio:
+            return SpecResult(spec, kind, 'error', engine='none',
+                              output=f"no nuXmv engine can check {kind} specs on an infinite-state model")
+        engines = [engine for engine in portfolio if (engine, kind) in ENGINE_COMMANDS]
+        result = None
+        for index, engine in enumerate(engines):
+            final = index == len(engines) - 1
+            result = self.check_with_engine(spec, kind, engine, timeout if final else self.engine_timeout)
+            if result.status in ('true', 'false') or final:
+                break
+            print(f"   nuXmv {engine} engine gave no verdict ({result.status}), trying the next engine")
+            if not self.alive:
+                try:
+                    self.reload()
+                except (NuXmvSessionError, OSError):
+                    break
+        return result
+
+    def check_with_engine(self, spec: str, kind: str, engine: str, timeout: float = None) -> SpecResult:
+        command = ENGINE_COMMANDS.get((engine, kind))
+        if command is None:
+            raise ValueError(f"Engine {engine} cannot check {kind} specs")
+        start_time = time.monotonic()
+        try:
+            setup_error = self._setup_engine(engine)
+            if setup_error:
+                return SpecResult(spec, kind, 'error', engine=engine, output=setup_error)
+            output = self.send(command.format(spec=spec, bound=self.bmc_bound), timeout)
+        except NuXmvSessionError as e:
+            status = 'timeout' if 'timed out' in str(e) else 'error'
+            return SpecResult(spec, kind, status, engine=engine, output=str(e),
+                              wall_time=time.monotonic() - start_time)
+        wall_time = time.monotonic() - start_time
+
+        match = _RESULT_RE.search(output)
+        if not match:
+            status = 'unknown' if 'no counterexample found' in output else 'error'
+            return SpecResult(spec, kind, status, engine=engine, output=output, wall_time=wall_time)
+        status = match.group(2)
+        trace = output[match.end():].strip() if status == 'false' else ""
+        return SpecResult(spec, kind, status, engine=engine, trace=trace, output=output, wall_time=wall_time)
+
+    def _setup_engine(self, engine: str) -> str:
+        """执行引擎的准备命令（每个进程一次），失败时返回错误输出（该模型上此引擎不再尝试）"""
+        if engine in self._engines_failed:
+            return self._engines_failed[engine]
+        if engine in self._engines_ready:
+            return ""
+        # go_msat already prepared the SMT engines
+        for command in ([] if self.infinite else ENGINE_SETUP.get(engine, [])):
+            output = self.send(command)
+            if _ERROR_RE.search(output):
+                self._engines_failed[engine] = output
+                return output
+        self._engines_ready.add(engine)
+        return ""
+
+    def close(self, force=False):
+        if self.process is None:
+            return
+        if not force and self.alive:
+            try:
+                self.process.stdin.write("quit\n")
+                self.process.stdin.flush()
+                self.process.wait(timeout=5)
+            except (BrokenPipeError, OSError, subprocess.TimeoutExpired):
+                pass
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.process.wait()
+
+    def __enter__(self):
+        self.load()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def nuXmv_check_specs(smv_content, smv_file_path, specs: List[str], kinds: Optional[List[str]] = None,
+                      infinite: Optional[bool] = None):
+    """
+        Check several specs on one model in a single interactive nuXmv session.
+        smv_file_path must contain the model (smv_content); specs are checked one by one (kinds: ctl /
+        ltl / invar per spec, ctl by default; the engine portfolio of each kind applies) and the result uses
+        the messages of nuXmv_model_checker, with the per-spec SpecResults in .spec_results.
+        infinite: the model has real / integer variables (SMT engines only); detected from the model when None.
+    """
+    kinds = kinds or ['ctl'] * len(specs)
+    if infinite is None:
+        infinite = bool(_INFINITE_TYPE_RE.search(smv_content))
+    session = NuXmvSession(smv_file_path, infinite=infinite)
+    try:
+        session.load()
+    except (NuXmvSessionError, OSError) as e:
+        session.close(force=True)
+        if 'timed out' in str(e):
+            return ToolOutput(f'SMV code execution timeout.\n Origin smv code: {smv_content}', session.runs)
+        return ToolOutput(f'SMV code compilation failed.\n Origin SMV code: {smv_content}\n CodeError: {e}',
+                          session.runs)
+
+    violated, unknown, results = [], [], []
+    reload_error = None
+    try:
+        for index, (spec, kind) in enumerate(zip(specs, kinds)):
+            if reload_error is not None:
+                # the session could not be restarted: the remaining specs are reported as errors
+                result = SpecResult(spec, kind, 'error', engine='none', output=reload_error)
+            else:
+                result = session.check(spec, kind)
+            results.append(result)
+            print(f"   nuXmv {kind} spec is {result.status} ({result.engine}, {result.wall_time:.2f}s): {spec}")
+            if result.status == 'false':
+                violated.append(f"[{result.engine}] {spec}\n{result.trace[:max_tokens]}")
+            elif result.status != 'true':
+                unknown.append(result)
+            if reload_error is None and not session.alive and index < len(specs) - 1:
+                # the last engine timed out and killed the process: continue with the next spec in a fresh one
+                try:
+                    session.reload()
+                except (NuXmvSessionError, OSError) as e:
+                    reload_error = f"nuXmv session could not be reloaded: {e}"
+    finally:
+        session.close()
 
-    return 'SMV Validation successful'
\ No newline at end of file
+    if violated:
+        output = ToolOutput('SMV Validation find violated properties: ' + "\n".join(violated), session.runs)
+    elif unknown and all(result.status in ('timeout', 'unknown') for result in unknown):
+        output = ToolOutput(f'SMV code execution timeout.\n Origin smv code: {smv_content}', session.runs)
+    elif unknown:
+        error = next(result for result in unknown if result.status not in ('timeout', 'unknown'))
+        output = ToolOutput(f'SMV code compilation failed.\n Origin SMV code: {smv_content}\n '
+                            f'CodeError: {error.output[:max_tokens]}', session.runs)
+    else:
+        output = ToolOutput('SMV Validation successful', session.runs)
+    # per-spec verdicts with the engine that decided them
+    output.spec_results = results
+    return output
@@ -2,124 +2,658 @@
 ## An example is provided in the end about how to use the code for verification on a certain case.
 
 import subprocess
+import sys
 import os
 import re
-from bs4 import BeautifulSoup
 import shutil
+import threading
+import time
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from pathlib import Path
 from typing import List, Dict
 from langchain_openai import ChatOpenAI
+# Resolve the parent directory as an absolute path
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+
+from src.workspace import get_workspace_manager
+from src.result_cache import get_result_cache, make_cache_key, normalize_st_source
+from src.toolchain_runner import run_tool, tool_limits, ToolOutput, summarize_runs
+from src.plcverif_daemon import run_plcverif
+from src.counterexample import Counterexample, parse_html_report, nuxmv_cex_file, read_cbmc_trace
+from src.st_slicer import SliceError, slice_file
+from src.st_ranges import RangeAnalysisError, infer_ranges, property_constants
+from src.smv_model import SmvModel, SmvTranslationError, SHARED_PATTERN_SPECS, split_pattern_params
+import config
+
+# process-wide limit on concurrent plcverif property checks, shared by all Verifier instances
+_plcverif_max_workers = max(1, getattr(config, 'plcverif_max_workers', None) or os.cpu_count() or 1)
+_plcverif_slots = threading.BoundedSemaphore(_plcverif_max_workers)
+# pattern properties of one task share a single plcverif translation (see _verify_shared_group)
+_plcverif_shared_model = getattr(config, 'plcverif_shared_model', True)
+# pattern properties are verified on the cone-of-influence slice of the program (src/st_slicer.py)
+_plcverif_slicing = getattr(config, 'plcverif_slicing', True)
+# inferred value ranges of numeric variables are added to the shared nuXmv model (src/st_ranges.py)
+_range_narrowing = getattr(config, 'range_narrowing', True)
+# nusmv and cbmc run concurrently per property and the first conclusive verdict wins; at most
+# plcverif_race_max_properties properties race at once, the others run nusmv -> cbmc sequentially
+RACE_BACKENDS = ("nusmv", "cbmc")
+_plcverif_backend_race = getattr(config, 'plcverif_backend_race', True)
+_plcverif_race_slots = threading.BoundedSemaphore(
+    max(1, getattr(config, 'plcverif_race_max_properties', None) or (os.cpu_count() or 2) // 2))
+# seconds a racing property may take before both backends are killed (None: only the tool limits)
+_plcverif_property_budget = getattr(config, 'plcverif_property_budget', None)
+# cbmc loop unwinding bound used by plcverif_call when a fixed unwind is requested
+DEFAULT_UNWIND = 10
+# adaptive unwind (plcverif_call(unwind=None), the default): cbmc is rerun on plcverif's C model with
+# unwind = initial, 2*initial, ... up to max while the per-property budget (seconds) allows the next step
+_cbmc_initial_unwind = getattr(config, 'cbmc_initial_unwind', 2)
+_cbmc_max_unwind = getattr(config, 'cbmc_max_unwind', 64)
+_cbmc_unwind_budget = getattr(config, 'cbmc_unwind_budget', None) or tool_limits('cbmc').get('wall') or 30
+# a pass below this bound is weaker than the old fixed unwind and is reported as inconclusive
+_cbmc_min_unwind = min(getattr(config, 'cbmc_min_unwind', DEFAULT_UNWIND), _cbmc_max_unwind)
+# the next bound is only tried if the last run's time times this factor still fits into the budget
+CBMC_COST_GROWTH = 2.5
+# historical verification cost per property (estimate_property_costs): weight of the latest run in the
+# running average per property kind, and the cost assumed for properties never verified before
+COST_AVERAGE_WEIGHT = 0.3
+DEFAULT_PROPERTY_COST = getattr(config, 'plcverif_default_property_cost', 30)
+
+
+class PropertyResult(str):
+    """
+    Summary text of one verified property (a plain str for existing callers) plus the structured
+    verdict ('satisfied' / 'violated' / 'unknown'), the backend used and the resource usage of all
+    tool runs behind it. Results served from the verification cache have cached=True and no runs.
+    Violated properties carry the structured Counterexample (src/counterexample.py) when one was found;
+    properties verified on a program slice record the kept statement ratio as metrics['slice_ratio'].
+    budget_exhausted marks unknown verdicts caused by the case's time budget (src/verification_scheduler.py).
+    bounded marks 'satisfied' verdicts of cbmc: they only hold up to the unwind bound and are not cached.
+    """
 
+    def __new__(cls, text, verdict="unknown", backend=None, runs=None, cached=False, original_metrics=None,
+                counterexample=None, slice_ratio=None, budget_exhausted=False, bounded=False):
+        obj = super().__new__(cls, text)
+        obj.verdict = verdict
+        obj.bounded = bounded
+        obj.budget_exhausted = budget_exhausted
+        obj.counterexample = counterexample
+        obj.backend = backend
+        obj.metrics = summarize_runs(runs or [])
+        if slice_ratio is not None:
+            obj.metrics['slice_ratio'] = round(slice_ratio, 4)
+        obj.cached = cached
+        # for cache hits: the resource usage of the run that produced the cached result
+        obj.original_metrics = original_metrics if cached else obj.metrics
+        return obj
 
-def plcverif_validation(st_dir: str, properties_to_be_validated: List[Dict[str, str]],
-                        base_dir: str = None):
-    summary = []
 
+def plcverif_validation(st_dir: str, properties_to_be_validated: List[Dict[str, str]],
+                        base_dir: str = None, budget=None):
+    """
+    Verify the properties of one ST file; returns one PropertyResult per property, in order.
+    budget (VerificationBudget, src/verification_scheduler.py) bounds the wall time of the whole case:
+    properties run cheapest first (historical cost) and the tools still running at the deadline are
+    killed; the properties it leaves inconclusive are recorded on the budget.
+    """
     base_name = os.path.basename(st_dir).split('.')[0]
     if not base_dir:
-        base_dir = f"/home/work/dataset/dataset_runnable_output/{base_name}"
+        # no output location requested: work in a temporary workspace, released once the summary is built
+        with get_workspace_manager().acquire(f"plcverif_{base_name}") as workspace:
+            return plcverif_validation(st_dir, properties_to_be_validated, base_dir=workspace.path, budget=budget)
+
+    # results already known for this (program, property, backend settings, tool versions) are reused
+    properties = list(enumerate(properties_to_be_validated, start=1))
+    cache = _verification_cache()
+    cache_keys = _verification_cache_keys(st_dir, properties) if cache is not None else {}
+    results = {}
+    for i, key in cache_keys.items():
+        cached = cache.get(key)
+        if cached is not None:
+            print(f"   💾 Verification cache hit for property {i}: {cached['verdict']}")
+            counterexample = cached.get('counterexample')
+            results[i] = PropertyResult(f"property {i}:" + cached['text'], cached['verdict'], cached['backend'],
+                                        cached=True, original_metrics=cached.get('metrics'),
+                                        counterexample=Counterexample.from_dict(counterexample) if counterexample else None)
+
+    pending = [(i, property) for i, property in properties if i not in results]
+    if budget is not None:
+        costs = estimate_property_costs(st_dir, pending)
+        pending.sort(key=lambda item: costs[item[0]])
+    for i, result in _verify_properties(st_dir, pending, base_dir, budget).items():
+        results[i] = result
+        # only conclusive verdicts are cached, timeouts and tool failures may not happen next time,
+        # and a bounded cbmc pass may still be refuted by a complete nuXmv check
+        if i in cache_keys and result.verdict in ("satisfied", "violated") and not result.bounded:
+            cache.put(cache_keys[i], {
+                "text": result[len(f"property {i}:"):],
+                "verdict": result.verdict,
+                "backend": result.backend,
+                "metrics": result.metrics,
+                "counterexample": result.counterexample.to_dict() if result.counterexample else None,
+            })
+    summary = [results[i] for i, _ in properties]
+
+    # print overall summary
+    print("\n########## Overall Validation Summary ##########\n")
+    for item in summary:
+        print(item)
+    print("\n########## End of Validation Summary ##########\n")
+    # return "Plcverif verification result:" + str(summary)
+    return summary
+
+
+def _verify_properties(st_dir: str, properties: List, base_dir: str, budget=None) -> Dict[int, PropertyResult]:
+    """
+    Verify (index, property) pairs, returning the results by index. Properties are independent
+    plcverif runs with their own output directory (base_dir/property_i) and are fanned out in the
+    given order; the process-wide semaphore bounds how many run at once across all callers. Pattern
+    properties sharing an entry point are translated once and checked in one nuXmv run; the rest (and
+    shared checks without a conclusive verdict) go through plcverif-cli one by one.
+    """
+    if len(properties) <= 1:
+        return {i: _validate_single_property(st_dir, i, property, base_dir, budget) for i, property in properties}
+
+    groups = _shared_model_groups(properties) if _plcverif_shared_model else []
+    grouped = {i for group in groups for i, _ in group}
+    with ThreadPoolExecutor(max_workers=min(len(properties), _plcverif_max_workers),
+                            thread_name_prefix="plcverif") as executor:
+        futures = {i: executor.submit(_validate_single_property, st_dir, i, property, base_dir, budget)
+                   for i, property in properties if i not in grouped}
+        results = {}
+        for group in groups:
+            start_time = time.monotonic()
+            group_results = _verify_shared_group(st_dir, group, base_dir, budget)
+            # the shared run is accounted evenly to the properties it decided
+            for i, property in group:
+                if i in group_results:
+                    _record_property_cost(st_dir, property, (time.monotonic() - start_time) / len(group_results))
+            results.update(group_results)
+        for i, property in properties:
+            if i in grouped and i not in results:
+                futures[i] = executor.submit(_validate_single_property, st_dir, i, property, base_dir, budget)
+        results.update({i: future.result() for i, future in futures.items()})
+    return results
+
+
+@lru_cache(maxsize=None)
+def _verification_tool_versions():
+    """
+    plcverif-cli / nuXmv / cbmc 的版本指纹（路径 + 修改时间，每个进程只探测一次），作为验证缓存键的一部分，
+    升级任一工具后旧的缓存结果自然失效。
+    """
+    versions = {}
+    for tool, locate in (('plcverif-cli', lambda: shutil.which('plcverif-cli')),
+                         ('nuXmv', lambda: backend_binary('nusmv')),
+                         ('cbmc', lambda: backend_binary('cbmc'))):
+        try:
+            path = os.path.realpath(locate() or '')
+            versions[tool] = f"{path}@{os.path.getmtime(path)}"
+        except (OSError, IndexError, ValueError):
+            versions[tool] = "unknown"
+    versions['plcverif_daemon_cmd'] = getattr(config, 'plcverif_daemon_cmd', None)
+    return versions
+
+
+def _verification_cache():
+    if not getattr(config, 'verification_cache_enabled', True):
+        return None
+    try:
+        return get_result_cache('verification_results')
+    except Exception as e:
+        print(f"   ⚠️  Verification cache disabled: {e}")
+        return None
+
+
+def _canonical_property(property: Dict) -> Dict:
+    """缓存键用的属性：只保留影响结果的字段，去掉 plcverif_call 给参数加的引号"""
+    spec = _property_spec(property)
+    canonical = {"job_req": spec.get("job_req", "assertion"), "entry_point": spec.get("entry_point")}
+    if canonical["job_req"] == "pattern":
+        canonical["pattern_id"] = spec.get("pattern_id")
+        canonical["pattern_params"] = split_pattern_params(spec.get("pattern_params") or {})
+    return canonical
+
+
+def _verification_cache_keys(st_dir: str, properties: List) -> Dict[int, str]:
+    """每个性质的缓存键：(规范化 ST 源码, 规范化属性, 后端策略, unwind, 工具版本) 的哈希"""
+    try:
+        with open(st_dir, 'r', encoding='utf-8', errors='replace') as f:
+            source = normalize_st_source(f.read())
+    except OSError:
+        return {}
+    backend_settings = {
+        "backends": ["nusmv", "cbmc"],
+        "unwind": {"initial": _cbmc_initial_unwind, "max": _cbmc_max_unwind, "min": _cbmc_min_unwind,
+                   "budget": _cbmc_unwind_budget},
+        "shared_model": _plcverif_shared_model,
+        "slicing": _plcverif_slicing,
+        "range_narrowing": _range_narrowing,
+    }
+    versions = _verification_tool_versions()
+    return {i: make_cache_key(source, _canonical_property(property), backend_settings, versions)
+            for i, property in properties}
+
+
+def _cost_history():
+    try:
+        return get_result_cache('verification_costs')
+    except Exception as e:
+        print(f"   ⚠️  Verification cost history disabled: {e}")
+        return None
 
-    for i, property in enumerate(properties_to_be_validated, start=1):
-        case_id = f"property_{i}"
-        output_dir = f"{base_dir}/{case_id}"
 
-        if 'job_req' not in property:
-            property = property.get('property', {})  # Update property if not existing
+def _property_kind(property: Dict) -> str:
+    spec = _property_spec(property)
+    return f"{spec.get('job_req', 'assertion')}:{spec.get('pattern_id') or ''}"
 
-        job_req = property.get("job_req", "assertion")
-        pattern_id = property.get("pattern_id")
-        pattern_params = property.get("pattern_params", {})
-        entry_point = property.get("entry_point", None)
 
-        backend = "nusmv"
+def estimate_property_costs(st_dir: str, properties: List) -> Dict[int, float]:
+    """
+    Expected wall time (seconds) of each (index, property): 0 for verification cache hits, the last
+    run of the same program and property, else the running average of its kind (job_req /
+    pattern_id), else plcverif_default_property_cost.
+    """
+    history, cache = _cost_history(), _verification_cache()
+    keys = _verification_cache_keys(st_dir, properties) if history is not None or cache is not None else {}
+    costs = {}
+    for i, property in properties:
+        cost = None
+        if cache is not None and i in keys and cache.get(keys[i]) is not None:
+            cost = 0.0      # served from the verification cache
+        elif history is not None:
+            exact = history.get(keys[i]) if i in keys else None
+            kind = history.get(f"kind:{_property_kind(property)}")
+            cost = (exact or {}).get('seconds') or (kind or {}).get('seconds')
+        costs[i] = cost if cost is not None else DEFAULT_PROPERTY_COST
+    return costs
+
+
+def _record_property_cost(st_dir: str, property: Dict, seconds: float, lower_bound: bool = False):
+    """
+    记录性质的验证耗时（同一程序 + 性质的最近一次，和按种类的滑动平均）；
+    lower_bound: 运行被预算打断，真实耗时至少是 seconds，只抬高该性质自己的记录
+    """
+    history = _cost_history()
+    if history is None:
+        return
+    key = _verification_cache_keys(st_dir, [(0, property)]).get(0)
+    if key is not None:
+        if lower_bound:
+            seconds = max(seconds, (history.get(key) or {}).get('seconds') or 0)
+        history.put(key, {'seconds': round(seconds, 3)})
+    if lower_bound:
+        return
+    kind_key = f"kind:{_property_kind(property)}"
+    previous = (history.get(kind_key) or {}).get('seconds')
+    average = seconds if previous is None else previous + COST_AVERAGE_WEIGHT * (seconds - previous)
+    history.put(kind_key, {'seconds': round(average, 3)})
+
+
+def invalidate_verification_cache():
+    """清空验证结果缓存（工具版本变化时会自动失效，这里用于手动清理）"""
+    cache = _verification_cache()
+    if cache is not None:
+        cache.clear()
+
+
+def _property_spec(property: Dict) -> Dict:
+    return property if 'job_req' in property else property.get('property', {})
+
+
+def _shared_model_groups(properties) -> List[List]:
+    """按 entry point 分组可共享模型的模式属性（每组至少两个）"""
+    groups = {}
+    for i, property in properties:
+        spec = _property_spec(property)
+        if spec.get("job_req") == "pattern" and spec.get("pattern_id") in SHARED_PATTERN_SPECS \
+                and spec.get("pattern_params"):
+            groups.setdefault(spec.get("entry_point"), []).append((i, spec))
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def _verify_shared_group(st_dir: str, group: List, base_dir: str, budget=None) -> Dict[int, PropertyResult]:
+    """
+    Translate the program once for all pattern properties of one entry point and check every spec
+    in a single nuXmv run. The model is generated by plcverif-cli for a synthetic invariant over
+    all pattern parameters, so its cone-of-influence reduction keeps every variable they reference.
+    Returns the conclusive results by property index; the others are left to the per-property path.
+    """
+    if budget is not None and budget.expired:
+        return {}
+    cancel_event = budget.event() if budget is not None else None
+    entry_point = group[0][1].get("entry_point")
+    case_id = "shared_model"
+    model_dir = f"{base_dir}/{case_id}_{group[0][0]}"
+    params = [f"({param})" for _, spec in group for param in split_pattern_params(spec["pattern_params"])]
+    source_file, slice_ratio = _sliced_source(st_dir, params, entry_point, f"{model_dir}.sliced.st")
+
+    with _plcverif_slots:
         output = plcverif_call(
-            source_file=st_dir,
+            source_file=source_file,
             case_id=case_id,
-            job_req=job_req,
-            backend=backend,
-            pattern_id=pattern_id,
-            pattern_params=pattern_params,
-            output_dir=output_dir,
-            entry_point=entry_point
+            job_req="pattern",
+            backend="nusmv",
+            pattern_id="pattern-invariant",
+            pattern_params={"1": " OR ".join(params)},
+            output_dir=model_dir,
+            entry_point=entry_point,
+            cancel_event=cancel_event
         )
+        runs = list(getattr(output, 'runs', []))
+        smv_file = os.path.join(model_dir, f"{case_id}.smv")
+        if not os.path.exists(smv_file):
+            print("Shared model generation failed, verifying the properties one by one.")
+            return {}
+
+        model = SmvModel.load(smv_file)
+        narrowed = model.narrow(_program_ranges(st_dir, entry_point, params))
+        if narrowed:
+            print(f"Shared model narrowed with {narrowed} value range constraints")
+        specs = {}
+        for i, spec in group:
+            try:
+                specs[i] = model.pattern_spec(spec["pattern_id"], spec["pattern_params"])
+            except SmvTranslationError as e:
+                print(f"property {i} cannot use the shared model: {e}")
+        if not specs:
+            return {}
+
+        # one named CTLSPEC per property, each checked into its own property_i/property_i.smv.cex
+        all_specs_file = os.path.join(model_dir, f"{case_id}.all.smv")
+        with open(all_specs_file, 'w') as f:
+            f.write(model.render({f"property_{i}": spec for i, spec in specs.items()}))
+        script_lines = ["set on_failure_script_quits", "set traces_hiding_prefix ___",
+                        "set default_trace_plugin 1", "go"]
+        for i in specs:
+            output_dir = f"{base_dir}/property_{i}"
+            get_workspace_manager().prepare_dir(output_dir)
+            cex_file = os.path.join(output_dir, f"property_{i}.smv.cex")
+            script_lines.append(f'check_ctlspec -P "property_{i}" -o "{cex_file}"')
+        script_lines.append("quit")
+        script_file = all_specs_file + ".script"
+        with open(script_file, 'w') as f:
+            f.write("\n".join(script_lines) + "\n")
+
+        print(f"Checking {len(specs)} properties on the shared model of {os.path.basename(st_dir)}")
+        runs.append(run_tool('nuXmv', [backend_binary("nusmv"), "-source", script_file, all_specs_file],
+                             cancel_event=cancel_event))
+
+    results = {}
+    for i, spec in group:
+        if i not in specs:
+            continue
+        verdict, details, counterexample = _nusmv_verdict(f"{base_dir}/property_{i}", f"property_{i}")
+        if verdict == "unknown":
+            continue
+        result_summary = f"property {i}: job_req: pattern" + details
+        result_summary += f"\npattern details:\n{generate_nl_description(spec['pattern_id'], spec['pattern_params'])}"
+        # the shared translation and check are accounted to the first property of the group
+        results[i] = PropertyResult(result_summary, verdict, "nusmv", runs if not results else [],
+                                    counterexample=counterexample, slice_ratio=slice_ratio)
+    return results
+
+
+def _validate_single_property(st_dir: str, i: int, property: Dict, base_dir: str, budget=None) -> PropertyResult:
+    """在全局并发上限内验证第 i 个性质；预算耗尽后不再启动，被预算打断的无结论结果会标记出来"""
+    with _plcverif_slots:
+        if budget is not None and budget.expired:
+            budget.record_inconclusive(i)
+            return PropertyResult(f"property {i}: job_req: {_property_spec(property).get('job_req', 'assertion')}"
+                                  f"\nNot verified: the time budget of the case was exhausted before it started.",
+                                  "unknown", budget_exhausted=True)
+        start_time = time.monotonic()
+        result = _verify_property(st_dir, i, property, base_dir, budget)
+    interrupted = budget is not None and budget.expired and result.verdict == "unknown"
+    _record_property_cost(st_dir, property, time.monotonic() - start_time, lower_bound=interrupted)
+    if interrupted:
+        budget.record_inconclusive(i)
+        marked = PropertyResult(result + "\nInconclusive: the time budget of the case was exhausted.",
+                                "unknown", result.backend, slice_ratio=result.metrics.get('slice_ratio'),
+                                budget_exhausted=True)
+        marked.metrics = result.metrics
+        marked.original_metrics = result.original_metrics
+        return marked
+    return result
+
+
+def _verify_property(st_dir: str, i: int, property: Dict, base_dir: str, budget=None) -> PropertyResult:
+    """验证第 i 个性质：plcverif-cli 调用、nusmv / cbmc 竞速（或 nusmv -> cbmc 回退）和结果解析"""
+    case_id = f"property_{i}"
+    output_dir = f"{base_dir}/{case_id}"
+
+    property = _property_spec(property)
+
+    job_req = property.get("job_req", "assertion")
+    pattern_id = property.get("pattern_id")
+    pattern_params = property.get("pattern_params", {})
+    entry_point = property.get("entry_point", None)
+
+    source_file, slice_ratio = st_dir, None
+    if job_req == "pattern" and pattern_params:
+        source_file, slice_ratio = _sliced_source(st_dir, split_pattern_params(pattern_params), entry_point,
+                                                  f"{output_dir}.sliced.st")
+    call_args = dict(source_file=source_file, case_id=case_id, job_req=job_req, pattern_id=pattern_id,
+                     entry_point=entry_point)
+    # race both backends when a race slot is free, otherwise run them one after the other
+    if _plcverif_backend_race and _plcverif_race_slots.acquire(blocking=False):
+        try:
+            backend, output, output_dir, runs = _race_backends(call_args, pattern_params, output_dir, budget)
+        finally:
+            _plcverif_race_slots.release()
+    else:
+        backend, output, runs = _sequential_backends(call_args, pattern_params, output_dir, budget)
 
-        # if nusmv fail/timeoutr, switch to  cbmc backend
-        if "Timeout" in output or "The NuSMV backend execution has not been successful" in output \
-                or 'No suitable files found for further analysis' in output:
-            backend = "cbmc"
-            print(
-                f"nusmv backend failed for case ID: {case_id}. Switching to cbmc backend.")
-            output = plcverif_call(
-                source_file=st_dir,
-                case_id=case_id,
-                job_req=job_req,
-                backend=backend,
-                pattern_id=pattern_id,
-                pattern_params=pattern_params,
-                output_dir=output_dir,
-                entry_point=entry_point
-            )
-
-        result_summary = f"property {i}: job_req: {job_req}"
-
-        if backend == "nusmv":
-            # handle nusmv/nuXmv backend logic
-            smv_cex_file = os.path.join(output_dir, f"{case_id}.smv.cex")
-            if os.path.exists(smv_cex_file):
-                with open(smv_cex_file, 'r') as f:
-                    cex_content = f.read()
-
-                if "is true" in cex_content:
-                    result_summary += " is satisfied by the program."
-                elif "is false" in cex_content:
-                    result_summary += " is violated by the program."
-                    # parse counterexample from html and feedback.
-                    html_files = [f for f in os.listdir(
-                        output_dir) if f.endswith('.html')]
-                    if html_files:
-                        html_file_path = os.path.join(
-                            output_dir, html_files[0])
-                        cex_details = parse_html_counterexample(html_file_path)
-                        result_summary += "\nCounterexample details:\n" + cex_details
-                    else:
-                        result_summary += "\nNo counterexample details found."
-            else:
-                result_summary += "verification could not be completed due to failed smv file generation"
-
-        elif backend == "cbmc":
-             # handle cbmc backend logic
-            if "VERIFICATION FAILED" in output:
-                result_summary += " is violated by the program."
-                html_files = [f for f in os.listdir(
-                    output_dir) if f.endswith('.html')]
-                if html_files:
-                    html_file_path = os.path.join(output_dir, html_files[0])
-                    cex_details = parse_html_counterexample(html_file_path)
-                    result_summary += "\nCounterexample details:\n" + cex_details
-                else:
-                    result_summary += "\nNo counterexample details found."
-                # add cbmc output info to summary
-                result_summary += "\ncbmc output info:\n" + output
-            elif "No suitable files found for further analysis" in output or "Timeout" in output:
-                result_summary += " is not successfully checked."
-            elif "VERIFICATION SUCCESSFUL" in output:
-                result_summary += " is satisfied by the program."
-            else:
-                result_summary += " validation result is not clear."
-
-        # summarize pattern details
-        if job_req == "pattern":
-            result_summary += f"\npattern details:\n{generate_nl_description(pattern_id, pattern_params)}"
-
-        summary.append(result_summary)
+    result_summary = f"property {i}: job_req: {job_req}"
+    verdict, details, counterexample = _backend_verdict(backend, output, output_dir, case_id)
+    result_summary += details
 
-    # print overall summary
-    print("\n########## Overall Validation Summary ##########\n")
-    for item in summary:
-        print(item)
-    print("\n########## End of Validation Summary ##########\n")
-    # return "Plcverif verification result:" + str(summary)
-    return summary
+    # summarize pattern details
+    if job_req == "pattern":
+        result_summary += f"\npattern details:\n{generate_nl_description(pattern_id, pattern_params)}"
+
+    return PropertyResult(result_summary, verdict, backend, runs, counterexample=counterexample,
+                          slice_ratio=slice_ratio, bounded=backend == "cbmc" and verdict == "satisfied")
+
+
+def _sliced_source(st_dir: str, expressions: List[str], entry_point: str, sliced_file: str):
+    """
+    Cone-of-influence slice of the program for the given property expressions, written next to the
+    property's output directory (plcverif_call empties the directory itself). Returns
+    (source file to verify, kept statement ratio); the original file and None when slicing is
+    disabled, not possible or removes nothing.
+    """
+    if not _plcverif_slicing:
+        return st_dir, None
+    try:
+        os.makedirs(os.path.dirname(sliced_file), exist_ok=True)
+        result = slice_file(st_dir, expressions, sliced_file, entry_point)
+    except (SliceError, OSError) as e:
+        print(f"Verifying the whole program, slicing not possible: {e}")
+        return st_dir, None
+    if not result.reduced:
+        return st_dir, None
+    print(f"Program slice for {os.path.basename(sliced_file)}: {result.summary()}")
+    return sliced_file, result.ratio
+
+
+def _program_ranges(st_dir: str, entry_point: str, expressions: List[str]) -> Dict:
+    """程序数值变量的取值范围（属性常量作为加宽阈值）；关闭或无法分析时为空"""
+    if not _range_narrowing:
+        return {}
+    try:
+        with open(st_dir, 'r', encoding='utf-8', errors='replace') as f:
+            return infer_ranges(f.read(), entry_point, property_constants(expressions))
+    except (RangeAnalysisError, OSError) as e:
+        print(f"No value ranges for the shared model: {e}")
+        return {}
+
+
+def _sequential_backends(call_args: Dict, pattern_params: Dict, output_dir: str, budget=None):
+    """nusmv 先跑，失败或超时后再从头跑 cbmc（预算耗尽时不再回退）；返回 (backend, output, runs)"""
+    backend = "nusmv"
+    runs = []
+    cancel_event = budget.event() if budget is not None else None
+    output = plcverif_call(**call_args, backend=backend, pattern_params=pattern_params, output_dir=output_dir,
+                           cancel_event=cancel_event)
+    runs.extend(getattr(output, 'runs', []))
+
+    # if nusmv fail/timeoutr, switch to  cbmc backend
+    if ("Timeout" in output or "The NuSMV backend execution has not been successful" in output
+            or 'No suitable files found for further analysis' in output) and not (budget and budget.expired):
+        backend = "cbmc"
+        print(
+            f"nusmv backend failed for case ID: {call_args['case_id']}. Switching to cbmc backend.")
+        output = plcverif_call(**call_args, backend=backend, pattern_params=pattern_params, output_dir=output_dir,
+                               cancel_event=cancel_event)
+        runs.extend(getattr(output, 'runs', []))
+    return backend, output, runs
+
+
+def _race_backends(call_args: Dict, pattern_params: Dict, output_dir: str, budget=None):
+    """
+    Run the nusmv and cbmc backends concurrently (output in output_dir/<backend>) and keep the
+    first decisive verdict: any nusmv verdict or a cbmc violation. The other backend's process group
+    is killed through its cancel event. A cbmc pass is only bounded, so it does not stop nusmv; it is
+    reported when nusmv ends without a verdict. Both are killed when the per-property budget
+    (config plcverif_property_budget) or the case budget runs out.
+    Returns (backend, output, backend output dir, runs of both backends).
+    """
+    case_id = call_args['case_id']
+    backend_dirs = {backend: f"{output_dir}/{backend}" for backend in RACE_BACKENDS}
+    cancel_events = {backend: budget.event() if budget is not None else threading.Event()
+                     for backend in RACE_BACKENDS}
+    winner, bounded_pass = None, None
+    executor = ThreadPoolExecutor(max_workers=len(RACE_BACKENDS), thread_name_prefix=f"plcverif-race-{case_id}")
+    # plcverif_call quotes the pattern params in place, so every backend gets its own copy
+    futures = {executor.submit(plcverif_call, **call_args, backend=backend, pattern_params=dict(pattern_params),
+                               output_dir=backend_dirs[backend], cancel_event=cancel_events[backend]): backend
+               for backend in RACE_BACKENDS}
+    try:
+        for future in as_completed(futures, timeout=_plcverif_property_budget):
+            backend = futures[future]
+            if future.exception() is not None:
+                continue
+            verdict = _backend_verdict(backend, future.result(), backend_dirs[backend], case_id, details=False)[0]
+            if verdict == "violated" or (verdict == "satisfied" and backend != "cbmc"):
+                winner = backend
+                break
+            if verdict == "satisfied":
+                bounded_pass = backend
+    except FuturesTimeout:
+        print(f"Time budget of {_plcverif_property_budget}s exhausted for case ID: {case_id}")
+    finally:
+        for event in cancel_events.values():
+            event.set()
+        executor.shutdown(wait=True)
+
+    outputs, runs, errors = {}, [], []
+    for future, backend in futures.items():
+        if future.exception() is not None:
+            errors.append(future.exception())
+            continue
+        outputs[backend] = future.result()
+        runs.extend(getattr(outputs[backend], 'runs', []))
+    if not outputs:
+        raise errors[0]
+    if winner is None and bounded_pass is not None:
+        print(f"Only a bounded cbmc check passed for case ID: {case_id}")
+        winner = bounded_pass
+    elif winner is None:
+        # nothing conclusive: report the first backend that produced output
+        winner = next(backend for backend in RACE_BACKENDS if backend in outputs)
+    else:
+        print(f"{winner} backend won the race for case ID: {case_id}")
+    return winner, outputs[winner], backend_dirs[winner], runs
+
+
+def _backend_verdict(backend: str, output: str, output_dir: str, case_id: str, details: bool = True):
+    """
+    返回 (verdict, 追加到结果摘要的文字, Counterexample 或 None)；
+    details=False 时只判定结论，不读取反例（竞速时用）
+    """
+    if backend == "nusmv":
+        return _nusmv_verdict(output_dir, case_id, details)
+    return _cbmc_verdict(output, output_dir, details)
+
+
+def _report_counterexample(output_dir: str):
+    """plcverif HTML 报告里的反例（ST 变量名和类型），没有报告或反例时返回 None"""
+    html_files = [f for f in os.listdir(output_dir) if f.endswith('.html')] if os.path.isdir(output_dir) else []
+    return parse_html_report(os.path.join(output_dir, html_files[0])) if html_files else None
+
+
+def _counterexample_details(counterexample) -> str:
+    if counterexample is None:
+        return "\nNo counterexample details found."
+    return "\nCounterexample details:\n" + counterexample.to_markdown()
+
+
+def _cbmc_verdict(output: str, output_dir: str, details: bool = True):
+    """根据 cbmc 输出返回 (verdict, 追加到结果摘要的文字, Counterexample)"""
+    if "VERIFICATION FAILED" in output:
+        if not details:
+            return "violated", "", None
+        # the report belongs to plcverif's own cbmc run, with adaptive unwind the violation may only
+        # have been found by a deeper run, whose --trace is part of the output
+        counterexample = _report_counterexample(output_dir) or read_cbmc_trace(output.splitlines())
+        text = " is violated by the program." + _counterexample_details(counterexample)
+        # add cbmc output info to summary (without the raw traces, they are in the table above)
+        text += "\ncbmc output info:\n" + strip_cbmc_traces(output)
+        return "violated", text, counterexample
+    if "No suitable files found for further analysis" in output or "Timeout" in output:
+        return "unknown", " is not successfully checked.", None
+    shallow = re.search(r'CBMC unwind budget exhausted: (\d+) < (\d+)', output)
+    if shallow:
+        return "unknown", (f" is not conclusively checked: cbmc only passed up to unwind {shallow.group(1)} "
+                           f"within the budget (at least {shallow.group(2)} is required)."), None
+    if "VERIFICATION SUCCESSFUL" in output:
+        bound = re.search(r'CBMC unwind bound reached: (\d+)', output)
+        if bound:
+            return "satisfied", f" is satisfied by the program (bounded check up to unwind {bound.group(1)}).", None
+        return "satisfied", " is satisfied by the program (bounded check).", None
+    return "unknown", " validation result is not clear.", None
+
+
+def _nusmv_verdict(output_dir: str, case_id: str, details: bool = True):
+    """读取 {case_id}.smv.cex，返回 (verdict, 追加到结果摘要的文字, Counterexample)"""
+    smv_cex_file = os.path.join(output_dir, f"{case_id}.smv.cex")
+    if not os.path.exists(smv_cex_file):
+        return "unknown", "verification could not be completed due to failed smv file generation", None
+
+    # the trace is only kept when there is no plcverif report to take the counterexample from
+    html_counterexample = _report_counterexample(output_dir) if details else None
+    status, trace_counterexample = nuxmv_cex_file(
+        smv_cex_file, max_steps=None if details and html_counterexample is None else 1)
+    if status == "satisfied":
+        return "satisfied", " is satisfied by the program.", None
+    if status == "violated":
+        if not details:
+            return "violated", "", None
+        # shared-model checks have no plcverif report, only the nuXmv trace
+        counterexample = html_counterexample or trace_counterexample
+        return "violated", " is violated by the program." + _counterexample_details(counterexample), counterexample
+    return "unknown", "", None
+
+
+def backend_binary(backend):
+    """nuXmv / cbmc 可执行文件路径（环境变量 nuXmv_PATH / CBMC_PATH，否则 whereis）"""
+    if backend == 'nusmv':
+        backend_path = os.getenv('nuXmv_PATH', '') + '/nuXmv'
+        if not os.path.isfile(backend_path):
+            backend_path = subprocess.getoutput('whereis nuXmv').split(' ')[1]
+    elif backend == 'cbmc':
+        backend_path = os.getenv('CBMC_PATH', '') + '/cbmc'
+        if not os.path.isfile(backend_path):
+            backend_path = subprocess.getoutput('whereis cbmc').split(' ')[1]
+    else:
+        raise ValueError("Unsupported backend: {}".format(backend))
 
+    if not os.path.isfile(backend_path):
+        raise FileNotFoundError(
+            "Backend binary not found at: {}".format(backend_path))
+    return backend_path
 
 
 def plcverif_call(
@@ -132,8 +666,9 @@ def plcverif_call(
     pattern_params=None,
     output_dir=None,
     entry_point=None,
-    unwind=10,
-    verbosity=7
+    unwind=None,
+    verbosity=7,
+    cancel_event=None
 ):
     """
     Call plcverif based on the provided parameters
@@ -149,8 +684,10 @@ def plcverif_call(
     - pattern_params (dict): Dictionary of pattern parameters (optional, required if job_req is 'pattern').
     - output_dir (str): Path to the output directory (default: based on source file).
     - entry_point (str): Optional entry point function or block (optional).
-    - unwind (int): Unwind value for CBMC backend (default: 10).
+    - unwind (int): Fixed unwind value for CBMC backend. Default None: adaptive unwind, the bound is
+      deepened within the cbmc_unwind_budget (see schedule_cbmc_unwind).
     - verbosity (int): Verbosity level for CBMC backend (default: 7).
+    - cancel_event (threading.Event): Kills the running tools once set (used when racing backends).
     """
 
     # Determine the case ID based on the source file name if not provided
@@ -159,31 +696,21 @@ def plcverif_call(
 
     # Determine the output directory based on the source file if not provided
     if not output_dir:
-        output_dir = f"/home/work/dataset/dataset_runnable_output/{case_id}/"
-
-    # if output_dir exists, just delete content in it.
-    if os.path.exists(output_dir):
-        print(f"Cleaning up existing output directory: {output_dir}")
-        shutil.rmtree(output_dir)
+        # no output location requested: run in a temporary workspace released when the call returns
+        with get_workspace_manager().acquire(case_id) as workspace:
+            return plcverif_call(source_file, case_id, job_type, backend, job_req, pattern_id,
+                                 pattern_params, workspace.path, entry_point, unwind, verbosity, cancel_event)
 
-    # Ensure the output directory exists
-    os.makedirs(output_dir, exist_ok=True)
+    # start from an empty output directory; stale content is removed in the background
+    get_workspace_manager().prepare_dir(output_dir)
 
     # Determine the path to the backend binary
-    if backend == 'nusmv':
-        backend_path = os.getenv('nuXmv_PATH', '') + '/nuXmv'
-        if not os.path.isfile(backend_path):
-            backend_path = subprocess.getoutput('whereis nuXmv').split(' ')[1]
-    elif backend == 'cbmc':
-        backend_path = os.getenv('CBMC_PATH', '') + '/cbmc'
-        if not os.path.isfile(backend_path):
-            backend_path = subprocess.getoutput('whereis cbmc').split(' ')[1]
-    else:
-        raise ValueError("Unsupported backend: {}".format(backend))
+    backend_path = backend_binary(backend)
 
-    if not os.path.isfile(backend_path):
-        raise FileNotFoundError(
-            "Backend binary not found at: {}".format(backend_path))
+    # adaptive unwind: plcverif only needs to generate the C model, a small bound keeps its own cbmc run cheap
+    adaptive_unwind = unwind is None
+    if adaptive_unwind:
+        unwind = _cbmc_initial_unwind
 
     # Construct the base command
     if backend == 'nusmv':
@@ -249,42 +776,51 @@ def plcverif_call(
         print(
             f"Patterns to be verified listed as follows:\n{generate_nl_description(pattern_id, pattern_params)}")
 
-    try:
-        result = subprocess.run(
-            cmd, check=True, capture_output=True, text=True)
-        output = result.stdout
-        print(output)
+    run = run_plcverif(cmd, cancel_event=cancel_event)
+    if run.timed_out:
+        # killed by the runner: reported like a backend timeout so that the caller falls back to cbmc
+        print(f"Verification timed out for case ID: {case_id} with job_req: {job_req}")
         print("************   Verification process completed   ***********\n")
+        return ToolOutput(f"Timeout: plcverif-cli killed ({run.killed_reason}) after {run.wall_time:.0f}s", [run])
 
-        # the rest parsing will be moved to tool
-        if "Output to file" in output:
-            return output  
-
-        elif "Timeout" in output or "The NuSMV backend execution has not been successful" in output:
-            print(
-                f"Verification timed out for case ID: {case_id} with job_req: {job_req}")
-            if backend == "cbmc":
-                # cbmc timeout means less unwind loops could be needed.
-                output = handle_unexpected_output(
-                    output_dir, backend, backend_path, int(unwind/2), verbosity)
-            return output  
-
-        else:
-            print(
-                f"Unexpected output for case ID: {case_id} with job_req: {job_req}. Check the logs for details.")
-            return handle_unexpected_output(output_dir, backend, backend_path, unwind, verbosity)
-
-    except subprocess.CalledProcessError as e:
-        error_output = e.stderr
+    if run.returncode != 0:
+        error_output = run.stderr
         print(
             f"Verification failed for case ID: {case_id} with job_req: {job_req}.")
         print(error_output)
         print("************   Verification process completed   ***********\n")
-        return error_output
+        return ToolOutput(error_output, [run])
         # if "SettingsParserException" in error_output:
         #     print("Error: The source file does not exist or could not be parsed.")
 
-    # print("************   Verification process completed   ***********\n")
+    output = run.stdout
+    print(output)
+    print("************   Verification process completed   ***********\n")
+
+    if backend == 'cbmc' and adaptive_unwind:
+        deepened = schedule_cbmc_unwind(source_file, entry_point, output_dir, backend_path, verbosity, cancel_event)
+        if deepened is not None:
+            return ToolOutput(deepened, [run, *deepened.runs])
+
+    # the rest parsing will be moved to tool
+    if "Output to file" in output:
+        return ToolOutput(output, [run])
+
+    elif "Timeout" in output or "The NuSMV backend execution has not been successful" in output:
+        print(
+            f"Verification timed out for case ID: {case_id} with job_req: {job_req}")
+        if backend == "cbmc":
+            # cbmc timeout means less unwind loops could be needed.
+            output = handle_unexpected_output(
+                output_dir, backend, backend_path, int(unwind/2), verbosity, cancel_event)
+            return ToolOutput(output, [run, *output.runs])
+        return ToolOutput(output, [run])
+
+    else:
+        print(
+            f"Unexpected output for case ID: {case_id} with job_req: {job_req}. Check the logs for details.")
+        output = handle_unexpected_output(output_dir, backend, backend_path, unwind, verbosity, cancel_event)
+        return ToolOutput(output, [run, *output.runs])
 
 
 def generate_nl_description(pattern_id, pattern_params):
@@ -326,13 +862,12 @@ def parse_smv_cex(cex_file_path):
     """
     try:
         with open(cex_file_path, 'r') as file:
-            lines = file.readlines()
-
-        for line in lines:
-            if "is true" in line:
-                return "satisfied", "The specification is true, indicating the property holds."
-            elif "is false" in line:
-                return "violated", "The specification is false, indicating the property is violated."
+            # only the status line is needed, the trace after it is not read
+            for line in file:
+                if "is true" in line:
+                    return "satisfied", "The specification is true, indicating the property holds."
+                elif "is false" in line:
+                    return "violated", "The specification is false, indicating the property is violated."
 
         return "unknown", "No clear success or failure message found in the counterexample file."
 
@@ -345,45 +880,10 @@ def parse_html_counterexample(html_file_path):
     Parse generated counterexample from HTML report file to indicate when a specification is violated.
     """
     try:
-        with open(html_file_path, 'r') as file:
-            soup = BeautifulSoup(file, 'lxml')
-
-        counterexample_details = ""
-
-        # Locate the Counterexample section
-        counterexample_section = soup.find('h2', string="Counterexample")
-        if counterexample_section:
-            table = counterexample_section.find_next('table')
-            if table:
-                # Append the header for counterexample details
-                counterexample_details += "### Counterexample Details:\n\n"
-
-                rows = table.find_all('tr')
-
-                # Iterate through all rows, including headers
-                for i, row in enumerate(rows):
-                    # Read both headers (th) and data cells (td)
-                    cols = row.find_all(['th', 'td'])
-                    cols_text = [ele.text.strip() for ele in cols]
-
-                    if cols_text:
-                        if i == 0:
-                            # Assume first row is the header, format it in Markdown style
-                            header_line = " | ".join(cols_text)
-                            separator_line = " | ".join(
-                                ['---'] * len(cols_text))
-                            counterexample_details += f"{header_line}\n{separator_line}\n"
-                        else:
-                            # Format each row in Markdown style
-                            row_line = " | ".join(cols_text)
-                            counterexample_details += f"{row_line}\n"
-            else:
-                counterexample_details += "Counterexample section found, but no details available."
-
-        return counterexample_details or "No counterexample found."
-
+        counterexample = parse_html_report(html_file_path)
     except FileNotFoundError:
         return f"HTML file not found: {html_file_path}"
+    return counterexample.to_markdown() if counterexample else "No counterexample found."
 
 
 def filter_smv_output(output):
@@ -406,6 +906,11 @@ def filter_smv_output(output):
 #     return "\n".join(filtered_lines)
 
 
+def strip_cbmc_traces(output):
+    """去掉 cbmc --trace 输出的 trace 部分，保留结果行"""
+    return re.sub(r'\n(Trace for |Counterexample:).*?(?=\n\*\*|\Z)', '', output, flags=re.S)
+
+
 def filter_cbmc_output(output):
     """过滤CBMC输出, 保留Results部分"""
     filtered_lines = []
@@ -469,7 +974,83 @@ def process_c_file(file_path):
         print(f"An error occurred: {e}")
 
 
-def handle_unexpected_output(output_dir, backend, backend_path, unwind, verbosity):
+def _unwind_cache():
+    if not getattr(config, 'verification_cache_enabled', True):
+        return None
+    try:
+        return get_result_cache('cbmc_unwind')
+    except Exception as e:
+        print(f"   ⚠️  Unwind cache disabled: {e}")
+        return None
+
+
+def schedule_cbmc_unwind(source_file, entry_point, output_dir, backend_path, verbosity=7, cancel_event=None):
+    """
+    Iterative deepening over the CBMC unwind bound on the C model plcverif generated in output_dir.
+
+    Starts at cbmc_initial_unwind (or at the largest bound that completed for this program before,
+    kept in the result cache), doubles the bound after every successful run while the predicted
+    cost of the next run fits into the remaining cbmc_unwind_budget, and stops at the first
+    violation, timeout or cbmc_max_unwind. Below cbmc_min_unwind it keeps deepening until the budget
+    is spent. Returns the filtered cbmc output of the deepest completed run followed by a
+    "CBMC unwind bound reached: k" line, or None when there is no C model. A pass that never reached
+    cbmc_min_unwind gets a "CBMC unwind budget exhausted" line instead and is not a verdict.
+    """
+    c_files = [f for f in os.listdir(output_dir) if f.endswith('.c')] if os.path.isdir(output_dir) else []
+    if not c_files:
+        return None
+    c_file = os.path.join(output_dir, c_files[0])
+    # modify c file so that c inf or nan check which is not included in st would not affect result
+    process_c_file(c_file)
+
+    cache, cache_key, cached_unwind = _unwind_cache(), None, 0
+    if cache is not None:
+        try:
+            with open(source_file, 'r', encoding='utf-8', errors='replace') as f:
+                cache_key = make_cache_key(normalize_st_source(f.read()), entry_point)
+            cached_unwind = (cache.get(cache_key) or {}).get('unwind', 0)
+        except OSError:
+            pass
+
+    unwind = max(_cbmc_initial_unwind, min(cached_unwind, _cbmc_max_unwind))
+    deadline = time.monotonic() + _cbmc_unwind_budget
+    runs, reached, last_output = [], None, ""
+    while unwind <= _cbmc_max_unwind:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        run = run_tool('cbmc', [backend_path, c_file, "--unwind", str(unwind), "--trace",
+                                "--verbosity", str(verbosity)],
+                       timeout=remaining, cancel_event=cancel_event)
+        runs.append(run)
+        if run.timed_out:
+            break
+        output = filter_cbmc_output(run.stdout)
+        if "VERIFICATION FAILED" not in output and "VERIFICATION SUCCESSFUL" not in output:
+            last_output = last_output or output
+            break
+        last_output, reached = output, unwind
+        print(f"cbmc completed unwind {unwind} in {run.wall_time:.2f}s")
+        if "VERIFICATION FAILED" in output or \
+                (unwind >= _cbmc_min_unwind and run.wall_time * CBMC_COST_GROWTH > deadline - time.monotonic()):
+            break
+        # the bound doubles, but the minimum and maximum bounds are not skipped
+        next_unwind = unwind * 2
+        for bound in (_cbmc_min_unwind, _cbmc_max_unwind):
+            if unwind < bound < next_unwind:
+                next_unwind = bound
+        unwind = next_unwind
+
+    if reached is None:
+        return ToolOutput(last_output if last_output and not runs[-1].timed_out else "Timeout", runs)
+    if cache_key is not None and reached > cached_unwind:
+        cache.put(cache_key, {'unwind': reached})
+    if reached < _cbmc_min_unwind and "VERIFICATION FAILED" not in last_output:
+        return ToolOutput(f"{last_output}\nCBMC unwind budget exhausted: {reached} < {_cbmc_min_unwind}", runs)
+    return ToolOutput(f"{last_output}\nCBMC unwind bound reached: {reached}", runs)
+
+
+def handle_unexpected_output(output_dir, backend, backend_path, unwind, verbosity, cancel_event=None):
     """
         If the process fails, check if there is useable generated files to continue validation.
         cbmc backend needs this recovery method more often.
@@ -480,33 +1061,28 @@ def handle_unexpected_output(output_dir, backend, backend_path, unwind, verbosit
 
         if smv_files and backend == 'nusmv':
             print("Running nuXmv on the generated .smv file...")
-            result = subprocess.run(f"{backend_path} {os.path.join(output_dir, smv_files[0])}",
-                                    shell=True, capture_output=True, text=True)
-            filtered_output = filter_smv_output(result.stdout)
-            return filtered_output
+            run = run_tool('nuXmv', [backend_path, os.path.join(output_dir, smv_files[0])],
+                           cancel_event=cancel_event)
+            if run.timed_out:
+                return ToolOutput("Timeout", [run])
+            return ToolOutput(filter_smv_output(run.stdout), [run])
 
         elif c_files and backend == 'cbmc':
             print("Running CBMC on the generated .c file...")
             # modify c file so that c inf or nan check
             process_c_file(os.path.join(output_dir, c_files[0]))
             # which is not included in st would not affect result
-            try:
-                result = subprocess.run(
-                    f"{backend_path} {os.path.join(output_dir, c_files[0])} --unwind {unwind} --verbosity {verbosity}",
-                    shell=True,
-                    capture_output=True,
-                    text=True,
-                    timeout=30  # Set a timeout of 30 seconds
-                )
-                filtered_output = filter_cbmc_output(result.stdout)
-            except subprocess.TimeoutExpired:
-                filtered_output = "Timeout"
-            return filtered_output
+            run = run_tool('cbmc', [backend_path, os.path.join(output_dir, c_files[0]),
+                                    "--unwind", str(unwind), "--trace", "--verbosity", str(verbosity)],
+                           cancel_event=cancel_event)
+            if run.timed_out:
+                return ToolOutput("Timeout", [run])
+            return ToolOutput(filter_cbmc_output(run.stdout), [run])
 
         else:
-            return "No suitable files found for further analysis."
+            return ToolOutput("No suitable files found for further analysis.")
     else:
-        return "Output directory does not exist. No further actions taken."
+        return ToolOutput("Output directory does not exist. No further actions taken.")
 
 
 if __name__ == "__main__":
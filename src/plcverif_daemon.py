@@ -0,0 +1,266 @@
+## Warm pool of long-running plcverif workers.
+## plcverif-cli is a JVM / Eclipse application: for short verifications JVM startup and plugin loading
+## cost more than the model checking itself. A worker is a plcverif process started once (command in
+## config.plcverif_daemon_cmd) that serves jobs over stdin / stdout, one JSON object per line:
+##   worker -> {"ready": true}                                   once, after startup
+##   caller -> {"id": "...", "args": [...plcverif-cli args], "cwd": "..."}
+##   worker -> {"id": "...", "returncode": 0, "stdout": "...", "stderr": "..."}
+## The worker itself is NOT part of this repository: plcverif-cli has no server mode, so the command
+## has to be an external program (e.g. a small JVM entry point on the plcverif classpath that calls
+## the CLI main per job) implementing the protocol above.
+## Without a configured command (the default), or when the worker binary is missing or cannot be
+## started, every job runs as a fresh plcverif-cli process, i.e. one cold JVM per property.
+import subprocess
+import sys
+import os
+import json
+import queue
+import signal
+import threading
+import time
+import uuid
+import atexit
+from pathlib import Path
+from typing import List, Optional
+# Resolve the parent directory as an absolute path
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+
+import config
+from src.toolchain_runner import run_tool, tool_limits, ToolRun
+
+
+# _next_response result when no line arrived in time (None means the worker closed stdout)
+_NO_RESPONSE = object()
+CANCEL_POLL_INTERVAL = 0.1   # seconds
+
+
+class PlcverifWorkerError(Exception):
+    """The worker process died or broke the protocol (the job itself may be fine)."""
+
+
+class PlcverifWorker:
+    """A single warm plcverif process serving one job at a time."""
+
+    def __init__(self, command: List[str], name: str, startup_timeout: float):
+        self.command = list(command)
+        self.name = name
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.jobs = 0
+        self._responses = queue.Queue()
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """启动 worker 并等待它报告 ready（JVM 启动和插件加载只发生在这里）"""
+        self.stop()
+        self._responses = queue.Queue()
+        self.process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            errors='replace',
+            bufsize=1,
+            start_new_session=True,
+        )
+        threading.Thread(target=self._read_responses, args=(self.process, self._responses), daemon=True).start()
+        ready = self._next_response(self.startup_timeout)
+        if not isinstance(ready, dict) or not ready.get("ready"):
+            self.stop()
+            raise PlcverifWorkerError(f"plcverif worker {self.name} did not report ready")
+        self.jobs = 0
+
+    @staticmethod
+    def _read_responses(process, responses):
+        for line in process.stdout:
+            line = line.strip()
+            if not line.startswith('{'):
+                continue    # log output of the worker
+            try:
+                responses.put(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        responses.put(None)  # EOF: the worker exited
+
+    def _next_response(self, timeout):
+        try:
+            return self._responses.get(timeout=timeout)
+        except queue.Empty:
+            return _NO_RESPONSE
+
+    def stop(self):
+        if self.process is None:
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.process.wait()
+        self.process = None
+
+    def run(self, args: List[str], timeout: float, cwd: str = None,
+            cancel_event: threading.Event = None) -> ToolRun:
+        """
+        提交一个作业。超时或 cancel_event 置位会杀死 worker（连同它启动的 nuXmv / cbmc 子进程），
+        返回 timed_out 的 ToolRun。
+
+        Raises:
+            PlcverifWorkerError: worker 已退出或返回了无效的响应
+        """
+        if not self.alive:
+            raise PlcverifWorkerError(f"plcverif worker {self.name} is not running")
+        job_id = uuid.uuid4().hex
+        start_time = time.monotonic()
+        try:
+            self.process.stdin.write(json.dumps({"id": job_id, "args": list(args), "cwd": cwd}) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise PlcverifWorkerError(f"plcverif worker {self.name} rejected the job: {e}")
+
+        deadline = start_time + timeout if timeout else None
+        killed_reason = ''
+        while True:
+            response = self._next_response(CANCEL_POLL_INTERVAL if cancel_event is not None else
+                                           (deadline - time.monotonic() if deadline else None))
+            if response is not _NO_RESPONSE:
+                break
+            if cancel_event is not None and cancel_event.is_set():
+                killed_reason = 'cancelled'
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                killed_reason = 'wall_timeout'
+                break
+        wall_time = time.monotonic() - start_time
+        if killed_reason:
+            self.stop()
+            print(f"   ⏱️  plcverif worker {self.name} killed ({killed_reason}) after {wall_time:.1f}s")
+            return ToolRun(tool='plcverif-daemon', command=['plcverif-cli', *args], returncode=-signal.SIGKILL,
+                           wall_time=wall_time, timed_out=True, killed_reason=killed_reason)
+        if response is None or response.get("id") != job_id:
+            self.stop()
+            raise PlcverifWorkerError(f"plcverif worker {self.name} exited during the job")
+        self.jobs += 1
+        return ToolRun(
+            tool='plcverif-daemon',
+            command=['plcverif-cli', *args],
+            returncode=response.get("returncode", 1),
+            stdout=response.get("stdout", ""),
+            stderr=response.get("stderr", ""),
+            wall_time=wall_time,
+        )
+
+
+class PlcverifDaemonPool:
+    """
+    A fixed number of warm plcverif workers, handed out through a queue so that concurrent property
+    checks (see plcverif_validation) each get their own worker. Dead or timed-out workers are
+    restarted before their next job; a job that fails at the worker level is retried once on a
+    fresh worker and then reported as failed so that the caller can fall back to plcverif-cli.
+    """
+
+    def __init__(self, command=None, size=None, startup_timeout=None, job_timeout=None):
+        self.command = command or getattr(config, 'plcverif_daemon_cmd', None)
+        if isinstance(self.command, str):
+            self.command = self.command.split()
+        self.size = size or getattr(config, 'plcverif_daemon_pool_size', 2)
+        self.startup_timeout = startup_timeout or getattr(config, 'plcverif_daemon_startup_timeout', 120)
+        self.job_timeout = job_timeout or tool_limits('plcverif-cli').get('wall')
+
+        self._workers = []
+        self._idle = queue.Queue()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        """启动全部 worker（预热）"""
+        with self._lock:
+            if self._started:
+                return
+            prefix = f"plcverif-{os.getpid()}"
+            try:
+                for i in range(self.size):
+                    worker = PlcverifWorker(self.command, f"{prefix}-{i}", self.startup_timeout)
+                    worker.start()
+                    self._workers.append(worker)
+                    self._idle.put(worker)
+            except (OSError, PlcverifWorkerError):
+                for worker in self._workers:
+                    worker.stop()
+                self._workers = []
+                raise
+            self._started = True
+            print(f"   ☕ plcverif worker pool started ({self.size} workers)")
+
+    def shutdown(self):
+        with self._lock:
+            for worker in self._workers:
+                worker.stop()
+            self._workers = []
+            self._idle = queue.Queue()
+            self._started = False
+
+    def run(self, args: List[str], cwd: str = None, timeout: float = None,
+            cancel_event: threading.Event = None) -> Optional[ToolRun]:
+        """在一个空闲 worker 上运行作业；worker 层面失败两次返回 None（由调用方回退到 CLI）"""
+        if not self._started:
+            self.start()
+        worker = self._idle.get()
+        try:
+            for attempt in range(2):
+                try:
+                    if not worker.alive:
+                        worker.start()
+                    return worker.run(args, timeout or self.job_timeout, cwd, cancel_event)
+                except (OSError, PlcverifWorkerError) as e:
+                    print(f"   ⚠️  {e}" + (", restarting..." if attempt == 0 else ""))
+            return None
+        finally:
+            self._idle.put(worker)
+
+
+_pool = None
+_pool_error = None
+_pool_lock = threading.Lock()
+
+
+def get_plcverif_daemon_pool() -> Optional[PlcverifDaemonPool]:
+    """
+    返回进程级共享的 worker 池；未配置 plcverif_daemon_cmd 或启动失败时返回 None。
+    启动失败只报告一次，之后直接走 CLI。
+    """
+    global _pool, _pool_error
+    with _pool_lock:
+        if _pool is not None or _pool_error is not None:
+            return _pool
+        if not getattr(config, 'plcverif_daemon_cmd', None):
+            return None
+        pool = PlcverifDaemonPool()
+        try:
+            pool.start()
+        except (OSError, PlcverifWorkerError) as e:
+            pool.shutdown()
+            _pool_error = e
+            print(f"   ⚠️  plcverif worker pool failed to start, using plcverif-cli: {e}")
+            return None
+        atexit.register(pool.shutdown)
+        _pool = pool
+        return _pool
+
+
+def run_plcverif(cmd: List[str], cwd: str = None, cancel_event: threading.Event = None) -> ToolRun:
+    """
+    Run a plcverif-cli command line (cmd[0] == 'plcverif-cli') on a warm worker when the pool is
+    configured, otherwise (or when the worker fails) as a fresh plcverif-cli process.
+    """
+    pool = get_plcverif_daemon_pool()
+    if pool is not None:
+        run = pool.run(cmd[1:], cwd=cwd, cancel_event=cancel_event)
+        if run is not None:
+            return run
+        print("   ⚠️  plcverif worker failed, falling back to plcverif-cli")
+    return run_tool('plcverif-cli', cmd, cwd=cwd, cancel_event=cancel_event)
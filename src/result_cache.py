@@ -0,0 +1,153 @@
+## Persistent, content-addressed result cache shared by the toolchain wrappers.
+## Results are stored as JSON in a sqlite database (one table per kind of result), so the cache
+## can be shared safely by several processes (web UI, fix loops, benchmark workers) at once.
+import sys
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Optional, Dict
+# Resolve the parent directory as an absolute path
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+
+import config
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "agents4plc", "results.sqlite")
+
+# run eviction once every EVICT_EVERY writes instead of on every put
+EVICT_EVERY = 100
+
+
+def normalize_st_source(source: str) -> str:
+    """
+    Normalize ST source text before hashing: unify line endings, drop trailing whitespace and
+    trailing blank lines. Leading blank lines are kept (they shift the reported line numbers), so
+    cached diagnostics still point at the right lines.
+    """
+    lines = source.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return "\n".join(line.rstrip() for line in lines).rstrip('\n')
+
+
+def make_cache_key(*parts) -> str:
+    """sha256 over the given parts (str or JSON-serializable objects)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, str):
+            part = json.dumps(part, sort_keys=True, ensure_ascii=False)
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    A small key -> JSON value store on top of sqlite.
+
+    - WAL journal + busy timeout make concurrent readers/writers from several processes safe.
+    - Entries older than max_age_days are dropped; beyond max_entries the least recently used
+      entries are dropped. Eviction runs on open and then periodically on writes.
+    """
+
+    def __init__(self, table: str, path: str = None, max_entries: int = None, max_age_days: float = None):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid cache table name: {table}")
+        self.table = table
+        self.path = path or getattr(config, 'result_cache_path', None) or DEFAULT_CACHE_PATH
+        self.max_entries = max_entries or getattr(config, 'result_cache_max_entries', 20000)
+        self.max_age_days = max_age_days or getattr(config, 'result_cache_max_age_days', 30)
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._local = threading.local()
+        self._writes = 0
+
+        with self._connect() as conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_last_access ON {self.table}(last_access)")
+        self.evict()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Dict]:
+        """返回缓存的值，未命中返回 None"""
+        try:
+            with self._connect() as conn:
+                row = conn.execute(f"SELECT value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (time.time(), key))
+            return json.loads(row[0])
+        except (sqlite3.Error, json.JSONDecodeError) as e:
+            print(f"   ⚠️  Result cache read failed ({self.table}): {e}")
+            return None
+
+    def put(self, key: str, value: Dict):
+        """写入（或覆盖）一条缓存"""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, created, last_access) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now, now)
+                )
+        except sqlite3.Error as e:
+            print(f"   ⚠️  Result cache write failed ({self.table}): {e}")
+            return
+
+        self._writes += 1
+        if self._writes % EVICT_EVERY == 0:
+            self.evict()
+
+    def delete(self, key: str):
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def evict(self):
+        """按时间和条目数淘汰旧缓存"""
+        try:
+            with self._connect() as conn:
+                if self.max_age_days:
+                    cutoff = time.time() - self.max_age_days * 86400
+                    conn.execute(f"DELETE FROM {self.table} WHERE created < ?", (cutoff,))
+                if self.max_entries:
+                    conn.execute(
+                        f"DELETE FROM {self.table} WHERE key IN ("
+                        f"SELECT key FROM {self.table} ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                        (self.max_entries,)
+                    )
+        except sqlite3.Error as e:
+            print(f"   ⚠️  Result cache eviction failed ({self.table}): {e}")
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM {self.table}")
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_result_cache(table: str) -> ResultCache:
+    """返回进程内共享的缓存实例（每张表一个）"""
+    with _caches_lock:
+        if table not in _caches:
+            _caches[table] = ResultCache(table)
+        return _caches[table]
@@ -0,0 +1,260 @@
+## Pool of long-lived RuSTy docker containers used by the compiler in docker mode.
+## Instead of paying `docker run --rm` (container creation + teardown) for every `plc --check`,
+## a few containers are started once with a shared host workspace mounted at /workspace and
+## check jobs are dispatched to them with `docker exec`.
+import subprocess
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import queue
+import time
+import uuid
+import atexit
+from pathlib import Path
+# Resolve the parent directory as an absolute path
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+
+import config
+from src.toolchain_runner import run_tool, ToolOutput
+
+CONTAINER_WORKSPACE = "/workspace"
+
+# `docker exec` return codes meaning the container itself (not plc) is broken
+DOCKER_EXEC_FAILURE_CODES = (125, 126, 127)
+
+
+class RustyContainer:
+    """A single long-lived RuSTy container kept alive with `sleep infinity`."""
+
+    def __init__(self, image, workspace, name):
+        self.image = image
+        self.workspace = workspace
+        self.name = name
+        self.last_health_check = 0.0
+
+    def start(self):
+        """启动容器（如果已有同名容器，先移除）"""
+        self.stop()
+        subprocess.run(
+            ['docker', 'run', '-d', '--rm',
+             '--name', self.name,
+             '--label', 'agents4plc.rusty-pool=1',
+             '-v', f'{self.workspace}:{CONTAINER_WORKSPACE}',
+             '--entrypoint', 'sleep',
+             self.image, 'infinity'],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            timeout=120,
+            check=True
+        )
+        self.last_health_check = time.monotonic()
+
+    def stop(self):
+        subprocess.run(
+            ['docker', 'rm', '-f', self.name],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=30
+        )
+
+    def is_healthy(self):
+        """检查容器是否仍在运行"""
+        try:
+            result = subprocess.run(
+                ['docker', 'inspect', '-f', '{{.State.Running}}', self.name],
+                capture_output=True,
+                text=True,
+                timeout=10
+            )
+        except subprocess.TimeoutExpired:
+            return False
+        self.last_health_check = time.monotonic()
+        return result.returncode == 0 and result.stdout.strip() == 'true'
+
+    def exec_check(self, container_paths, timeout):
+        """在容器内对一个或多个文件执行 plc --check，返回 ToolRun"""
+        return run_tool('docker', ['docker', 'exec', self.name, 'plc', '--check', *container_paths],
+                        timeout=timeout, merge_stderr=True)
+
+
+class RustyContainerPool:
+    """
+    A fixed-size pool of RuSTy containers sharing one mounted host workspace.
+
+    Containers are handed out through a queue, so concurrent callers (threads) each get
+    their own container. Before a container is reused it is health-checked at most once
+    every `health_check_interval` seconds; dead containers are restarted transparently,
+    and a job that fails at the docker level is retried once on a fresh container.
+    """
+
+    def __init__(self, size=None, image=None, workspace=None,
+                 health_check_interval=None, check_timeout=None, acquire_timeout=None):
+        self.size = size or getattr(config, 'rusty_pool_size', 2)
+        self.image = image or getattr(config, 'rusty_docker_image', 'ghcr.io/plc-lang/rusty-docker:docker-x86_64')
+        self.health_check_interval = health_check_interval or getattr(config, 'rusty_pool_health_interval', 30)
+        self.check_timeout = check_timeout or getattr(config, 'rusty_pool_check_timeout', 60)
+        self.acquire_timeout = acquire_timeout or getattr(config, 'rusty_pool_acquire_timeout', 300)
+
+        workspace = workspace or getattr(config, 'rusty_pool_workspace', None)
+        self._owns_workspace = workspace is None
+        self.workspace = os.path.abspath(workspace or tempfile.mkdtemp(prefix='rusty_pool_'))
+        os.makedirs(self.workspace, exist_ok=True)
+
+        self._containers = []
+        self._idle = queue.Queue()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        """启动全部容器"""
+        with self._lock:
+            if self._started:
+                return
+            prefix = f"agents4plc-rusty-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+            try:
+                for i in range(self.size):
+                    container = RustyContainer(self.image, self.workspace, f"{prefix}-{i}")
+                    container.start()
+                    self._containers.append(container)
+                    self._idle.put(container)
+            except Exception:
+                for container in self._containers:
+                    container.stop()
+                self._containers = []
+                raise
+            self._started = True
+            print(f"   🐳 RuSTy container pool started ({self.size} containers, workspace {self.workspace})")
+
+    def shutdown(self):
+        """停止全部容器并清理工作目录"""
+        with self._lock:
+            for container in self._containers:
+                try:
+                    container.stop()
+                except Exception:
+                    pass
+            self._containers = []
+            self._idle = queue.Queue()
+            self._started = False
+            if self._owns_workspace:
+                shutil.rmtree(self.workspace, ignore_errors=True)
+
+    def _acquire(self):
+        """
+        取出一个空闲容器（最多等待 acquire_timeout 秒，超时抛出 RuntimeError）。
+        健康检查重启失败时容器仍放回队列，并标记为下次取出时重新检查，池不会因此变空。
+        """
+        try:
+            container = self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise RuntimeError(f"no RuSTy container became available within {self.acquire_timeout}s") from None
+        healthy = False
+        try:
+            if time.monotonic() - container.last_health_check > self.health_check_interval:
+                if not container.is_healthy():
+                    print(f"   ⚠️  Container {container.name} is unhealthy, restarting...")
+                    container.start()
+            healthy = True
+        finally:
+            if not healthy:
+                container.last_health_check = 0.0
+                self._idle.put(container)
+        return container
+
+    def _stage_files(self, file_dirs):
+        """
+        把源文件放进共享工作目录。
+        返回 ([(宿主机原路径, 容器内路径)], 需要清理的临时目录或 None)
+        """
+        staged = []
+        job_dir = None
+        for index, file_dir in enumerate(file_dirs):
+            abs_file_path = os.path.abspath(file_dir)
+            if os.path.commonpath([abs_file_path, self.workspace]) == self.workspace:
+                rel_path = os.path.relpath(abs_file_path, self.workspace)
+                staged.append((abs_file_path, f"{CONTAINER_WORKSPACE}/{rel_path}"))
+                continue
+            if job_dir is None:
+                job_dir = os.path.join(self.workspace, uuid.uuid4().hex)
+            # one sub directory per file so that equal basenames do not clash
+            file_job_dir = os.path.join(job_dir, str(index))
+            os.makedirs(file_job_dir)
+            shutil.copyfile(abs_file_path, os.path.join(file_job_dir, os.path.basename(abs_file_path)))
+            rel_path = os.path.relpath(os.path.join(file_job_dir, os.path.basename(abs_file_path)), self.workspace)
+            staged.append((abs_file_path, f"{CONTAINER_WORKSPACE}/{rel_path}"))
+        return staged, job_dir
+
+    def check_many(self, file_dirs):
+        """
+        Run a single `plc --check file1 file2 ...` over all file_dirs inside a pooled container.
+
+        Returns:
+            ToolOutput: combined stdout/stderr of the compiler (unfiltered), with the container-side
+                        paths of the files mapped back to the given host paths; `.runs` holds the
+                        docker exec invocations.
+        """
+        if not self._started:
+            self.start()
+
+        staged, job_dir = self._stage_files(file_dirs)
+        container_paths = [container_path for _, container_path in staged]
+        runs = []
+        try:
+            container = self._acquire()
+            try:
+                runs.append(container.exec_check(container_paths, self.check_timeout))
+                if runs[-1].returncode in DOCKER_EXEC_FAILURE_CODES and not container.is_healthy():
+                    # container died under us: restart and retry the job once
+                    print(f"   ⚠️  Container {container.name} failed during check, restarting...")
+                    container.last_health_check = 0.0  # restart 失败时下次取出先重新检查
+                    container.start()
+                    runs.append(container.exec_check(container_paths, self.check_timeout))
+            finally:
+                self._idle.put(container)
+        finally:
+            if job_dir is not None:
+                shutil.rmtree(job_dir, ignore_errors=True)
+
+        result = runs[-1]
+        if result.timed_out:
+            return ToolOutput(f"error: plc --check timed out after {result.wall_time:.0f}s", runs)
+        output = result.stdout
+        # replace longer paths first so that no path is a prefix of an already replaced one
+        for host_path, container_path in sorted(staged, key=lambda item: -len(item[1])):
+            output = output.replace(container_path, host_path)
+        return ToolOutput(output, runs)
+
+    def check(self, file_dir):
+        """Run `plc --check` on a single file inside a pooled container (see check_many)."""
+        return self.check_many([file_dir])
+
+
+_pool = None
+_pool_error = None
+_pool_lock = threading.Lock()
+
+
+def get_rusty_pool():
+    """
+    返回进程级共享的容器池（首次调用时创建并启动）。
+    启动失败会被记住，之后的调用直接抛出同一个错误，避免每次检查都重试启动。
+    """
+    global _pool, _pool_error
+    with _pool_lock:
+        if _pool_error is not None:
+            raise _pool_error
+        if _pool is None:
+            pool = RustyContainerPool()
+            try:
+                pool.start()
+            except Exception as e:
+                pool.shutdown()
+                _pool_error = RuntimeError(f"RuSTy container pool failed to start: {e}")
+                raise _pool_error
+            atexit.register(pool.shutdown)
+            _pool = pool
+        return _pool
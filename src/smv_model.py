@@ -0,0 +1,203 @@
+## Helpers to reuse one plcverif-generated nuXmv model for several requirements.
+## plcverif writes the model followed by a single `-- Requirement` section; SmvModel keeps the model
+## part and the declared variable types so that pattern properties can be translated into typed
+## CTL specs (plcverif's EoC / BoC cycle encoding) and checked together in one nuXmv run.
+import math
+import re
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+# Resolve the parent directory as an absolute path
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+
+from src.st_ast import (STSyntaxError, Literal, Name, Member, UnaryOp, BinaryOp, parse_expression)
+
+# CTL forms of the patterns as plcverif generates them; {1}, {2} are the translated pattern params.
+# LTL-based patterns (statechange-betweencycles, leadsto*, timed-trigger) are not shared and keep
+# going through plcverif-cli one property at a time.
+SHARED_PATTERN_SPECS = {
+    "pattern-implication": "AG((EoC) -> (({1}) -> ({2})))",
+    "pattern-invariant": "AG((EoC) -> ({1}))",
+    "pattern-forbidden": "AG((EoC) -> (!({1})))",
+    "pattern-reachability": "EF((EoC) & ({1}))",
+    "pattern-repeatability": "AG(EF((EoC) & ({1})))",
+}
+
+_LOGICAL_OPS = {'AND': '&', 'OR': '|', 'XOR': 'xor'}
+_COMPARISON_OPS = {'=': '=', '<>': '!=', '<': '<', '>': '>', '<=': '<=', '>=': '>='}
+_ARITHMETIC_OPS = {'+': '+', '-': '-', '*': '*', '/': '/', 'MOD': 'mod'}
+
+_VAR_DECL_RE = re.compile(r'^\s*([A-Za-z_][\w$#]*)\s*:\s*([^;]+);', re.MULTILINE)
+_WORD_TYPE_RE = re.compile(r'(signed|unsigned)\s+word\s*\[\s*(\d+)\s*\]')
+
+
+class SmvTranslationError(Exception):
+    """The property cannot be expressed over this model (unknown variable, unsupported construct...)."""
+
+
+def split_pattern_params(pattern_params: Dict) -> List[str]:
+    """pattern_params 的值（按参数序号），去掉 plcverif_call 加上的引号"""
+    keys = sorted(pattern_params, key=lambda key: int(key) if str(key).isdigit() else str(key))
+    return [str(pattern_params[key]).strip().strip('"') for key in keys]
+
+
+class SmvModel:
+    """A plcverif-generated nuXmv model without its requirement section."""
+
+    def __init__(self, text: str):
+        marker = text.find("-- Requirement")
+        self.body = (text[:marker] if marker >= 0 else text).rstrip() + "\n"
+        self.var_types = {}
+        var_section = self.body.split("ASSIGN", 1)[0]
+        for name, smv_type in _VAR_DECL_RE.findall(var_section):
+            self.var_types[name] = " ".join(smv_type.split())
+
+    @classmethod
+    def load(cls, smv_file: str) -> 'SmvModel':
+        with open(smv_file, 'r') as f:
+            return cls(f.read())
+
+    def narrow(self, ranges: Dict) -> int:
+        """
+        Add the inferred value ranges of program variables (src/st_ranges.py, lower-case name ->
+        Interval) as INVAR constraints on the matching instance_<name> word variables.
+        Returns the number of constraints added.
+        """
+        constraints = []
+        for name, interval in ranges.items():
+            smv_name = next((var for var in self.var_types if var.lower() == f"instance_{name}"), None)
+            word = _WORD_TYPE_RE.fullmatch(self.var_types.get(smv_name) or "")
+            if word is None:
+                continue
+            signed, width = word.group(1) == 'signed', word.group(2)
+            parts = []
+            for value, operator in ((interval.low, '>='), (interval.high, '<=')):
+                if math.isfinite(value):
+                    value = math.ceil(value) if operator == '>=' else math.floor(value)
+                    sign = "-" if value < 0 else ""
+                    parts.append(f"{smv_name} {operator} {sign}0{'s' if signed else 'u'}d{width}_{abs(value)}")
+            if parts:
+                constraints.append(f"INVAR {' & '.join(parts)};")
+        if constraints:
+            self.body += "-- value ranges inferred from the program\n" + "\n".join(constraints) + "\n"
+        return len(constraints)
+
+    def render(self, specs: Dict[str, str]) -> str:
+        """模型 + 命名的 CTLSPEC（name -> spec）"""
+        lines = [self.body, "-- Requirements"]
+        for name, spec in specs.items():
+            lines.append(f"CTLSPEC NAME {name} := {spec};")
+        return "\n".join(lines) + "\n"
+
+    def pattern_spec(self, pattern_id: str, pattern_params: Dict) -> str:
+        """把模式属性翻译成该模型上的 CTL spec"""
+        template = SHARED_PATTERN_SPECS.get(pattern_id)
+        if template is None:
+            raise SmvTranslationError(f"pattern {pattern_id} is not supported in shared models")
+        params = [self.translate(param) for param in split_pattern_params(pattern_params)]
+        if len(params) < template.count('{'):
+            raise SmvTranslationError(f"missing parameters for {pattern_id}")
+        return template.format(None, *params)
+
+    def translate(self, expression: str) -> str:
+        """ST 布尔表达式（instance.x 形式的变量）-> nuXmv 表达式，整数字面量带上变量的 word 类型"""
+        try:
+            expr = parse_expression(expression)
+        except STSyntaxError as e:
+            raise SmvTranslationError(f"cannot parse '{expression}': {e}")
+        if self.type_of(expr) != 'boolean':
+            raise SmvTranslationError(f"'{expression}' is not a boolean expression")
+        return self.render_expr(expr)
+
+    def variable(self, expr) -> str:
+        path = []
+        while isinstance(expr, Member):
+            path.append(expr.member)
+            expr = expr.base
+        if not isinstance(expr, Name):
+            raise SmvTranslationError("unsupported variable access")
+        path.append(expr.name)
+        name = "_".join(reversed(path))
+        if name not in self.var_types:
+            raise SmvTranslationError(f"variable {name} is not part of the model")
+        return name
+
+    def type_of(self, expr) -> Optional[str]:
+        """nuXmv 类型；不带类型的整数字面量返回 None（由另一侧操作数决定）"""
+        if isinstance(expr, Literal):
+            if expr.type_name == 'BOOL':
+                return 'boolean'
+            if expr.type_name == 'REAL':
+                return 'real'
+            if isinstance(expr.value, int):
+                return None
+            raise SmvTranslationError(f"unsupported literal {expr.raw}")
+        if isinstance(expr, (Name, Member)):
+            return self.var_types[self.variable(expr)]
+        if isinstance(expr, UnaryOp):
+            return 'boolean' if expr.op == 'NOT' else self.type_of(expr.operand)
+        if isinstance(expr, BinaryOp):
+            if expr.op in _LOGICAL_OPS or expr.op in _COMPARISON_OPS:
+                return 'boolean'
+            if expr.op in _ARITHMETIC_OPS:
+                return self.type_of(expr.left) or self.type_of(expr.right)
+        raise SmvTranslationError(f"unsupported expression {type(expr).__name__}")
+
+    def render_expr(self, expr, expected: str = None) -> str:
+        if isinstance(expr, Literal):
+            return self.render_literal(expr, expected)
+        if isinstance(expr, (Name, Member)):
+            return self.variable(expr)
+        if isinstance(expr, UnaryOp):
+            if expr.op == 'NOT':
+                return f"(!{self.render_expr(expr.operand, 'boolean')})"
+            operand = self.render_expr(expr.operand, expected)
+            return operand if expr.op == '+' else f"(-{operand})"
+        if isinstance(expr, BinaryOp):
+            if expr.op in _LOGICAL_OPS:
+                left, right = self.render_expr(expr.left, 'boolean'), self.render_expr(expr.right, 'boolean')
+                return f"({left} {_LOGICAL_OPS[expr.op]} {right})"
+            operator = _COMPARISON_OPS.get(expr.op) or _ARITHMETIC_OPS.get(expr.op)
+            if operator is None:
+                raise SmvTranslationError(f"unsupported operator {expr.op}")
+            operand_type = self.type_of(expr.left) or self.type_of(expr.right) \
+                if expr.op in _COMPARISON_OPS else expected
+            left = self.render_expr(expr.left, operand_type)
+            right = self.render_expr(expr.right, operand_type)
+            return f"({left} {operator} {right})"
+        raise SmvTranslationError(f"unsupported expression {type(expr).__name__}")
+
+    @staticmethod
+    def render_literal(literal: Literal, expected: str = None) -> str:
+        if literal.type_name == 'BOOL':
+            return "TRUE" if literal.value else "FALSE"
+        if literal.type_name == 'REAL':
+            return repr(literal.value)
+        word = _WORD_TYPE_RE.fullmatch(expected or "")
+        if word:
+            signed, width = word.group(1) == 'signed', word.group(2)
+            if not signed and literal.value < 0:
+                raise SmvTranslationError(f"negative literal {literal.raw} for an unsigned variable")
+            sign = "-" if literal.value < 0 else ""
+            return f"{sign}0{'s' if signed else 'u'}d{width}_{abs(literal.value)}"
+        return str(literal.value)
+
+
+if __name__ == "__main__":
+    model = SmvModel("""MODULE main
+	VAR
+		instance_i : signed word[16]; -- frozen
+		instance_o : signed word[16]; -- frozen
+		instance_run : boolean;
+		EoC : boolean; -- frozen
+	ASSIGN
+		init(EoC) := FALSE;
+
+-- Requirement
+CTLSPEC AG((EoC) -> ((instance_i) = (0sd16_0)));
+""")
+    print(model.pattern_spec("pattern-implication", {"1": "instance.i >= 1 AND instance.i <= 5",
+                                                     "2": "instance.o = instance.i * instance.i"}))
+    print(model.pattern_spec("pattern-forbidden", {"1": '"instance.o < -1 OR NOT instance.run"'}))
+    print(model.render({"p1": model.pattern_spec("pattern-invariant", {"1": "instance.run = TRUE"})}))
@@ -0,0 +1,1089 @@
+## In-process front end for IEC 61131-3 Structured Text: a linear regex tokenizer and a
+## recursive-descent parser that produce a typed AST (dataclasses below, every node carries a Span).
+## The grammar covers the subset produced by the agents and found in the benchmarks:
+## PROGRAM / FUNCTION_BLOCK / FUNCTION, TYPE (enums, structs, aliases, subranges), VAR blocks,
+## IF / CASE / FOR / WHILE / REPEAT, calls with `:=` / `=>` arguments, typed and time literals.
+## CONFIGURATION blocks are skipped. Constructs outside that subset (classes, methods, actions...)
+## raise STUnsupportedError so that callers can fall back to the real compiler.
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, fields
+from typing import List, Optional, Tuple, Union, Iterator
+
+
+class STSyntaxError(Exception):
+    """语法错误，带行列号（从 1 开始）"""
+
+    def __init__(self, message, line=0, col=0):
+        super().__init__(message)
+        self.message = message
+        self.line = line
+        self.col = col
+
+    def __str__(self):
+        return f"{self.line}:{self.col}: {self.message}"
+
+
+class STUnsupportedError(STSyntaxError):
+    """The source uses a construct this front end does not model (not necessarily an error)."""
+
+
+############### tokens ###############
+
+@dataclass(slots=True)
+class Token:
+    kind: str       # ident, kw, int, real, string, time, typed, address, op, eof
+    value: str      # keywords are upper-cased, everything else keeps its spelling
+    line: int
+    col: int
+    end_line: int
+    end_col: int
+
+
+KEYWORDS = {
+    'PROGRAM', 'END_PROGRAM', 'FUNCTION', 'END_FUNCTION', 'FUNCTION_BLOCK', 'END_FUNCTION_BLOCK',
+    'TYPE', 'END_TYPE', 'STRUCT', 'END_STRUCT', 'ARRAY', 'OF', 'POINTER', 'REF_TO',
+    'VAR', 'VAR_INPUT', 'VAR_OUTPUT', 'VAR_IN_OUT', 'VAR_TEMP', 'VAR_STAT', 'VAR_GLOBAL',
+    'VAR_EXTERNAL', 'VAR_CONFIG', 'END_VAR', 'CONSTANT', 'RETAIN', 'NON_RETAIN', 'PERSISTENT', 'AT',
+    'IF', 'THEN', 'ELSIF', 'ELSE', 'END_IF', 'CASE', 'END_CASE', 'FOR', 'TO', 'BY', 'DO', 'END_FOR',
+    'WHILE', 'END_WHILE', 'REPEAT', 'UNTIL', 'END_REPEAT', 'EXIT', 'CONTINUE', 'RETURN',
+    'AND', 'OR', 'XOR', 'NOT', 'MOD', 'TRUE', 'FALSE',
+    'CLASS', 'END_CLASS', 'INTERFACE', 'END_INTERFACE', 'METHOD', 'END_METHOD', 'PROPERTY',
+    'ACTION', 'END_ACTION', 'ACTIONS', 'END_ACTIONS', 'CONFIGURATION', 'END_CONFIGURATION',
+    'RESOURCE', 'END_RESOURCE', 'NAMESPACE',
+    'EXTENDS', 'IMPLEMENTS',
+}
+
+VAR_SECTIONS = ('VAR', 'VAR_INPUT', 'VAR_OUTPUT', 'VAR_IN_OUT', 'VAR_TEMP', 'VAR_STAT',
+                'VAR_GLOBAL', 'VAR_EXTERNAL')
+VAR_QUALIFIERS = ('CONSTANT', 'RETAIN', 'NON_RETAIN', 'PERSISTENT')
+STATEMENT_KEYWORDS = ('IF', 'CASE', 'FOR', 'WHILE', 'REPEAT', 'EXIT', 'CONTINUE', 'RETURN', 'NOT', 'TRUE', 'FALSE')
+UNSUPPORTED_KEYWORDS = ('CLASS', 'INTERFACE', 'METHOD', 'PROPERTY', 'ACTION', 'ACTIONS',
+                        'RESOURCE', 'NAMESPACE', 'EXTENDS', 'IMPLEMENTS', 'VAR_CONFIG')
+
+_TOKEN_PATTERNS = [
+    ('ws', r'[ \t\r\n\f\v]+'),
+    ('comment', r'//[^\n]*'),
+    ('block_comment', r'\(\*|/\*'),       # may nest, skipped by _block_comment_end
+    ('pragma', r'\{[^}]*\}'),
+    ('time', r'(?:LTIME|TIME_OF_DAY|TIME|TOD|DATE_AND_TIME|DATE|DT|LT|T|D)\#[-+]?[\w.:]+'),
+    ('based', r'(?:2|8|16)\#[0-9A-Fa-f_]+'),
+    ('typed', r'[A-Za-z_]\w*\#'),
+    ('real', r'\d[\d_]*\.\d[\d_]*(?:[eE][-+]?\d+)?|\d[\d_]*[eE][-+]?\d+'),
+    ('int', r'\d[\d_]*'),
+    ('string', r"'(?:\$.|[^'$\n])*'|\"(?:\$.|[^\"$\n])*\""),
+    ('bad_string', r"['\"]"),
+    ('address', r'%[IQM][XBWDL]?[\d.]*\*?'),
+    ('ident', r'[A-Za-z_]\w*'),
+    ('op', r':=|=>|<=|>=|<>|\*\*|\.\.|[-+*/=<>():;,.\[\]&^]'),
+]
+TOKEN_RE = re.compile('|'.join(f'(?P<{name}>{pattern})' for name, pattern in _TOKEN_PATTERNS),
+                      re.IGNORECASE | re.DOTALL)
+BLOCK_COMMENT_DELIMITERS = {'(*': re.compile(r'\(\*|\*\)'), '/*': re.compile(r'/\*|\*/')}
+
+
+def _block_comment_end(source: str, pos: int) -> int:
+    """pos 处块注释的结束位置；注释可以嵌套（和 RuSTy 一致），未闭合时返回 -1"""
+    delimiters = BLOCK_COMMENT_DELIMITERS[source[pos:pos + 2]]
+    opener = source[pos:pos + 2]
+    depth = 0
+    for match in delimiters.finditer(source, pos):
+        depth += 1 if match.group() == opener else -1
+        if depth == 0:
+            return match.end()
+    return -1
+
+
+def tokenize(source: str) -> List[Token]:
+    """把 ST 源码切成 token 列表（跳过空白、注释和 pragma），最后一个 token 是 eof"""
+    tokens = []
+    append = tokens.append
+    match_at = TOKEN_RE.match
+    pos = 0
+    line, line_start = 1, 0            # tracked while scanning: tokens other than ws / comments never span lines
+    length = len(source)
+    while pos < length:
+        match = match_at(source, pos)
+        if match is None:
+            raise STSyntaxError(f"Unexpected character {source[pos]!r}", line, pos - line_start + 1)
+        kind = match.lastgroup
+        end = match.end()
+        if kind == 'block_comment':
+            end = _block_comment_end(source, pos)
+            if end < 0:
+                raise STSyntaxError("Unterminated comment", line, pos - line_start + 1)
+            kind = 'comment'
+        if kind == 'ws' or kind == 'comment' or kind == 'pragma':
+            newlines = source.count('\n', pos, end)
+            if newlines:
+                line += newlines
+                line_start = source.rindex('\n', pos, end) + 1
+            pos = end
+            continue
+        col = pos - line_start + 1
+        if kind == 'bad_string':
+            raise STSyntaxError("Unterminated string literal", line, col)
+        value = match.group()
+        if kind == 'based':
+            kind = 'int'
+        elif kind == 'ident':
+            upper = value.upper()
+            if upper in KEYWORDS:
+                kind, value = 'kw', upper
+        append(Token(kind, value, line, col, line, end - line_start + 1))
+        pos = end
+    col = length - line_start + 1
+    tokens.append(Token('eof', '', line, col, line, col))
+    return tokens
+
+
+############### AST ###############
+
+@dataclass(slots=True)
+class Span:
+    line: int
+    col: int
+    end_line: int
+    end_col: int
+
+
+@dataclass
+class Node:
+    span: Optional[Span] = field(default=None, kw_only=True, compare=False, repr=False)
+
+
+# --- types ---
+
+@dataclass
+class NamedType(Node):
+    name: str
+    length: Optional['Expr'] = None        # STRING[20]
+
+
+@dataclass
+class ArrayType(Node):
+    dimensions: List[Tuple['Expr', 'Expr']]
+    element_type: 'TypeRef'
+
+
+@dataclass
+class PointerType(Node):
+    target: 'TypeRef'
+
+
+@dataclass
+class SubrangeType(Node):
+    base: str
+    low: 'Expr'
+    high: 'Expr'
+
+
+@dataclass
+class EnumType(Node):
+    values: List[Tuple[str, Optional['Expr']]]
+    base: Optional[str] = None
+
+
+@dataclass
+class StructType(Node):
+    members: List['VarDecl']
+
+
+TypeRef = Union[NamedType, ArrayType, PointerType, SubrangeType, EnumType, StructType]
+
+
+# --- expressions ---
+
+@dataclass
+class Literal(Node):
+    value: object          # bool / int / float / str; TIME literals are in milliseconds
+    type_name: str         # BOOL, INT (any integer), REAL, STRING, WSTRING, TIME, DATE... or an explicit type prefix
+    raw: str = ""
+
+
+@dataclass
+class EnumLiteral(Node):
+    type_name: str         # E_State#IDLE
+    value: str
+
+
+@dataclass
+class Name(Node):
+    name: str
+
+
+@dataclass
+class DirectAddress(Node):
+    address: str           # %IX0.0
+
+
+@dataclass
+class Member(Node):
+    base: 'Expr'
+    member: str            # bit access (x.3) keeps the digits as member name
+
+
+@dataclass
+class Index(Node):
+    base: 'Expr'
+    indices: List['Expr']
+
+
+@dataclass
+class Deref(Node):
+    base: 'Expr'
+
+
+@dataclass
+class Argument(Node):
+    value: 'Expr'
+    name: Optional[str] = None     # None for positional arguments
+    output: bool = False           # `name => target`
+
+
+@dataclass
+class Call(Node):
+    func: 'Expr'                   # Name (function / FB instance) or Member (nested instance)
+    args: List[Argument]
+
+
+@dataclass
+class UnaryOp(Node):
+    op: str                        # NOT, -, +
+    operand: 'Expr'
+
+
+@dataclass
+class BinaryOp(Node):
+    op: str                        # OR XOR AND = <> < > <= >= + - * / MOD **
+    left: 'Expr'
+    right: 'Expr'
+
+
+@dataclass
+class ArrayLiteral(Node):
+    elements: List['Expr']
+
+
+@dataclass
+class RepeatedInit(Node):
+    count: 'Expr'                  # 3(0) inside an array initializer
+    value: Optional['Expr']
+
+
+@dataclass
+class StructLiteral(Node):
+    fields: List[Tuple[str, 'Expr']]
+
+
+Expr = Union[Literal, EnumLiteral, Name, DirectAddress, Member, Index, Deref, Call, UnaryOp, BinaryOp,
+             ArrayLiteral, RepeatedInit, StructLiteral]
+
+
+# --- statements ---
+
+@dataclass
+class Assignment(Node):
+    target: Expr
+    value: Expr
+
+
+@dataclass
+class CallStatement(Node):
+    call: Call
+
+
+@dataclass
+class IfStatement(Node):
+    branches: List[Tuple[Expr, List['Statement']]]    # IF + ELSIF branches
+    else_body: Optional[List['Statement']] = None
+
+
+@dataclass
+class CaseRange(Node):
+    low: Expr
+    high: Expr
+
+
+@dataclass
+class CaseBranch(Node):
+    labels: List[Union[Expr, CaseRange]]
+    body: List['Statement']
+
+
+@dataclass
+class CaseStatement(Node):
+    selector: Expr
+    branches: List[CaseBranch]
+    else_body: Optional[List['Statement']] = None
+
+
+@dataclass
+class ForStatement(Node):
+    variable: str
+    start: Expr
+    end: Expr
+    step: Optional[Expr]
+    body: List['Statement']
+
+
+@dataclass
+class WhileStatement(Node):
+    condition: Expr
+    body: List['Statement']
+
+
+@dataclass
+class RepeatStatement(Node):
+    body: List['Statement']
+    condition: Expr
+
+
+@dataclass
+class ExitStatement(Node):
+    pass
+
+
+@dataclass
+class ContinueStatement(Node):
+    pass
+
+
+@dataclass
+class ReturnStatement(Node):
+    pass
+
+
+Statement = Union[Assignment, CallStatement, IfStatement, CaseStatement, ForStatement, WhileStatement,
+                  RepeatStatement, ExitStatement, ContinueStatement, ReturnStatement]
+
+
+# --- declarations ---
+
+@dataclass
+class VarDecl(Node):
+    names: List[str]
+    type: TypeRef
+    init: Optional[Expr] = None
+    section: str = 'VAR'
+    constant: bool = False
+    address: Optional[str] = None
+
+
+@dataclass
+class VarBlock(Node):
+    section: str                   # VAR, VAR_INPUT, VAR_OUTPUT, ...
+    decls: List[VarDecl]
+    qualifiers: List[str] = field(default_factory=list)
+
+
+@dataclass
+class TypeDecl(Node):
+    name: str
+    type: TypeRef
+    init: Optional[Expr] = None
+
+
+@dataclass
+class POU(Node):
+    kind: str                      # PROGRAM, FUNCTION_BLOCK, FUNCTION
+    name: str
+    var_blocks: List[VarBlock]
+    body: List[Statement]
+    return_type: Optional[TypeRef] = None
+
+    def declarations(self) -> Iterator[VarDecl]:
+        for block in self.var_blocks:
+            yield from block.decls
+
+
+@dataclass
+class CompilationUnit(Node):
+    pous: List[POU] = field(default_factory=list)
+    types: List[TypeDecl] = field(default_factory=list)
+    globals: List[VarBlock] = field(default_factory=list)
+    configurations: List[str] = field(default_factory=list)    # names only, the body is not modelled
+
+    def find_pou(self, name: str) -> Optional[POU]:
+        for pou in self.pous:
+            if pou.name.lower() == name.lower():
+                return pou
+        return None
+
+
+def iter_child_nodes(node) -> Iterator[Node]:
+    """按字段顺序遍历直接子节点（包括列表 / 元组里的节点）"""
+    def expand(value):
+        if isinstance(value, Node):
+            yield value
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                yield from expand(item)
+
+    for f in fields(node):
+        if f.name != 'span':
+            yield from expand(getattr(node, f.name))
+
+
+def walk(node) -> Iterator[Node]:
+    """深度优先遍历 node 及其全部子孙节点"""
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        yield current
+        stack.extend(reversed(list(iter_child_nodes(current))))
+
+
+TIME_UNITS_MS = {'d': 86400000, 'h': 3600000, 'm': 60000, 's': 1000, 'ms': 1, 'us': 0.001, 'ns': 0.000001}
+TIME_PART_RE = re.compile(r'(\d+(?:\.\d+)?)(ms|us|ns|d|h|m|s)', re.IGNORECASE)
+
+
+def parse_time_literal(raw: str) -> float:
+    """T#1h2m3s / TIME#-1.5s -> 毫秒"""
+    text = raw.split('#', 1)[1].replace('_', '').lower()
+    sign = -1 if text.startswith('-') else 1
+    total = sum(float(number) * TIME_UNITS_MS[unit] for number, unit in TIME_PART_RE.findall(text))
+    total *= sign
+    return int(total) if total == int(total) else total
+
+
+############### parser ###############
+
+class _Parser:
+    """Recursive-descent parser over the token list; raises STSyntaxError on the first error."""
+
+    def __init__(self, tokens: List[Token]):
+        self.tokens = tokens
+        self.pos = 0
+
+    # --- token helpers ---
+
+    def peek(self, offset=0) -> Token:
+        if not offset:
+            return self.tokens[self.pos]        # pos never moves past the eof token
+        return self.tokens[min(self.pos + offset, len(self.tokens) - 1)]
+
+    def next(self) -> Token:
+        token = self.tokens[self.pos]
+        if token.kind != 'eof':
+            self.pos += 1
+        return token
+
+    def at_kw(self, *names) -> bool:
+        token = self.peek()
+        return token.kind == 'kw' and token.value in names
+
+    def at_op(self, *ops) -> bool:
+        token = self.peek()
+        return token.kind == 'op' and token.value in ops
+
+    def accept_kw(self, *names) -> Optional[Token]:
+        return self.next() if self.at_kw(*names) else None
+
+    def accept_op(self, *ops) -> Optional[Token]:
+        return self.next() if self.at_op(*ops) else None
+
+    def error(self, expected, token=None) -> STSyntaxError:
+        token = token or self.peek()
+        found = "end of file" if token.kind == 'eof' else f"'{token.value}'"
+        return STSyntaxError(f"Expected {expected}, found {found}", token.line, token.col)
+
+    def expect_kw(self, name) -> Token:
+        if not self.at_kw(name):
+            raise self.error(name)
+        return self.next()
+
+    def expect_op(self, op) -> Token:
+        if not self.at_op(op):
+            raise self.error(f"'{op}'")
+        return self.next()
+
+    def expect_ident(self, what="identifier") -> Token:
+        token = self.peek()
+        if token.kind != 'ident':
+            self.check_quoted_identifier(token)
+            raise self.error(what)
+        return self.next()
+
+    def span_from(self, start: Token) -> Span:
+        last = self.tokens[self.pos - 1] if self.pos > 0 else start
+        return Span(start.line, start.col, last.end_line, last.end_col)
+
+    def check_supported(self):
+        token = self.peek()
+        if token.kind == 'kw' and token.value in UNSUPPORTED_KEYWORDS:
+            raise STUnsupportedError(f"'{token.value}' is not supported by the ST front end", token.line, token.col)
+
+    @staticmethod
+    def check_quoted_identifier(token: Token):
+        """SCL 风格的带引号标识符（"Timer_FB"）和 WSTRING 字面量无法区分，出现在标识符位置时交给真实编译器"""
+        if token.kind == 'string' and token.value.startswith('"'):
+            raise STUnsupportedError(f"quoted identifier {token.value} is not supported by the ST front end",
+                                     token.line, token.col)
+
+    # --- compilation unit ---
+
+    def parse_unit(self) -> CompilationUnit:
+        start = self.peek()
+        unit = CompilationUnit()
+        while self.peek().kind != 'eof':
+            self.check_supported()
+            if self.accept_op(';'):
+                continue
+            if self.at_kw('TYPE'):
+                unit.types.extend(self.parse_type_block())
+            elif self.at_kw('PROGRAM', 'FUNCTION_BLOCK', 'FUNCTION'):
+                unit.pous.append(self.parse_pou())
+            elif self.at_kw('VAR_GLOBAL'):
+                unit.globals.append(self.parse_var_block())
+            elif self.at_kw('CONFIGURATION'):
+                unit.configurations.append(self.skip_configuration())
+            else:
+                raise self.error("PROGRAM, FUNCTION_BLOCK, FUNCTION or TYPE")
+        unit.span = self.span_from(start)
+        return unit
+
+    def skip_configuration(self) -> str:
+        """CONFIGURATION ... END_CONFIGURATION 只记录名字，内容（资源、任务绑定）跳过"""
+        self.expect_kw('CONFIGURATION')
+        name = self.expect_ident("configuration name").value
+        while not self.accept_kw('END_CONFIGURATION'):
+            if self.peek().kind == 'eof':
+                raise self.error("END_CONFIGURATION")
+            self.next()
+        return name
+
+    def parse_pou(self) -> POU:
+        start = self.next()
+        kind = start.value
+        name = self.expect_ident(f"{kind} name").value
+        return_type = None
+        if kind == 'FUNCTION' and self.accept_op(':'):
+            return_type = self.parse_type_ref()
+        self.check_supported()
+
+        var_blocks = []
+        while self.at_kw(*VAR_SECTIONS):
+            var_blocks.append(self.parse_var_block())
+            self.check_supported()
+        # Siemens style `BEGIN` before the body is tolerated
+        if self.peek().kind == 'ident' and self.peek().value.upper() == 'BEGIN':
+            self.next()
+
+        end_kw = f"END_{kind}"
+        body = self.parse_statements((end_kw,))
+        self.expect_kw(end_kw)
+        return POU(kind, name, var_blocks, body, return_type, span=self.span_from(start))
+
+    # --- declarations ---
+
+    def parse_var_block(self) -> VarBlock:
+        start = self.next()
+        section = start.value
+        qualifiers = []
+        while self.at_kw(*VAR_QUALIFIERS):
+            qualifiers.append(self.next().value)
+        constant = 'CONSTANT' in qualifiers
+        decls = []
+        while not self.at_kw('END_VAR'):
+            if self.peek().kind == 'eof' or self.at_kw(*VAR_SECTIONS):
+                raise self.error("END_VAR")
+            decls.append(self.parse_var_decl(section, constant))
+        self.expect_kw('END_VAR')
+        self.accept_op(';')
+        return VarBlock(section, decls, qualifiers, span=self.span_from(start))
+
+    def parse_var_decl(self, section, constant) -> VarDecl:
+        start = self.peek()
+        names = [self.expect_ident("variable name").value]
+        while self.accept_op(','):
+            names.append(self.expect_ident("variable name").value)
+        address = None
+        if self.accept_kw('AT'):
+            token = self.next()
+            if token.kind != 'address':
+                raise self.error("direct address", token)
+            address = token.value
+        self.expect_op(':')
+        type_ref = self.parse_type_ref()
+        init = self.parse_initializer() if self.accept_op(':=') else None
+        self.expect_op(';')
+        return VarDecl(names, type_ref, init, section, constant, address, span=self.span_from(start))
+
+    def parse_type_block(self) -> List[TypeDecl]:
+        self.expect_kw('TYPE')
+        decls = []
+        while not self.at_kw('END_TYPE'):
+            if self.peek().kind == 'eof':
+                raise self.error("END_TYPE")
+            start = self.peek()
+            name = self.expect_ident("type name").value
+            self.expect_op(':')
+            type_ref = self.parse_type_ref()
+            init = self.parse_initializer() if self.accept_op(':=') else None
+            self.accept_op(';')
+            decls.append(TypeDecl(name, type_ref, init, span=self.span_from(start)))
+        self.expect_kw('END_TYPE')
+        self.accept_op(';')
+        return decls
+
+    def parse_type_ref(self) -> TypeRef:
+        start = self.peek()
+        if self.accept_kw('ARRAY'):
+            self.expect_op('[')
+            dimensions = []
+            while True:
+                low = self.parse_expression()
+                self.expect_op('..')
+                dimensions.append((low, self.parse_expression()))
+                if not self.accept_op(','):
+                    break
+            self.expect_op(']')
+            self.expect_kw('OF')
+            return ArrayType(dimensions, self.parse_type_ref(), span=self.span_from(start))
+        if self.accept_kw('POINTER'):
+            self.expect_kw('TO')
+            return PointerType(self.parse_type_ref(), span=self.span_from(start))
+        if self.accept_kw('REF_TO'):
+            return PointerType(self.parse_type_ref(), span=self.span_from(start))
+        if self.accept_kw('STRUCT'):
+            members = []
+            while not self.at_kw('END_STRUCT'):
+                if self.peek().kind == 'eof':
+                    raise self.error("END_STRUCT")
+                members.append(self.parse_var_decl('STRUCT', False))
+            self.expect_kw('END_STRUCT')
+            return StructType(members, span=self.span_from(start))
+        if self.at_op('('):
+            return self.parse_enum(None, start)
+
+        name = self.expect_ident("type name").value
+        if self.at_op('(') and self.peek(1).kind == 'ident' and self.peek(2).value in (':=', ',', ')'):
+            return self.parse_enum(name, start)
+        if self.accept_op('('):
+            low = self.parse_expression()
+            self.expect_op('..')
+            high = self.parse_expression()
+            self.expect_op(')')
+            return SubrangeType(name, low, high, span=self.span_from(start))
+        length = None
+        if name.upper() in ('STRING', 'WSTRING') and self.at_op('[', '('):
+            close = ']' if self.next().value == '[' else ')'
+            length = self.parse_expression()
+            self.expect_op(close)
+        return NamedType(name, length, span=self.span_from(start))
+
+    def parse_enum(self, base, start) -> EnumType:
+        self.expect_op('(')
+        values = []
+        while True:
+            name = self.expect_ident("enumeration value").value
+            value = self.parse_expression() if self.accept_op(':=') else None
+            values.append((name, value))
+            if not self.accept_op(','):
+                break
+        self.expect_op(')')
+        return EnumType(values, base, span=self.span_from(start))
+
+    def parse_initializer(self) -> Expr:
+        start = self.peek()
+        if self.accept_op('['):
+            elements = []
+            while not self.at_op(']'):
+                element_start = self.peek()
+                if element_start.kind == 'int' and self.peek(1).value == '(':
+                    count = self.parse_primary()
+                    self.expect_op('(')
+                    value = None if self.at_op(')') else self.parse_initializer()
+                    self.expect_op(')')
+                    elements.append(RepeatedInit(count, value, span=self.span_from(element_start)))
+                else:
+                    elements.append(self.parse_initializer())
+                if not self.accept_op(','):
+                    break
+            self.expect_op(']')
+            return ArrayLiteral(elements, span=self.span_from(start))
+        if self.at_op('(') and self.peek(1).kind == 'ident' and self.peek(2).value == ':=':
+            self.next()
+            struct_fields = []
+            while True:
+                name = self.expect_ident("member name").value
+                self.expect_op(':=')
+                struct_fields.append((name, self.parse_initializer()))
+                if not self.accept_op(','):
+                    break
+            self.expect_op(')')
+            return StructLiteral(struct_fields, span=self.span_from(start))
+        return self.parse_expression()
+
+    # --- statements ---
+
+    def parse_statements(self, terminators) -> List[Statement]:
+        statements = []
+        while not self.at_kw(*terminators):
+            if self.peek().kind == 'eof':
+                raise self.error(" or ".join(terminators))
+            if self.accept_op(';'):
+                continue
+            self.check_supported()
+            if self.peek().kind == 'kw' and self.peek().value not in STATEMENT_KEYWORDS:
+                raise self.error(" or ".join(terminators))
+            statements.append(self.parse_statement())
+        return statements
+
+    def parse_statement(self) -> Statement:
+        self.check_supported()
+        start = self.peek()
+        if start.kind == 'kw':
+            handler = {
+                'IF': self.parse_if, 'CASE': self.parse_case, 'FOR': self.parse_for,
+                'WHILE': self.parse_while, 'REPEAT': self.parse_repeat,
+            }.get(start.value)
+            if handler is not None:
+                return handler()
+            simple = {'EXIT': ExitStatement, 'CONTINUE': ContinueStatement, 'RETURN': ReturnStatement}.get(start.value)
+            if simple is not None:
+                self.next()
+                self.expect_op(';')
+                return simple(span=self.span_from(start))
+
+        self.check_quoted_identifier(start)
+        target = self.parse_unary()
+        if self.accept_op(':='):
+            value = self.parse_expression()
+            statement = Assignment(target, value)
+        elif isinstance(target, Call):
+            statement = CallStatement(target)
+        else:
+            raise self.error("':=' or a call")
+        if not self.at_op(';'):
+            raise self.error("';'")
+        self.next()
+        statement.span = self.span_from(start)
+        return statement
+
+    def parse_if(self) -> IfStatement:
+        start = self.expect_kw('IF')
+        branches = []
+        condition = self.parse_expression()
+        self.expect_kw('THEN')
+        branches.append((condition, self.parse_statements(('ELSIF', 'ELSE', 'END_IF'))))
+        while self.accept_kw('ELSIF'):
+            condition = self.parse_expression()
+            self.expect_kw('THEN')
+            branches.append((condition, self.parse_statements(('ELSIF', 'ELSE', 'END_IF'))))
+        else_body = self.parse_statements(('END_IF',)) if self.accept_kw('ELSE') else None
+        self.expect_kw('END_IF')
+        return IfStatement(branches, else_body, span=self.span_from(start))
+
+    def at_case_label(self) -> bool:
+        """当前位置是否是 CASE 分支标签（在 `:=` 或 `;` 之前先遇到顶层的 `:`）"""
+        depth = 0
+        for token in self.tokens[self.pos:]:
+            if token.kind == 'eof':
+                return False
+            if token.kind == 'kw' and token.value not in ('TRUE', 'FALSE', 'MOD', 'AND', 'OR', 'XOR', 'NOT'):
+                return False
+            if token.kind == 'op':
+                if token.value in ('(', '['):
+                    depth += 1
+                elif token.value in (')', ']'):
+                    depth -= 1
+                elif token.value in (':=', ';', '=>'):
+                    return False
+                elif token.value == ':' and depth == 0:
+                    return True
+        return False
+
+    def parse_case(self) -> CaseStatement:
+        start = self.expect_kw('CASE')
+        selector = self.parse_expression()
+        self.expect_kw('OF')
+        branches = []
+        while not self.at_kw('ELSE', 'END_CASE'):
+            if self.peek().kind == 'eof':
+                raise self.error("END_CASE")
+            if self.accept_op(';'):
+                continue
+            branch_start = self.peek()
+            if not self.at_case_label():
+                raise self.error("case label")
+            labels = []
+            while True:
+                label_start = self.peek()
+                low = self.parse_expression()
+                if self.accept_op('..'):
+                    labels.append(CaseRange(low, self.parse_expression(), span=self.span_from(label_start)))
+                else:
+                    labels.append(low)
+                if not self.accept_op(','):
+                    break
+            self.expect_op(':')
+            body = []
+            while not (self.at_kw('ELSE', 'END_CASE') or self.at_case_label()):
+                if self.peek().kind == 'eof':
+                    raise self.error("END_CASE")
+                if self.accept_op(';'):
+                    continue
+                self.check_supported()
+                if self.peek().kind == 'kw' and self.peek().value not in STATEMENT_KEYWORDS:
+                    raise self.error("ELSE or END_CASE")
+                body.append(self.parse_statement())
+            branches.append(CaseBranch(labels, body, span=self.span_from(branch_start)))
+        else_body = self.parse_statements(('END_CASE',)) if self.accept_kw('ELSE') else None
+        self.expect_kw('END_CASE')
+        return CaseStatement(selector, branches, else_body, span=self.span_from(start))
+
+    def parse_for(self) -> ForStatement:
+        start = self.expect_kw('FOR')
+        variable = self.expect_ident("loop variable").value
+        self.expect_op(':=')
+        first = self.parse_expression()
+        self.expect_kw('TO')
+        last = self.parse_expression()
+        step = self.parse_expression() if self.accept_kw('BY') else None
+        self.expect_kw('DO')
+        body = self.parse_statements(('END_FOR',))
+        self.expect_kw('END_FOR')
+        return ForStatement(variable, first, last, step, body, span=self.span_from(start))
+
+    def parse_while(self) -> WhileStatement:
+        start = self.expect_kw('WHILE')
+        condition = self.parse_expression()
+        self.expect_kw('DO')
+        body = self.parse_statements(('END_WHILE',))
+        self.expect_kw('END_WHILE')
+        return WhileStatement(condition, body, span=self.span_from(start))
+
+    def parse_repeat(self) -> RepeatStatement:
+        start = self.expect_kw('REPEAT')
+        body = self.parse_statements(('UNTIL',))
+        self.expect_kw('UNTIL')
+        condition = self.parse_expression()
+        self.expect_kw('END_REPEAT')
+        return RepeatStatement(body, condition, span=self.span_from(start))
+
+    # --- expressions (IEC 61131-3 precedence, lowest first) ---
+
+    BINARY_LEVELS = [
+        ('OR',),
+        ('XOR',),
+        ('AND', '&'),
+        ('=', '<>'),
+        ('<', '>', '<=', '>='),
+        ('+', '-'),
+        ('*', '/', 'MOD'),
+        ('**',),
+    ]
+    BINARY_PRECEDENCE = {op: level for level, operators in enumerate(BINARY_LEVELS) for op in operators}
+
+    def parse_expression(self, min_level=0) -> Expr:
+        """precedence climbing: one call per operand instead of one per precedence level"""
+        start = self.peek()
+        left = self.parse_unary()
+        while True:
+            token = self.tokens[self.pos]
+            level = self.BINARY_PRECEDENCE.get(token.value) if token.kind in ('op', 'kw') else None
+            if level is None or level < min_level:
+                return left
+            self.next()
+            right = self.parse_expression(level + 1)
+            left = BinaryOp('AND' if token.value == '&' else token.value, left, right, span=self.span_from(start))
+
+    def parse_unary(self) -> Expr:
+        start = self.peek()
+        if self.accept_kw('NOT'):
+            return UnaryOp('NOT', self.parse_unary(), span=self.span_from(start))
+        if self.at_op('-', '+'):
+            op = self.next().value
+            operand = self.parse_unary()
+            if isinstance(operand, Literal) and op == '-' and isinstance(operand.value, (int, float)) \
+                    and not isinstance(operand.value, bool):
+                return Literal(-operand.value, operand.type_name, '-' + operand.raw, span=self.span_from(start))
+            return UnaryOp(op, operand, span=self.span_from(start))
+        return self.parse_postfix(self.parse_primary())
+
+    def parse_postfix(self, expr) -> Expr:
+        start_span = expr.span
+        if isinstance(expr, Literal) and expr.raw.startswith('"') and self.at_op('.', '[', '('):
+            self.check_quoted_identifier(self.tokens[self.pos - 1])
+        while True:
+            if self.at_op('.') and self.peek(1).kind in ('ident', 'int', 'kw'):
+                self.next()
+                member = self.next().value
+                expr = Member(expr, member)
+            elif self.accept_op('['):
+                indices = [self.parse_expression()]
+                while self.accept_op(','):
+                    indices.append(self.parse_expression())
+                self.expect_op(']')
+                expr = Index(expr, indices)
+            elif self.accept_op('^'):
+                expr = Deref(expr)
+            elif self.at_op('(') and isinstance(expr, (Name, Member)):
+                self.next()
+                expr = Call(expr, self.parse_arguments())
+            else:
+                return expr
+            last = self.tokens[self.pos - 1]
+            expr.span = Span(start_span.line, start_span.col, last.end_line, last.end_col)
+
+    def parse_arguments(self) -> List[Argument]:
+        args = []
+        while not self.at_op(')'):
+            start = self.peek()
+            if start.kind == 'ident' and self.peek(1).value in (':=', '=>'):
+                name = self.next().value
+                output = self.next().value == '=>'
+                args.append(Argument(self.parse_expression(), name, output, span=self.span_from(start)))
+            else:
+                args.append(Argument(self.parse_expression(), span=self.span_from(start)))
+            if not self.accept_op(','):
+                break
+        self.expect_op(')')
+        return args
+
+    def parse_primary(self) -> Expr:
+        token = self.peek()
+        if token.kind == 'int':
+            self.next()
+            text = token.value.replace('_', '')
+            if '#' in text:
+                base, digits = text.split('#', 1)
+                value = int(digits, int(base))
+            else:
+                value = int(text)
+            return Literal(value, 'INT', token.value, span=self.span_from(token))
+        if token.kind == 'real':
+            self.next()
+            return Literal(float(token.value.replace('_', '')), 'REAL', token.value, span=self.span_from(token))
+        if token.kind == 'kw' and token.value in ('TRUE', 'FALSE'):
+            self.next()
+            return Literal(token.value == 'TRUE', 'BOOL', token.value, span=self.span_from(token))
+        if token.kind == 'string':
+            self.next()
+            type_name = 'WSTRING' if token.value.startswith('"') else 'STRING'
+            return Literal(token.value[1:-1], type_name, token.value, span=self.span_from(token))
+        if token.kind == 'time':
+            self.next()
+            prefix = token.value.split('#', 1)[0].upper()
+            if prefix in ('T', 'TIME', 'LT', 'LTIME'):
+                return Literal(parse_time_literal(token.value), 'TIME', token.value, span=self.span_from(token))
+            return Literal(token.value.split('#', 1)[1], prefix, token.value, span=self.span_from(token))
+        if token.kind == 'typed':
+            self.next()
+            type_name = token.value[:-1]
+            if self.peek().kind == 'ident':
+                value = self.next().value
+                return EnumLiteral(type_name, value, span=self.span_from(token))
+            literal = self.parse_unary()
+            if not isinstance(literal, Literal):
+                raise self.error("literal after type prefix")
+            return Literal(literal.value, type_name.upper(), token.value + literal.raw, span=self.span_from(token))
+        if token.kind == 'address':
+            self.next()
+            return DirectAddress(token.value, span=self.span_from(token))
+        if token.kind == 'ident':
+            self.next()
+            return Name(token.value, span=self.span_from(token))
+        if self.accept_op('('):
+            expr = self.parse_expression()
+            self.expect_op(')')
+            return expr
+        self.check_supported()
+        raise self.error("expression")
+
+
+def parse_st(source: str) -> CompilationUnit:
+    """
+    解析 ST 源码，返回 CompilationUnit。
+
+    Raises:
+        STSyntaxError: 第一个语法错误（带行列号）
+        STUnsupportedError: 源码使用了本前端不支持的结构
+    """
+    return _Parser(tokenize(source)).parse_unit()
+
+
+# parsed units of recently seen sources: all tools looking at the same program share one parse
+PARSE_CACHE_SIZE = 64
+_parse_cache: "OrderedDict[str, CompilationUnit]" = OrderedDict()
+_parse_cache_lock = threading.Lock()
+
+
+def parse_st_cached(source: str) -> CompilationUnit:
+    """
+    parse_st with an LRU cache keyed by the SHA-1 of the source. The same CompilationUnit object is
+    returned to every caller, so it must be treated as read-only. Syntax errors are not cached.
+    """
+    key = hashlib.sha1(source.encode('utf-8', 'surrogatepass')).hexdigest()
+    with _parse_cache_lock:
+        unit = _parse_cache.get(key)
+        if unit is not None:
+            _parse_cache.move_to_end(key)
+            return unit
+    unit = parse_st(source)
+    with _parse_cache_lock:
+        _parse_cache[key] = unit
+        while len(_parse_cache) > PARSE_CACHE_SIZE:
+            _parse_cache.popitem(last=False)
+    return unit
+
+
+def source_segment(source: str, span: Span) -> str:
+    """源码中 span 覆盖的文本（行列从 1 开始，结束位置不含）"""
+    line_starts = [0] + [m.end() for m in re.finditer('\n', source)]
+    start = line_starts[span.line - 1] + span.col - 1
+    end = line_starts[span.end_line - 1] + span.end_col - 1
+    return source[start:end]
+
+
+def parse_expression(source: str) -> Expr:
+    """解析单个 ST 表达式（例如属性模式参数）"""
+    parser = _Parser(tokenize(source))
+    expr = parser.parse_expression()
+    if parser.peek().kind != 'eof':
+        raise parser.error("end of expression")
+    return expr
+
+
+if __name__ == "__main__":
+    test_st_code = """
+TYPE E_Mode : (IDLE, RUN := 5, STOP); END_TYPE
+
+FUNCTION_BLOCK Motor
+VAR_INPUT
+    start, stop : BOOL;
+    speed : INT := 10;
+END_VAR
+VAR_OUTPUT
+    running : BOOL;
+END_VAR
+VAR
+    mode : E_Mode := IDLE;
+    t : TON;
+    buf : ARRAY[1..3] OF INT := [3(0)];
+END_VAR
+    t(IN := start AND NOT stop, PT := T#1s500ms);
+    CASE mode OF
+        IDLE: IF t.Q THEN mode := RUN; END_IF
+        RUN, STOP:
+            running := speed > 0 AND mode = E_Mode#RUN;
+    ELSE
+        running := FALSE;
+    END_CASE;
+    FOR speed := 1 TO 3 BY 1 DO buf[speed] := -speed ** 2; END_FOR;
+END_FUNCTION_BLOCK
+"""
+    unit = parse_st(test_st_code)
+    for pou in unit.pous:
+        print(pou.kind, pou.name, [decl.names for decl in pou.declarations()])
+        for statement in pou.body:
+            print("  ", statement.span.line, type(statement).__name__)
+    print(unit.types)
+    try:
+        parse_st("PROGRAM P\nVAR x : INT; END_VAR\nx := 1\nEND_PROGRAM")
+    except STSyntaxError as e:
+        print("Syntax error:", e)
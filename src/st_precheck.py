@@ -0,0 +1,428 @@
+## Fast in-process pre-check of ST code, run in front of the external compilers (RuSTy / matiec).
+## Built on the AST of src/st_ast.py it reports syntax errors and unresolved references, in the
+## same CheckResult / Diagnostic shape as src/compiler.py. For matiec it additionally reports
+## unknown types, duplicate declarations, unknown FB members / call parameters, writes to constants
+## and assignments between obviously incompatible types; RuSTy is more lenient there (it accepts
+## e.g. `b : BOOL := 1;` or `b := 1;`), so those checks are off for it.
+## The check is conservative: it only reports what the real compilers also reject. Code using
+## constructs the front end does not model is reported as passed and left to the compiler.
+import sys
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+# Resolve the parent directory as an absolute path
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+
+from src.compiler import CheckResult, Diagnostic, SOURCE_PLACEHOLDER
+from src.st_ast import (
+    parse_st_cached, walk, STSyntaxError, STUnsupportedError, CompilationUnit, POU, VarDecl,
+    NamedType, ArrayType, PointerType, SubrangeType, EnumType, StructType,
+    Literal, EnumLiteral, Name, Member, Index, Deref, Call, UnaryOp, BinaryOp,
+    Assignment, ForStatement,
+)
+
+PRECHECK_COMPILER = "precheck"
+
+# diagnostics every supported compiler reports: syntax errors and unresolved references
+COMMON_CODES = {"P001", "P002"}
+# the stricter checks (P003-P008) only match what matiec rejects
+STRICT_COMPILERS = {"matiec"}
+
+# elementary type -> category used by the assignment compatibility check
+ELEMENTARY_TYPES = {
+    'BOOL': 'bool',
+    'SINT': 'int', 'INT': 'int', 'DINT': 'int', 'LINT': 'int',
+    'USINT': 'int', 'UINT': 'int', 'UDINT': 'int', 'ULINT': 'int',
+    'BYTE': 'bits', 'WORD': 'bits', 'DWORD': 'bits', 'LWORD': 'bits',
+    'REAL': 'real', 'LREAL': 'real',
+    'TIME': 'time', 'LTIME': 'time',
+    'STRING': 'string', 'WSTRING': 'string', 'CHAR': 'string', 'WCHAR': 'string',
+    'DATE': 'date', 'LDATE': 'date', 'TIME_OF_DAY': 'date', 'TOD': 'date', 'LTOD': 'date',
+    'DATE_AND_TIME': 'date', 'DT': 'date', 'LDT': 'date',
+}
+GENERIC_TYPES = {'ANY', 'ANY_DERIVED', 'ANY_ELEMENTARY', 'ANY_MAGNITUDE', 'ANY_NUM', 'ANY_REAL', 'ANY_INT',
+                 'ANY_BIT', 'ANY_STRING', 'ANY_DATE', '__VOID'}
+
+# inputs / outputs of the IEC standard function blocks
+STANDARD_FUNCTION_BLOCKS = {
+    'TON': ({'IN', 'PT'}, {'Q', 'ET'}),
+    'TOF': ({'IN', 'PT'}, {'Q', 'ET'}),
+    'TP': ({'IN', 'PT'}, {'Q', 'ET'}),
+    'CTU': ({'CU', 'R', 'PV'}, {'Q', 'CV'}),
+    'CTD': ({'CD', 'LD', 'PV'}, {'Q', 'CV'}),
+    'CTUD': ({'CU', 'CD', 'R', 'LD', 'PV'}, {'QU', 'QD', 'CV'}),
+    'R_TRIG': ({'CLK'}, {'Q'}),
+    'F_TRIG': ({'CLK'}, {'Q'}),
+    'SR': ({'S1', 'R'}, {'Q1'}),
+    'RS': ({'S', 'R1'}, {'Q1'}),
+}
+# typed variants shipped by the RuSTy standard library (TON_TIME, CTU_DINT, ...)
+STANDARD_FB_VARIANT_RE = re.compile(r'^(TON|TOF|TP)_L?TIME$|^(CTU|CTD|CTUD)_U?[SDL]?INT$', re.IGNORECASE)
+
+INCOMPATIBLE_CATEGORIES = {
+    'bool': {'int', 'real', 'time', 'string'},
+    'string': {'bool', 'int', 'real', 'time'},
+    'time': {'bool', 'string'},
+    'int': {'bool', 'string'},
+    'real': {'bool', 'string'},
+}
+
+COMPARISON_OPERATORS = ('=', '<>', '<', '>', '<=', '>=')
+
+
+def _standard_fb(type_name: str) -> Optional[str]:
+    upper = type_name.upper()
+    if upper in STANDARD_FUNCTION_BLOCKS:
+        return upper
+    match = STANDARD_FB_VARIANT_RE.match(upper)
+    if match:
+        return match.group(1) or match.group(2)
+    return None
+
+
+class _PrecheckContext:
+    """Symbol tables for one compilation unit plus the diagnostics found so far."""
+
+    def __init__(self, unit: CompilationUnit, lines: List[str], file_name: str, strict: bool = False):
+        self.unit = unit
+        self.lines = lines
+        self.file_name = file_name
+        self.strict = strict
+        self.diagnostics: List[Diagnostic] = []
+        self.reported = set()
+
+        self.types = {decl.name.lower(): decl for decl in unit.types}
+        self.pous = {pou.name.lower(): pou for pou in unit.pous}
+        self.global_names = set(self.pous)
+        self.global_vars: Dict[str, VarDecl] = {}
+        for block in unit.globals:
+            for decl in block.decls:
+                for name in decl.names:
+                    self.global_vars[name.lower()] = decl
+        self.global_names |= set(self.global_vars)
+        self.enum_values = {}
+        for decl in unit.types:
+            if isinstance(decl.type, EnumType):
+                self.enum_values[decl.name.lower()] = {value.lower() for value, _ in decl.type.values}
+                self.global_names |= self.enum_values[decl.name.lower()]
+
+    def report(self, node, code, message):
+        if not self.strict and code not in COMMON_CODES:
+            return
+        span = node.span
+        key = (span.line, span.col, code, message) if span else (0, 0, code, message)
+        if key in self.reported:
+            return
+        self.reported.add(key)
+        self.diagnostics.append(Diagnostic(self.file_name, span.line if span else 0, span.col if span else 0,
+                                           "error", code, message))
+
+    def render(self) -> str:
+        """按 RuSTy 的输出格式渲染诊断信息，修复 agent 看到的错误格式和真实编译器一致"""
+        blocks = []
+        for diagnostic in self.diagnostics:
+            source_line = self.lines[diagnostic.line - 1] if 0 < diagnostic.line <= len(self.lines) else ""
+            gutter = " " * len(str(diagnostic.line))
+            blocks.append("\n".join([
+                f"error[{diagnostic.code}]: {diagnostic.message}",
+                f"{gutter} ┌─ {diagnostic.file}:{diagnostic.line}:{diagnostic.col}",
+                f"{gutter} │",
+                f"{diagnostic.line} │ {source_line}",
+                f"{gutter} │ {' ' * max(diagnostic.col - 1, 0)}^ {diagnostic.message}",
+            ]))
+        return "\n\n".join(blocks)
+
+    # --- types ---
+
+    def is_known_type(self, name: str) -> bool:
+        upper = name.upper()
+        return (upper in ELEMENTARY_TYPES or upper in GENERIC_TYPES or _standard_fb(name) is not None
+                or name.lower() in self.types or name.lower() in self.pous)
+
+    def check_type(self, type_ref):
+        if isinstance(type_ref, NamedType):
+            if not self.is_known_type(type_ref.name):
+                self.report(type_ref, "P003", f"Unknown type '{type_ref.name}'")
+        elif isinstance(type_ref, ArrayType):
+            self.check_type(type_ref.element_type)
+        elif isinstance(type_ref, PointerType):
+            self.check_type(type_ref.target)
+        elif isinstance(type_ref, SubrangeType):
+            if not self.is_known_type(type_ref.base):
+                self.report(type_ref, "P003", f"Unknown type '{type_ref.base}'")
+        elif isinstance(type_ref, StructType):
+            for member in type_ref.members:
+                self.check_type(member.type)
+
+    def resolve_named_type(self, type_ref):
+        """展开类型别名，返回最终的 TypeRef"""
+        seen = set()
+        while isinstance(type_ref, NamedType) and type_ref.name.lower() in self.types:
+            if type_ref.name.lower() in seen:
+                break
+            seen.add(type_ref.name.lower())
+            type_ref = self.types[type_ref.name.lower()].type
+        return type_ref
+
+    def category(self, type_ref) -> Optional[str]:
+        type_ref = self.resolve_named_type(type_ref)
+        if isinstance(type_ref, NamedType):
+            return ELEMENTARY_TYPES.get(type_ref.name.upper())
+        if isinstance(type_ref, SubrangeType):
+            return ELEMENTARY_TYPES.get(type_ref.base.upper())
+        return None
+
+    def members_of(self, type_ref) -> Optional[Dict[str, Optional[VarDecl]]]:
+        """FB / 结构体类型的成员名（小写）；未知或不适用时返回 None"""
+        type_ref = self.resolve_named_type(type_ref)
+        if isinstance(type_ref, StructType):
+            return {name.lower(): decl for decl in type_ref.members for name in decl.names}
+        if not isinstance(type_ref, NamedType):
+            return None
+        standard = _standard_fb(type_ref.name)
+        if standard is not None:
+            inputs, outputs = STANDARD_FUNCTION_BLOCKS[standard]
+            return {name.lower(): None for name in inputs | outputs}
+        pou = self.pous.get(type_ref.name.lower())
+        if pou is not None and pou.kind == 'FUNCTION_BLOCK':
+            return {name.lower(): decl for decl in pou.declarations() for name in decl.names}
+        return None
+
+
+class _POUChecker:
+    """Checks declarations and body of a single POU."""
+
+    def __init__(self, context: _PrecheckContext, pou: POU):
+        self.context = context
+        self.pou = pou
+        self.locals: Dict[str, VarDecl] = {}
+        self.local_enum_values = set()
+
+    def check(self):
+        context = self.context
+        for decl in self.pou.declarations():
+            for name in decl.names:
+                if name.lower() in self.locals:
+                    context.report(decl, "P004", f"Duplicate symbol '{name}'")
+                self.locals[name.lower()] = decl
+            if isinstance(decl.type, EnumType):
+                self.local_enum_values |= {value.lower() for value, _ in decl.type.values}
+            context.check_type(decl.type)
+        if self.pou.return_type is not None:
+            context.check_type(self.pou.return_type)
+
+        for decl in self.pou.declarations():
+            for expr in ([decl.init] if decl.init is not None else []):
+                self.check_references(expr)
+            if isinstance(decl.type, ArrayType):
+                for low, high in decl.type.dimensions:
+                    self.check_references(low)
+                    self.check_references(high)
+
+        for statement in self.pou.body:
+            self.check_references(statement)
+            for node in walk(statement):
+                if isinstance(node, Assignment):
+                    self.check_assignment(node)
+                elif isinstance(node, Call):
+                    self.check_call(node)
+                elif isinstance(node, ForStatement):
+                    self.check_name(node, node.variable)
+
+    # --- symbols ---
+
+    def lookup(self, name: str) -> Optional[VarDecl]:
+        lowered = name.lower()
+        return self.locals.get(lowered) or self.context.global_vars.get(lowered)
+
+    def is_defined(self, name: str) -> bool:
+        lowered = name.lower()
+        if lowered in self.locals or lowered in self.context.global_names or lowered in self.local_enum_values:
+            return True
+        # a FUNCTION assigns its result to its own name
+        return self.pou.kind == 'FUNCTION' and lowered == self.pou.name.lower()
+
+    def check_name(self, node, name):
+        if not self.is_defined(name):
+            self.context.report(node, "P002", f"Could not resolve reference to '{name}'")
+
+    def check_references(self, root):
+        """检查表达式 / 语句中引用的变量是否已声明，以及成员访问是否存在"""
+        callee_nodes = set()
+        for node in walk(root):
+            if isinstance(node, Call):
+                callee_nodes.add(id(node.func))
+            elif isinstance(node, Name):
+                if id(node) not in callee_nodes:
+                    self.check_name(node, node.name)
+            elif isinstance(node, Member):
+                self.check_member(node)
+            elif isinstance(node, EnumLiteral):
+                values = self.context.enum_values.get(node.type_name.lower())
+                if values is not None and node.value.lower() not in values:
+                    self.context.report(node, "P002", f"Could not resolve reference to '{node.type_name}#{node.value}'")
+
+    def type_of(self, expr):
+        """变量引用的声明类型（只处理 name 和 name.member），未知时返回 None"""
+        if isinstance(expr, Name):
+            decl = self.lookup(expr.name)
+            return decl.type if decl is not None else None
+        if isinstance(expr, Member):
+            base_type = self.type_of(expr.base)
+            members = self.context.members_of(base_type) if base_type is not None else None
+            if members:
+                decl = members.get(expr.member.lower())
+                return decl.type if decl is not None else None
+        if isinstance(expr, Index):
+            base_type = self.context.resolve_named_type(self.type_of(expr.base)) if self.type_of(expr.base) else None
+            if isinstance(base_type, ArrayType):
+                return base_type.element_type
+        return None
+
+    def check_member(self, node: Member):
+        if node.member.isdigit():
+            return                                  # bit access
+        base_type = self.type_of(node.base)
+        if base_type is None:
+            return
+        members = self.context.members_of(base_type)
+        if members is not None and node.member.lower() not in members:
+            self.context.report(node, "P006", f"Could not resolve reference to '{node.member}'")
+
+    # --- statements ---
+
+    def check_call(self, node: Call):
+        if isinstance(node.func, Name):
+            decl = self.lookup(node.func.name)
+            if decl is not None:
+                parameters = self.context.members_of(decl.type)
+            else:
+                pou = self.context.pous.get(node.func.name.lower())
+                parameters = ({name.lower() for d in pou.declarations() for name in d.names}
+                              if pou is not None else None)
+        elif isinstance(node.func, Member):
+            func_type = self.type_of(node.func)
+            parameters = self.context.members_of(func_type) if func_type is not None else None
+        else:
+            parameters = None
+        if parameters is None:
+            return
+        for argument in node.args:
+            if argument.name is not None and argument.name.lower() not in parameters:
+                self.context.report(argument, "P007", f"Unknown parameter '{argument.name}' in call to "
+                                                      f"'{getattr(node.func, 'name', getattr(node.func, 'member', ''))}'")
+
+    def check_assignment(self, node: Assignment):
+        target = node.target
+        if not isinstance(target, (Name, Member, Index, Deref)):
+            self.context.report(target, "P008", "Expression is not assignable")
+            return
+        if isinstance(target, Name):
+            decl = self.lookup(target.name)
+            if decl is not None and decl.constant:
+                self.context.report(target, "P008", f"Cannot assign to CONSTANT '{target.name}'")
+
+        target_type = self.type_of(target)
+        if target_type is None and isinstance(target, Name) and self.pou.kind == 'FUNCTION' \
+                and target.name.lower() == self.pou.name.lower():
+            target_type = self.pou.return_type
+        target_category = self.context.category(target_type) if target_type is not None else None
+        value_category = self.expression_category(node.value)
+        if target_category and value_category and value_category in INCOMPATIBLE_CATEGORIES.get(target_category, ()):
+            self.context.report(node, "P005", f"Invalid assignment: cannot assign '{value_category.upper()}' "
+                                              f"to '{target_category.upper()}'")
+
+    def expression_category(self, expr) -> Optional[str]:
+        """表达式结果的大类（bool/int/real/time/string），推断不出时返回 None"""
+        if isinstance(expr, Literal):
+            if expr.raw.startswith('"'):
+                return None                         # WSTRING literal or SCL quoted identifier
+            return ELEMENTARY_TYPES.get(expr.type_name.upper())
+        if isinstance(expr, (Name, Member, Index)):
+            declared = self.type_of(expr)
+            return self.context.category(declared) if declared is not None else None
+        if isinstance(expr, UnaryOp):
+            return self.expression_category(expr.operand)
+        if isinstance(expr, BinaryOp):
+            if expr.op in COMPARISON_OPERATORS:
+                return 'bool'
+            left = self.expression_category(expr.left)
+            right = self.expression_category(expr.right)
+            if expr.op in ('AND', 'OR', 'XOR'):
+                return 'bool' if left == right == 'bool' else None
+            if left == right and left in ('int', 'real'):
+                return left
+            if {left, right} == {'int', 'real'}:
+                return 'real'
+            if left == 'time' and right == 'time' and expr.op in ('+', '-'):
+                return 'time'
+        return None
+
+
+def precheck_st_code(st_code: str, file_name: str = SOURCE_PLACEHOLDER, compiler: str = "rusty") -> CheckResult:
+    """
+    对 ST 代码做进程内预检查
+
+    Args:
+        st_code: ST 源码
+        file_name: 诊断信息中使用的文件名
+        compiler: 后面要调用的编译器 ("rusty" 或 "matiec")；只有 matiec 才做类型/声明等严格检查
+
+    Returns:
+        CheckResult: compiler 为 "precheck"；passed=False 时 diagnostics/output 给出错误位置。
+                     遇到前端不支持的结构时返回 passed=True（交给真实编译器判断）。
+    """
+    lines = st_code.splitlines()
+    try:
+        unit = parse_st_cached(st_code)
+    except STUnsupportedError as e:
+        return CheckResult(passed=True, output=f"precheck skipped: {e.message}", compiler=PRECHECK_COMPILER)
+    except STSyntaxError as e:
+        context = _PrecheckContext(CompilationUnit(), lines, file_name)
+        context.diagnostics.append(Diagnostic(file_name, e.line, e.col, "error", "P001", e.message))
+        return CheckResult(passed=False, output=context.render(), diagnostics=context.diagnostics,
+                           compiler=PRECHECK_COMPILER)
+
+    context = _PrecheckContext(unit, lines, file_name, strict=compiler.lower() in STRICT_COMPILERS)
+    for decl in unit.types:
+        context.check_type(decl.type)
+    for pou in unit.pous:
+        _POUChecker(context, pou).check()
+
+    context.diagnostics.sort(key=lambda d: (d.line, d.col))
+    return CheckResult(passed=not context.diagnostics, output=context.render(),
+                       diagnostics=context.diagnostics, compiler=PRECHECK_COMPILER)
+
+
+def precheck_st_file(file_dir: str, compiler: str = "rusty") -> CheckResult:
+    with open(file_dir, 'r', encoding='utf-8', errors='replace') as f:
+        return precheck_st_code(f.read(), file_dir, compiler)
+
+
+if __name__ == "__main__":
+    test_st_code = """
+FUNCTION_BLOCK TemperatureControl
+VAR_INPUT
+    temperature : REAL;
+END_VAR
+VAR_OUTPUT
+    motor : BOOL;
+END_VAR
+VAR
+    t : TON;
+END_VAR
+    t(IN := temperature > 80.0, PT := T#2s, Q => motr);
+    IF t.Done THEN
+        motor := 1;
+    END_IF;
+END_FUNCTION_BLOCK
+"""
+    start_time = time.perf_counter()
+    result = precheck_st_code(test_st_code, "test.st", "matiec")
+    print(f"passed={result.passed} ({(time.perf_counter() - start_time) * 1000:.2f} ms)")
+    print(result.output)
+    # RuSTy accepts `motor := 1;` and unknown FB members are left to it: only the unresolved 'motr' remains
+    print(precheck_st_code(test_st_code, "test.st").output)
+    print(precheck_st_code("PROGRAM P\nVAR x : INT; END_VAR\nIF x > 1 THEN\n  x := 2;\nEND_PROGRAM\n").output)
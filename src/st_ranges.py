@@ -0,0 +1,645 @@
+## Value range inference for the integer / REAL variables of an ST program (interval abstract
+## interpretation on the AST). Generated programs declare INT / DINT / REAL variables whose values
+## stay in small ranges, while the model checkers explore the whole domain. The analysis runs the
+## PLC cycle abstractly until the variable intervals are stable (widening to program and property
+## constants, so that `x >= 36464` style thresholds stay precise), and the resulting ranges are
+## added to the nuXmv models as INVAR constraints: they hold in every reachable state, and IC3 /
+## k-induction / BDD reachability use them to prune the state space.
+## The analysis is sound for the variables it reports: anything it cannot follow (arrays, bit
+## access, VAR_IN_OUT of unknown calls, arithmetic overflow) widens the variable to its full type.
+## Integer arithmetic wraps around in the operand type (as in the nuXmv word model), so an
+## intermediate result outside that type's range widens to the whole type, not only the final value.
+import math
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+# Resolve the parent directory as an absolute path
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+
+from src.st_ast import (STSyntaxError, NamedType, Literal, Name, Call, UnaryOp, BinaryOp,
+                        Assignment, CallStatement, IfStatement, CaseStatement, CaseRange, ForStatement,
+                        WhileStatement, RepeatStatement, ExitStatement, ContinueStatement, ReturnStatement,
+                        parse_st_cached, parse_expression, walk)
+from src.st_slicer import root_name
+
+# (signed, bits) of the integer types; TIME is a signed 32-bit millisecond count
+INTEGER_TYPES = {
+    'SINT': (True, 8), 'INT': (True, 16), 'DINT': (True, 32), 'LINT': (True, 64),
+    'USINT': (False, 8), 'UINT': (False, 16), 'UDINT': (False, 32), 'ULINT': (False, 64),
+    'BYTE': (False, 8), 'WORD': (False, 16), 'DWORD': (False, 32), 'LWORD': (False, 64),
+    'TIME': (True, 32),
+}
+REAL_TYPES = {'REAL', 'LREAL'}
+# calls that cannot modify the variables passed to them (functions and standard FBs without VAR_IN_OUT)
+PURE_CALLS = {'ABS', 'MIN', 'MAX', 'LIMIT', 'SEL', 'MUX', 'SQRT', 'TRUNC', 'MOVE', 'TON', 'TOF', 'TP',
+              'R_TRIG', 'F_TRIG', 'CTU', 'CTD', 'CTUD'}
+# cycles run with plain joins before widening kicks in; the fixpoint gives up after MAX_ITERATIONS
+WIDENING_DELAY = 3
+MAX_ITERATIONS = 60
+_NUMBER_RE = re.compile(r'(?<![\w#.])-?\d+(?:\.\d+)?(?![\w#])')
+
+
+class RangeAnalysisError(Exception):
+    """The program cannot be analysed (syntax error, ambiguous entry point)."""
+
+
+@dataclass(frozen=True)
+class Interval:
+    low: float
+    high: float
+
+    @property
+    def is_point(self) -> bool:
+        return self.low == self.high
+
+    def join(self, other: Optional['Interval']) -> 'Interval':
+        if other is None:
+            return self
+        return Interval(min(self.low, other.low), max(self.high, other.high))
+
+    def meet(self, other: 'Interval') -> Optional['Interval']:
+        """交集，空集返回 None"""
+        low, high = max(self.low, other.low), min(self.high, other.high)
+        return Interval(low, high) if low <= high else None
+
+    def within(self, other: 'Interval') -> bool:
+        return other.low <= self.low and self.high <= other.high
+
+    def __str__(self):
+        return f"[{self.low}, {self.high}]"
+
+
+TOP = Interval(-math.inf, math.inf)
+
+
+def type_interval(type_name: str) -> Optional[Interval]:
+    """整数 / REAL 类型的取值范围，其他类型返回 None（不分析）"""
+    type_name = type_name.upper()
+    if type_name in INTEGER_TYPES:
+        signed, bits = INTEGER_TYPES[type_name]
+        return Interval(-(1 << (bits - 1)), (1 << (bits - 1)) - 1) if signed else Interval(0, (1 << bits) - 1)
+    if type_name in REAL_TYPES:
+        return TOP
+    return None
+
+
+def property_constants(expressions: Iterable[str]) -> List[float]:
+    """属性表达式里的数值常量（作为加宽阈值）"""
+    constants = []
+    for expression in expressions:
+        try:
+            nodes = walk(parse_expression(str(expression).strip().strip('"')))
+            constants += [node.value for node in nodes if isinstance(node, Literal)
+                          and isinstance(node.value, (int, float)) and not isinstance(node.value, bool)]
+        except STSyntaxError:
+            constants += [float(number) if '.' in number else int(number)
+                          for number in _NUMBER_RE.findall(str(expression))]
+    return constants
+
+
+def _common_type(left, right):
+    """两个运算类型的公共类型：REAL 优先，否则取更宽的整数类型（任一侧有符号则有符号）"""
+    if left is None or right is None:
+        return left if right is None else right
+    if 'REAL' in (left, right):
+        return 'REAL'
+    return (left[0] or right[0], max(left[1], right[1]))
+
+
+def _outward(low, high, real):
+    """REAL 运算结果向外取整一位，抵消浮点舍入"""
+    if not real:
+        return Interval(low, high)
+    return Interval(math.nextafter(low, -math.inf), math.nextafter(high, math.inf))
+
+
+class _RangeAnalysis:
+    """Abstract execution of the cycle body on interval states (dict lower-case name -> Interval)."""
+
+    def __init__(self, unit, pou, thresholds: Iterable[float] = ()):
+        self.unit = unit
+        self.pou = pou
+        self.types: Dict[str, Interval] = {}        # analysed variable -> type range
+        self.integer_types: Dict[str, Tuple[bool, int]] = {}    # integer variable -> (signed, bits)
+        self.real = set()
+        self.inputs, self.temps, self.state = set(), {}, {}
+        self.constants = {}
+        self.seen: Dict[str, Interval] = {}         # every value assigned during a cycle
+        self._loop_exits: List[List[dict]] = []
+        self._returns: List[dict] = []
+        self._declare()
+        program_constants = [node.value for node in walk(pou) if isinstance(node, Literal)
+                             and isinstance(node.value, (int, float)) and not isinstance(node.value, bool)]
+        # c - 1 / c + 1 keep strict comparisons against c precise
+        self.thresholds = sorted({value + delta for value in list(thresholds) + program_constants
+                                  for delta in (-1, 0, 1)})
+
+    def _declare(self):
+        written = set()
+        for statement in self.pou.body:
+            for node in walk(statement):
+                if isinstance(node, Assignment):
+                    written.add(root_name(node.target))
+                elif isinstance(node, Call):
+                    pure = self.pure_call(node)
+                    written.update(root_name(argument.value) for argument in node.args
+                                   if argument.output or not pure)
+        for decl in self.pou.declarations():
+            if not isinstance(decl.type, NamedType) or decl.type.length is not None:
+                continue
+            bounds = type_interval(decl.type.name)
+            if bounds is None or decl.address:
+                continue
+            for st_name in decl.names:
+                name = st_name.lower()
+                self.types[name] = bounds
+                if decl.type.name.upper() in REAL_TYPES:
+                    self.real.add(name)
+                else:
+                    self.integer_types[name] = INTEGER_TYPES[decl.type.name.upper()]
+                init = self.evaluate(decl.init, {}) if decl.init is not None else Interval(0, 0)
+                init = init if init.within(bounds) else bounds
+                if decl.constant:
+                    self.constants[name] = init
+                elif decl.section in ('VAR_INPUT', 'VAR_IN_OUT', 'VAR_EXTERNAL', 'VAR_GLOBAL') or \
+                        (self.pou.kind == 'PROGRAM' and decl.section == 'VAR' and name not in written
+                         and decl.init is None):
+                    # driven by the environment (see src/st_to_smv.py for unwritten PROGRAM variables)
+                    self.inputs.add(name)
+                elif decl.section == 'VAR_TEMP':
+                    self.temps[name] = init
+                else:
+                    self.state[name] = init
+
+    # --- expressions ---
+
+    def evaluate(self, expr, env) -> Interval:
+        if isinstance(expr, Literal):
+            if isinstance(expr.value, bool) or not isinstance(expr.value, (int, float)):
+                return TOP
+            return Interval(expr.value, expr.value)
+        if isinstance(expr, Name):
+            name = expr.name.lower()
+            if name in self.constants:
+                return self.constants[name]
+            if name in env:
+                return env[name]
+            return self.types.get(name, TOP)
+        if isinstance(expr, UnaryOp):
+            operand = self.evaluate(expr.operand, env)
+            value = Interval(-operand.high, -operand.low) if expr.op == '-' else operand if expr.op == '+' else TOP
+            return self.wrap(expr, value)
+        if isinstance(expr, BinaryOp):
+            return self.wrap(expr, self.arithmetic(expr, env))
+        if isinstance(expr, Call) and isinstance(expr.func, Name):
+            value = self.function(expr.func.name.upper(), [self.evaluate(arg.value, env) for arg in expr.args])
+            return self.wrap(expr, value)
+        return TOP
+
+    def wrap(self, expr, value: Interval) -> Interval:
+        """整数运算结果超出运算类型的范围时会回绕，可能是该类型的任何值"""
+        integer_type = self.operand_type(expr)
+        if not isinstance(integer_type, tuple):
+            return value
+        signed, bits = integer_type
+        bounds = Interval(-(1 << (bits - 1)), (1 << (bits - 1)) - 1) if signed else Interval(0, (1 << bits) - 1)
+        return value if value.within(bounds) else bounds
+
+    def operand_type(self, expr):
+        """
+        表达式的运算类型（与 src/st_to_smv.py 的 common_type 一致）：整数为 (signed, bits)，
+        REAL 为 'REAL'；无类型的整数字面量（跟随另一侧的类型）和无法确定时为 None
+        """
+        if isinstance(expr, Literal):
+            return 'REAL' if isinstance(expr.value, float) else None
+        if isinstance(expr, Name):
+            name = expr.name.lower()
+            return 'REAL' if name in self.real else self.integer_types.get(name)
+        if isinstance(expr, UnaryOp):
+            return self.operand_type(expr.operand)
+        if isinstance(expr, BinaryOp):
+            return _common_type(self.operand_type(expr.left), self.operand_type(expr.right))
+        if isinstance(expr, Call) and isinstance(expr.func, Name):
+            name = expr.func.name.upper()
+            if '_TO_' in name:
+                target = name.split('_TO_', 1)[1]
+                return 'REAL' if target in REAL_TYPES else INTEGER_TYPES.get(target)
+            args = expr.args[1:] if name == 'SEL' else expr.args
+            result = None
+            for arg in args:
+                result = _common_type(result, self.operand_type(arg.value))
+            return result
+        return None
+
+    def is_real(self, expr) -> bool:
+        return any(isinstance(node, Literal) and isinstance(node.value, float) or
+                   isinstance(node, Name) and node.name.lower() in self.real for node in walk(expr))
+
+    def arithmetic(self, expr: BinaryOp, env) -> Interval:
+        if expr.op not in ('+', '-', '*', '/', 'MOD'):
+            return TOP
+        left, right = self.evaluate(expr.left, env), self.evaluate(expr.right, env)
+        real = self.is_real(expr)
+        if expr.op == '+':
+            return _outward(left.low + right.low, left.high + right.high, real)
+        if expr.op == '-':
+            return _outward(left.low - right.high, left.high - right.low, real)
+        if math.inf in (abs(left.low), abs(left.high), abs(right.low), abs(right.high)):
+            return TOP
+        if expr.op == '*':
+            corners = [a * b for a in (left.low, left.high) for b in (right.low, right.high)]
+            return _outward(min(corners), max(corners), real)
+        if right.low <= 0 <= right.high:
+            return TOP
+        if expr.op == '/':
+            if real:
+                corners = [a / b for a in (left.low, left.high) for b in (right.low, right.high)]
+                return _outward(min(corners), max(corners), real)
+            # integer division truncates towards zero, which is monotone in both operands
+            corners = [int(a / b) for a in (left.low, left.high) for b in (right.low, right.high)]
+            return Interval(min(corners), max(corners))
+        if real:
+            return TOP
+        bound = max(abs(right.low), abs(right.high)) - 1
+        if left.low >= 0:
+            return Interval(0, min(left.high, bound))
+        if left.high <= 0:
+            return Interval(max(left.low, -bound), 0)
+        return Interval(-bound, bound)
+
+    @staticmethod
+    def function(name: str, args: List[Interval]) -> Interval:
+        if '_TO_' in name and len(args) == 1:
+            target = type_interval(name.split('_TO_', 1)[1])
+            value = args[0]
+            if target is None:
+                return TOP
+            if name.split('_TO_', 1)[1] not in REAL_TYPES:
+                # REAL_TO_INT rounds to the nearest integer
+                value = Interval(math.floor(value.low), math.ceil(value.high)) \
+                    if math.isfinite(value.low) and math.isfinite(value.high) else TOP
+            return value if value.within(target) else target
+        if name == 'ABS' and len(args) == 1:
+            value = args[0]
+            if value.low >= 0:
+                return value
+            if value.high <= 0:
+                return Interval(-value.high, -value.low)
+            return Interval(0, max(-value.low, value.high))
+        if name in ('MIN', 'MAX') and len(args) >= 2:
+            pick = min if name == 'MIN' else max
+            return Interval(pick(arg.low for arg in args), pick(arg.high for arg in args))
+        if name == 'LIMIT' and len(args) == 3:
+            low, value, high = args
+            # LIMIT(MN, IN, MX) = MIN(MAX(IN, MN), MX), also when MX < MN
+            return Interval(min(max(low.low, value.low), high.low), min(max(low.high, value.high), high.high))
+        if name == 'SEL' and len(args) == 3:
+            return args[1].join(args[2])
+        return TOP
+
+    # --- conditions ---
+
+    def refine(self, condition, env, positive=True) -> Optional[dict]:
+        """条件成立（positive）/ 不成立时的状态；不可能满足时返回 None"""
+        if env is None:
+            return None
+        if isinstance(condition, UnaryOp) and condition.op == 'NOT':
+            return self.refine(condition.operand, env, not positive)
+        if isinstance(condition, BinaryOp) and condition.op in ('AND', 'OR'):
+            conjunction = (condition.op == 'AND') == positive
+            if conjunction:
+                return self.refine(condition.right, self.refine(condition.left, env, positive), positive)
+            return _join_states(self.refine(condition.left, env, positive),
+                                self.refine(condition.right, env, positive))
+        if isinstance(condition, BinaryOp) and condition.op in ('=', '<>', '<', '>', '<=', '>='):
+            op = condition.op if positive else {'=': '<>', '<>': '=', '<': '>=', '>=': '<', '>': '<=',
+                                                '<=': '>'}[condition.op]
+            env = self.restrict(condition.left, op, condition.right, env)
+            mirrored = {'<': '>', '>': '<', '<=': '>=', '>=': '<='}.get(op, op)
+            return self.restrict(condition.right, mirrored, condition.left, env)
+        return env
+
+    def restrict(self, target, op, other, env) -> Optional[dict]:
+        """target op other 成立时收窄 target 的区间"""
+        if env is None or not isinstance(target, Name):
+            return env
+        name = target.name.lower()
+        if name not in self.types or name in self.constants:
+            return env
+        current = self.evaluate(target, env)
+        bound = self.evaluate(other, env)
+        step = 0 if name in self.real else 1
+        if op == '=':
+            limit = bound
+        elif op == '<':
+            limit = Interval(-math.inf, bound.high - step)
+        elif op == '<=':
+            limit = Interval(-math.inf, bound.high)
+        elif op == '>':
+            limit = Interval(bound.low + step, math.inf)
+        elif op == '>=':
+            limit = Interval(bound.low, math.inf)
+        else:
+            # x <> c only removes c when it is an end point of an integer range
+            if bound.is_point and not step == 0 and current.is_point and current.low == bound.low:
+                return None
+            return env
+        refined = current.meet(limit)
+        if refined is None:
+            return None
+        env = dict(env)
+        env[name] = refined
+        return env
+
+    # --- statements ---
+
+    def assign(self, name: str, value: Interval, env):
+        bounds = self.types[name]
+        if not value.within(bounds):
+            # overflow wraps around (or REAL leaves the finite range): any value of the type
+            value = bounds
+        env[name] = value
+        self.seen[name] = value.join(self.seen.get(name))
+
+    def clobber(self, name: Optional[str], env):
+        if name in self.types and name not in self.constants:
+            self.assign(name, self.types[name], env)
+
+    def execute(self, statements, env) -> Optional[dict]:
+        for statement in statements:
+            if env is None:
+                return None
+            env = self.statement(statement, env)
+        return env
+
+    def statement(self, statement, env) -> Optional[dict]:
+        if isinstance(statement, Assignment):
+            env = dict(env)
+            self.calls(statement.value, env)
+            if isinstance(statement.target, Name) and statement.target.name.lower() in self.types:
+                self.assign(statement.target.name.lower(), self.evaluate(statement.value, env), env)
+            else:
+                # bit / element / member writes
+                self.clobber(root_name(statement.target), env)
+            return env
+        if isinstance(statement, CallStatement):
+            env = dict(env)
+            self.calls(statement.call, env)
+            return env
+        if isinstance(statement, IfStatement):
+            result, remaining = None, env
+            for condition, body in statement.branches:
+                result = _join_states(result, self.execute(body, self.refine(condition, remaining)))
+                remaining = self.refine(condition, remaining, positive=False)
+            return _join_states(result, self.execute(statement.else_body or [], remaining))
+        if isinstance(statement, CaseStatement):
+            return self.case(statement, env)
+        if isinstance(statement, ForStatement):
+            return self.for_loop(statement, env)
+        if isinstance(statement, WhileStatement):
+            return self.loop(statement.body, env, statement.condition, test_first=True)
+        if isinstance(statement, RepeatStatement):
+            return self.loop(statement.body, env, statement.condition, test_first=False)
+        if isinstance(statement, (ExitStatement, ContinueStatement)):
+            if self._loop_exits:
+                # CONTINUE goes back to the loop head, which is joined with every iteration anyway
+                self._loop_exits[-1].append(env)
+            return None
+        if isinstance(statement, ReturnStatement):
+            self._returns.append(env)
+            return None
+        return env
+
+    def calls(self, node, env):
+        """调用可能经 VAR_IN_OUT / 输出参数修改传入的变量"""
+        for call in (child for child in walk(node) if isinstance(child, Call)):
+            pure = self.pure_call(call)
+            for argument in call.args:
+                if argument.output or not pure:
+                    self.clobber(root_name(argument.value), env)
+
+    def pure_call(self, call: Call) -> bool:
+        """调用不会修改非输出参数（标准函数 / 没有 VAR_IN_OUT 的标准 FB）"""
+        callee = call.func.name.upper() if isinstance(call.func, Name) else None
+        return bool(callee) and ('_TO_' in callee or callee in PURE_CALLS or self.instance_type(callee) in PURE_CALLS)
+
+    def instance_type(self, name: Optional[str]) -> Optional[str]:
+        if name is None:
+            return None
+        for decl in self.pou.declarations():
+            if any(st_name.upper() == name for st_name in decl.names) and isinstance(decl.type, NamedType):
+                return decl.type.name.upper()
+        return None
+
+    def case(self, statement: CaseStatement, env) -> Optional[dict]:
+        result = None
+        for branch in statement.branches:
+            branch_env = None
+            for label in branch.labels:
+                if isinstance(label, CaseRange):
+                    refined = self.restrict(statement.selector, '>=', label.low, env)
+                    refined = self.restrict(statement.selector, '<=', label.high, refined)
+                else:
+                    refined = self.restrict(statement.selector, '=', label, env)
+                branch_env = _join_states(branch_env, refined)
+            result = _join_states(result, self.execute(branch.body, branch_env))
+        return _join_states(result, self.execute(statement.else_body or [], env))
+
+    def for_loop(self, statement: ForStatement, env) -> Optional[dict]:
+        name = statement.variable.lower()
+        start, end = self.evaluate(statement.start, env), self.evaluate(statement.end, env)
+        step = self.evaluate(statement.step, env) if statement.step is not None else Interval(1, 1)
+        if name not in self.types:
+            return self.loop(statement.body, env, None, test_first=True)
+        span = start.join(end)
+        env = dict(env)
+        self.assign(name, span, env)
+        after = self.loop(statement.body, env, None, test_first=True, pinned={name: span})
+        if after is not None:
+            # the loop ends with the variable one step past the end value
+            self.assign(name, span.join(Interval(span.low + min(step.low, 0), span.high + max(step.high, 0))),
+                        after)
+        return after
+
+    def loop(self, body, env, condition, test_first, pinned=None) -> Optional[dict]:
+        """循环体不动点（带加宽）；condition 为 WHILE 的继续条件 / REPEAT 的结束条件"""
+        self._loop_exits.append([])
+        head = env
+        try:
+            for iteration in range(MAX_ITERATIONS):
+                entry = head
+                if condition is not None and test_first:
+                    entry = self.refine(condition, head)
+                if entry is not None and pinned:
+                    entry = dict(entry)
+                    for name, value in pinned.items():
+                        entry[name] = entry[name].meet(value) or value
+                end = self.execute(body, entry)
+                if condition is not None and not test_first:
+                    end = self.refine(condition, end, positive=False)
+                joined = _join_states(head, end)
+                if iteration >= WIDENING_DELAY:
+                    joined = self.widen(head, joined)
+                if joined == head:
+                    break
+                head = joined
+            else:
+                head = {name: self.types[name] for name in head}
+        finally:
+            exits = self._loop_exits.pop()
+        if condition is None:
+            after = head
+        elif test_first:
+            after = self.refine(condition, head, positive=False)
+        else:
+            after = self.refine(condition, self.execute(body, head))
+        for state in exits:
+            after = _join_states(after, state)
+        return after
+
+    def widen(self, old: dict, new: dict) -> dict:
+        """变化的边界跳到下一个阈值（程序 / 属性常量），没有阈值时跳到类型边界"""
+        widened = {}
+        for name, value in new.items():
+            previous = old.get(name)
+            if previous is None or value == previous:
+                widened[name] = value
+                continue
+            bounds = self.types[name]
+            low, high = value.low, value.high
+            if low < previous.low:
+                low = max([t for t in self.thresholds if t <= low and t >= bounds.low], default=bounds.low)
+            if high > previous.high:
+                high = min([t for t in self.thresholds if t >= high and t <= bounds.high], default=bounds.high)
+            widened[name] = Interval(low, high)
+        return widened
+
+    # --- cycle ---
+
+    def run(self) -> Dict[str, Interval]:
+        """PLC 周期的不动点：周期开始时状态变量的取值范围 ∪ 周期内赋过的所有值"""
+        state = dict(self.state)
+        for iteration in range(MAX_ITERATIONS):
+            entry = dict(state)
+            entry.update(self.temps)
+            entry.update({name: self.types[name] for name in self.inputs})
+            self._returns = []
+            end = self.execute(self.pou.body, entry)
+            for returned in self._returns:
+                end = _join_states(end, returned)
+            next_state = dict(state)
+            if end is not None:
+                next_state = {name: value.join(end.get(name)) for name, value in state.items()}
+            if iteration >= WIDENING_DELAY:
+                next_state = self.widen(state, next_state)
+            if next_state == state:
+                break
+            state = next_state
+        else:
+            state = {name: self.types[name] for name in state}
+        ranges = {}
+        for name, value in state.items():
+            value = value.join(self.seen.get(name))
+            if not (value.low <= self.types[name].low and value.high >= self.types[name].high):
+                ranges[name] = value
+        return ranges
+
+
+def _join_states(left: Optional[dict], right: Optional[dict]) -> Optional[dict]:
+    if left is None:
+        return right
+    if right is None:
+        return left
+    return {name: value.join(right.get(name)) for name, value in left.items()}
+
+
+def _find_pou(unit, entry_point: Optional[str]):
+    if entry_point:
+        pou = unit.find_pou(entry_point)
+        if pou is None:
+            raise RangeAnalysisError(f"entry point {entry_point} not found")
+        return pou
+    candidates = [pou for pou in unit.pous if pou.kind != 'FUNCTION']
+    if len(candidates) != 1:
+        raise RangeAnalysisError("entry point is ambiguous")
+    return candidates[0]
+
+
+def pou_ranges(unit, pou, thresholds: Iterable[float] = ()) -> Dict[str, Interval]:
+    """已解析程序里 pou 的变量范围（见 infer_ranges）"""
+    return _RangeAnalysis(unit, pou, thresholds).run()
+
+
+def bound_text(value: float, upper: bool, real: bool) -> str:
+    """区间端点写进模型时的常量：整数取整，REAL 向外取到千分位"""
+    if not real:
+        return str(math.floor(value) if upper else math.ceil(value))
+    rounded = (math.ceil(value * 1000) if upper else math.floor(value * 1000)) / 1000
+    return f"{rounded:.3f}"
+
+
+def infer_ranges(source: str, entry_point: str = None, thresholds: Iterable[float] = ()) -> Dict[str, Interval]:
+    """
+    被验证 POU 的状态变量（VAR / VAR_OUTPUT，整数和 REAL）在所有可达状态下的取值范围
+
+    Args:
+        source: ST 源码
+        entry_point: 被验证的 POU，缺省时取唯一的 PROGRAM / FUNCTION_BLOCK
+        thresholds: 加宽阈值，一般是属性里的常量（property_constants）
+
+    Returns:
+        Dict[str, Interval]: 小写变量名 -> 区间，只包含比类型范围更窄的变量
+
+    Raises:
+        RangeAnalysisError
+    """
+    try:
+        unit = parse_st_cached(source)
+    except STSyntaxError as e:
+        raise RangeAnalysisError(f"cannot parse ST: {e}")
+    return pou_ranges(unit, _find_pou(unit, entry_point), thresholds)
+
+
+if __name__ == "__main__":
+    ranges = infer_ranges("""
+FUNCTION_BLOCK Tank
+VAR_INPUT
+    Pressure_LOW : INT;
+    fill : BOOL;
+END_VAR
+VAR_OUTPUT
+    level : INT := 0;
+    stage : INT;
+    ratio : REAL;
+    limited : INT;
+END_VAR
+VAR
+    i : INT;
+    total : DINT;
+    cap : INT;
+END_VAR
+    IF fill AND level < 100 THEN
+        level := level + 1;
+    ELSIF level > 0 THEN
+        level := level - 1;
+    END_IF;
+    CASE stage OF
+        0: IF Pressure_LOW >= 36 THEN stage := 1; END_IF;
+        1..3: stage := stage + 1;
+    ELSE
+        stage := 0;
+    END_CASE;
+    total := 0;
+    FOR i := 1 TO 10 DO
+        total := total + i;
+    END_FOR;
+    ratio := INT_TO_REAL(level) / 100.0;
+    cap := stage * 10;
+    limited := LIMIT(5, level, cap);    // variable upper limit: cap = 0 gives 0, so limited starts at 0, not 5
+END_FUNCTION_BLOCK
+""", thresholds=property_constants(["instance.level <= 100"]))
+    for name, interval in ranges.items():
+        print(name, interval)
@@ -0,0 +1,343 @@
+## Cone-of-influence slicing of ST programs before verification.
+## A property only depends on the variables it references and, transitively, on every variable
+## read by a statement that assigns one of them or decides whether such a statement runs. The
+## slicer computes that set on the AST of the verified POU (flow-insensitive: a PLC program runs
+## in a loop, so every assignment of a relevant variable may reach the property), and removes the
+## other statements and variable declarations from the source text. Everything it cannot reason
+## about (other POUs, types, comments) is kept, so the sliced program has the same verdict.
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional, Set
+# Resolve the parent directory as an absolute path
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+
+from src.st_ast import (STSyntaxError, Name, Member, Index, Deref, Call, Assignment, CallStatement,
+                        IfStatement, CaseStatement, CaseRange, ForStatement, WhileStatement, RepeatStatement,
+                        ExitStatement, ContinueStatement, ReturnStatement, parse_st_cached, parse_expression, walk)
+
+# plcverif names the instance of the verified POU `instance` in requirements
+INSTANCE_NAME = "instance"
+# plcverif reads assertions from //#ASSERT comments, which may reference sliced-away variables
+_ASSERTION_ANNOTATION_RE = re.compile(r'#ASSERT', re.IGNORECASE)
+_LOOPS = (ForStatement, WhileStatement, RepeatStatement)
+# rest of a line that only holds a comment on the removed statement / declaration
+_LINE_COMMENT_RE = re.compile(r'\s*(\(\*((?!\*\)).)*\*\)|//.*)?\s*')
+
+
+class SliceError(Exception):
+    """The program or the property is outside what the slicer can handle; verify the whole program."""
+
+
+@dataclass
+class SliceResult:
+    source: str                 # sliced ST source
+    statements_total: int
+    statements_kept: int
+    variables_total: int
+    variables_kept: int
+    relevant: Set[str]          # lower-case names in the cone of influence
+
+    @property
+    def ratio(self) -> float:
+        """保留的语句比例（1.0 表示没有切掉任何语句）"""
+        return self.statements_kept / self.statements_total if self.statements_total else 1.0
+
+    @property
+    def reduced(self) -> bool:
+        return self.statements_kept < self.statements_total or self.variables_kept < self.variables_total
+
+    def summary(self) -> str:
+        return (f"kept {self.statements_kept}/{self.statements_total} statements, "
+                f"{self.variables_kept}/{self.variables_total} variables (slice ratio {self.ratio:.2f})")
+
+
+def root_name(expr) -> Optional[str]:
+    """被访问变量的根名字：a.b[i].c -> a"""
+    while isinstance(expr, (Member, Index, Deref)):
+        expr = expr.base
+    return expr.name.lower() if isinstance(expr, Name) else None
+
+
+def names_in(node) -> Set[str]:
+    """node 里出现的全部名字（小写），成员访问只记根名字"""
+    names = set()
+    for child in walk(node):
+        if isinstance(child, Name):
+            names.add(child.name.lower())
+    return names
+
+
+def property_variables(expressions: Iterable[str]) -> Set[str]:
+    """
+    Variables of the verified POU referenced by property expressions: `instance.x.y` -> x
+    (names without the instance prefix are taken as they are).
+    """
+    variables = set()
+    for expression in expressions:
+        try:
+            expr = parse_expression(expression)
+        except STSyntaxError as e:
+            raise SliceError(f"cannot parse property expression '{expression}': {e}")
+        inner = set()       # ids of nodes that are the base of a member access
+        for node in walk(expr):
+            if isinstance(node, Member):
+                inner.add(id(node.base))
+            if not isinstance(node, (Name, Member)) or id(node) in inner:
+                continue
+            path = []
+            while isinstance(node, Member):
+                path.append(node.member)
+                node = node.base
+            if not isinstance(node, Name):
+                continue
+            path.append(node.name)
+            path.reverse()
+            if path[0].lower() == INSTANCE_NAME and len(path) > 1:
+                variables.add(path[1].lower())
+            elif len(path) == 1 or path[0].lower() != INSTANCE_NAME:
+                variables.add(path[0].lower())
+    return variables
+
+
+class _ConeOfInfluence:
+    """Fixpoint of the relevant variable set and the statements that must be kept for it."""
+
+    def __init__(self, pou, seeds: Set[str]):
+        self.pou = pou
+        self.relevant = set(seeds)
+        self.kept = set()          # id() of the statements to keep
+        # (position, written variables) of every simple statement, in source order
+        self.writers = [((node.span.line, node.span.col), self.writes(node)) for node in walk(pou)
+                        if isinstance(node, (Assignment, CallStatement))]
+
+    def compute(self):
+        while True:
+            before = len(self.relevant)
+            self.kept = set()
+            self.visit(self.pou.body, loop_kept=False)
+            # initial values, array bounds and FB types of kept declarations
+            for decl in self.pou.declarations():
+                if any(name.lower() in self.relevant for name in decl.names):
+                    self.relevant |= names_in(decl)
+            if len(self.relevant) == before:
+                return self
+
+    def visit(self, statements, loop_kept: bool) -> bool:
+        """标记需要保留的语句并把它们的依赖加入 relevant；返回是否有语句被保留"""
+        any_kept = False
+        for statement in statements:
+            if self.needed(statement, loop_kept):
+                self.kept.add(id(statement))
+                any_kept = True
+        return any_kept
+
+    def needed(self, statement, loop_kept: bool) -> bool:
+        if isinstance(statement, (ExitStatement, ContinueStatement)):
+            return loop_kept
+        if isinstance(statement, ReturnStatement):
+            # ends the cycle: matters when a relevant variable is written after it
+            position = (statement.span.line, statement.span.col)
+            return any(written & self.relevant for start, written in self.writers if start > position)
+        if isinstance(statement, (Assignment, CallStatement)):
+            if not self.writes(statement) & self.relevant:
+                return False
+            self.relevant |= names_in(statement)
+            return True
+
+        if isinstance(statement, IfStatement):
+            bodies = [body for _, body in statement.branches] + [statement.else_body or []]
+            conditions = [condition for condition, _ in statement.branches]
+        elif isinstance(statement, CaseStatement):
+            bodies = [branch.body for branch in statement.branches] + [statement.else_body or []]
+            conditions = [statement.selector] + [label for branch in statement.branches for label in branch.labels]
+        elif isinstance(statement, _LOOPS):
+            # EXIT / CONTINUE only matter when the loop itself is kept
+            if not self.visit(statement.body, loop_kept=False):
+                return False
+            self.visit(statement.body, loop_kept=True)
+            self.relevant |= self.loop_control(statement)
+            return True
+        else:
+            raise SliceError(f"unsupported statement {type(statement).__name__}")
+
+        kept = [self.visit(body, loop_kept) for body in bodies]
+        if not any(kept):
+            return False
+        for condition in conditions:
+            self.relevant |= names_in(condition) if not isinstance(condition, CaseRange) else \
+                names_in(condition.low) | names_in(condition.high)
+        return True
+
+    @staticmethod
+    def loop_control(statement) -> Set[str]:
+        if isinstance(statement, ForStatement):
+            names = {statement.variable.lower()} | names_in(statement.start) | names_in(statement.end)
+            return names | (names_in(statement.step) if statement.step is not None else set())
+        return names_in(statement.condition)
+
+    @staticmethod
+    def writes(statement) -> Set[str]:
+        """
+        Variables a simple statement may modify: the assignment target, the called FB instance and,
+        conservatively, every variable passed to a call (VAR_IN_OUT / output parameters).
+        """
+        written = set()
+        if isinstance(statement, Assignment):
+            written.add(root_name(statement.target))
+        for node in walk(statement):
+            if isinstance(node, Call):
+                written.add(root_name(node.func))
+                for argument in node.args:
+                    written.add(root_name(argument.value))
+        written.discard(None)
+        return written
+
+
+class _SourceEditor:
+    """Removes AST node spans (1-based line / column, end exclusive) from the source text."""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.line_starts = [0] + [m.end() for m in re.finditer('\n', source)]
+        self.ranges = []
+
+    def offset(self, line, col):
+        return self.line_starts[line - 1] + col - 1
+
+    def remove(self, span, trailing_semicolon=False):
+        start, end = self.offset(span.line, span.col), self.offset(span.end_line, span.end_col)
+        text = self.source
+        if trailing_semicolon:
+            # `END_IF;` -- the parser does not include the optional `;` in the statement span
+            probe = end
+            while probe < len(text) and text[probe] in ' \t':
+                probe += 1
+            if probe < len(text) and text[probe] == ';':
+                end = probe + 1
+        # drop whole lines (with their end-of-line comment) when nothing else is on them
+        line_start = text.rfind('\n', 0, start) + 1
+        line_end = text.find('\n', end)
+        line_end = len(text) if line_end < 0 else line_end
+        if not text[line_start:start].strip() and _LINE_COMMENT_RE.fullmatch(text[end:line_end]):
+            start, end = line_start, min(line_end + 1, len(text))
+        self.ranges.append((start, end))
+
+    def render(self) -> str:
+        pieces, position = [], 0
+        for start, end in sorted(self.ranges):
+            if start < position:
+                continue
+            pieces.append(self.source[position:start])
+            position = end
+        pieces.append(self.source[position:])
+        return "".join(pieces)
+
+
+def _find_pou(unit, entry_point: Optional[str]):
+    if entry_point:
+        pou = unit.find_pou(entry_point)
+        if pou is None:
+            raise SliceError(f"entry point {entry_point} not found")
+        return pou
+    candidates = [pou for pou in unit.pous if pou.kind != 'FUNCTION']
+    if len(candidates) != 1:
+        raise SliceError("entry point is ambiguous")
+    return candidates[0]
+
+
+def _count_statements(statements) -> int:
+    return sum(1 for statement in statements for node in walk(statement)
+               if isinstance(node, (Assignment, CallStatement, IfStatement, CaseStatement, ForStatement,
+                                    WhileStatement, RepeatStatement, ExitStatement, ContinueStatement,
+                                    ReturnStatement)))
+
+
+def slice_source(source: str, property_expressions: Iterable[str], entry_point: str = None) -> SliceResult:
+    """
+    对 source 中被验证的 POU 做影响锥切片
+
+    Args:
+        source: ST 源码
+        property_expressions: 属性里的 ST 表达式（pattern_params 的值，instance.x 形式）
+        entry_point: 被验证的 POU（plcverif 的 -lf.entry），为空时取唯一的 PROGRAM / FUNCTION_BLOCK
+
+    Raises:
+        SliceError: 无法安全切片（解析失败、带断言注释、属性引用了 POU 之外的变量...）
+    """
+    if _ASSERTION_ANNOTATION_RE.search(source):
+        raise SliceError("program has assertion annotations")
+    try:
+        unit = parse_st_cached(source)
+    except STSyntaxError as e:
+        raise SliceError(f"cannot parse program: {e}")
+    pou = _find_pou(unit, entry_point)
+
+    declared = {name.lower() for decl in pou.declarations() for name in decl.names}
+    seeds = property_variables(property_expressions)
+    if not seeds:
+        raise SliceError("property references no variables")
+    unknown = seeds - declared
+    if unknown:
+        raise SliceError(f"property references undeclared variables: {', '.join(sorted(unknown))}")
+
+    cone = _ConeOfInfluence(pou, seeds).compute()
+    editor = _SourceEditor(source)
+
+    def prune(statements) -> int:
+        kept = 0
+        for statement in statements:
+            if id(statement) not in cone.kept:
+                editor.remove(statement.span, trailing_semicolon=True)
+                continue
+            kept += 1
+            if isinstance(statement, IfStatement):
+                for _, body in statement.branches:
+                    kept += prune(body)
+                kept += prune(statement.else_body or [])
+            elif isinstance(statement, CaseStatement):
+                for branch in statement.branches:
+                    kept += prune(branch.body)
+                kept += prune(statement.else_body or [])
+            elif isinstance(statement, _LOOPS):
+                kept += prune(statement.body)
+        return kept
+
+    statements_kept = prune(pou.body)
+
+    variables_total = variables_kept = 0
+    for block in pou.var_blocks:
+        kept_decls = [decl for decl in block.decls if any(name.lower() in cone.relevant for name in decl.names)]
+        variables_total += sum(len(decl.names) for decl in block.decls)
+        variables_kept += sum(len(decl.names) for decl in kept_decls)
+        if not kept_decls and block.decls:
+            editor.remove(block.span)
+            continue
+        for decl in block.decls:
+            if decl not in kept_decls:
+                editor.remove(decl.span)
+
+    return SliceResult(source=editor.render(), statements_total=_count_statements(pou.body),
+                       statements_kept=statements_kept, variables_total=variables_total,
+                       variables_kept=variables_kept, relevant=cone.relevant)
+
+
+def slice_file(st_file: str, property_expressions: Iterable[str], output_file: str,
+               entry_point: str = None) -> SliceResult:
+    """切片 st_file 写到 output_file（即使没有切掉任何东西）"""
+    with open(st_file, 'r', encoding='utf-8', errors='replace') as f:
+        result = slice_source(f.read(), property_expressions, entry_point)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(result.source)
+    return result
+
+
+if __name__ == "__main__":
+    st_file = sys.argv[1] if len(sys.argv) > 1 else str(parent_dir / "elevator" / "evevator_st.st")
+    expressions = sys.argv[2:] or ["instance.MotorUp AND instance.MotorDown"]
+    with open(st_file, 'r', encoding='utf-8') as f:
+        result = slice_source(f.read(), expressions)
+    print(result.source)
+    print(f"-- {result.summary()}")
@@ -0,0 +1,824 @@
+## Deterministic ST -> nuXmv translation for the direct SMV evaluation (evaluate/smv_evaluation.py).
+## One PLC cycle is one transition: the model alternates between a PLC_START state (inputs of the
+## cycle chosen, state variables hold the values of the previous cycle) and a PLC_END state (all
+## variables hold the values computed by the cycle), which is the encoding the pattern templates of
+## src/tools.py expect. The cycle body is executed symbolically: every assignment becomes a DEFINE
+## over the start-state values and IF / CASE merge their branches with case expressions, so the
+## model grows linearly with the program. Supported: one PROGRAM / FUNCTION_BLOCK with BOOL,
+## integer, REAL, TIME and enumeration variables, IF / CASE / FOR with constant bounds, standard
+## conversion and selection functions and TON / TOF / TP / R_TRIG / F_TRIG instances (a cycle lasts
+## smv_cycle_time_ms). Anything else raises SmvTranslationError so that callers can fall back.
+import re
+import sys
+import math
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+# Resolve the parent directory as an absolute path
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+
+import config
+from src.smv_model import SmvTranslationError
+from src.st_ranges import pou_ranges, property_constants, bound_text
+from src.st_ast import (STSyntaxError, NamedType, EnumType, Literal, EnumLiteral, Name, Member, Call, UnaryOp,
+                        BinaryOp, Assignment, CallStatement, IfStatement, CaseStatement, CaseRange, ForStatement,
+                        parse_st_cached, parse_expression, walk)
+
+CYCLE_TIME_MS = getattr(config, 'smv_cycle_time_ms', 100)
+# value ranges of the numeric state variables (src/st_ranges.py) are added as INVAR constraints
+RANGE_NARROWING = getattr(config, 'range_narrowing', True)
+# FOR loops are unrolled; longer loops are not translated
+MAX_UNROLL = 256
+
+BOOLEAN = 'boolean'
+REAL = 'real'
+INT_LITERAL = 'int'          # integer literal whose type is decided by the other operand / the target
+
+# ST type -> nuXmv type; words give bit-precise wrap-around arithmetic
+_ST_TYPES = {
+    'BOOL': BOOLEAN,
+    'SINT': 'signed word[8]', 'INT': 'signed word[16]', 'DINT': 'signed word[32]', 'LINT': 'signed word[64]',
+    'USINT': 'unsigned word[8]', 'UINT': 'unsigned word[16]', 'UDINT': 'unsigned word[32]',
+    'ULINT': 'unsigned word[64]', 'BYTE': 'unsigned word[8]', 'WORD': 'unsigned word[16]',
+    'DWORD': 'unsigned word[32]', 'LWORD': 'unsigned word[64]',
+    'REAL': REAL, 'LREAL': REAL,
+    'TIME': 'signed word[32]',       # milliseconds
+}
+_WORD_RE = re.compile(r'^(signed|unsigned) word\[(\d+)\]$')
+
+_LOGICAL_OPS = {'AND': '&', 'OR': '|', 'XOR': 'xor'}
+_COMPARISON_OPS = {'=': '=', '<>': '!=', '<': '<', '>': '>', '<=': '<=', '>=': '>='}
+_ARITHMETIC_OPS = {'+': '+', '-': '-', '*': '*', '/': '/', 'MOD': 'mod'}
+
+# timer / edge detection FBs: state members and the members a program may read
+TIMER_TYPES = {'TON', 'TOF', 'TP'}
+TRIGGER_TYPES = {'R_TRIG', 'F_TRIG'}
+_FB_MEMBERS = {
+    'TON': {'Q': BOOLEAN, 'IN': BOOLEAN}, 'TOF': {'Q': BOOLEAN, 'IN': BOOLEAN}, 'TP': {'Q': BOOLEAN, 'IN': BOOLEAN},
+    'R_TRIG': {'Q': BOOLEAN, 'CLK': BOOLEAN}, 'F_TRIG': {'Q': BOOLEAN, 'CLK': BOOLEAN},
+}
+
+# nuXmv keywords that cannot be used as identifiers
+_SMV_RESERVED = {
+    'MODULE', 'DEFINE', 'CONSTANTS', 'VAR', 'IVAR', 'FROZENVAR', 'INIT', 'TRANS', 'INVAR', 'SPEC', 'CTLSPEC',
+    'LTLSPEC', 'PSLSPEC', 'COMPUTE', 'NAME', 'INVARSPEC', 'FAIRNESS', 'JUSTICE', 'COMPASSION', 'ISA', 'ASSIGN',
+    'CONSTRAINT', 'SIMPWFF', 'CTLWFF', 'LTLWFF', 'PSLWFF', 'COMPWFF', 'IN', 'MIN', 'MAX', 'MIRROR', 'PRED',
+    'PREDICATES', 'process', 'array', 'of', 'boolean', 'integer', 'real', 'word', 'word1', 'bool', 'signed',
+    'unsigned', 'extend', 'resize', 'sizeof', 'uwconst', 'swconst', 'EX', 'AX', 'EF', 'AF', 'EG', 'AG', 'E',
+    'F', 'O', 'G', 'H', 'X', 'Y', 'Z', 'A', 'U', 'S', 'V', 'T', 'BU', 'EBF', 'ABF', 'EBG', 'ABG', 'case',
+    'esac', 'mod', 'next', 'init', 'union', 'in', 'xor', 'xnor', 'self', 'TRUE', 'FALSE', 'count', 'abs',
+    'max', 'min', 'floor', 'toint', 'PLC_START', 'PLC_END',
+}
+
+
+@dataclass
+class SmvProgram:
+    """Result of translate_st: the nuXmv model plus what is needed to translate properties over it."""
+    text: str
+    pou_name: str
+    var_types: Dict[str, str]               # smv name -> nuXmv type of the state / input variables
+    names: Dict[str, str]                   # lower-case ST access path (x, t.q) -> smv name
+    enum_values: Dict[str, str] = field(default_factory=dict)   # lower-case value -> enum type name
+    infinite: bool = False                  # uses reals: only SMT-based nuXmv engines apply
+
+    def translate_expression(self, expression: str) -> str:
+        """
+        属性里的 ST 表达式（instance.x 形式）-> 模型上的 nuXmv 表达式（状态变量的当前值）
+
+        Raises:
+            SmvTranslationError
+        """
+        try:
+            expr = parse_expression(expression.strip().strip('"'))
+        except STSyntaxError as e:
+            raise SmvTranslationError(f"cannot parse '{expression}': {e}")
+        renderer = _Renderer(self, {}, instance_prefix=True)
+        text, smv_type = renderer.expr(expr)
+        if smv_type != BOOLEAN:
+            raise SmvTranslationError(f"'{expression}' is not a boolean expression")
+        return text
+
+
+def smv_identifier(name: str) -> str:
+    identifier = re.sub(r'[^A-Za-z0-9_$#-]', '_', name)
+    if identifier in _SMV_RESERVED or identifier.upper() in _SMV_RESERVED:
+        identifier += '_'
+    return identifier
+
+
+def access_path(expr) -> str:
+    """Name / Member 链 -> 小写访问路径（a.b.c）"""
+    parts = []
+    while isinstance(expr, Member):
+        parts.append(expr.member)
+        expr = expr.base
+    if not isinstance(expr, Name):
+        raise SmvTranslationError("unsupported variable access")
+    parts.append(expr.name)
+    return ".".join(reversed(parts)).lower()
+
+
+def word_type(smv_type: Optional[str]) -> Optional[Tuple[bool, int]]:
+    """(signed, width) of a word type, None for other types"""
+    match = _WORD_RE.match(smv_type or "")
+    return (match.group(1) == 'signed', int(match.group(2))) if match else None
+
+
+def word_literal(value: int, smv_type: str) -> str:
+    signed, width = word_type(smv_type)
+    low, high = (-(1 << (width - 1)), (1 << (width - 1)) - 1) if signed else (0, (1 << width) - 1)
+    if not low <= value <= high:
+        raise SmvTranslationError(f"constant {value} does not fit into {smv_type}")
+    sign = "-" if value < 0 else ""
+    return f"{sign}0{'s' if signed else 'u'}d{width}_{abs(value)}"
+
+
+def word_range(smv_type: str) -> Tuple[int, int]:
+    signed, width = word_type(smv_type)
+    return (-(1 << (width - 1)), (1 << (width - 1)) - 1) if signed else (0, (1 << width) - 1)
+
+
+class _Renderer:
+    """Renders ST expressions over a symbolic environment (lower-case access path -> nuXmv expression)."""
+
+    def __init__(self, program: SmvProgram, env: Dict[str, str], instance_prefix: bool = False):
+        self.program = program
+        self.env = env
+        self.instance_prefix = instance_prefix   # property expressions name variables instance.x
+
+    # --- variables ---
+
+    def path(self, expr) -> str:
+        path = access_path(expr)
+        if self.instance_prefix and path.startswith('instance.'):
+            path = path[len('instance.'):]
+        return path
+
+    def variable(self, expr) -> Tuple[str, str]:
+        path = self.path(expr)
+        name = self.program.names.get(path)
+        if name is None:
+            if path in self.program.enum_values:
+                return smv_identifier(expr.name if isinstance(expr, Name) else path), \
+                    f"enum:{self.program.enum_values[path]}"
+            raise SmvTranslationError(f"unknown variable {path}")
+        return self.env.get(path, name), self.program.var_types[name]
+
+    # --- expressions ---
+
+    def expr(self, expr, expected: str = None) -> Tuple[str, str]:
+        """(nuXmv 表达式, 类型)；无类型的整数字面量类型为 INT_LITERAL"""
+        if isinstance(expr, Literal):
+            return self.literal(expr, expected)
+        if isinstance(expr, EnumLiteral):
+            return smv_identifier(expr.value), f"enum:{expr.type_name.lower()}"
+        if isinstance(expr, (Name, Member)):
+            return self.variable(expr)
+        if isinstance(expr, UnaryOp):
+            if expr.op == 'NOT':
+                operand, smv_type = self.expr(expr.operand, expected)
+                return f"(!{operand})", smv_type
+            operand, smv_type = self.expr(expr.operand, expected)
+            if smv_type == INT_LITERAL:
+                return str(-int(operand) if expr.op == '-' else int(operand)), INT_LITERAL
+            return (operand if expr.op == '+' else f"(-{operand})"), smv_type
+        if isinstance(expr, BinaryOp):
+            return self.binary(expr, expected)
+        if isinstance(expr, Call):
+            return self.function(expr, expected)
+        raise SmvTranslationError(f"unsupported expression {type(expr).__name__}")
+
+    def literal(self, literal: Literal, expected: str = None) -> Tuple[str, str]:
+        if literal.type_name == 'BOOL':
+            return ("TRUE" if literal.value else "FALSE"), BOOLEAN
+        if literal.type_name == 'TIME':
+            return word_literal(int(round(literal.value)), _ST_TYPES['TIME']), _ST_TYPES['TIME']
+        if isinstance(literal.value, float) or literal.type_name in ('REAL', 'LREAL'):
+            return repr(float(literal.value)), REAL
+        if isinstance(literal.value, int):
+            if expected and expected != INT_LITERAL:
+                return self.coerce(str(literal.value), INT_LITERAL, expected), expected
+            return str(literal.value), INT_LITERAL
+        raise SmvTranslationError(f"unsupported literal {literal.raw}")
+
+    def binary(self, expr: BinaryOp, expected: str = None) -> Tuple[str, str]:
+        if expr.op in _LOGICAL_OPS:
+            left, left_type = self.expr(expr.left, expected if expected != BOOLEAN else None)
+            right, right_type = self.expr(expr.right, left_type if left_type != INT_LITERAL else None)
+            common = self.common_type(left_type, right_type)
+            return (f"({self.coerce(left, left_type, common)} {_LOGICAL_OPS[expr.op]} "
+                    f"{self.coerce(right, right_type, common)})"), common
+        if expr.op in _COMPARISON_OPS:
+            left, left_type = self.expr(expr.left)
+            right, right_type = self.expr(expr.right)
+            folded = self.fold_out_of_range(expr.op, left, left_type, right, right_type)
+            if folded is not None:
+                return folded, BOOLEAN
+            common = self.common_type(left_type, right_type)
+            return (f"({self.coerce(left, left_type, common)} {_COMPARISON_OPS[expr.op]} "
+                    f"{self.coerce(right, right_type, common)})"), BOOLEAN
+        if expr.op in _ARITHMETIC_OPS:
+            left, left_type = self.expr(expr.left, expected)
+            right, right_type = self.expr(expr.right, expected)
+            if left_type == INT_LITERAL and right_type == INT_LITERAL:
+                return str(_fold(expr.op, int(left), int(right))), INT_LITERAL
+            common = self.common_type(left_type, right_type)
+            if common == BOOLEAN or common.startswith('enum:'):
+                raise SmvTranslationError(f"arithmetic on {common} values")
+            operator = '/' if expr.op == '/' else _ARITHMETIC_OPS[expr.op]
+            return (f"({self.coerce(left, left_type, common)} {operator} "
+                    f"{self.coerce(right, right_type, common)})"), common
+        raise SmvTranslationError(f"unsupported operator {expr.op}")
+
+    def fold_out_of_range(self, op, left, left_type, right, right_type) -> Optional[str]:
+        """整数常量超出另一侧 word 类型的范围时比较结果是常量（例如 INT 变量 <= 65535）"""
+        if (left_type == INT_LITERAL) == (right_type == INT_LITERAL):
+            return None
+        if left_type == INT_LITERAL:
+            mirrored = {'<': '>', '>': '<', '<=': '>=', '>=': '<='}
+            return self.fold_out_of_range(mirrored.get(op, op), right, right_type, left, left_type)
+        if not word_type(left_type):
+            return None
+        low, high = word_range(left_type)
+        value = int(right)
+        if low <= value <= high:
+            return None
+        above = value > high        # the constant is above every value of the variable
+        result = {'=': False, '<>': True, '<': above, '<=': above, '>': not above, '>=': not above}[op]
+        return "TRUE" if result else "FALSE"
+
+    def function(self, call: Call, expected: str = None) -> Tuple[str, str]:
+        if not isinstance(call.func, Name):
+            raise SmvTranslationError("unsupported call")
+        name = call.func.name.upper()
+        args = [arg.value for arg in call.args]
+        if '_TO_' in name:
+            source, target = name.split('_TO_', 1)
+            if len(args) != 1 or target not in _ST_TYPES:
+                raise SmvTranslationError(f"unsupported conversion {name}")
+            value, value_type = self.expr(args[0], _ST_TYPES.get(source))
+            target_type = _ST_TYPES[target]
+            if value_type == REAL and word_type(target_type):
+                # REAL_TO_INT rounds to the nearest integer
+                return f"{_cast_integer(f'floor({value} + 0.5)', target_type)}", target_type
+            return self.coerce(value, value_type, target_type, explicit=True), target_type
+        if name in ('ABS',) and len(args) == 1:
+            value, value_type = self.expr(args[0], expected)
+            zero = self.coerce("0", INT_LITERAL, value_type) if value_type != REAL else "0.0"
+            return f"(case {value} < {zero} : -{value}; TRUE : {value}; esac)", value_type
+        if name in ('MIN', 'MAX') and len(args) >= 2:
+            values = [self.expr(arg, expected) for arg in args]
+            common = values[0][1]
+            for _, value_type in values[1:]:
+                common = self.common_type(common, value_type)
+            texts = [self.coerce(text, value_type, common) for text, value_type in values]
+            result = texts[0]
+            operator = '<=' if name == 'MIN' else '>='
+            for text in texts[1:]:
+                result = f"(case {result} {operator} {text} : {result}; TRUE : {text}; esac)"
+            return result, common
+        if name == 'LIMIT' and len(args) == 3:
+            low, value, high = (self.expr(arg, expected) for arg in args)
+            common = self.common_type(self.common_type(low[1], value[1]), high[1])
+            low_text, value_text, high_text = (self.coerce(text, value_type, common)
+                                               for text, value_type in (low, value, high))
+            return (f"(case {value_text} < {low_text} : {low_text}; {value_text} > {high_text} : {high_text}; "
+                    f"TRUE : {value_text}; esac)"), common
+        if name == 'SEL' and len(args) == 3:
+            selector, _ = self.expr(args[0], BOOLEAN)
+            first, second = self.expr(args[1], expected), self.expr(args[2], expected)
+            common = self.common_type(first[1], second[1])
+            return (f"(case {selector} : {self.coerce(second[0], second[1], common)}; "
+                    f"TRUE : {self.coerce(first[0], first[1], common)}; esac)"), common
+        raise SmvTranslationError(f"unsupported function {name}")
+
+    # --- types ---
+
+    @staticmethod
+    def common_type(left: str, right: str) -> str:
+        if left == INT_LITERAL:
+            return right
+        if right == INT_LITERAL or left == right:
+            return left
+        if REAL in (left, right):
+            if BOOLEAN in (left, right):
+                raise SmvTranslationError("mixing BOOL and REAL")
+            return REAL
+        left_word, right_word = word_type(left), word_type(right)
+        if left_word and right_word:
+            # the wider type, signed if either is signed
+            width = max(left_word[1], right_word[1])
+            return f"{'signed' if left_word[0] or right_word[0] else 'unsigned'} word[{width}]"
+        raise SmvTranslationError(f"incompatible types {left} and {right}")
+
+    def coerce(self, text: str, source: str, target: str, explicit: bool = False) -> str:
+        """把 source 类型的表达式转换成 target 类型（隐式只允许拓宽）"""
+        if source == target or target in (None, INT_LITERAL):
+            return text
+        if source == INT_LITERAL:
+            if target == REAL:
+                return f"{int(text)}.0"
+            if word_type(target):
+                return word_literal(int(text), target)
+            raise SmvTranslationError(f"integer constant {text} used as {target}")
+        if target == REAL and word_type(source):
+            return f"toint({text})"
+        source_word, target_word = word_type(source), word_type(target)
+        if source_word and target_word:
+            if target_word[1] < source_word[1] and not explicit:
+                raise SmvTranslationError(f"implicit narrowing from {source} to {target}")
+            if source_word[0] != target_word[0]:
+                text = f"{'signed' if target_word[0] else 'unsigned'}({text})"
+            return f"resize({text}, {target_word[1]})" if source_word[1] != target_word[1] else text
+        if source == BOOLEAN and target_word and explicit:
+            word = f"extend(word1({text}), {target_word[1] - 1})"
+            return f"signed({word})" if target_word[0] else word
+        if word_type(source) and target == BOOLEAN and explicit:
+            return f"({text} != {word_literal(0, source)})"
+        raise SmvTranslationError(f"cannot convert {source} to {target}")
+
+
+def _cast_integer(integer_expression: str, target: str) -> str:
+    signed, width = word_type(target)
+    return f"{'signed' if signed else 'unsigned'} word[{width}]({integer_expression})"
+
+
+def _fold(op, left, right):
+    if op == '+':
+        return left + right
+    if op == '-':
+        return left - right
+    if op == '*':
+        return left * right
+    if right == 0:
+        raise SmvTranslationError("division by zero")
+    if op == '/':
+        return int(left / right)
+    return left - right * int(left / right)
+
+
+class _Translator:
+    """Symbolic execution of one cycle of the POU body."""
+
+    def __init__(self, unit, pou, cycle_time_ms):
+        self.unit = unit
+        self.pou = pou
+        self.cycle_time_ms = cycle_time_ms
+        self.program = SmvProgram(text="", pou_name=pou.name, var_types={}, names={})
+        self.enum_types = {}        # lower-case type name -> [values]
+        self.inputs = []            # smv names
+        self.state = []             # smv names, in declaration order
+        self.initial = {}           # smv name -> init expression
+        self.constants = {}         # smv name -> value expression (VAR CONSTANT, VAR_TEMP start value)
+        self.read_only = set()
+        self.fb_instances = {}      # lower-case instance name -> (fb type, {param: value})
+        self.defines = []           # (name, expression)
+        self.ranges = {}            # lower-case ST name -> Interval of a narrowed state variable
+        self._define_counter = 0
+
+    # --- declarations ---
+
+    def declare(self):
+        for type_decl in self.unit.types:
+            if isinstance(type_decl.type, EnumType):
+                values = [value for value, _ in type_decl.type.values]
+                self.enum_types[type_decl.name.lower()] = values
+                for value in values:
+                    self.program.enum_values[value.lower()] = type_decl.name.lower()
+
+        # a PROGRAM has no VAR_INPUT section: variables its body never writes are driven by the environment
+        self.environment = set()
+        if self.pou.kind == 'PROGRAM':
+            written = {path.split('.')[0] for path in _written_paths(self.pou.body)}
+            self.environment = {name.lower() for decl in self.pou.declarations() for name in decl.names
+                                if decl.section == 'VAR' and decl.init is None and name.lower() not in written}
+        for decl in self.pou.declarations():
+            if decl.address:
+                raise SmvTranslationError("located variables are not supported")
+            for st_name in decl.names:
+                self.declare_variable(st_name, decl)
+
+    def smv_type(self, type_ref) -> str:
+        if isinstance(type_ref, EnumType):
+            raise SmvTranslationError("anonymous enumerations are not supported")
+        if not isinstance(type_ref, NamedType) or type_ref.length is not None:
+            raise SmvTranslationError(f"unsupported type {type(type_ref).__name__}")
+        name = type_ref.name.upper()
+        if name in _ST_TYPES:
+            return _ST_TYPES[name]
+        if type_ref.name.lower() in self.enum_types:
+            return f"enum:{type_ref.name.lower()}"
+        raise SmvTranslationError(f"unsupported type {type_ref.name}")
+
+    def declare_variable(self, st_name, decl):
+        if isinstance(decl.type, NamedType) and decl.type.name.upper() in _FB_MEMBERS:
+            self.declare_fb_instance(st_name, decl.type.name.upper())
+            return
+        smv_type = self.smv_type(decl.type)
+        smv_name = smv_identifier(st_name)
+        self.program.names[st_name.lower()] = smv_name
+        self.program.var_types[smv_name] = smv_type
+        renderer = _Renderer(self.program, {})
+        if decl.init is not None:
+            init, init_type = renderer.expr(decl.init, smv_type)
+            init = renderer.coerce(init, init_type, smv_type)
+        else:
+            init = self.default_value(smv_type)
+        if decl.constant:
+            self.constants[smv_name] = init
+            self.read_only.add(smv_name)
+            return
+        if decl.section == 'VAR_INPUT' or st_name.lower() in self.environment:
+            self.inputs.append(smv_name)
+            return
+        if decl.section == 'VAR_TEMP':
+            # temporaries do not survive the cycle: they start from their initial value every time
+            self.constants[smv_name] = init
+            return
+        self.state.append(smv_name)
+        self.initial[smv_name] = init
+
+    def declare_fb_instance(self, st_name, fb_type):
+        smv_base = smv_identifier(st_name)
+        self.fb_instances[st_name.lower()] = fb_type
+        for member, smv_type in _FB_MEMBERS[fb_type].items():
+            smv_name = f"{smv_base}_{member}"
+            self.program.names[f"{st_name.lower()}.{member.lower()}"] = smv_name
+            self.program.var_types[smv_name] = smv_type
+            self.state.append(smv_name)
+            self.initial[smv_name] = "FALSE"
+        if fb_type in TIMER_TYPES:
+            # elapsed time in cycles, bounded by the preset (declared once the preset is known)
+            self.program.names[f"{st_name.lower()}.__count"] = f"{smv_base}_count"
+
+    def default_value(self, smv_type):
+        if smv_type == BOOLEAN:
+            return "FALSE"
+        if smv_type == REAL:
+            return "0.0"
+        if smv_type.startswith('enum:'):
+            return smv_identifier(self.enum_types[smv_type[5:]][0])
+        return word_literal(0, smv_type)
+
+    # --- statements ---
+
+    def define(self, hint: str, expression: str) -> str:
+        """表达式存成 DEFINE（宏），后续引用它的名字，避免表达式在分支合并时重复展开"""
+        if re.fullmatch(r'[\w$#.-]+', expression):
+            return expression
+        self._define_counter += 1
+        name = f"__{hint}_{self._define_counter}"
+        self.defines.append((name, expression))
+        return name
+
+    def execute(self, statements, env: Dict[str, str]):
+        for statement in statements:
+            if isinstance(statement, Assignment):
+                self.assign(statement, env)
+            elif isinstance(statement, IfStatement):
+                self.execute_if(statement, env)
+            elif isinstance(statement, CaseStatement):
+                self.execute_case(statement, env)
+            elif isinstance(statement, ForStatement):
+                self.execute_for(statement, env)
+            elif isinstance(statement, CallStatement):
+                self.call_fb(statement.call, env)
+            else:
+                raise SmvTranslationError(f"unsupported statement {type(statement).__name__}")
+
+    def assign(self, statement: Assignment, env):
+        renderer = _Renderer(self.program, env)
+        path = renderer.path(statement.target)
+        smv_name = self.program.names.get(path)
+        if smv_name is None:
+            raise SmvTranslationError(f"assignment to unknown variable {path}")
+        if smv_name in self.read_only:
+            raise SmvTranslationError(f"assignment to constant {path}")
+        if smv_name in self.inputs:
+            raise SmvTranslationError(f"assignment to input {path}")
+        if '.' in path:
+            raise SmvTranslationError(f"assignment to FB member {path}")
+        target_type = self.program.var_types[smv_name]
+        value, value_type = renderer.expr(statement.value, target_type)
+        env[path] = self.define(smv_name, renderer.coerce(value, value_type, target_type))
+
+    def merge(self, branches: List[Tuple[Optional[str], Dict[str, str]]], env):
+        """分支各自执行后的环境合并成 case 表达式；condition 为 None 表示其余情况"""
+        changed = set()
+        for _, branch_env in branches:
+            changed |= {path for path, value in branch_env.items() if env.get(path) != value}
+        for path in sorted(changed):
+            original = env.get(path, self.program.names[path])
+            arms = [f"{condition} : {branch_env.get(path, original)};" for condition, branch_env in branches
+                    if condition is not None]
+            default = next((branch_env.get(path, original) for condition, branch_env in branches
+                            if condition is None), original)
+            env[path] = self.define(self.program.names[path], f"case {' '.join(arms)} TRUE : {default}; esac")
+
+    def execute_if(self, statement: IfStatement, env):
+        renderer = _Renderer(self.program, env)
+        branches = []
+        for condition, body in statement.branches:
+            text, smv_type = renderer.expr(condition, BOOLEAN)
+            if smv_type != BOOLEAN:
+                raise SmvTranslationError("IF condition is not boolean")
+            branch_env = dict(env)
+            self.execute(body, branch_env)
+            branches.append((self.define("cond", text), branch_env))
+        if statement.else_body:
+            branch_env = dict(env)
+            self.execute(statement.else_body, branch_env)
+            branches.append((None, branch_env))
+        self.merge(branches, env)
+
+    def execute_case(self, statement: CaseStatement, env):
+        renderer = _Renderer(self.program, env)
+        selector, selector_type = renderer.expr(statement.selector)
+        selector = self.define("sel", selector)
+        branches = []
+        for branch in statement.branches:
+            tests = []
+            for label in branch.labels:
+                if isinstance(label, CaseRange):
+                    low, low_type = renderer.expr(label.low, selector_type)
+                    high, high_type = renderer.expr(label.high, selector_type)
+                    tests.append(f"({selector} >= {renderer.coerce(low, low_type, selector_type)} & "
+                                 f"{selector} <= {renderer.coerce(high, high_type, selector_type)})")
+                else:
+                    value, value_type = renderer.expr(label, selector_type)
+                    tests.append(f"{selector} = {renderer.coerce(value, value_type, selector_type)}")
+            branch_env = dict(env)
+            self.execute(branch.body, branch_env)
+            branches.append((self.define("cond", " | ".join(tests)), branch_env))
+        if statement.else_body:
+            branch_env = dict(env)
+            self.execute(statement.else_body, branch_env)
+            branches.append((None, branch_env))
+        self.merge(branches, env)
+
+    def execute_for(self, statement: ForStatement, env):
+        bounds = []
+        for expr in (statement.start, statement.end, statement.step):
+            if expr is None:
+                bounds.append(1)
+                continue
+            text, smv_type = _Renderer(self.program, {}).expr(expr)
+            if smv_type != INT_LITERAL:
+                raise SmvTranslationError("FOR loops need constant bounds")
+            bounds.append(int(text))
+        start, end, step = bounds
+        if step == 0:
+            raise SmvTranslationError("FOR loop with step 0")
+        values = list(range(start, end + (1 if step > 0 else -1), step))
+        if len(values) > MAX_UNROLL:
+            raise SmvTranslationError(f"FOR loop with more than {MAX_UNROLL} iterations")
+        path = statement.variable.lower()
+        smv_name = self.program.names.get(path)
+        if smv_name is None:
+            raise SmvTranslationError(f"unknown loop variable {statement.variable}")
+        loop_type = self.program.var_types[smv_name]
+        for value in values:
+            env[path] = word_literal(value, loop_type)
+            self.execute(statement.body, env)
+        env[path] = word_literal(values[-1] + step if values else start, loop_type)
+
+    def call_fb(self, call: Call, env):
+        if not isinstance(call.func, Name) or call.func.name.lower() not in self.fb_instances:
+            raise SmvTranslationError("only TON / TOF / TP / R_TRIG / F_TRIG instances can be called")
+        instance = call.func.name.lower()
+        fb_type = self.fb_instances[instance]
+        renderer = _Renderer(self.program, env)
+        base = smv_identifier(call.func.name)
+        inputs, outputs = {}, []
+        for argument in call.args:
+            if argument.name is None:
+                raise SmvTranslationError(f"positional arguments in the call of {call.func.name}")
+            if argument.output:
+                outputs.append((argument.name.upper(), argument.value))
+            else:
+                inputs[argument.name.upper()] = argument.value
+
+        def current(member):
+            path = f"{instance}.{member.lower()}"
+            return env.get(path, self.program.names[path])
+
+        if fb_type in TRIGGER_TYPES:
+            clk = inputs.get('CLK')
+            if clk is None:
+                raise SmvTranslationError(f"{call.func.name} called without CLK")
+            clk_text, _ = renderer.expr(clk, BOOLEAN)
+            clk_text = self.define(f"{base}_CLK", clk_text)
+            memory = current('CLK')
+            edge = f"({clk_text} & !{memory})" if fb_type == 'R_TRIG' else f"(!{clk_text} & {memory})"
+            env[f"{instance}.q"] = self.define(f"{base}_Q", edge)
+            env[f"{instance}.clk"] = clk_text
+        else:
+            self.call_timer(instance, fb_type, base, inputs, renderer, env, current)
+
+        for member, target in outputs:
+            path = f"{instance}.{member.lower()}"
+            if path not in self.program.names:
+                raise SmvTranslationError(f"unsupported output {member} of {call.func.name}")
+            self.assign(Assignment(target, Member(Name(call.func.name), member)), env)
+
+    def call_timer(self, instance, fb_type, base, inputs, renderer, env, current):
+        if 'IN' not in inputs:
+            raise SmvTranslationError(f"timer {instance} called without IN")
+        count_name = self.program.names[f"{instance}.__count"]
+        known = self.program.var_types.get(count_name)
+        preset = inputs.get('PT')
+        if preset is None:
+            # PT keeps the value of the previous call
+            if known is None:
+                raise SmvTranslationError(f"timer {instance} called without PT")
+            preset_ms = int(known.split('..')[1]) * self.cycle_time_ms
+        elif isinstance(preset, (Name, Member)) and renderer.path(preset) in self.program.names:
+            preset_name = self.program.names[renderer.path(preset)]
+            preset = self.constants.get(preset_name)
+            match = re.fullmatch(r'(-?)0sd32_(\d+)', preset or "")
+            if not match:
+                raise SmvTranslationError(f"timer {instance} needs a constant preset time")
+            preset_ms = int(match.group(2)) * (-1 if match.group(1) else 1)
+        elif isinstance(preset, Literal) and preset.type_name == 'TIME':
+            preset_ms = preset.value
+        else:
+            raise SmvTranslationError(f"timer {instance} needs a constant preset time")
+        steps = max(0, math.ceil(preset_ms / self.cycle_time_ms))
+        if known is not None and known != f"0..{steps}":
+            raise SmvTranslationError(f"timer {instance} is called with different preset times")
+        if known is None:
+            self.program.var_types[count_name] = f"0..{steps}"
+            self.state.append(count_name)
+            self.initial[count_name] = "0"
+
+        in_text, _ = renderer.expr(inputs['IN'], BOOLEAN)
+        in_text = self.define(f"{base}_IN", in_text)
+        count, q, previous_in = current('__count'), current('Q'), current('IN')
+        step_count = f"(case {count} < {steps} : {count} + 1; TRUE : {steps}; esac)"
+        if fb_type == 'TON':
+            new_count = f"case {in_text} : {step_count}; TRUE : 0; esac"
+            new_q = lambda c: f"({in_text} & {c} >= {steps})"
+        elif fb_type == 'TOF':
+            # counts from the falling edge of IN; Q stays TRUE until the preset time has passed
+            new_count = f"case {in_text} : 0; {q} : {step_count}; TRUE : {count}; esac"
+            new_q = lambda c: f"({in_text} | ({q} & {c} < {steps}))"
+        else:
+            # TP: a rising edge of IN starts a pulse of the preset length that cannot be retriggered
+            start = f"({in_text} & !{previous_in} & !{q})"
+            new_count = f"case {start} : 0; {q} : {step_count}; {in_text} : {count}; TRUE : 0; esac"
+            new_q = lambda c: f"(({start} & {steps} > 0) | ({q} & {c} < {steps}))"
+        count_value = self.define(count_name, new_count)
+        env[f"{instance}.__count"] = count_value
+        env[f"{instance}.q"] = self.define(f"{base}_Q", new_q(count_value))
+        env[f"{instance}.in"] = in_text
+
+    # --- model ---
+
+    def render(self, env) -> str:
+        lines = [f"-- {self.pou.kind} {self.pou.name}, translated from ST (one transition per PLC cycle)",
+                 "MODULE main", "VAR", "\t__cycle_end : boolean;"]
+        for smv_name in self.inputs + self.state:
+            lines.append(f"\t{smv_name} : {self.declared_type(smv_name)};")
+        lines += ["DEFINE", "\tPLC_START := !__cycle_end;", "\tPLC_END := __cycle_end;"]
+        for smv_name, value in self.constants.items():
+            lines.append(f"\t{smv_name} := {value};")
+        for name, expression in self.defines:
+            lines.append(f"\t{name} := {expression};")
+        lines += ["ASSIGN", "\tinit(__cycle_end) := FALSE;", "\tnext(__cycle_end) := !__cycle_end;"]
+        names = {smv_name: path for path, smv_name in self.program.names.items()}
+        for smv_name in self.state:
+            lines.append(f"\tinit({smv_name}) := {self.initial[smv_name]};")
+            value = env.get(names[smv_name], smv_name)
+            if value != smv_name:
+                lines.append(f"\tnext({smv_name}) := case PLC_START : {value}; TRUE : {smv_name}; esac;")
+            else:
+                lines.append(f"\tnext({smv_name}) := {smv_name};")
+        constraints = self.range_constraints()
+        if constraints:
+            lines += ["-- value ranges inferred from the program"] + [f"INVAR {c};" for c in constraints]
+        if self.inputs:
+            # inputs are sampled at the start of the cycle and stay stable until its end
+            frozen = " & ".join(f"next({smv_name}) = {smv_name}" for smv_name in self.inputs)
+            lines += ["TRANS", f"\tPLC_START -> ({frozen});"]
+        return "\n".join(lines) + "\n"
+
+    def range_constraints(self) -> List[str]:
+        constraints = []
+        for name, interval in self.ranges.items():
+            smv_name = self.program.names.get(name)
+            if smv_name not in self.state:
+                continue
+            smv_type = self.program.var_types[smv_name]
+            if word_type(smv_type):
+                low, high = (word_literal(int(bound_text(value, upper, False)), smv_type)
+                             for value, upper in ((interval.low, False), (interval.high, True)))
+            elif smv_type == REAL:
+                low, high = bound_text(interval.low, False, True), bound_text(interval.high, True, True)
+            else:
+                continue
+            parts = []
+            if math.isfinite(interval.low):
+                parts.append(f"{smv_name} >= {low}")
+            if math.isfinite(interval.high):
+                parts.append(f"{smv_name} <= {high}")
+            if parts:
+                constraints.append(" & ".join(parts))
+        return constraints
+
+    def declared_type(self, smv_name):
+        smv_type = self.program.var_types[smv_name]
+        if smv_type.startswith('enum:'):
+            return "{" + ", ".join(smv_identifier(value) for value in self.enum_types[smv_type[5:]]) + "}"
+        return smv_type
+
+
+def _written_paths(statements):
+    """lower-case access paths assigned anywhere in the statements (also through `=>` outputs)"""
+    paths = set()
+    for statement in statements:
+        for node in walk(statement):
+            targets = []
+            if isinstance(node, Assignment):
+                targets.append(node.target)
+            elif isinstance(node, Call):
+                targets += [argument.value for argument in node.args if argument.output]
+            for target in targets:
+                try:
+                    paths.add(access_path(target))
+                except SmvTranslationError:
+                    pass
+    return paths
+
+
+def _find_pou(unit, entry_point: str = None):
+    if entry_point:
+        pou = unit.find_pou(entry_point)
+        if pou is None:
+            raise SmvTranslationError(f"POU {entry_point} not found")
+        return pou
+    candidates = [pou for pou in unit.pous if pou.kind in ('PROGRAM', 'FUNCTION_BLOCK')]
+    if not candidates:
+        raise SmvTranslationError("no PROGRAM or FUNCTION_BLOCK to translate")
+    programs = [pou for pou in candidates if pou.kind == 'PROGRAM']
+    return (programs or candidates)[-1]
+
+
+def translate_st(source: str, entry_point: str = None, cycle_time_ms: int = None,
+                 range_hints: Iterable[str] = ()) -> SmvProgram:
+    """
+    ST 源码 -> nuXmv 模型（PLC_START / PLC_END 周期编码）
+    range_hints: 属性表达式，其中的常量作为取值范围推断的加宽阈值
+
+    Raises:
+        SmvTranslationError: 语法错误或超出支持范围的结构（调用方可回退到 LLM 翻译）
+    """
+    try:
+        unit = parse_st_cached(source)
+    except STSyntaxError as e:
+        raise SmvTranslationError(f"cannot parse ST: {e}")
+    pou = _find_pou(unit, entry_point)
+    translator = _Translator(unit, pou, cycle_time_ms or CYCLE_TIME_MS)
+    translator.declare()
+    if RANGE_NARROWING:
+        translator.ranges = pou_ranges(unit, pou, property_constants(range_hints))
+    env = {}
+    translator.execute(pou.body, env)
+    program = translator.program
+    program.text = translator.render(env)
+    program.infinite = any(smv_type == REAL for smv_type in program.var_types.values())
+    return program
+
+
+if __name__ == "__main__":
+    program = translate_st("""
+FUNCTION_BLOCK Pump
+VAR_INPUT
+    start, stop : BOOL;
+    level : INT;
+END_VAR
+VAR_OUTPUT
+    running : BOOL;
+    alarm : BOOL;
+END_VAR
+VAR
+    delay : TON;
+    mode : INT := 0;
+END_VAR
+    IF stop THEN
+        running := FALSE;
+    ELSIF start AND level > 10 THEN
+        running := TRUE;
+    END_IF;
+    delay(IN := running AND level < 20, PT := T#300ms);
+    alarm := delay.Q;
+    CASE mode OF
+        0: IF running THEN mode := 1; END_IF;
+        1: mode := mode + 1;
+    ELSE
+        mode := 0;
+    END_CASE;
+END_FUNCTION_BLOCK
+""")
+    print(program.text)
+    print(program.translate_expression("NOT instance.alarm OR instance.running"))
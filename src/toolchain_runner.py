@@ -0,0 +1,241 @@
+## Shared runner for the external toolchain (plc, iec2iec, plcverif-cli, nuXmv, cbmc, docker).
+## Every invocation runs in its own process group with per-tool wall / CPU timeouts and a memory
+## rlimit; on timeout the whole group is killed (plcverif-cli spawns the model checkers as children).
+## Wall time, CPU time and peak RSS of each run are recorded on the returned ToolRun so that budgets
+## can be tuned from data.
+import sys
+import os
+import signal
+import resource
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Dict
+# Resolve the parent directory as an absolute path
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+
+import config
+
+# seconds / MiB; None disables the limit. Override per tool with config.toolchain_limits, e.g.
+# toolchain_limits = {"cbmc": {"wall": 60, "memory_mb": 8192}}
+DEFAULT_TOOL_LIMITS = {
+    'plc': {'wall': 60, 'cpu': 60, 'memory_mb': 2048},
+    'iec2iec': {'wall': 30, 'cpu': 30, 'memory_mb': 1024},
+    # the JVM reserves far more address space than it uses, so no RLIMIT_AS for plcverif-cli
+    'plcverif-cli': {'wall': 300, 'cpu': None, 'memory_mb': None},
+    'nuXmv': {'wall': 60, 'cpu': 60, 'memory_mb': 4096},
+    'cbmc': {'wall': 30, 'cpu': 30, 'memory_mb': 4096},
+    'docker': {'wall': 120, 'cpu': None, 'memory_mb': None},
+}
+FALLBACK_LIMITS = {'wall': 120, 'cpu': None, 'memory_mb': None}
+RSS_SAMPLE_INTERVAL = 0.05   # seconds
+
+
+def tool_limits(tool: str) -> Dict:
+    """默认限制与 config.toolchain_limits 合并后的结果"""
+    limits = dict(DEFAULT_TOOL_LIMITS.get(tool, FALLBACK_LIMITS))
+    limits.update(getattr(config, 'toolchain_limits', {}).get(tool, {}))
+    return limits
+
+
+@dataclass
+class ToolRun:
+    """One external tool invocation and its resource usage."""
+    tool: str
+    command: List[str]
+    returncode: Optional[int]
+    stdout: str = ""
+    stderr: str = ""
+    wall_time: float = 0.0          # seconds
+    cpu_time: float = 0.0           # user + system seconds of the tool process (and children it waited for)
+    peak_rss_kb: int = 0            # high-water mark of the tool process itself (VmHWM)
+    timed_out: bool = False
+    killed_reason: str = ""         # wall_timeout / cpu_limit / cancelled
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and not self.timed_out
+
+    def metrics(self) -> Dict:
+        return {
+            'tool': self.tool,
+            'wall_time': round(self.wall_time, 4),
+            'cpu_time': round(self.cpu_time, 4),
+            'peak_rss_kb': self.peak_rss_kb,
+            'returncode': self.returncode,
+            'timed_out': self.timed_out,
+            'killed_reason': self.killed_reason,
+        }
+
+
+class ToolOutput(str):
+    """Tool output text (a plain str for existing callers) carrying the ToolRun records behind it."""
+
+    def __new__(cls, text="", runs=None):
+        obj = super().__new__(cls, text)
+        obj.runs = list(runs or [])
+        return obj
+
+
+def summarize_runs(runs: List[ToolRun]) -> Dict:
+    """多次调用的资源汇总（时间累加，内存取峰值）"""
+    return {
+        'runs': [run.tool for run in runs],
+        'wall_time': round(sum(run.wall_time for run in runs), 4),
+        'cpu_time': round(sum(run.cpu_time for run in runs), 4),
+        'peak_rss_kb': max((run.peak_rss_kb for run in runs), default=0),
+        'timed_out': any(run.timed_out for run in runs),
+    }
+
+
+def limit_resources(pid, cpu_seconds, memory_mb):
+    """
+    Apply rlimits to the freshly started process. Done with prlimit() from the parent instead of a
+    preexec_fn: a preexec_fn forces fork() instead of vfork(), and the forked copy of this Python
+    process would then be counted in the tool's peak RSS.
+    """
+    try:
+        if cpu_seconds:
+            cpu_seconds_int = int(cpu_seconds + 0.999)
+            resource.prlimit(pid, resource.RLIMIT_CPU, (cpu_seconds_int, cpu_seconds_int + 5))
+        if memory_mb:
+            memory_bytes = int(memory_mb) * 1024 * 1024
+            resource.prlimit(pid, resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    except (ProcessLookupError, PermissionError, ValueError, OSError):
+        pass    # the process already exited, or the limit is above the hard limit of this process
+
+
+def _read_hwm_kb(pid) -> int:
+    """VmHWM of a running process in KiB, 0 when unavailable (process gone, no /proc)."""
+    try:
+        with open(f"/proc/{pid}/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def _kill_group(pid):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def run_tool(tool: str, cmd: List[str], cwd: str = None, timeout: float = None, cpu_time: float = None,
+             memory_mb: int = None, merge_stderr: bool = False, env: Dict = None,
+             cancel_event: threading.Event = None) -> ToolRun:
+    """
+    运行外部工具
+
+    Args:
+        tool: 工具名（决定默认限制，见 DEFAULT_TOOL_LIMITS）
+        cmd: 命令参数列表
+        cwd: 工作目录
+        timeout / cpu_time / memory_mb: 覆盖该工具的墙钟时间、CPU 时间（秒）和内存（MiB）限制
+        merge_stderr: stderr 合并到 stdout（等价于 2>&1）
+        cancel_event: 置位后杀死整个进程组（killed_reason='cancelled'），用于后端竞速时终止落败的一方
+
+    Returns:
+        ToolRun: 超时不抛异常，timed_out=True 且 returncode 为被杀死时的值
+
+    Raises:
+        OSError: 工具不存在或无法启动
+    """
+    limits = tool_limits(tool)
+    wall_limit = timeout if timeout is not None else limits.get('wall')
+    cpu_limit = cpu_time if cpu_time is not None else limits.get('cpu')
+    memory_limit = memory_mb if memory_mb is not None else limits.get('memory_mb')
+
+    start_time = time.monotonic()
+    process = subprocess.Popen(
+        cmd,
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT if merge_stderr else subprocess.PIPE,
+        text=True,
+        errors='replace',
+        start_new_session=True,
+    )
+    limit_resources(process.pid, cpu_limit, memory_limit)
+
+    # read both pipes on helper threads so that the main thread can reap the child with wait4 (rusage)
+    chunks = {'stdout': [], 'stderr': []}
+    readers = []
+    for name in ('stdout', 'stderr'):
+        stream = getattr(process, name)
+        if stream is not None:
+            reader = threading.Thread(target=lambda s=stream, n=name: chunks[n].append(s.read()), daemon=True)
+            reader.start()
+            readers.append(reader)
+
+    # ru_maxrss of the reaped child also covers the forked copy of this process before exec(), so the
+    # peak RSS is sampled from /proc (VmHWM is monotonic, the last sample is close to the real peak);
+    # the monitor also enforces the wall timeout by killing the whole process group
+    killed = {'reason': ''}
+    peak = {'rss_kb': 0}
+    finished = threading.Event()
+
+    def monitor():
+        deadline = start_time + wall_limit if wall_limit else None
+        while not finished.wait(RSS_SAMPLE_INTERVAL):
+            peak['rss_kb'] = max(peak['rss_kb'], _read_hwm_kb(process.pid))
+            if deadline is not None and time.monotonic() >= deadline:
+                killed['reason'] = 'wall_timeout'
+                _kill_group(process.pid)
+                return
+            if cancel_event is not None and cancel_event.is_set():
+                killed['reason'] = 'cancelled'
+                _kill_group(process.pid)
+                return
+
+    peak['rss_kb'] = _read_hwm_kb(process.pid)
+    monitor_thread = threading.Thread(target=monitor, daemon=True)
+    monitor_thread.start()
+    try:
+        _, status, rusage = os.wait4(process.pid, 0)
+    finally:
+        finished.set()
+        monitor_thread.join()
+    wall_time = time.monotonic() - start_time
+    returncode = os.waitstatus_to_exitcode(status)
+    process.returncode = returncode
+    # grandchildren may still hold the pipes open after a kill
+    if killed['reason']:
+        _kill_group(process.pid)
+    for reader in readers:
+        reader.join(timeout=5)
+    for stream in (process.stdout, process.stderr):
+        if stream is not None:
+            stream.close()
+
+    if not killed['reason'] and returncode == -signal.SIGXCPU:
+        killed['reason'] = 'cpu_limit'
+    run = ToolRun(
+        tool=tool,
+        command=list(cmd),
+        returncode=returncode,
+        stdout="".join(chunks['stdout']),
+        stderr="".join(chunks['stderr']),
+        wall_time=wall_time,
+        cpu_time=rusage.ru_utime + rusage.ru_stime,
+        peak_rss_kb=peak['rss_kb'] or rusage.ru_maxrss,
+        timed_out=bool(killed['reason']),
+        killed_reason=killed['reason'],
+    )
+    if run.timed_out:
+        print(f"   ⏱️  {tool} killed ({run.killed_reason}) after {wall_time:.1f}s")
+    return run
+
+
+if __name__ == "__main__":
+    run = run_tool('demo', [sys.executable, '-c', 'print(sum(range(10**6)))'])
+    print(run.stdout.strip(), run.metrics())
+    run = run_tool('demo', ['sh', '-c', 'sleep 5 & sleep 5; echo never'], timeout=0.5)
+    print(run.metrics())
@@ -222,15 +222,45 @@ def parse_plc_file(file_dir):
 # print(parse_plc_file("/home/lzh/work/Agents4PLC-release/benchmark/medium.json"))
 
 ### automatically turn json-format data into ltl & ctl sentences
-def generate_smv_compatible_ltl_ctl_model(property_data):
+# kind of spec each pattern translates to, used to pick the nuXmv engine (see src/nuXmv.py ENGINE_PORTFOLIO):
+# invar -> INVARSPEC (IC3 / BMC induction / BDD), ltl -> LTLSPEC (BMC / BDD), ctl -> SPEC (BDD)
+PATTERN_SPEC_KINDS = {
+    "pattern-implication": "invar",
+    "pattern-invariant": "invar",
+    "pattern-forbidden": "invar",
+    "pattern-statechange-duringcycle": "ctl",
+    "pattern-statechange-betweencycles": "ltl",
+    "pattern-reachability": "ctl",
+    "pattern-repeatability": "ctl",
+    "pattern-leadsto": "ctl",
+    "pattern-leadsto-trigger": "ctl",
+    "pattern-leadsto-earlier": "ctl",
+    "pattern-timed-trigger": "ctl",
+}
+
+# state formulas of the invariant patterns (the body of their AG(...) CTL templates)
+INVARIANT_PATTERN_TEMPLATES = {
+    "pattern-implication": "(PLC_END & ({param1})) -> ({param2})",
+    "pattern-invariant": "PLC_END -> ({param1})",
+    "pattern-forbidden": "PLC_END -> !({param1})",
+}
+
+
+def generate_smv_compatible_ltl_ctl_model(property_data, with_kind=False, param_converter=None):
     """
     Generates SMV-compatible LTL/CTL model based on the provided job request pattern and pattern ID.
 
     Args:
         property_data (dict): A dictionary containing the property details, including job_req and pattern_id. (See properties in benchmark)
+        with_kind (bool): Also return the spec kind ('invar' / 'ltl' / 'ctl'); invariant patterns are then
+            returned as the state formula of an INVARSPEC instead of an AG(...) CTL formula.
+        param_converter (callable): Translates one pattern parameter (an ST expression) into nuXmv syntax,
+            e.g. SmvProgram.translate_expression of src/st_to_smv.py; by default "instance." is stripped and
+            the operators are replaced textually.
 
     Returns:
         str: The generated SMV-compatible LTL/CTL model or an empty string if job_req is not 'pattern' or required fields are missing.
+        (str, str): (spec, kind) when with_kind is set; kind is None when no spec was generated.
     """
     def convert_pattern_params(pattern_params):
         """
@@ -315,7 +345,7 @@ def generate_smv_compatible_ltl_ctl_model(property_data):
         "pattern-invariant": "AG(PLC_END -> ({param1}))",
         "pattern-forbidden": "AG(PLC_END -> !({param1}))",
         "pattern-statechange-duringcycle": "AG((PLC_START & ({param1})) -> A[!PLC_END U (PLC_END & ({param2}))])",
-        "pattern-statechange-betweencycles": "G((PLC_END & ({param1}) & X[!PLC_END U (PLC_END & ({param2}))]) -> X[!PLC_END U (PLC_END & ({param3}))])",
+        "pattern-statechange-betweencycles": "G((PLC_END & ({param1}) & X(!PLC_END U (PLC_END & ({param2})))) -> X(!PLC_END U (PLC_END & ({param3}))))",
         "pattern-reachability": "EF(PLC_END & ({param1}))",
         "pattern-repeatability": "AG(EF(PLC_END & ({param1})))",
         "pattern-leadsto": "!(E[({param1}) U (PLC_END & !({param2}))])",
@@ -332,18 +362,26 @@ def generate_smv_compatible_ltl_ctl_model(property_data):
     # Check if job_req is "pattern", if pattern_id exists in the template dictionary, and pattern_params is not empty
     if job_req == "pattern" and pattern_id in pattern_templates and pattern_params:
         # Convert pattern_params to named parameters and format expressions
-        converted_params = convert_pattern_params(pattern_params)
+        if param_converter is not None:
+            starting_index = min(int(key) for key in pattern_params.keys())
+            converted_params = {f"param{int(key) - starting_index + 1}": param_converter(value)
+                                for key, value in pattern_params.items()}
+        else:
+            converted_params = convert_pattern_params(pattern_params)
 
         # Get the template for the given pattern_id
         template = pattern_templates[pattern_id]
+        kind = PATTERN_SPEC_KINDS.get(pattern_id, "ctl")
+        if with_kind and kind == "invar":
+            template = INVARIANT_PATTERN_TEMPLATES[pattern_id]
         
         # Fill the template with the corresponding pattern parameters
         filled_model = template.format(**converted_params)
         
-        return filled_model
+        return (filled_model, kind) if with_kind else filled_model
     else:
         # Return empty string if conditions are not met
-        return ""
+        return ("", None) if with_kind else ""
 
 def extract_section(text, start_tag, end_tag):
     """ Helper function to extract content between start and end tags, excluding the tags themselves.
@@ -0,0 +1,153 @@
+## Deadline-aware scheduling of plcverif verification over a batch of cases (benchmark runs).
+## The whole batch gets one wall-clock limit. Cases run cheapest first (estimated from the
+## historical cost of their properties, see plcverif.estimate_property_costs), and each case gets a
+## share of the remaining time proportional to its estimate: time a case does not use flows back
+## to the cases after it. A VerificationBudget is handed down to plcverif_validation, which runs
+## the cheap properties first and kills the tools of a case when its budget runs out; properties
+## left inconclusive because of the budget are recorded on the budget and reported per case.
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+# Resolve the parent directory as an absolute path
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+
+import config
+
+# a case never gets less than this many seconds while the batch still has time left
+MIN_CASE_BUDGET = getattr(config, 'plcverif_min_case_budget', 10)
+
+
+class VerificationBudget:
+    """
+    A wall-clock deadline for one verification case. The cancel events handed out by event() are set
+    when the deadline passes (or cancel() is called), which kills the tool process groups waiting on
+    them (src/toolchain_runner.run_tool).
+    """
+
+    def __init__(self, seconds: Optional[float], label: str = ""):
+        self.label = label
+        self.seconds = seconds
+        self.started = time.monotonic()
+        self.deadline = self.started + seconds if seconds is not None else None
+        self.inconclusive: List[int] = []          # property indices left unknown by the budget
+        self._events: List[threading.Event] = []
+        self._lock = threading.Lock()
+        self._expired = threading.Event()
+        self._timer = None
+        if seconds is not None and seconds <= 0:
+            self._expired.set()
+        elif seconds is not None:
+            self._timer = threading.Timer(max(0.0, seconds), self.cancel)
+            self._timer.daemon = True
+            self._timer.start()
+
+    @property
+    def expired(self) -> bool:
+        return self._expired.is_set()
+
+    def remaining(self) -> Optional[float]:
+        """剩余秒数（无限制时为 None）"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def used(self) -> float:
+        return time.monotonic() - self.started
+
+    def event(self) -> threading.Event:
+        """到期时会被置位的取消事件（每个并发的工具调用一个）"""
+        event = threading.Event()
+        with self._lock:
+            self._events.append(event)
+            if self._expired.is_set():
+                event.set()
+        return event
+
+    def cancel(self):
+        with self._lock:
+            self._expired.set()
+            for event in self._events:
+                event.set()
+
+    def record_inconclusive(self, index: int):
+        with self._lock:
+            self.inconclusive.append(index)
+
+    def close(self):
+        """结束计时（不置位事件）"""
+        if self._timer is not None:
+            self._timer.cancel()
+
+
+@dataclass
+class CaseReport:
+    name: str
+    estimated_cost: float
+    budget: Optional[float]
+    used: float = 0.0
+    skipped: bool = False               # the batch deadline had passed before the case started
+    inconclusive: List[int] = field(default_factory=list)
+
+
+class BatchScheduler:
+    """
+    Runs verification cases under one batch time limit (None: unlimited, cases only ordered).
+
+    verify(case, budget) does the work of one case and must hand the budget to
+    plcverif_validation; its return values are collected in the original case order.
+    """
+
+    def __init__(self, time_limit: Optional[float] = None, min_case_budget: float = MIN_CASE_BUDGET):
+        self.time_limit = time_limit
+        self.min_case_budget = min_case_budget
+        self.reports: List[CaseReport] = []
+        self.started = None
+
+    def run(self, cases: Sequence, verify: Callable, estimate: Callable[[object], float],
+            name: Callable[[object], str] = str) -> List:
+        self.started = time.monotonic()
+        deadline = self.started + self.time_limit if self.time_limit is not None else None
+        estimates = [max(estimate(case), 1.0) for case in cases]
+        # cheapest first: a pathological case at the end cannot starve the cheap ones
+        order = sorted(range(len(cases)), key=lambda index: (estimates[index], index))
+        results = [None] * len(cases)
+        reports = {}
+        for position, index in enumerate(order):
+            report = CaseReport(name(cases[index]), round(estimates[index], 2), None)
+            reports[index] = report
+            seconds = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    report.skipped = True
+                    report.budget = 0.0
+                    seconds = 0.0
+                else:
+                    # proportional share of what is left, unused time of earlier cases included
+                    pending = sum(estimates[later] for later in order[position:])
+                    seconds = min(remaining, max(self.min_case_budget, remaining * estimates[index] / pending))
+                    report.budget = round(seconds, 2)
+            budget = VerificationBudget(seconds, label=report.name)
+            try:
+                results[index] = verify(cases[index], budget)
+            finally:
+                budget.close()
+                report.used = round(budget.used(), 2)
+                report.inconclusive = sorted(budget.inconclusive)
+        self.reports = [reports[index] for index in range(len(cases))]
+        return results
+
+    def summary(self) -> Dict:
+        """批次报告：时间限制、实际用时、每个 case 的预算和因预算耗尽而无结论的性质"""
+        elapsed = time.monotonic() - self.started if self.started is not None else 0.0
+        return {
+            "time_limit": self.time_limit,
+            "elapsed": round(elapsed, 2),
+            "budget_exhausted_properties": sum(len(report.inconclusive) for report in self.reports),
+            "skipped_cases": [report.name for report in self.reports if report.skipped],
+            "cases": [report.__dict__ for report in self.reports],
+        }
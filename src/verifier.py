@@ -9,10 +9,12 @@ parent_dir = Path(__file__).resolve().parent.parent
 sys.path.append(str(parent_dir))
 
 import os
-import tempfile
+import config
 from typing import Optional, List, Dict, Tuple
-from dataclasses import dataclass
-from src.compiler import rusty_compiler, matiec_compiler
+from dataclasses import dataclass, field
+from src.compiler import compile_st_file, Diagnostic
+from src.st_precheck import precheck_st_code
+from src.workspace import get_workspace_manager
 from src.plcverif import plcverif_validation
 
 
@@ -22,6 +24,8 @@ class CompileResult:
     success: bool
     error_message: str = ""
     compiler_used: str = ""
+    diagnostics: List[Diagnostic] = field(default_factory=list)  # 编译器输出解析得到的结构化诊断
+    metrics: Dict = field(default_factory=dict)  # 编译器调用的耗时 / CPU / 峰值内存
 
     def __str__(self):
         if self.success:
@@ -73,6 +77,15 @@ class Verifier:
         if self.compiler_type not in ["rusty", "matiec"]:
             raise ValueError(f"Unsupported compiler: {compiler_type}. Use 'rusty' or 'matiec'.")
 
+        # 最近一次编译通过的代码所在的工作目录，属性验证要用到，下一次编译或验证结束时释放
+        self._workspace = None
+
+    def release_workspace(self):
+        """释放最近一次编译检查使用的工作目录（异步清理）"""
+        if self._workspace is not None:
+            self._workspace.release()
+            self._workspace = None
+
     def verify(self,
                st_code: str,
                properties: Optional[List[Dict]] = None,
@@ -95,6 +108,7 @@ class Verifier:
 
         # 如果编译失败，直接返回
         if not compile_result.success:
+            self.release_workspace()
             return VerifyResult(
                 compile_result=compile_result,
                 overall_success=False,
@@ -121,6 +135,7 @@ class Verifier:
             overall_success = compile_result.success
             summary = "Compilation passed. No property verification performed."
 
+        self.release_workspace()
         return VerifyResult(
             compile_result=compile_result,
             property_results=property_results,
@@ -141,13 +156,24 @@ class Verifier:
         """
         print(f"\n🔍 [Verifier] Starting compilation check...")
         print(f"   Compiler: {self.compiler_type}")
+        self.release_workspace()
+
+        # 进程内预检查：明显的语法/语义错误直接返回，不再调用外部编译器
+        if getattr(config, 'st_precheck_enabled', True):
+            precheck = precheck_st_code(st_code, compiler=self.compiler_type)
+            if not precheck.passed:
+                print(f"   ⚡ Precheck found {len(precheck.errors)} error(s), {self.compiler_type} compiler skipped")
+                return CompileResult(
+                    success=False,
+                    compiler_used="Precheck",
+                    error_message=precheck.output,
+                    diagnostics=precheck.diagnostics
+                )
 
-        # 保存代码到临时文件
+        # 保存代码到工作目录（tmpfs 上，用完后异步清理）
         if save_to_file:
-            # 创建临时文件
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.ST', delete=False) as f:
-                f.write(st_code)
-                temp_file = f.name
+            self._workspace = get_workspace_manager().acquire("compile")
+            temp_file = self._workspace.write("code.ST", st_code)
             print(f"   Temp file: {temp_file}")
             print(f"   Code size: {len(st_code)} bytes")
         else:
@@ -156,74 +182,37 @@ class Verifier:
             temp_file = None
 
         try:
-            # 调用编译器
+            # 调用编译器（单次调用，同时得到结果和诊断信息）
             print(f"   Invoking {self.compiler_type} compiler...")
-            if self.compiler_type == "rusty":
-                success = rusty_compiler(temp_file)
-                compiler_name = "Rusty"
-            else:  # matiec
-                success = matiec_compiler(temp_file)
-                compiler_name = "Matiec"
-
-            if success:
+            check = compile_st_file(temp_file, self.compiler_type)
+            compiler_name = "Rusty" if self.compiler_type == "rusty" else "Matiec"
+
+            if check.passed:
                 return CompileResult(
                     success=True,
                     compiler_used=temp_file,  # 保存文件路径以供后续验证使用
-                    error_message=""
+                    error_message="",
+                    diagnostics=check.diagnostics,
+                    metrics=check.metrics
                 )
             else:
-                # 尝试获取更详细的错误信息
-                error_msg = self._get_detailed_compile_error(temp_file, self.compiler_type)
+                self.release_workspace()
                 return CompileResult(
                     success=False,
                     compiler_used=compiler_name,
-                    error_message=error_msg or "Compilation failed. Check syntax."
+                    error_message=check.output or "Compilation failed. Check syntax.",
+                    diagnostics=check.diagnostics,
+                    metrics=check.metrics
                 )
 
         except Exception as e:
+            self.release_workspace()
             return CompileResult(
                 success=False,
                 compiler_used=self.compiler_type,
                 error_message=f"Compilation error: {str(e)}"
             )
 
-    def _get_detailed_compile_error(self, file_path: str, compiler_type: str) -> str:
-        """
-        获取详细的编译错误信息
-
-        Args:
-            file_path: ST文件路径
-            compiler_type: 编译器类型
-
-        Returns:
-            错误信息字符串
-        """
-        import subprocess
-
-        try:
-            if compiler_type == "rusty":
-                result = subprocess.run(
-                    f'plc --check {file_path}',
-                    shell=True,
-                    capture_output=True,
-                    text=True
-                )
-                return result.stderr + result.stdout
-            elif compiler_type == "matiec":
-                from config import MATIEC_PATH
-                result = subprocess.run(
-                    f'iec2iec -f -p "{file_path}"',
-                    cwd=MATIEC_PATH,
-                    shell=True,
-                    capture_output=True,
-                    text=True
-                )
-                return result.stderr + result.stdout
-        except Exception as e:
-            return f"Failed to get detailed error: {str(e)}"
-
-        return "Unknown compilation error"
-
     def property_check(self,
                        st_file_path: str,
                        properties: List[Dict],
@@ -239,9 +228,11 @@ class Verifier:
         Returns:
             验证结果列表
         """
+        workspace = None
         if not output_dir:
-            # 使用临时目录
-            output_dir = tempfile.mkdtemp(prefix="plcverif_")
+            # 使用临时工作目录，结果读完后即释放
+            workspace = get_workspace_manager().acquire("plcverif")
+            output_dir = workspace.path
 
         try:
             # 调用plcverif验证
@@ -253,6 +244,9 @@ class Verifier:
             return results
         except Exception as e:
             return [f"Property verification failed: {str(e)}"]
+        finally:
+            if workspace is not None:
+                workspace.release()
 
     def quick_compile_check(self, st_code: str) -> bool:
         """
@@ -265,6 +259,7 @@ class Verifier:
             编译是否成功
         """
         result = self.compile_check(st_code)
+        self.release_workspace()
         return result.success
 
 
@@ -0,0 +1,209 @@
+## Workspace manager for compiler / verifier artifacts.
+## Per-job directories are allocated under a tmpfs root (/dev/shm by default, config `workspace_root`),
+## emptied directories are recycled from a small pool, and deletion happens asynchronously on a
+## background thread so that callers never wait for rmtree. Artifacts are only kept on request
+## (Workspace(keep=True) or config `keep_artifacts`), e.g. for debugging.
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import queue
+import uuid
+import atexit
+from pathlib import Path
+# Resolve the parent directory as an absolute path
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+
+import config
+
+TMPFS_CANDIDATES = ("/dev/shm",)
+
+
+def _default_root():
+    """优先使用 tmpfs（/dev/shm），不可写时退回系统临时目录"""
+    for candidate in TMPFS_CANDIDATES:
+        if os.path.isdir(candidate) and os.access(candidate, os.W_OK):
+            return candidate
+    return tempfile.gettempdir()
+
+
+def _empty_directory(path):
+    for entry in os.scandir(path):
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path, ignore_errors=True)
+        else:
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+class Workspace:
+    """A directory for one job. Use as a context manager or call release() when done."""
+
+    def __init__(self, manager, path, keep=False):
+        self.manager = manager
+        self.path = path
+        self.keep = keep
+        self.released = False
+
+    def file(self, name):
+        """工作目录下某个文件的路径"""
+        return os.path.join(self.path, name)
+
+    def write(self, name, content):
+        """写入文件并返回其路径"""
+        file_path = self.file(name)
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return file_path
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.manager.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    def __repr__(self):
+        return f"Workspace({self.path!r}, keep={self.keep})"
+
+
+class WorkspaceManager:
+    """
+    Hands out per-job directories below one root directory owned by this process.
+
+    - acquire() reuses an emptied directory from the pool when one is available;
+    - release() queues the directory for the cleanup thread, which empties it and puts it back
+      into the pool (or deletes it once the pool is full); kept workspaces are left untouched;
+    - prepare_dir() replaces the `rmtree + makedirs` pattern for caller-chosen output directories:
+      the old directory is renamed out of the way and deleted in the background.
+    """
+
+    def __init__(self, root=None, pool_size=None, keep_artifacts=None):
+        self.root = root or getattr(config, 'workspace_root', None) or _default_root()
+        self.pool_size = pool_size if pool_size is not None else getattr(config, 'workspace_pool_size', 16)
+        self.keep_artifacts = keep_artifacts if keep_artifacts is not None \
+            else getattr(config, 'keep_artifacts', False)
+
+        os.makedirs(self.root, exist_ok=True)
+        self.base = tempfile.mkdtemp(prefix=f"agents4plc-{os.getpid()}-", dir=self.root)
+
+        self._free = []
+        self._free_lock = threading.Lock()
+        self._cleanup_queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._kept = []
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._cleanup_loop, name="workspace-cleanup", daemon=True)
+                self._worker.start()
+
+    def _cleanup_loop(self):
+        while True:
+            path, recycle = self._cleanup_queue.get()
+            try:
+                if path is None:
+                    return
+                if recycle and os.path.isdir(path):
+                    _empty_directory(path)
+                    with self._free_lock:
+                        if len(self._free) < self.pool_size:
+                            self._free.append(path)
+                            continue
+                shutil.rmtree(path, ignore_errors=True)
+            except OSError as e:
+                print(f"   ⚠️  Workspace cleanup failed for {path}: {e}")
+            finally:
+                self._cleanup_queue.task_done()
+
+    def acquire(self, prefix="job", keep=None) -> Workspace:
+        """分配一个空的工作目录"""
+        keep = self.keep_artifacts if keep is None else keep
+        path = None
+        if not keep:
+            with self._free_lock:
+                if self._free:
+                    path = self._free.pop()
+        if path is None:
+            path = tempfile.mkdtemp(prefix=f"{prefix}_", dir=self.base)
+        return Workspace(self, path, keep)
+
+    def release(self, workspace: Workspace):
+        if workspace.keep:
+            self._kept.append(workspace.path)
+            print(f"   📁 Artifacts kept in {workspace.path}")
+            return
+        self._ensure_worker()
+        self._cleanup_queue.put((workspace.path, True))
+
+    def prepare_dir(self, path):
+        """
+        Make `path` an empty directory without waiting for the old content to be deleted.
+        Any existing directory is renamed next to itself and removed by the cleanup thread.
+        """
+        if os.path.exists(path):
+            stale_path = f"{path.rstrip(os.sep)}.stale-{uuid.uuid4().hex[:8]}"
+            try:
+                os.rename(path, stale_path)
+                self._ensure_worker()
+                self._cleanup_queue.put((stale_path, False))
+            except OSError:
+                shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def wait(self):
+        """等待已排队的清理任务完成"""
+        if self._worker is not None:
+            self._cleanup_queue.join()
+
+    def shutdown(self):
+        """Finish pending cleanup and remove the root directory (kept workspaces survive)."""
+        if self._worker is not None and self._worker.is_alive():
+            self._cleanup_queue.put((None, False))
+            self._worker.join(timeout=30)
+        if self._kept:
+            for entry in os.scandir(self.base):
+                if entry.path not in self._kept:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+        else:
+            shutil.rmtree(self.base, ignore_errors=True)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_workspace_manager() -> WorkspaceManager:
+    """返回进程级共享的工作目录管理器"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = WorkspaceManager()
+            atexit.register(_manager.shutdown)
+        return _manager
+
+
+if __name__ == "__main__":
+    manager = get_workspace_manager()
+    print(f"Workspace root: {manager.base}")
+    with manager.acquire("compile") as workspace:
+        print(workspace.write("test.ST", "PROGRAM P\nEND_PROGRAM\n"))
+    manager.wait()
+    with manager.acquire("compile") as workspace:
+        print(f"Recycled: {workspace.path}, empty: {not os.listdir(workspace.path)}")
+    out_dir = manager.prepare_dir(os.path.join(manager.base, "output"))
+    open(os.path.join(out_dir, "a.txt"), "w").close()
+    manager.prepare_dir(out_dir)
+    manager.wait()
+    print(sorted(os.listdir(manager.base)))